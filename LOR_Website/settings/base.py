@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 
     "django_select2",
     "accounts.apps.AccountsConfig",
@@ -100,6 +101,23 @@ LOGGING = {
     },
 }
 
+# ─── QUERY PROFILER (characters.middleware.LogSlowQueriesMiddleware) ───────────
+# JSON lines go to the "perf.sql" logger. Budgets are per resolved view name;
+# "*" covers every view without its own entry. Leave a limit as None to skip it.
+QUERY_PROFILER = {
+    "PATH_PREFIXES": ("/characters/", "/campaigns/"),
+    "SLOW_REQUEST_MS": int(os.getenv("QUERY_PROFILER_SLOW_MS", "300")),
+    "TOP_SLOWEST": 15,
+    "N_PLUS_ONE_THRESHOLD": int(os.getenv("QUERY_PROFILER_N_PLUS_ONE", "5")),
+    "BUDGETS": {
+        "characters:character_detail": {"queries": 300, "ms": 1500},
+        "characters:character_tab":    {"queries": 60,  "ms": 500},
+        "characters:class_detail":     {"queries": 40,  "ms": 500},
+        "*":                           {"queries": 150, "ms": None},
+    },
+    # None = raise on a blown query budget under DEBUG / tests, header-only otherwise
+    "RAISE_ON_BUDGET": None,
+}
 
 # ─── MIDDLEWARE ─────────────────────────────────────────────────────────────────
 MIDDLEWARE = [
@@ -209,12 +227,13 @@ DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "LoR Builder <no-reply@lorb
 SITE_DOMAIN = os.getenv("SITE_DOMAIN", "www.lorbuilder.com")
 SITE_SCHEME = os.getenv("SITE_SCHEME", "https")
 # settings.py
-EMAIL_BACKEND = "accounts.email_backends.ResendEmailBackend"  # use Resend for Django mail
+EMAIL_BACKEND = "accounts.email_backends.OutboxEmailBackend"  # queue; drain_email_outbox sends via Resend
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL", "LoR Builder <no-reply@lorbuilder.com>")
 RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
 
 # Resend API key from env (unchanged style)
 RESEND_API_KEY = os.getenv("RESEND_API_KEY", "")
+RESEND_API_URL = os.getenv("RESEND_API_URL", "https://api.resend.com")
 from pathlib import Path
 MEDIA_ROOT = Path("/data/media")
 MEDIA_URL  = "/media/"
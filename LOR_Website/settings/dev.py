@@ -14,6 +14,9 @@ MIDDLEWARE += [
 
 # Templates in dev: show errors inline
 TEMPLATES[0]['OPTIONS']['debug'] = True
+
+# Query budgets fail loudly in dev (set QUERY_BUDGET_RAISE=0 to only log)
+QUERY_PROFILER = {**QUERY_PROFILER, "RAISE_ON_BUDGET": os.getenv("QUERY_BUDGET_RAISE", "1") == "1"}
 # after load_dotenv…
 NODE_BIN_PATH = os.environ.get("NODE_BIN_PATH", "node")
 NPM_BIN_PATH  = os.environ.get("NPM_BIN_PATH",  "npm")
\ No newline at end of file
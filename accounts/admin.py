@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserEmail, EmailVerification
+from .models import UserEmail, EmailVerification, EmailOutbox
 
 
 
@@ -11,3 +11,20 @@ class UserEmailAdmin(admin.ModelAdmin):
 class EmailVerificationAdmin(admin.ModelAdmin):
     list_display = ("user", "email", "purpose", "token", "created_at", "used_at")
     list_filter = ("purpose", "used_at")
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ("id", "subject", "status", "attempts", "next_attempt_at", "sent_at", "created_at")
+    list_filter = ("status",)
+    search_fields = ("subject", "provider_id", "last_error")
+    readonly_fields = ("provider_id", "created_at", "sent_at", "claimed_at", "last_error")
+    actions = ["retry_now"]
+
+    @admin.action(description="Retry now (re-queue selected)")
+    def retry_now(self, request, queryset):
+        from django.utils import timezone
+        n = (queryset.exclude(status=EmailOutbox.STATUS_SENT)
+                     .update(status=EmailOutbox.STATUS_PENDING, attempts=0,
+                             next_attempt_at=timezone.now(), claimed_at=None))
+        self.message_user(request, f"Re-queued {n} email(s).")
@@ -0,0 +1,48 @@
+# accounts/management/commands/drain_email_outbox.py
+
+import signal
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from accounts import outbox
+
+
+class Command(BaseCommand):
+    help = "Deliver queued EmailOutbox rows through Resend (batching, retries with backoff, dead-lettering)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Drain what is due now and exit instead of polling.")
+        parser.add_argument("--interval", type=float, default=5.0,
+                            help="Seconds to sleep between polls when the outbox is empty.")
+        parser.add_argument("--batch-size", type=int, default=outbox.BATCH_SIZE,
+                            help=f"Messages per provider call (max {outbox.BATCH_SIZE}).")
+        parser.add_argument("--api-url", default="",
+                            help="Provider base URL (default RESEND_API_URL), e.g. a local stub server.")
+
+    def handle(self, *args, **opts):
+        try:
+            client = outbox.ResendClient(base_url=opts["api_url"] or None)
+        except ImproperlyConfigured as e:
+            raise CommandError(str(e))
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+        try:
+            while not stopping:
+                close_old_connections()
+                t0 = time.perf_counter()
+                counts = outbox.drain(client, batch_size=opts["batch_size"])
+                if counts:
+                    summary = ", ".join(f"{n} {status}" for status, n in sorted(counts.items()))
+                    self.stdout.write(f"📨 {summary} in {time.perf_counter() - t0:.2f}s")
+                if opts["once"]:
+                    break
+                if not counts:
+                    time.sleep(opts["interval"])
+        finally:
+            client.close()
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_emailverification_useremail_delete_submission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_email', models.CharField(max_length=255)),
+                ('to', models.JSONField(default=list)),
+                ('cc', models.JSONField(blank=True, default=list)),
+                ('bcc', models.JSONField(blank=True, default=list)),
+                ('reply_to', models.JSONField(blank=True, default=list)),
+                ('subject', models.CharField(blank=True, max_length=998)),
+                ('text', models.TextField(blank=True)),
+                ('html', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('dead', 'Dead-lettered')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('provider_id', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at', 'id'], name='emailoutbox_due_idx')],
+            },
+        ),
+    ]
@@ -28,4 +28,49 @@ class EmailVerification(models.Model):
         self.used_at = timezone.now()
         self.save(update_fields=["used_at"])
     def __str__(self):
-        return f"{self.user} {self.purpose} → {self.email}"
\ No newline at end of file
+        return f"{self.user} {self.purpose} → {self.email}"
+
+class EmailOutbox(models.Model):
+    """
+    One outgoing email. Web requests only insert rows (accounts/outbox.py); the
+    drain_email_outbox worker sends them through the provider and records the
+    outcome, retrying with backoff until MAX_ATTEMPTS, then dead-lettering.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"
+    STATUS_SENT = "sent"
+    STATUS_DEAD = "dead"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_DEAD, "Dead-lettered"),
+    ]
+
+    from_email = models.CharField(max_length=255)
+    to         = models.JSONField(default=list)
+    cc         = models.JSONField(default=list, blank=True)
+    bcc        = models.JSONField(default=list, blank=True)
+    reply_to   = models.JSONField(default=list, blank=True)
+    subject    = models.CharField(max_length=998, blank=True)
+    text       = models.TextField(blank=True)
+    html       = models.TextField(blank=True)
+
+    status          = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts        = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_at      = models.DateTimeField(null=True, blank=True)
+    last_error      = models.TextField(blank=True)
+    provider_id     = models.CharField(max_length=100, blank=True)
+    created_at      = models.DateTimeField(auto_now_add=True)
+    sent_at         = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            # the worker's poll: due pending rows, oldest first
+            models.Index(fields=["status", "next_attempt_at", "id"], name="emailoutbox_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.status} → {', '.join(self.to or [])}: {self.subject}"
@@ -0,0 +1,304 @@
+# accounts/outbox.py
+"""
+Transactional email outbox.
+
+Web requests never talk to the email API. They insert an EmailOutbox row
+(enqueue / enqueue_message, or Django's send_mail through
+OutboxEmailBackend), which commits or rolls back with the rest of the
+request. The drain_email_outbox worker then:
+
+  - claims due rows with SELECT … FOR UPDATE SKIP LOCKED, so several workers
+    can drain concurrently, and a row left in "sending" by a crashed worker
+    is picked up again after CLAIM_LEASE;
+  - sends them through one pooled requests.Session, up to BATCH_SIZE per call
+    to Resend's batch endpoint. If a batch is rejected as a whole (say one bad
+    address), its rows are retried one by one so only the bad one is
+    dead-lettered;
+  - reschedules transient failures (network, 408/429/5xx) with exponential
+    backoff and jitter, honouring Retry-After. After MAX_ATTEMPTS, or on a
+    permanent 4xx, it marks the row dead with the last error kept for the
+    admin.
+
+Delivery is at-least-once. Every provider call carries an Idempotency-Key
+derived from the outbox row id(s), and the provider drops a repeat of a key it
+has already seen:
+
+  - a single message is sent as "outbox-<id>", so resending it alone (after
+    a crash between "provider accepted" and "row marked sent", or a timeout)
+    never delivers it twice;
+  - the batch endpoint takes one key per request, not one per message, so a
+    batch is keyed by its set of row ids. Only a retry of exactly the same set
+    is recognised. If a batch call fails ambiguously (timeout, 5xx) and its
+    rows come back in a different grouping (backoff is jittered per row, or
+    a lease lapsed), messages the provider did accept can go out again;
+  - a batch refused as a whole (4xx) sent nothing, so the one-by-one
+    fallback cannot duplicate it.
+
+Right before each call the worker renews its claim and drops rows whose lease
+lapsed to another worker, so the one-by-one fallback for a refused batch can
+run past CLAIM_LEASE without racing a reclaimer.
+
+RESEND_API_URL points the client at another host, e.g. a local stub server
+in tests.
+"""
+import hashlib
+import logging
+import random
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMultiAlternatives
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+API_URL       = getattr(settings, "RESEND_API_URL", "https://api.resend.com").rstrip("/")
+BATCH_SIZE    = 100                                       # Resend's per-call batch limit
+MAX_ATTEMPTS  = getattr(settings, "EMAIL_OUTBOX_MAX_ATTEMPTS", 8)
+BACKOFF_BASE  = getattr(settings, "EMAIL_OUTBOX_BACKOFF_BASE", 30)       # seconds; doubles per attempt
+BACKOFF_MAX   = getattr(settings, "EMAIL_OUTBOX_BACKOFF_MAX", 60 * 60)   # seconds
+CLAIM_LEASE   = timedelta(seconds=getattr(settings, "EMAIL_OUTBOX_CLAIM_LEASE", 5 * 60))
+TIMEOUT       = (5, 30)                                   # connect, read
+
+RETRYABLE_STATUS = {408, 409, 425, 429}
+
+
+# ── enqueue (web side) ────────────────────────────────────────────────────────
+def enqueue(*, to, subject, text="", html="", from_email=None, cc=(), bcc=(), reply_to=()) -> EmailOutbox:
+    return EmailOutbox.objects.create(
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to), cc=list(cc), bcc=list(bcc), reply_to=list(reply_to),
+        subject=subject or "", text=text or "", html=html or "",
+    )
+
+
+def message_row(msg) -> EmailOutbox:
+    """An unsaved row for a django.core.mail EmailMessage (its text/html alternative becomes the html body)."""
+    html = ""
+    if isinstance(msg, EmailMultiAlternatives):
+        html = next((alt for alt, mimetype in msg.alternatives if mimetype == "text/html"), "")
+    return EmailOutbox(
+        from_email=msg.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(msg.to or []), cc=list(msg.cc or []), bcc=list(msg.bcc or []), reply_to=list(msg.reply_to or []),
+        subject=msg.subject or "", text=msg.body or "", html=html or "",
+    )
+
+
+def enqueue_message(msg) -> EmailOutbox:
+    row = message_row(msg)
+    row.save()
+    return row
+
+
+def payload(row) -> dict:
+    """The Resend JSON body for one row."""
+    data = {"from": row.from_email, "to": list(row.to), "subject": row.subject, "text": row.text}
+    for key, value in (("cc", row.cc), ("bcc", row.bcc), ("reply_to", row.reply_to)):
+        if value:
+            data[key] = list(value)
+    if row.html:
+        data["html"] = row.html
+    return data
+
+
+# ── provider client ───────────────────────────────────────────────────────────
+class ProviderError(Exception):
+    def __init__(self, message, *, status=None, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class ResendClient:
+    """Resend's /emails and /emails/batch over one keep-alive session."""
+
+    def __init__(self, api_key=None, base_url=None, session=None):
+        api_key = api_key or getattr(settings, "RESEND_API_KEY", "")
+        if not api_key:
+            raise ImproperlyConfigured("RESEND_API_KEY not set")
+        self.base_url = (base_url or API_URL).rstrip("/")
+        self.session = session or requests.Session()
+        self.session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        self.session.headers.update({
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+        })
+
+    def close(self):
+        self.session.close()
+
+    def _post(self, path, body, idempotency_key=None):
+        headers = {"Idempotency-Key": idempotency_key} if idempotency_key else None
+        try:
+            r = self.session.post(f"{self.base_url}{path}", json=body, timeout=TIMEOUT, headers=headers)
+        except requests.RequestException as e:
+            raise ProviderError(f"Network error: {e!s}") from e
+
+        try:
+            data = r.json()
+        except ValueError:
+            data = {"message": r.text}
+        if r.status_code // 100 == 2:
+            return data
+
+        message = (data.get("message") or data.get("error") or r.text or "") if isinstance(data, dict) else r.text
+        retry_after = r.headers.get("Retry-After")
+        raise ProviderError(
+            f"Resend API error {r.status_code}: {message}",
+            status=r.status_code,
+            retryable=r.status_code in RETRYABLE_STATUS or r.status_code >= 500,
+            retry_after=int(retry_after) if (retry_after or "").isdigit() else None,
+        )
+
+    def send(self, body, *, idempotency_key=None) -> str:
+        return (self._post("/emails", body, idempotency_key) or {}).get("id", "")
+
+    def send_batch(self, bodies, *, idempotency_key) -> list:
+        data = self._post("/emails/batch", list(bodies), idempotency_key) or {}
+        return [item.get("id", "") for item in data.get("data") or []]
+
+
+# ── worker side ───────────────────────────────────────────────────────────────
+def claim(limit=BATCH_SIZE) -> list:
+    """Lock up to `limit` due rows (pending, or stuck in "sending" past the lease) and mark them sending."""
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(Q(status=EmailOutbox.STATUS_PENDING, next_attempt_at__lte=now)
+                    | Q(status=EmailOutbox.STATUS_SENDING, claimed_at__lt=now - CLAIM_LEASE))
+            .order_by("next_attempt_at", "id")[:limit]
+        )
+        for row in rows:
+            row.status = EmailOutbox.STATUS_SENDING
+            row.claimed_at = now
+        EmailOutbox.objects.bulk_update(rows, ["status", "claimed_at"])
+    return rows
+
+
+def renew(rows) -> list:
+    """Push the lease on claimed `rows` forward; returns the ones still held (a lapsed one may have been reclaimed)."""
+    if not rows:
+        return []
+    now = timezone.now()
+    mine = reduce(or_, (Q(pk=r.pk, claimed_at=r.claimed_at) for r in rows))
+    with transaction.atomic():
+        held = set(
+            EmailOutbox.objects.select_for_update()
+            .filter(mine, status=EmailOutbox.STATUS_SENDING)
+            .values_list("pk", flat=True)
+        )
+        EmailOutbox.objects.filter(pk__in=held).update(claimed_at=now)
+    for row in rows:
+        if row.pk in held:
+            row.claimed_at = now
+        else:
+            logger.warning("email outbox #%s: claim lapsed and was taken by another worker; skipping", row.pk)
+    return [r for r in rows if r.pk in held]
+
+
+def backoff(attempts, retry_after=None) -> float:
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, attempts - 1))
+    delay *= random.uniform(0.8, 1.2)
+    return max(delay, retry_after or 0)
+
+
+def _key(rows) -> str:
+    # the batch key only matches a retry of the very same rows; see the module docstring
+    if len(rows) == 1:
+        return f"outbox-{rows[0].pk}"
+    ids = ",".join(str(r.pk) for r in sorted(rows, key=lambda r: r.pk))
+    return "outbox-batch-" + hashlib.sha1(ids.encode()).hexdigest()
+
+
+def _sent(row, provider_id, now):
+    row.status = EmailOutbox.STATUS_SENT
+    row.attempts += 1
+    row.provider_id = provider_id or ""
+    row.sent_at = now
+    row.claimed_at = None
+    row.last_error = ""
+
+
+def _failed(row, err, now):
+    row.attempts += 1
+    row.claimed_at = None
+    row.last_error = str(err)[:2000]
+    if not err.retryable or row.attempts >= MAX_ATTEMPTS:
+        row.status = EmailOutbox.STATUS_DEAD
+        logger.error("email outbox #%s dead-lettered after %s attempt(s): %s", row.pk, row.attempts, err)
+    else:
+        row.status = EmailOutbox.STATUS_PENDING
+        row.next_attempt_at = now + timedelta(seconds=backoff(row.attempts, err.retry_after))
+
+
+def deliver(rows, client) -> list:
+    """
+    Send claimed rows (one batch call when there are several) and record each
+    outcome. Returns the rows handled; rows whose lease lapsed to another
+    worker are left alone.
+    """
+    rows = renew(rows)
+    if len(rows) > 1:
+        try:
+            ids = client.send_batch([payload(r) for r in rows], idempotency_key=_key(rows))
+        except ProviderError as err:
+            if err.retryable:
+                now = timezone.now()
+                for row in rows:
+                    _failed(row, err, now)
+            else:
+                # the whole batch was refused (usually one invalid message): isolate it,
+                # renewing the claim per row since the one-by-one sends can outlast the lease
+                handled = []
+                for row in rows:
+                    if renew([row]):
+                        _deliver_one(row, client)
+                        handled.append(row)
+                rows = handled
+        else:
+            now = timezone.now()
+            ids += [""] * (len(rows) - len(ids))
+            for row, provider_id in zip(rows, ids):
+                _sent(row, provider_id, now)
+    elif rows:
+        _deliver_one(rows[0], client)
+
+    EmailOutbox.objects.bulk_update(
+        rows, ["status", "attempts", "provider_id", "sent_at", "claimed_at", "last_error", "next_attempt_at"],
+    )
+    return rows
+
+
+def _deliver_one(row, client):
+    try:
+        provider_id = client.send(payload(row), idempotency_key=_key([row]))
+    except ProviderError as err:
+        _failed(row, err, timezone.now())
+    else:
+        _sent(row, provider_id, timezone.now())
+
+
+def drain(client, *, batch_size=BATCH_SIZE, max_batches=None) -> dict:
+    """Deliver due rows until none are left (or `max_batches`); returns {status: count} for the rows handled."""
+    counts = {}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        rows = claim(min(max(1, batch_size), BATCH_SIZE))
+        if not rows:
+            break
+        for row in deliver(rows, client):
+            counts[row.status] = counts.get(row.status, 0) + 1
+        batches += 1
+    return counts
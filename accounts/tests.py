@@ -1,3 +1,109 @@
+import json
+import threading
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 from django.test import TestCase
+from django.utils import timezone
+
+from accounts import outbox
+from accounts.models import EmailOutbox
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Records each POST and answers with the next scripted (status, body) for its path."""
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])) or b"null")
+        self.server.calls.append({
+            "path": self.path,
+            "key": self.headers.get("Idempotency-Key"),
+            "body": body,
+        })
+        script = self.server.script.get(self.path) or []
+        status, data = script.pop(0) if script else (200, None)
+        if data is None:
+            n = len(body) if isinstance(body, list) else 1
+            ids = [f"re_{len(self.server.calls)}_{i}" for i in range(n)]
+            data = {"data": [{"id": i} for i in ids]} if isinstance(body, list) else {"id": ids[0]}
+        raw = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, *args):
+        pass
+
+
+class OutboxDrainTests(TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        self.server.calls = []
+        self.server.script = {}
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        host, port = self.server.server_address
+        self.client_ = outbox.ResendClient(api_key="test", base_url=f"http://{host}:{port}")
+        self.addCleanup(self.client_.close)
+
+    def _enqueue(self, n):
+        return [
+            outbox.enqueue(to=[f"user{i}@example.com"], subject=f"Hello {i}", text="hi", from_email="gm@example.com")
+            for i in range(n)
+        ]
+
+    def test_due_rows_go_out_in_one_batch_call(self):
+        rows = self._enqueue(3)
+
+        counts = outbox.drain(self.client_)
+
+        self.assertEqual(counts, {EmailOutbox.STATUS_SENT: 3})
+        self.assertEqual([c["path"] for c in self.server.calls], ["/emails/batch"])
+        self.assertEqual([m["to"] for m in self.server.calls[0]["body"]], [r.to for r in rows])
+        for row in rows:
+            row.refresh_from_db()
+            self.assertEqual(row.status, EmailOutbox.STATUS_SENT)
+            self.assertTrue(row.provider_id)
+            self.assertIsNone(row.claimed_at)
+
+    def test_server_error_is_retried_after_backoff_with_the_same_key(self):
+        (row,) = self._enqueue(1)
+        self.server.script["/emails"] = [(503, {"message": "unavailable"})]
+
+        before = timezone.now()
+        self.assertEqual(outbox.drain(self.client_), {EmailOutbox.STATUS_PENDING: 1})
+        row.refresh_from_db()
+        self.assertEqual(row.attempts, 1)
+        self.assertIn("503", row.last_error)
+        self.assertGreaterEqual(row.next_attempt_at, before + timedelta(seconds=outbox.BACKOFF_BASE * 0.8))
+
+        # not due yet: nothing is sent
+        self.assertEqual(outbox.drain(self.client_), {})
+        self.assertEqual(len(self.server.calls), 1)
+
+        EmailOutbox.objects.filter(pk=row.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.drain(self.client_), {EmailOutbox.STATUS_SENT: 1})
+        row.refresh_from_db()
+        self.assertEqual(row.attempts, 2)
+        self.assertEqual([c["key"] for c in self.server.calls], [f"outbox-{row.pk}"] * 2)
+
+    def test_rows_reclaimed_after_a_lapsed_lease_are_not_sent_twice(self):
+        rows = self._enqueue(2)
+        stalled = outbox.claim()  # worker A claims, then stalls past the lease
+        EmailOutbox.objects.filter(pk__in=[r.pk for r in rows]).update(
+            claimed_at=timezone.now() - outbox.CLAIM_LEASE - timedelta(seconds=1),
+        )
+        for row in stalled:
+            row.refresh_from_db()
+
+        self.assertEqual(outbox.drain(self.client_), {EmailOutbox.STATUS_SENT: 2})  # worker B
+        self.assertEqual(outbox.deliver(stalled, self.client_), [])                 # A wakes up
 
-# Create your tests here.
+        self.assertEqual(len(self.server.calls), 1)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.STATUS_SENT).count(), 2)
@@ -5,19 +5,17 @@ class EmailSendError(RuntimeError):
     pass
 
 import logging
-import requests
 from django.conf import settings
 
+from .outbox import enqueue
+
 logger = logging.getLogger(__name__)
 
 class EmailSendError(RuntimeError):
     pass
 
 def send_verification_email(user, email, *, verify_url: str) -> str:
-    api_key = getattr(settings, "RESEND_API_KEY", "")
-    if not api_key:
-        raise EmailSendError("RESEND_API_KEY not set")
-
+    """Queue the verification email (delivered by drain_email_outbox); returns the outbox id."""
     from_addr = getattr(settings, "DEFAULT_FROM_EMAIL", None)
     if not from_addr:
         raise EmailSendError("DEFAULT_FROM_EMAIL not configured")
@@ -36,43 +34,6 @@ def send_verification_email(user, email, *, verify_url: str) -> str:
       <p>If you did not request this, ignore this email.</p>
     """
 
-    payload = {
-        "from": from_addr,
-        "to": [email],
-        "subject": subject,
-        "text": text,
-        "html": html,
-    }
-
-    try:
-        r = requests.post(
-            "https://api.resend.com/emails",
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-            json=payload,
-            timeout=30,
-        )
-    except requests.RequestException as e:
-        logger.exception("Resend network error sending verification email")
-        raise EmailSendError(f"Network error sending verification email: {e!s}")
-
-    try:
-        data = r.json()
-    except Exception:
-        data = {"raw": r.text}
-
-    logger.warning(
-        "verification_email status=%s to=%s from=%s response=%s",
-        r.status_code,
-        email,
-        from_addr,
-        data,
-    )
-
-    if r.status_code // 100 != 2:
-        msg = data.get("message") or data.get("error") or r.text or f"HTTP {r.status_code}"
-        raise EmailSendError(f"Resend API error: {msg}")
-
-    return data.get("id", "")
+    row = enqueue(from_email=from_addr, to=[email], subject=subject, text=text, html=html)
+    logger.info("verification_email queued outbox=%s to=%s", row.pk, email)
+    return str(row.pk)
@@ -97,6 +97,8 @@ from characters.models import (
     SpecialItem,
     SpecialItemTraitValue,
 )
+from characters.services.party_stats import PartyStats
+from characters.services.proficiency import ProficiencyResolver
 
 # --- Helpers --------------------------------------------------------------
 
@@ -147,78 +149,27 @@ def _skill_total(character: Character, skill_name: str) -> int:
 
     return int(total)
 
-def _class_progress_prof_bonus(character: Character, code: str) -> int:
+def _class_progress_prof_bonus(character: Character, code: str, resolver=None) -> int:
     """
     Highest ProficiencyTier.bonus reached for a given proficiency 'code'
     across all of the character's classes at their current class levels.
     Ignores weapon/armor groups for simplicity.
     """
-    best = 0
-    # the character's spreads across base classes
-    for cp in CharacterClassProgress.objects.filter(character=character).select_related("character_class"):
-        if not cp.levels:
-            continue
-        rows = (ClassProficiencyProgress.objects
-                .filter(character_class=cp.character_class,
-                        proficiency_type=code,
-                        armor_group__isnull=True,
-                        weapon_group__isnull=True,
-                        at_level__lte=cp.levels)
-                .select_related("tier"))
-        for r in rows:
-            if isinstance(r.tier, ProficiencyTier):
-                try:
-                    best = max(best, int(r.tier.bonus or 0))
-                except (TypeError, ValueError):
-                    pass
-    return int(best)
-
-def _feature_or_item_prof_override(character: Character, code: str) -> int:
+    resolver = resolver or ProficiencyResolver.for_character(character)
+    return int(resolver.class_bonus(character.pk, code))
+
+def _feature_or_item_prof_override(character: Character, code: str, resolver=None) -> int:
     """
     Highest override coming from:
       - ClassFeature(kind='modify_proficiency', target=code, amount=tier)
       - Active SpecialItem trait values that set modify_proficiency on code
     """
-    best = 0
-    # features
-    feats = (CharacterFeature.objects
-             .filter(character=character,
-                     feature__kind="modify_proficiency",
-                     feature__modify_proficiency_target=code,
-                     feature__modify_proficiency_amount__isnull=False)
-             .select_related("feature__modify_proficiency_amount"))
-    for cf in feats:
-        tier = getattr(cf.feature, "modify_proficiency_amount", None)
-        if isinstance(tier, ProficiencyTier):
-            try:
-                best = max(best, int(tier.bonus or 0))
-            except (TypeError, ValueError):
-                pass
-
-    # items (active via CharacterActivation)
-    try:
-        si_ct = ContentType.objects.get_for_model(SpecialItem)
-        active_ids = list(character.activations
-                          .filter(content_type=si_ct, is_active=True)
-                          .values_list("object_id", flat=True))
-        if active_ids:
-            for tv in SpecialItemTraitValue.objects.filter(
-                special_item_id__in=active_ids,
-                modify_proficiency_target=code
-            ):
-                try:
-                    best = max(best, int(tv.modify_proficiency_amount))
-                except (TypeError, ValueError):
-                    pass
-    except Exception:
-        # if activations or items aren't used yet, just ignore
-        pass
-
-    return int(best)
+    resolver = resolver or ProficiencyResolver.for_character(character)
+    return int(resolver.override_bonus(character.pk, code))
 
-def _prof_bonus(character: Character, code: str) -> int:
-    return max(_class_progress_prof_bonus(character, code),
-               _feature_or_item_prof_override(character, code))
+def _prof_bonus(character: Character, code: str, resolver=None) -> int:
+    resolver = resolver or ProficiencyResolver.for_character(character)
+    return int(resolver.bonus(character.pk, code))
 
 def _equipped_armor_value(character: Character) -> int:
     """
@@ -245,9 +196,10 @@ def gm_dashboard(request, campaign_id: int):
     if not _is_gm(request.user, campaign):
         return HttpResponseForbidden("GM access only.")
 
-    chars = (Character.objects
-             .filter(campaign=campaign, status="active")
-             .select_related("user", "race", "subrace"))
+    chars = list(Character.objects
+                 .filter(campaign=campaign, status="active")
+                 .select_related("user", "race", "subrace"))
+    party = PartyStats(chars, skills=("Perception",))
 
     rows = []
     for c in chars:
@@ -255,12 +207,12 @@ def gm_dashboard(request, campaign_id: int):
         con_mod = _ability_mod(c.constitution)
         wis_mod = _ability_mod(c.wisdom)
 
-        passive_perception = 10 + _skill_total(c, "Perception")
-        dodge = 10 + dex_mod + _prof_bonus(c, "dodge")
-        armor = _equipped_armor_value(c)
-        reflex = dex_mod + _prof_bonus(c, "reflex")
-        fortitude = con_mod + _prof_bonus(c, "fortitude")
-        will = wis_mod + _prof_bonus(c, "will")
+        passive_perception = 10 + party.skill_total(c, "Perception")
+        dodge = 10 + dex_mod + party.prof_bonus(c, "dodge")
+        armor = party.armor_value(c)
+        reflex = dex_mod + party.prof_bonus(c, "reflex")
+        fortitude = con_mod + party.prof_bonus(c, "fortitude")
+        will = wis_mod + party.prof_bonus(c, "will")
 
         rows.append({
             "id": c.id,
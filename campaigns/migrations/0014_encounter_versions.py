@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0013_alter_enemytype_dodge'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='damageevent',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='encounter',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='encounterenemy',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='encounterparticipant',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
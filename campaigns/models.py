@@ -327,6 +327,8 @@ class Encounter(models.Model):
     name = models.CharField(max_length=160)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # bumped on every change to the tracker; see campaigns/services/encounter_live.py
+    version = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ["-created_at", "name"]
@@ -351,6 +353,7 @@ class EncounterEnemy(models.Model):
     initiative = models.IntegerField(null=True, blank=True)
     notes = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=0)  # encounter version of the last change
 
     class Meta:
         ordering = ["id"]
@@ -375,7 +378,7 @@ class EncounterParticipant(models.Model):
     initiative = models.IntegerField(null=True, blank=True)
     added_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-
+    version = models.PositiveIntegerField(default=0)  # encounter version of the last change
 
     class Meta:
         unique_together = [("encounter", "character")]
@@ -404,6 +407,7 @@ class DamageEvent(models.Model):
     amount = models.PositiveIntegerField()
     note = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    version = models.PositiveIntegerField(default=0)  # encounter version it was logged at
 
     class Meta:
         ordering = ["-created_at"]
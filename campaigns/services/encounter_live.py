@@ -0,0 +1,116 @@
+# campaigns/services/encounter_live.py
+"""
+Versioned encounter state, so GM actions and the players' tracker pages trade
+small JSON deltas instead of rebuilding encounter_detail after every click.
+
+Each change to an encounter takes a new number from bump() inside the same
+transaction: Encounter.version goes up by one (UPDATE ... SET version =
+version + 1, so concurrent GM tabs queue on the row lock) and the rows the
+change touched (EncounterEnemy, EncounterParticipant, DamageEvent) are
+stamped with it. changes_since(encounter, n) then answers "what happened
+after version n" from three narrow value queries:
+
+  - order: every combatant as "enemy:<id>" / "pc:<id>" in tracker order
+    (initiative high to low, unset last, then name). A key the page doesn't
+    have, or one it has that is gone, means rows were added or removed;
+  - enemies / participants: name, initiative, HP (and GM notes) of the rows
+    stamped after n;
+  - events: damage log entries stamped after n.
+
+Clients poll with the last version they saw; an unchanged encounter costs one
+version lookup. There is no long-poll or SSE: the site runs sync gunicorn
+workers and a held request would block one for everybody. Rows removed
+outright (participants, creatures) only bump the encounter; they show up as
+missing keys in order.
+"""
+from django.db.models import F
+
+from campaigns.models import DamageEvent, Encounter, EncounterEnemy, EncounterParticipant
+
+UNSET_INITIATIVE = 999999  # sorts combatants without initiative last, as encounter_detail does
+
+
+def current_version(encounter_id) -> int:
+    return Encounter.objects.filter(pk=encounter_id).values_list("version", flat=True).first() or 0
+
+
+def bump(encounter) -> int:
+    """Next version for `encounter`; call inside the transaction that makes the change."""
+    Encounter.objects.filter(pk=encounter.pk).update(version=F("version") + 1)
+    encounter.version = current_version(encounter.pk)
+    return encounter.version
+
+
+def save_stamped(encounter, obj, fields) -> int:
+    """obj.save(update_fields=fields) stamped with a fresh encounter version; returns it."""
+    obj.version = bump(encounter)
+    obj.save(update_fields=[*fields, "version"])
+    return obj.version
+
+
+def combat_sort_key(initiative, name):
+    return (UNSET_INITIATIVE if initiative is None else -initiative, name)
+
+
+def _enemy_name(row, prefix=""):
+    return row[f"{prefix}name_override"] or row[f"{prefix}enemy_type__name"] or ""
+
+
+def changes_since(encounter, since: int, *, include_notes: bool = False) -> dict:
+    """Compact delta of `encounter` after version `since` (see module docstring)."""
+    version = current_version(encounter.pk)
+    if since >= version:
+        return {"version": version, "changed": False}
+
+    enemies = EncounterEnemy.objects.filter(encounter_id=encounter.pk).values(
+        "id", "version", "name_override", "enemy_type__name", "enemy_type__initiative",
+        "initiative", "current_hp", "max_hp", "notes",
+    )
+    participants = EncounterParticipant.objects.filter(encounter_id=encounter.pk).values(
+        "id", "version", "initiative", "character__name", "character__user__username",
+    )
+
+    order, changed_enemies, changed_pcs = [], [], []
+    for row in enemies:
+        initiative = row["initiative"] if row["initiative"] is not None else row["enemy_type__initiative"]
+        name = _enemy_name(row)
+        order.append((combat_sort_key(initiative, name), f"enemy:{row['id']}"))
+        if row["version"] > since:
+            item = {"id": row["id"], "name": name, "initiative": initiative,
+                    "hp": [row["current_hp"], row["max_hp"]]}
+            if include_notes:
+                item["notes"] = row["notes"]
+            changed_enemies.append(item)
+    for row in participants:
+        name = f"{row['character__user__username']} · {row['character__name']}"
+        order.append((combat_sort_key(row["initiative"], name), f"pc:{row['id']}"))
+        if row["version"] > since:
+            changed_pcs.append({"id": row["id"], "name": name, "initiative": row["initiative"]})
+    order.sort()
+
+    events = DamageEvent.objects.filter(encounter_id=encounter.pk, version__gt=since).order_by("id").values(
+        "id", "kind", "amount", "note", "created_at",
+        "attacker_character__name",
+        "attacker_enemy__name_override", "attacker_enemy__enemy_type__name",
+        "target_character__name",
+        "target_enemy__name_override", "target_enemy__enemy_type__name",
+    )
+    return {
+        "version": version,
+        "changed": True,
+        "order": [key for _sort, key in order],
+        "enemies": changed_enemies,
+        "participants": changed_pcs,
+        "events": [
+            {
+                "id": e["id"],
+                "kind": e["kind"],
+                "amount": e["amount"],
+                "note": e["note"],
+                "attacker": e["attacker_character__name"] or _enemy_name(e, "attacker_enemy__") or None,
+                "target": e["target_character__name"] or _enemy_name(e, "target_enemy__") or None,
+                "at": e["created_at"].isoformat(),
+            }
+            for e in events
+        ],
+    }
@@ -31,6 +31,7 @@ urlpatterns = [
     # Encounters
     path("<int:campaign_id>/encounters/create/", views.create_encounter, name="create_encounter"),
     path("<int:campaign_id>/encounters/<int:encounter_id>/", views.encounter_detail, name="encounter_detail"),
+    path("<int:campaign_id>/encounters/<int:encounter_id>/changes/", views.encounter_changes, name="encounter_changes"),
     path("<int:campaign_id>/encounters/<int:encounter_id>/delete/", views.delete_encounter, name="delete_encounter"),
     path("<int:campaign_id>/encounters/<int:encounter_id>/add-enemy/", views.add_enemy_to_encounter, name="add_enemy_to_encounter"),
     path("<int:campaign_id>/encounters/<int:encounter_id>/remove/<int:ee_id>/", views.remove_encounter_enemy, name="remove_encounter_enemy"),
@@ -68,6 +68,8 @@ def campaign_list(request):
 # campaigns/views.py  (add near other imports)
 from characters.models import Skill, Armor, Character  # Armor & Skill needed
 from characters.models import ClassProficiencyProgress           
+from characters.services.party_stats import PartyStats
+from characters.services.proficiency import ProficiencyResolver
 
 # campaigns/views.py
 from django.contrib.auth.decorators import login_required
@@ -91,31 +93,22 @@ def _ability_mod(score):
     except (TypeError, ValueError):
         return 0
 
-def _prof_bonus_for(character: Character, ptype: str) -> int:
+def _prof_bonus_for(character: Character, ptype: str, resolver=None) -> int:
     """
     Max tier bonus the character reaches across their class splits for a given proficiency type.
+    Pass a ProficiencyResolver built for the whole party to avoid per-character queries.
     """
-    best = 0
-    for cp in character.class_progress.select_related('character_class').all():
-        row = (ClassProficiencyProgress.objects
-               .filter(character_class=cp.character_class,
-                       proficiency_type=ptype,
-                       at_level__lte=cp.levels)
-               .select_related('tier')
-               .order_by('at_level')
-               .last())
-        if row and row.tier:
-            best = max(best, int(row.tier.bonus))
-    return best
+    resolver = resolver or ProficiencyResolver.for_character(character)
+    return int(resolver.class_bonus(character.pk, ptype))
 # --- Helpers (add these just above gm_dashboard) --------------------------
 
 def _half_level_up(level: int | None) -> int:
     return (int(level or 0) + 1) // 2  # ceil(level/2)
 
 
-def _prof_bonus(character: Character, code: str) -> int:
+def _prof_bonus(character: Character, code: str, resolver=None) -> int:
     # Alias to your existing class-based proficiency lookup
-    return _prof_bonus_for(character, code)
+    return _prof_bonus_for(character, code, resolver)
 
 def _equipped_armor_value(character: Character) -> int:
     # TODO: replace with your real equipped-armor logic when available
@@ -134,49 +127,9 @@ def gm_dashboard(request, campaign_id: int):
              .filter(campaign=campaign, status="active")
              .select_related("user", "race", "subrace"))
 
-    rows = []
-    for c in chars:
-        dex_mod = _ability_mod(c.dexterity)
-        con_mod = _ability_mod(c.constitution)
-        wis_mod = _ability_mod(c.wisdom)
-        half_up = (int(c.level or 0) + 1) // 2  # ceil(level/2)
-
-        # Passive Perception: no skill table lookups; just class prof + WIS + half-level
-        pp_class_prof = int(_prof_bonus(c, "perception") or 0)
-        passive_perception = 10 + wis_mod + half_up + pp_class_prof
-
-        # Armor: stubbed helper so it's defined (returns 0 until you wire equipment)
-        armor = int(_equipped_armor_value(c) or 0)
-
-        # Defenses: ability + prof + half_up if trained
-        dodge_prof = int(_prof_bonus(c, "dodge") or 0)
-        dodge = 10 + dex_mod + dodge_prof + (half_up if dodge_prof > 0 else 0)
-
-        reflex_prof = int(_prof_bonus(c, "reflex") or 0)
-        reflex = dex_mod + reflex_prof + (half_up if reflex_prof > 0 else 0)
-
-        fort_prof = int(_prof_bonus(c, "fortitude") or 0)
-        fortitude = con_mod + fort_prof + (half_up if fort_prof > 0 else 0)
-
-        will_prof = int(_prof_bonus(c, "will") or 0)
-        will = wis_mod + will_prof + (half_up if will_prof > 0 else 0)
-
-        rows.append({
-            "id": c.id,
-            "name": c.name,
-            "player": getattr(c.user, "username", "—"),
-            "level": c.level,
-            "speed": c.effective_speed if hasattr(c, "effective_speed") else 30,
-            "hp": int(c.HP or 0),
-            "temp": int(c.temp_HP or 0),
-            "pp": int(passive_perception),
-            "dodge": int(dodge),
-            "armor": int(armor),
-            "reflex": int(reflex),
-            "fortitude": int(fortitude),
-            "will": int(will),
-            "race": str(c.race) if c.race_id else "—",
-        })
+    # Passive Perception: class prof + WIS + half-level; defences: ability + prof + half_up if trained.
+    # All rows come from one batch (class progression only), not per-character queries.
+    rows = PartyStats(chars, class_only=True).rows()
 
     context = {"campaign": campaign, "rows": rows}
     return render(request, "campaigns/gm_dashboard.html", context)
@@ -688,6 +641,42 @@ def create_encounter(request, campaign_id):
 
 from .forms import AddParticipantForm, SetParticipantInitiativeForm, RecordDamageForm, UpdateEnemyNoteForm
 from .models import EncounterParticipant, DamageEvent, EncounterEnemy
+from django.db.models import F
+from django.db.models.functions import Greatest, Least
+from django.http import JsonResponse
+from campaigns.services import encounter_live
+
+
+def _wants_json(request) -> bool:
+    return request.headers.get("x-requested-with") == "XMLHttpRequest"
+
+
+def _int_param(params, name, default=0) -> int:
+    try:
+        return int(params.get(name))
+    except (TypeError, ValueError):
+        return default
+
+
+def _tracker_reply(request, campaign, enc, message, *, level=messages.SUCCESS, is_gm=True):
+    """
+    Outcome of a tracker action. Fetch callers (X-Requested-With) get the delta
+    since the version they sent as `since`; form posts get the flash message
+    and the usual redirect back to encounter_detail.
+    """
+    if _wants_json(request):
+        since = _int_param(request.POST, "since", enc.version - 1)
+        payload = encounter_live.changes_since(enc, since, include_notes=is_gm)
+        return JsonResponse({"ok": True, "message": message, **payload})
+    messages.add_message(request, level, message)
+    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+
+
+def _tracker_error(request, campaign, enc, message):
+    if _wants_json(request):
+        return JsonResponse({"ok": False, "error": message}, status=400)
+    messages.error(request, message)
+    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
 
 @login_required
 def add_participant(request, campaign_id, encounter_id):
@@ -699,23 +688,24 @@ def add_participant(request, campaign_id, encounter_id):
 
     form = AddParticipantForm(request.POST, campaign=campaign)
     if not form.is_valid():
-        messages.error(request, "Pick a character.")
-        return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
-
-    p, created = EncounterParticipant.objects.get_or_create(
-        encounter=enc,
-        character=form.cleaned_data["character"],
-        defaults={
-            "role": form.cleaned_data["role"],
-            "initiative": form.cleaned_data.get("initiative"),
-            "added_by": request.user,
-        },
-    )
+        return _tracker_error(request, campaign, enc, "Pick a character.")
+
+    with transaction.atomic():
+        p, created = EncounterParticipant.objects.get_or_create(
+            encounter=enc,
+            character=form.cleaned_data["character"],
+            defaults={
+                "role": form.cleaned_data["role"],
+                "initiative": form.cleaned_data.get("initiative"),
+                "added_by": request.user,
+            },
+        )
+        if created:
+            encounter_live.save_stamped(enc, p, [])
     if created:
-        messages.success(request, f"Added {p.character.name} to initiative.")
-    else:
-        messages.info(request, f"{p.character.name} is already in this encounter.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+        return _tracker_reply(request, campaign, enc, f"Added {p.character.name} to initiative.")
+    return _tracker_reply(request, campaign, enc, f"{p.character.name} is already in this encounter.",
+                          level=messages.INFO)
 
 
 @login_required
@@ -728,14 +718,14 @@ def set_participant_initiative(request, campaign_id, encounter_id):
 
     form = SetParticipantInitiativeForm(request.POST)
     if not form.is_valid():
-        messages.error(request, "Enter a valid initiative.")
-        return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+        return _tracker_error(request, campaign, enc, "Enter a valid initiative.")
 
-    p = get_object_or_404(EncounterParticipant, id=form.cleaned_data["participant_id"], encounter=enc)
+    p = get_object_or_404(EncounterParticipant.objects.select_related("character"),
+                          id=form.cleaned_data["participant_id"], encounter=enc)
     p.initiative = form.cleaned_data["initiative"]
-    p.save(update_fields=["initiative"])
-    messages.success(request, f"{p.character.name} initiative set to {p.initiative}.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+    with transaction.atomic():
+        encounter_live.save_stamped(enc, p, ["initiative"])
+    return _tracker_reply(request, campaign, enc, f"{p.character.name} initiative set to {p.initiative}.")
 
 
 @login_required
@@ -748,9 +738,10 @@ def remove_participant(request, campaign_id, encounter_id, participant_id):
 
     p = get_object_or_404(EncounterParticipant, id=participant_id, encounter=enc)
     name = p.character.name
-    p.delete()
-    messages.info(request, f"Removed {name} from encounter.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+    with transaction.atomic():
+        encounter_live.bump(enc)
+        p.delete()
+    return _tracker_reply(request, campaign, enc, f"Removed {name} from encounter.", level=messages.INFO)
 
 
 @login_required
@@ -763,31 +754,37 @@ def record_damage(request, campaign_id, encounter_id):
 
     form = RecordDamageForm(request.POST, campaign=campaign)
     if not form.is_valid():
-        messages.error(request, "Enter a valid HP removal and who did it.")
-        return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+        return _tracker_error(request, campaign, enc, "Enter a valid HP removal and who did it.")
 
-    ee = get_object_or_404(EncounterEnemy, id=form.cleaned_data["ee_id"], encounter=enc)
+    ee = get_object_or_404(EncounterEnemy.objects.select_related("enemy_type"),
+                           id=form.cleaned_data["ee_id"], encounter=enc)
     amount = form.cleaned_data["amount"]
     attacker_choice = form.cleaned_data["attacker"]
     other_name = (form.cleaned_data.get("other_name") or "").strip()
 
-    # Always subtract HP
-    ee.current_hp = max(min(ee.current_hp - amount, ee.max_hp), -999)
-    ee.save(update_fields=["current_hp"])
-
     # Build event
     attacker_character_id = int(attacker_choice) if attacker_choice.isdigit() else None
     note = f"Other: {other_name}" if attacker_choice == "other" and other_name else ""
 
-    DamageEvent.objects.create(
-        encounter=enc,
-        attacker_user=request.user,
-        attacker_character_id=attacker_character_id,
-        target_enemy=ee,
-        kind="dmg",
-        amount=amount,
-        note=note,
-    )
+    with transaction.atomic():
+        # Always subtract HP (in SQL, so two quick hits both land)
+        version = encounter_live.bump(enc)
+        EncounterEnemy.objects.filter(pk=ee.pk).update(
+            current_hp=Greatest(Least(F("current_hp") - amount, F("max_hp")), -999),
+            version=version,
+        )
+        ee.current_hp = EncounterEnemy.objects.values_list("current_hp", flat=True).get(pk=ee.pk)
+
+        DamageEvent.objects.create(
+            encounter=enc,
+            attacker_user=request.user,
+            attacker_character_id=attacker_character_id,
+            target_enemy=ee,
+            kind="dmg",
+            amount=amount,
+            note=note,
+            version=version,
+        )
 
     if attacker_character_id:
         who = (campaign.characters.filter(id=attacker_character_id)
@@ -795,8 +792,11 @@ def record_damage(request, campaign_id, encounter_id):
     else:
         who = other_name or "Other"
 
-    messages.success(request, f"{who} damaged {ee.display_name} for {amount}. Now {ee.current_hp}/{ee.max_hp}.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+    return _tracker_reply(
+        request, campaign, enc,
+        f"{who} damaged {ee.display_name} for {amount}. Now {ee.current_hp}/{ee.max_hp}.",
+        is_gm=_is_gm(request.user, campaign),
+    )
 
 
 from django.db.models import Sum, Max, Count
@@ -885,14 +885,14 @@ def update_enemy_note(request, campaign_id, encounter_id):
 
     form = UpdateEnemyNoteForm(request.POST)
     if not form.is_valid():
-        messages.error(request, "Enter a valid note.")
-        return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+        return _tracker_error(request, campaign, enc, "Enter a valid note.")
 
-    ee = get_object_or_404(EncounterEnemy, id=form.cleaned_data["ee_id"], encounter=enc)
+    ee = get_object_or_404(EncounterEnemy.objects.select_related("enemy_type"),
+                           id=form.cleaned_data["ee_id"], encounter=enc)
     ee.notes = form.cleaned_data["notes"] or ""
-    ee.save(update_fields=["notes"])
-    messages.success(request, f"Updated notes for {ee.display_name}.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+    with transaction.atomic():
+        encounter_live.save_stamped(enc, ee, ["notes"])
+    return _tracker_reply(request, campaign, enc, f"Updated notes for {ee.display_name}.")
 from .models import EncounterParticipant, EncounterEnemy
 
 @login_required
@@ -908,22 +908,21 @@ def set_combat_initiative(request, campaign_id, encounter_id):
     try:
         init = int(request.POST.get("initiative"))
     except (TypeError, ValueError):
-        messages.error(request, "Enter a valid initiative.")
-        return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+        return _tracker_error(request, campaign, enc, "Enter a valid initiative.")
 
     if kind == "enemy":
-        ee = get_object_or_404(EncounterEnemy, id=obj_id, encounter=enc)
-        ee.initiative = init
-        ee.save(update_fields=["initiative"])
-        messages.success(request, f"{ee.display_name} initiative set to {init}.")
+        obj = get_object_or_404(EncounterEnemy.objects.select_related("enemy_type"), id=obj_id, encounter=enc)
+        name = obj.display_name
     elif kind == "pc":
-        p = get_object_or_404(EncounterParticipant, id=obj_id, encounter=enc)
-        p.initiative = init
-        p.save(update_fields=["initiative"])
-        messages.success(request, f"{p.character.name} initiative set to {init}.")
+        obj = get_object_or_404(EncounterParticipant.objects.select_related("character"), id=obj_id, encounter=enc)
+        name = obj.character.name
     else:
-        messages.error(request, "Unknown combatant.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+        return _tracker_error(request, campaign, enc, "Unknown combatant.")
+
+    obj.initiative = init
+    with transaction.atomic():
+        encounter_live.save_stamped(enc, obj, ["initiative"])
+    return _tracker_reply(request, campaign, enc, f"{name} initiative set to {init}.")
 
 
 @login_required
@@ -936,23 +935,21 @@ def nudge_combat_initiative(request, campaign_id, encounter_id):
 
     kind = request.POST.get("kind")
     obj_id = request.POST.get("id")
-    delta = int(request.POST.get("delta", "0"))
+    delta = _int_param(request.POST, "delta", 0)
 
     if kind == "enemy":
-        ee = get_object_or_404(EncounterEnemy, id=obj_id, encounter=enc)
-        ee.initiative = (ee.initiative or 0) + delta
-        ee.save(update_fields=["initiative"])
+        obj = get_object_or_404(EncounterEnemy, id=obj_id, encounter=enc)
     elif kind == "pc":
-        p = get_object_or_404(EncounterParticipant, id=obj_id, encounter=enc)
-        p.initiative = (p.initiative or 0) + delta
-        p.save(update_fields=["initiative"])
+        obj = get_object_or_404(EncounterParticipant, id=obj_id, encounter=enc)
     else:
-        messages.error(request, "Unknown combatant.")
-        return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+        return _tracker_error(request, campaign, enc, "Unknown combatant.")
+
+    obj.initiative = (obj.initiative or 0) + delta
+    with transaction.atomic():
+        encounter_live.save_stamped(enc, obj, ["initiative"])
 
     sign = "+" if delta >= 0 else ""
-    messages.success(request, f"Initiative {sign}{delta}.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+    return _tracker_reply(request, campaign, enc, f"Initiative {sign}{delta}.")
 
 @login_required
 def encounter_detail(request, campaign_id, encounter_id):
@@ -982,7 +979,9 @@ def encounter_detail(request, campaign_id, encounter_id):
         Q(campaign__isnull=True) | Q(campaign=campaign)
     ).order_by("name")
 
-    participants = enc.participants.select_related("character", "character__user")
+    participants = list(enc.participants.select_related(
+        "character", "character__user", "character__race", "character__subrace"))
+    party = PartyStats([p.character for p in participants])
 
     combat = []
     for ee in enemies:
@@ -1003,6 +1002,7 @@ def encounter_detail(request, campaign_id, encounter_id):
             "sub": "Player",
             "initiative": p.initiative,
             "hp": None,
+            "stats": party.row(p.character),
             "obj": p,
         })
     combat.sort(key=lambda r: (999999 if r["initiative"] is None else -r["initiative"], r["name"]))
@@ -1023,6 +1023,25 @@ def encounter_detail(request, campaign_id, encounter_id):
         "combat_colspan": colspan,
         "add_participant_form": add_participant_form,
     })
+
+
+@login_required
+def encounter_changes(request, campaign_id, encounter_id):
+    """
+    GET ?since=<version> → JSON delta of the tracker after that version
+    (campaigns/services/encounter_live.py). Never blocks; the page polls.
+    """
+    enc = get_object_or_404(Encounter.objects.only("id", "campaign_id", "version"),
+                            id=encounter_id, campaign_id=campaign_id)
+    role = (CampaignMembership.objects.filter(campaign_id=campaign_id, user=request.user)
+            .values_list("role", flat=True).first())
+    if role is None:
+        return HttpResponseForbidden("Join the campaign first.")
+
+    since = _int_param(request.GET, "since", 0)
+    return JsonResponse(encounter_live.changes_since(enc, since, include_notes=role == "gm"))
+
+
 @login_required
 def record_enemy_to_pc_damage(request, campaign_id, encounter_id):
     campaign = get_object_or_404(Campaign, id=campaign_id)
@@ -1032,8 +1051,7 @@ def record_enemy_to_pc_damage(request, campaign_id, encounter_id):
 
     form = RecordEnemyToPCDamageForm(request.POST, campaign=campaign)
     if not form.is_valid():
-        messages.error(request, "Enter a valid enemy → player damage entry.")
-        return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+        return _tracker_error(request, campaign, enc, "Enter a valid enemy → player damage entry.")
 
     attacker_ee = get_object_or_404(EncounterEnemy, id=form.cleaned_data["attacker_ee_id"], encounter=enc)
     victim = form.cleaned_data["target_character"]
@@ -1041,16 +1059,18 @@ def record_enemy_to_pc_damage(request, campaign_id, encounter_id):
     note = form.cleaned_data.get("note", "")
 
     # Log only — enemy HP is NOT changed here.
-    DamageEvent.objects.create(
-        encounter=enc,
-        attacker_enemy=attacker_ee,
-        target_character=victim,
-        kind="dmg",
-        amount=amount,
-        note=note,
-    )
-    messages.success(request, f"{attacker_ee.display_name} hit {victim.name} for {amount}.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+    with transaction.atomic():
+        DamageEvent.objects.create(
+            encounter=enc,
+            attacker_enemy=attacker_ee,
+            target_character=victim,
+            kind="dmg",
+            amount=amount,
+            note=note,
+            version=encounter_live.bump(enc),
+        )
+    return _tracker_reply(request, campaign, enc, f"{attacker_ee.display_name} hit {victim.name} for {amount}.",
+                          is_gm=_is_gm(request.user, campaign))
 @login_required
 def delete_enemy_type(request, campaign_id, enemy_type_id):
     campaign = get_object_or_404(Campaign, id=campaign_id)
@@ -1237,26 +1257,26 @@ def add_enemy_to_encounter(request, campaign_id, encounter_id):
 
     form = AddEnemyToEncounterForm(request.POST)
     if not form.is_valid():
-        messages.error(request, "Pick an enemy and count.")
-        return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+        return _tracker_error(request, campaign, enc, "Pick an enemy and count.")
 
     et = form.cleaned_data["enemy_type"]
     side = form.cleaned_data["side"]
     count = form.cleaned_data["count"]
-    created = 0
-    for _ in range(count):
-        EncounterEnemy.objects.create(
-            encounter=enc,
-            enemy_type=et,
-            side=side,
-            max_hp=et.hp,
-            current_hp=et.hp,
-        )
-        created += 1
-
+    with transaction.atomic():
+        version = encounter_live.bump(enc)
+        created = len(EncounterEnemy.objects.bulk_create([
+            EncounterEnemy(
+                encounter=enc,
+                enemy_type=et,
+                side=side,
+                max_hp=et.hp,
+                current_hp=et.hp,
+                version=version,
+            )
+            for _ in range(count)
+        ]))
 
-    messages.success(request, f"Added {created} × {et.name}.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+    return _tracker_reply(request, campaign, enc, f"Added {created} × {et.name}.")
 
 from django.db.models import Q
 
@@ -1322,6 +1342,7 @@ def remove_encounter_enemy(request, campaign_id, encounter_id, ee_id):
 
     ee = get_object_or_404(EncounterEnemy, id=ee_id, encounter=enc)
     name = ee.display_name
-    ee.delete()
-    messages.info(request, f"Removed {name}.")
-    return redirect("campaigns:encounter_detail", campaign_id=campaign.id, encounter_id=enc.id)
+    with transaction.atomic():
+        encounter_live.bump(enc)
+        ee.delete()
+    return _tracker_reply(request, campaign, enc, f"Removed {name}.", level=messages.INFO)
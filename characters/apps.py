@@ -7,6 +7,10 @@ class CharactersConfig(AppConfig):
     def ready(self):
         try:
             from . import audit_signals  # noqa
+            from . import snapshot_signals  # noqa
+            from . import catalog_signals  # noqa
+            from . import search_signals  # noqa
+            from . import rulebook_signals  # noqa
             from django_summernote.fields import SummernoteTextField
             orig = SummernoteTextField.to_python
 
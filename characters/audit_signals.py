@@ -1,10 +1,32 @@
 # characters/audit_signals.py
+"""
+Model change log for the admin-selected AuditTrackedModel types.
+
+  - "before" values come from what the row held when it was loaded: every
+    characters model gets a from_db hook that keeps the loaded values
+    (Model._audit_loaded, tracked models only), so an update costs no extra
+    SELECT. Only fields that were deferred, or instances built by hand with a
+    pk, fall back to one .values() query.
+  - change rows are buffered per transaction and written with one bulk_create
+    in transaction.on_commit. Each savepoint context gets its own buffer
+    callback (found again through a per-thread map keyed by savepoint ids), so
+    rows recorded inside a rolled-back savepoint are dropped with it. Outside a
+    transaction a row is written immediately, as before.
+  - content type ids and the tracked field lists are cached per process.
+
+Batch jobs that bypass save() use services/bulk_writes.py, which logs through
+update_changes / create_changes / record_changes below.
+"""
 from __future__ import annotations
 
+import copy
+import threading
+import weakref
 from functools import lru_cache
 
+from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, transaction
 from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
 
@@ -15,9 +37,16 @@ from .models import AuditTrackedModel, ModelChangeLog
 AUDIT_EXCLUDE_MODEL_NAMES = {
     "audittrackedmodel",
     "changecategory",
+    "characterleveljournal",
     "modelchangelog",
+    "sheetsyncstate",
 }
 
+# Bookkeeping columns that never show up in a change log entry.
+AUDIT_IGNORE_FIELD_NAMES = {"sync_hash"}
+
+BULK_BATCH_SIZE = 500
+
 
 def _is_audit_model(sender: type[models.Model]) -> bool:
     return sender._meta.model_name in AUDIT_EXCLUDE_MODEL_NAMES
@@ -27,6 +56,17 @@ def _snapshot_key(sender: type[models.Model], pk: int) -> tuple[str, str, int]:
     return (sender._meta.app_label, sender._meta.model_name, int(pk))
 
 
+_ct_ids: dict[str, int] = {}
+
+
+def _ct_id(model: type[models.Model]) -> int:
+    key = model._meta.label_lower
+    ct_id = _ct_ids.get(key)
+    if ct_id is None:
+        ct_id = _ct_ids[key] = ContentType.objects.get_for_model(model).id
+    return ct_id
+
+
 @lru_cache(maxsize=512)
 def _tracked_cfg_for_ct_id(ct_id: int):
     try:
@@ -46,10 +86,17 @@ def _tracked_cfg_for_ct_id(ct_id: int):
     }
 
 
+def _cfg(sender: type[models.Model]):
+    if sender._meta.app_label != "characters" or _is_audit_model(sender):
+        return None
+    return _tracked_cfg_for_ct_id(_ct_id(sender))
+
+
 @receiver(post_save, sender=AuditTrackedModel)
 @receiver(post_delete, sender=AuditTrackedModel)
 def _clear_tracking_cache(*args, **kwargs):
     _tracked_cfg_for_ct_id.cache_clear()
+    _fields_for.cache_clear()
 
 
 def _iter_concrete_fields(sender: type[models.Model], cfg) -> list[models.Field]:
@@ -61,7 +108,7 @@ def _iter_concrete_fields(sender: type[models.Model], cfg) -> list[models.Field]
             continue
         if f.many_to_many:
             continue
-        if f.primary_key:
+        if f.primary_key or f.name in AUDIT_IGNORE_FIELD_NAMES:
             continue
         fields.append(f)
 
@@ -74,22 +121,34 @@ def _iter_concrete_fields(sender: type[models.Model], cfg) -> list[models.Field]
     return fields
 
 
-def _serialize_instance(instance: models.Model, fields: list[models.Field]) -> dict:
+@lru_cache(maxsize=512)
+def _fields_for(sender: type[models.Model], ct_id: int) -> tuple[models.Field, ...]:
+    return tuple(_iter_concrete_fields(sender, _tracked_cfg_for_ct_id(ct_id)))
+
+
+def _primitive(val):
+    # keep JSON-serializable primitives; fallback to str for unknowns
+    if isinstance(val, (str, int, float, bool)) or val is None or isinstance(val, (list, dict)):
+        return val
+    return str(val)
+
+
+def _serialize_instance(instance: models.Model, fields) -> dict:
     data = {}
     for f in fields:
         # FK values should use attname (field_id)
         if f.is_relation and f.many_to_one:
             data[f.name] = getattr(instance, f.attname, None)
         else:
-            val = getattr(instance, f.name, None)
-            # keep JSON-serializable primitives; fallback to str for unknowns
-            if isinstance(val, (str, int, float, bool)) or val is None or isinstance(val, (list, dict)):
-                data[f.name] = val
-            else:
-                data[f.name] = str(val)
+            data[f.name] = _primitive(getattr(instance, f.name, None))
     return data
 
 
+def _serialize_loaded(loaded: dict, fields) -> dict:
+    """_serialize_instance() over the values captured at load time (keyed by attname)."""
+    return {f.name: _primitive(loaded.get(f.attname)) for f in fields}
+
+
 def _diff(before: dict | None, after: dict | None) -> dict:
     before = before or {}
     after = after or {}
@@ -101,145 +160,265 @@ def _diff(before: dict | None, after: dict | None) -> dict:
     return out
 
 
-@receiver(pre_save)
-def audit_pre_save(sender, instance, **kwargs):
-    if sender._meta.app_label != "characters":
-        return
-    if _is_audit_model(sender):
-        return
-    if instance.pk is None:
+# ── loaded-values snapshot ────────────────────────────────────────────────────
+def _remember(instance: models.Model, attnames) -> None:
+    """Record the current values of `attnames` as what the DB now holds."""
+    loaded = instance.__dict__.setdefault("_audit_loaded", {})
+    state = instance.__dict__
+    for attname in attnames:
+        if attname in state:
+            val = state[attname]
+            # JSON / array values may be mutated in place later; keep our own copy
+            loaded[attname] = copy.deepcopy(val) if isinstance(val, (list, dict)) else val
+
+
+def _tracks_updates(model) -> bool:
+    cfg = _cfg(model)
+    return bool(cfg and cfg["track_updates"])
+
+
+def _audited_from_db(cls, db, field_names, values):
+    instance = models.Model.from_db.__func__(cls, db, field_names, values)
+    if _tracks_updates(cls):
+        _remember(instance, field_names)
+    return instance
+
+
+def _audited_refresh_from_db(base):
+    """Wrap the model's own refresh_from_db (Character drops cached data in it)."""
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        base(self, using=using, fields=fields, from_queryset=from_queryset)
+        if not _tracks_updates(type(self)):
+            return
+        concrete = [f for f in self._meta.concrete_fields]
+        if fields is not None:
+            wanted = set(fields)
+            concrete = [f for f in concrete if f.name in wanted or f.attname in wanted]
+        _remember(self, [f.attname for f in concrete])
+    return refresh_from_db
+
+
+def _install_loaded_values_hooks() -> None:
+    for model in apps.get_app_config("characters").get_models():
+        if _is_audit_model(model):
+            continue
+        model.from_db = classmethod(_audited_from_db)
+        model.refresh_from_db = _audited_refresh_from_db(model.refresh_from_db)
+
+
+_install_loaded_values_hooks()
+
+
+# ── buffered writes ───────────────────────────────────────────────────────────
+_pending = threading.local()
+
+
+def _pending_buffers() -> weakref.WeakValueDictionary:
+    """This thread's open buffers, keyed by (db alias, savepoint ids) of the context they were opened in."""
+    buffers = getattr(_pending, "buffers", None)
+    if buffers is None:
+        buffers = _pending.buffers = weakref.WeakValueDictionary()
+    return buffers
+
+
+class _PendingChanges:
+    """
+    on_commit callback holding the change rows recorded in one savepoint context.
+
+    Only the connection's on_commit list holds it strongly, so when a rollback
+    discards the callback the buffer drops out of _pending_buffers() as well;
+    on commit the callback removes itself before writing.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.entries: list[ModelChangeLog] = []
+
+    def __call__(self):
+        buffers = _pending_buffers()
+        if buffers.get(self.key) is self:
+            del buffers[self.key]
+        ModelChangeLog.objects.bulk_create(self.entries, batch_size=BULK_BATCH_SIZE)
+
+
+def _record(ct_id: int, instance: models.Model, action: str, changes: dict) -> None:
+    user = get_current_user()
+    entry = ModelChangeLog(
+        content_type_id=ct_id,
+        object_id=int(instance.pk),
+        object_repr=str(instance)[:200],
+        action=action,
+        changed_by=user if getattr(user, "is_authenticated", False) else None,
+        request_path=get_current_path(),
+        changes=changes,
+    )
+
+    conn = transaction.get_connection()
+    if not conn.in_atomic_block:
+        entry.save()
         return
 
-    ct_id = ContentType.objects.get_for_model(sender).id
-    cfg = _tracked_cfg_for_ct_id(ct_id)
+    key = (conn.alias, frozenset(conn.savepoint_ids))
+    buffers = _pending_buffers()
+    pending = buffers.get(key)
+    if pending is None:
+        pending = buffers[key] = _PendingChanges(key)
+        transaction.on_commit(pending, robust=True)
+    pending.entries.append(entry)
+
+
+# ── bulk writes (services/bulk_writes.py) ────────────────────────────────────
+def update_changes(model, instances, field_names) -> list[tuple[models.Model, dict]]:
+    """
+    [(instance, changes)] for instances about to be bulk-updated on `field_names`,
+    diffed against their loaded values (one query for rows that weren't loaded).
+    """
+    cfg = _cfg(model)
     if not cfg or not cfg["track_updates"]:
-        return
+        return []
+    wanted = set(field_names)
+    fields = [f for f in _fields_for(model, _ct_id(model)) if f.name in wanted or f.attname in wanted]
+    if not fields:
+        return []
+
+    attnames = [f.attname for f in fields]
+    missing = {obj.pk: obj for obj in instances
+               if not all(a in (obj.__dict__.get("_audit_loaded") or {}) for a in attnames)}
+    pks = list(missing)
+    for i in range(0, len(pks), BULK_BATCH_SIZE):
+        for row in model._base_manager.filter(pk__in=pks[i:i + BULK_BATCH_SIZE]).values("pk", *attnames):
+            obj = missing[row.pop("pk")]
+            obj.__dict__.setdefault("_audit_loaded", {}).update(row)
+
+    out = []
+    for obj in instances:
+        loaded = obj.__dict__.get("_audit_loaded")
+        if loaded is None:
+            continue
+        changes = _diff(_serialize_loaded(loaded, fields), _serialize_instance(obj, fields))
+        if changes:
+            out.append((obj, changes))
+    return out
 
-    fields = _iter_concrete_fields(sender, cfg)
-    try:
-        old = sender.objects.get(pk=instance.pk)
-    except sender.DoesNotExist:
+
+def create_changes(model, instances) -> list[tuple[models.Model, dict]]:
+    cfg = _cfg(model)
+    if not cfg or not cfg["track_creates"]:
+        return []
+    fields = _fields_for(model, _ct_id(model))
+    return [
+        (obj, {k: {"before": None, "after": v} for k, v in _serialize_instance(obj, fields).items()})
+        for obj in instances if obj.pk is not None
+    ]
+
+
+def record_changes(model, action: str, pairs) -> None:
+    ct_id = _ct_id(model)
+    for obj, changes in pairs:
+        _record(ct_id, obj, action, changes)
+
+
+def remember_written(model, instances, field_names=None) -> None:
+    """After a bulk write: the written values are now what the DB holds."""
+    if not _tracks_updates(model):
         return
+    written = model._meta.concrete_fields
+    if field_names is not None:
+        wanted = set(field_names)
+        written = [f for f in written if f.name in wanted or f.attname in wanted]
+    attnames = [f.attname for f in written]
+    for obj in instances:
+        _remember(obj, attnames)
 
-    before = _serialize_instance(old, fields)
-    set_before_snapshot(_snapshot_key(sender, instance.pk), before)
 
+@receiver(pre_save)
+def audit_pre_save(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    cfg = _cfg(sender)
+    if not cfg or not cfg["track_updates"]:
+        return
 
-@receiver(post_save)
-def audit_post_save(sender, instance, created, **kwargs):
-    if sender._meta.app_label != "characters":
+    # Normally everything was captured at load time; fetch only what wasn't
+    # (deferred fields, or an instance constructed with an explicit pk).
+    fields = _fields_for(sender, _ct_id(sender))
+    loaded = instance.__dict__.get("_audit_loaded") or {}
+    missing = [f.attname for f in fields if f.attname not in loaded]
+    if not missing:
         return
-    if _is_audit_model(sender):
+    row = sender._base_manager.filter(pk=instance.pk).values(*missing).first()
+    if row is None:
         return
+    instance.__dict__.setdefault("_audit_loaded", {}).update(row)
+
 
-    ct = ContentType.objects.get_for_model(sender)
-    cfg = _tracked_cfg_for_ct_id(ct.id)
+@receiver(post_save)
+def audit_post_save(sender, instance, created, update_fields=None, **kwargs):
+    cfg = _cfg(sender)
     if not cfg:
         return
-
-    user = get_current_user()
-    path = get_current_path()
-    obj_repr = str(instance)[:200]
+    ct_id = _ct_id(sender)
+    fields = _fields_for(sender, ct_id)
 
     if created:
-        if not cfg["track_creates"]:
-            return
-        fields = _iter_concrete_fields(sender, cfg)
-        after = _serialize_instance(instance, fields)
-        changes = {k: {"before": None, "after": v} for k, v in after.items()}
-        ModelChangeLog.objects.create(
-            content_type=ct,
-            object_id=int(instance.pk),
-            object_repr=obj_repr,
-            action=ModelChangeLog.ACTION_CREATE,
-            changed_by=user if getattr(user, "is_authenticated", False) else None,
-            request_path=path,
-            changes=changes,
-        )
+        if cfg["track_creates"]:
+            after = _serialize_instance(instance, fields)
+            changes = {k: {"before": None, "after": v} for k, v in after.items()}
+            _record(ct_id, instance, ModelChangeLog.ACTION_CREATE, changes)
+        if cfg["track_updates"]:
+            _remember(instance, [f.attname for f in sender._meta.concrete_fields])
         return
 
     if not cfg["track_updates"]:
         return
 
-    fields = _iter_concrete_fields(sender, cfg)
-    after = _serialize_instance(instance, fields)
-    before = pop_before_snapshot(_snapshot_key(sender, instance.pk))
-    changes = _diff(before, after)
-    if not changes:
+    if update_fields is not None:
+        fields = [f for f in fields if f.name in update_fields or f.attname in update_fields]
+    loaded = instance.__dict__.get("_audit_loaded")
+    if loaded is None:
         return
+    changes = _diff(_serialize_loaded(loaded, fields), _serialize_instance(instance, fields))
 
-    ModelChangeLog.objects.create(
-        content_type=ct,
-        object_id=int(instance.pk),
-        object_repr=obj_repr,
-        action=ModelChangeLog.ACTION_UPDATE,
-        changed_by=user if getattr(user, "is_authenticated", False) else None,
-        request_path=path,
-        changes=changes,
-    )
+    written = sender._meta.concrete_fields
+    if update_fields is not None:
+        written = [f for f in written if f.name in update_fields or f.attname in update_fields]
+    _remember(instance, [f.attname for f in written])
+
+    if changes:
+        _record(ct_id, instance, ModelChangeLog.ACTION_UPDATE, changes)
 
 
 @receiver(pre_delete)
 def audit_pre_delete(sender, instance, **kwargs):
-    if sender._meta.app_label != "characters":
-        return
-    if _is_audit_model(sender):
-        return
     if instance.pk is None:
         return
-
-    ct_id = ContentType.objects.get_for_model(sender).id
-    cfg = _tracked_cfg_for_ct_id(ct_id)
+    cfg = _cfg(sender)
     if not cfg or not cfg["track_deletes"]:
         return
 
-    fields = _iter_concrete_fields(sender, cfg)
-    before = _serialize_instance(instance, fields)
+    before = _serialize_instance(instance, _fields_for(sender, _ct_id(sender)))
     set_before_snapshot(_snapshot_key(sender, instance.pk), before)
 
 
 @receiver(post_delete)
 def audit_post_delete(sender, instance, **kwargs):
-    if sender._meta.app_label != "characters":
-        return
-    if _is_audit_model(sender):
-        return
     if instance.pk is None:
         return
-
-    ct = ContentType.objects.get_for_model(sender)
-    cfg = _tracked_cfg_for_ct_id(ct.id)
+    cfg = _cfg(sender)
     if not cfg or not cfg["track_deletes"]:
         return
 
-    user = get_current_user()
-    path = get_current_path()
-    obj_repr = str(instance)[:200]
-
     before = pop_before_snapshot(_snapshot_key(sender, instance.pk))
     changes = {k: {"before": v, "after": None} for k, v in (before or {}).items()}
-
-    ModelChangeLog.objects.create(
-        content_type=ct,
-        object_id=int(instance.pk),
-        object_repr=obj_repr,
-        action=ModelChangeLog.ACTION_DELETE,
-        changed_by=user if getattr(user, "is_authenticated", False) else None,
-        request_path=path,
-        changes=changes,
-    )
+    _record(_ct_id(sender), instance, ModelChangeLog.ACTION_DELETE, changes)
 
 
 @receiver(m2m_changed)
 def audit_m2m(sender, instance, action, reverse, model, pk_set, **kwargs):
     # This fires for every M2M everywhere; keep it extremely cheap.
-    if instance._meta.app_label != "characters":
-        return
     if action not in {"post_add", "post_remove", "post_clear"}:
         return
-
-    ct = ContentType.objects.get_for_model(instance.__class__)
-    cfg = _tracked_cfg_for_ct_id(ct.id)
+    cfg = _cfg(instance.__class__)
     if not cfg or not cfg["track_m2m"]:
         return
 
@@ -252,20 +431,9 @@ def audit_m2m(sender, instance, action, reverse, model, pk_set, **kwargs):
     if not field_name:
         return
 
-    user = get_current_user()
-    path = get_current_path()
-
-    ModelChangeLog.objects.create(
-        content_type=ct,
-        object_id=int(instance.pk),
-        object_repr=str(instance)[:200],
-        action=ModelChangeLog.ACTION_M2M,
-        changed_by=user if getattr(user, "is_authenticated", False) else None,
-        request_path=path,
-        changes={
-            field_name: {
-                "before": None,
-                "after": {"action": action, "pks": sorted(list(pk_set)) if pk_set else []},
-            }
-        },
-    )
+    _record(_ct_id(instance.__class__), instance, ModelChangeLog.ACTION_M2M, {
+        field_name: {
+            "before": None,
+            "after": {"action": action, "pks": sorted(list(pk_set)) if pk_set else []},
+        }
+    })
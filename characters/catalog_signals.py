@@ -0,0 +1,69 @@
+# characters/catalog_signals.py
+from __future__ import annotations
+
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from .models import (
+    Armor, ArmorTrait, CharacterClass, ClassFeat, ClassFeature, ClassLevel, ClassLevelFeature,
+    ClassProficiencyProgress, ClassSubclass, ClassTag, MartialMastery, PrestigeClass,
+    ProficiencyTier, Race, RaceFeatureOption, RacialFeature, Spell, SpellSlotRow,
+    SubclassGroup, SubclassTierLevel, SubSkill, Subrace, Weapon, WeaponTrait, WeaponTraitValue,
+)
+from .services.bulk_writes import bulk_saved
+from .services.rules_catalog import bump_catalog_version
+
+
+# Everything the rules catalog loads; any write here moves the catalog version.
+CATALOG_MODELS = (
+    CharacterClass,
+    ClassFeature,
+    RacialFeature,
+    ClassLevel,
+    ClassLevelFeature,
+    ClassProficiencyProgress,
+    ProficiencyTier,
+    SpellSlotRow,
+    SubclassGroup,
+    SubclassTierLevel,
+    MartialMastery,
+    Weapon,
+    WeaponTrait,
+    WeaponTraitValue,
+    Armor,
+    ArmorTrait,
+)
+
+# Not loaded by the catalog, but served by the cached codex views (services/codex_cache.py),
+# whose ETags are the catalog version.
+CODEX_MODELS = (
+    Spell,
+    ClassFeat,
+    Race,
+    Subrace,
+    RaceFeatureOption,
+    PrestigeClass,
+    ClassSubclass,
+    ClassTag,
+    SubSkill,
+)
+
+
+def _rules_changed(sender, **kwargs):
+    bump_catalog_version()
+
+
+for _model in CATALOG_MODELS + CODEX_MODELS:
+    post_save.connect(_rules_changed, sender=_model, dispatch_uid=f"rules_catalog:{_model.__name__}:save")
+    post_delete.connect(_rules_changed, sender=_model, dispatch_uid=f"rules_catalog:{_model.__name__}:delete")
+    bulk_saved.connect(_rules_changed, sender=_model, dispatch_uid=f"rules_catalog:{_model.__name__}:bulk")
+
+for _through in (
+    Armor.traits.through,
+    MartialMastery.classes.through,
+    MartialMastery.allowed_weapons.through,
+    MartialMastery.allowed_traits.through,
+    CharacterClass.tags.through,
+    ClassFeature.subclasses.through,
+    ClassFeature.gain_subskills.through,
+):
+    m2m_changed.connect(_rules_changed, sender=_through, dispatch_uid=f"rules_catalog:{_through.__name__}")
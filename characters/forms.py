@@ -421,11 +421,17 @@ class LevelUpForm(forms.Form):
                 choices.append((f"sub_{ss.id}", f"{ss.skill.name} – {ss.name}"))
 
         return choices
-    def __init__(self, *args, character, to_choose, uni, preview_cls, grants_class_feat=False, **kwargs):
+    def __init__(self, *args, character, to_choose, uni, preview_cls, grants_class_feat=False, planner=None, **kwargs):
         
         super().__init__(*args, **kwargs)
         self.character = character
         self.uni = uni
+        # services.level_up.LevelUpPlanner: class progress / owned feats already loaded for this request
+        self.planner = planner
+        if planner is not None:
+            existing_class_ids = [cp.character_class_id for cp in planner.class_progress()]
+        else:
+            existing_class_ids = character.class_progress.values_list("character_class_id", flat=True)
         # inside LevelUpForm.__init__ just after super().__init__
         next_level = character.level + 1
 
@@ -454,8 +460,7 @@ class LevelUpForm(forms.Form):
                 qs = CharacterClass.objects.order_by("name")
             elif next_level < 5:
                 # until you reach 5th level, you must stick to classes you already have
-                existing = character.class_progress.values_list("character_class_id", flat=True)
-                qs = CharacterClass.objects.filter(pk__in=existing).order_by("name")
+                qs = CharacterClass.objects.filter(pk__in=existing_class_ids).order_by("name")
             else:
                 # from 5th level onward, you may choose any class (multiclassing allowed)
                 qs = CharacterClass.objects.order_by("name")
@@ -463,15 +468,16 @@ class LevelUpForm(forms.Form):
             self.fields["base_class"].queryset = qs
         elif next_level < 5:
             # until you reach 5th level, you must stick to classes you already have
-            existing = character.class_progress.values_list("character_class_id", flat=True)
-            qs = CharacterClass.objects.filter(pk__in=existing).order_by("name")
+            qs = CharacterClass.objects.filter(pk__in=existing_class_ids).order_by("name")
         else:
             # from 5th level onward, you may choose any class (multiclassing allowed)
             qs = CharacterClass.objects.order_by("name")
         
         self.fields["base_class"].queryset = qs
 
-        if preview_cls:
+        if preview_cls and planner is not None:
+            cls_level_after = planner.class_level_after(preview_cls)
+        elif preview_cls:
             cp = character.class_progress.filter(character_class=preview_cls).first()
             cls_level_after = (cp.levels if cp else 0) + 1
         else:
@@ -515,7 +521,8 @@ class LevelUpForm(forms.Form):
                  .filter(Q(level_prerequisite__exact="") |
                          Q(level_prerequisite__iregex=rf'(^|[,;/\s]){lvl}([,;/\s]|$)'))
                  .filter(race_q)
-                 .exclude(pk__in=character.feats.values_list("feat__pk", flat=True))
+                 .exclude(pk__in=(planner.owned_feat_ids() if planner is not None
+                                  else character.feats.values_list("feat__pk", flat=True)))
                  .order_by("name"))
             self.fields["general_feat"].queryset = q
             self.fields["general_feat"].required = True
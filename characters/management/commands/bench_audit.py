@@ -0,0 +1,89 @@
+# characters/management/commands/bench_audit.py
+
+import time
+
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from characters.models import AuditTrackedModel, ModelChangeLog
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Audit-log overhead: load N rows of a model and save each with one changed field, "
+        "untracked vs. tracked (AuditTrackedModel enabled), inside one transaction whose "
+        "on_commit hooks are run and then rolled back. Prints queries and ms per mode."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", default="characters.Spell", help="app_label.Model to save (default characters.Spell).")
+        parser.add_argument("--field", default="", help="Text field to touch (default: first non-unique text field).")
+        parser.add_argument("--rows", type=int, default=50, help="Rows saved per round.")
+        parser.add_argument("--rounds", type=int, default=5, help="Measured rounds per mode.")
+
+    def _pick_field(self, model, name):
+        if name:
+            return model._meta.get_field(name)
+        for f in model._meta.concrete_fields:
+            if isinstance(f, (models.CharField, models.TextField)) and not f.unique and not f.choices:
+                return f
+        raise CommandError(f"{model.__name__} has no plain text field to touch; pass --field.")
+
+    def handle(self, *args, **opts):
+        try:
+            model = apps.get_model(opts["model"])
+        except (LookupError, ValueError) as e:
+            raise CommandError(str(e))
+        field = self._pick_field(model, opts["field"])
+        rows = max(1, opts["rows"])
+        rounds = max(1, opts["rounds"])
+        if not model.objects.exists():
+            raise CommandError(f"No {model.__name__} rows to save.")
+
+        results = {}
+        try:
+            with transaction.atomic():
+                ct = ContentType.objects.get_for_model(model)
+                tracking, _ = AuditTrackedModel.objects.get_or_create(content_type=ct)
+                for mode in ("untracked", "tracked"):
+                    tracking.enabled = mode == "tracked"
+                    tracking.track_updates = True
+                    tracking.save()   # clears the per-process tracking cache
+
+                    queries = ms = logged = 0
+                    for i in range(rounds + 1):               # first round warms caches
+                        before = ModelChangeLog.objects.count()
+                        with CaptureQueriesContext(connection) as q:
+                            t0 = time.perf_counter()
+                            with TestCase.captureOnCommitCallbacks(execute=True):
+                                for obj in model.objects.order_by("pk")[:rows]:
+                                    value = f"{getattr(obj, field.attname) or ''}~"
+                                    setattr(obj, field.attname, value[-field.max_length:] if field.max_length else value)
+                                    obj.save()
+                            elapsed = (time.perf_counter() - t0) * 1000
+                        if i:
+                            queries += len(q.captured_queries)
+                            ms += elapsed
+                            logged += ModelChangeLog.objects.count() - before
+                    results[mode] = (queries / rounds, ms / rounds, logged / rounds)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        self.stdout.write(f"{model.__name__}.{field.name}: {rows} saves per round, {rounds} rounds")
+        self.stdout.write(f"{'mode':<10} {'queries':>8} {'ms':>9} {'log rows':>9}")
+        for mode, (q, ms, logged) in results.items():
+            self.stdout.write(f"{mode:<10} {q:>8.1f} {ms:>9.1f} {logged:>9.1f}")
+        base_q, base_ms, _ = results["untracked"]
+        q, ms, _ = results["tracked"]
+        self.stdout.write(self.style.SUCCESS(
+            f"audit overhead: +{q - base_q:.1f} queries, +{ms - base_ms:.1f} ms per {rows} saves"
+        ))
@@ -0,0 +1,79 @@
+# characters/management/commands/bench_formulas.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from characters.models import ClassFeature
+from characters.services.formulas import (
+    cache_info, clear_cache, evaluate_int, normalize_formula,
+)
+
+FORMULA_FIELDS = (
+    "cantrips_formula", "spells_known_formula", "spells_prepared_formula",
+    "martial_points_formula", "available_masteries_formula",
+)
+
+# used when the DB has no formulas yet
+SAMPLE_FORMULAS = (
+    "level", "1 + level/4 round down", "ceil(level/2) + 1", "max(1, intelligence_mod + level)",
+    "2 + (class_level/3)", "wisdom_mod + level", "floor(level/5) + 2", "proficiency_modifier*2",
+)
+
+
+def _ctx(level: int) -> dict:
+    return {
+        "level": level, "class_level": level,
+        "strength_mod": 1, "dexterity_mod": 2, "constitution_mod": 1,
+        "intelligence_mod": 3, "wisdom_mod": 2, "charisma_mod": 0,
+        "proficiency_modifier": 2 + level // 4,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Micro-benchmark the formula engine: per-call parse + eval (the old way) "
+        "vs. the cached compiled formulas, over every formula stored on ClassFeature."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rounds", type=int, default=200, help="Evaluate every formula this many times per mode.")
+
+    def handle(self, *args, **opts):
+        rounds = max(1, int(opts["rounds"] or 200))
+
+        exprs = set()
+        for row in ClassFeature.objects.values_list(*FORMULA_FIELDS):
+            exprs.update(e.strip() for e in row if e and e.strip())
+        exprs = sorted(exprs) or list(SAMPLE_FORMULAS)
+        contexts = [_ctx(lvl) for lvl in range(1, 21)]
+        calls = rounds * len(exprs) * len(contexts)
+        self.stdout.write(f"{len(exprs)} distinct formulas × {len(contexts)} levels × {rounds} rounds = {calls} evaluations")
+
+        def _old(expr, ctx):
+            try:
+                return int(eval(normalize_formula.__wrapped__(expr), {"__builtins__": {}}, ctx))
+            except Exception:
+                return None
+
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for ctx in contexts:
+                for e in exprs:
+                    _old(e, ctx)
+        old_s = time.perf_counter() - t0
+
+        clear_cache()
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            for ctx in contexts:
+                for e in exprs:
+                    evaluate_int(e, ctx, None)
+        new_s = time.perf_counter() - t0
+
+        self.stdout.write(f"  eval() per call : {old_s * 1e6 / calls:8.2f} µs/eval  ({old_s:.3f}s)")
+        self.stdout.write(f"  compiled engine : {new_s * 1e6 / calls:8.2f} µs/eval  ({new_s:.3f}s)")
+        if new_s:
+            self.stdout.write(self.style.SUCCESS(f"✅ {old_s / new_s:.1f}× faster"))
+        info = cache_info()["compile"]
+        self.stdout.write(f"  compile cache: hits={info.hits} misses={info.misses} size={info.currsize}/{info.maxsize}")
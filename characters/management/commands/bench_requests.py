@@ -0,0 +1,225 @@
+# characters/management/commands/bench_requests.py
+"""
+End-to-end request benchmark: wall time + query count per endpoint, p50/p95,
+and an optional JSON report to diff between commits.
+
+Run generate_synthetic_data first; the GM / campaign / encounter / character
+are picked from that data unless given explicitly. The level-up POST is a full
+payload for the character's next level, checked against the preview endpoint
+before anything is timed.
+"""
+import json
+import logging
+import math
+import platform
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from campaigns.models import CampaignMembership, Encounter
+from characters.forms import LevelUpForm
+from characters.models import Character, ClassFeat
+from characters.services.level_up import LevelUpPlanner
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _pct(values, p):
+    vals = sorted(values)
+    if not vals:
+        return 0.0
+    k = max(0, min(len(vals) - 1, math.ceil(p / 100.0 * len(vals)) - 1))
+    return vals[k]
+
+
+def _git_rev():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=str(settings.BASE_DIR.parent), stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return ""
+
+
+def _level_up_payload(character) -> dict:
+    """
+    A complete level-up POST for `character`'s main class: every field the modal
+    would require, filled with its first choice.
+    """
+    planner = LevelUpPlanner(character)
+    progress = max(planner.class_progress(), key=lambda cp: int(cp.levels or 0), default=None)
+    if progress is None:
+        raise CommandError(f"Character {character.pk} has no class levels to advance.")
+    cls = progress.character_class
+    cls_level = planner.class_level_after(cls)
+    uni = planner.universal_features(character.level + 1)
+    form = LevelUpForm(None, character=character, to_choose=planner.level_features(cls, cls_level),
+                       preview_cls=cls, uni=uni[0] if uni else None, planner=planner)
+
+    data = {"level_up_submit": "1", "base_class": str(cls.pk), "advance_track": "base"}
+    for name, field in form.fields.items():
+        if name in data or name.startswith("asi"):
+            continue
+        # subclass / option pickers too, so the level grants what it would in play
+        if not (field.required or name.startswith("feat_")):
+            continue
+        if getattr(field, "queryset", None) is not None:
+            first = field.queryset.first()
+            if first is not None:
+                data[name] = str(first.pk)
+        elif getattr(field, "choices", None):
+            data[name] = str(list(field.choices)[0][0])
+    if "asi_mode" in form.fields:
+        data.update(asi_mode="1+1", asi_a="strength", asi_b="dexterity")
+
+    need = int(getattr(planner.skill_feat_grant(cls, cls_level), "num_picks", 0) or 0)
+    if need:
+        data["skill_feat_pick"] = [
+            str(pk) for pk in ClassFeat.objects.filter(feat_type__iexact="Skill")
+            .exclude(pk__in=planner.owned_feat_ids()).order_by("name").values_list("pk", flat=True)[:need]
+        ]
+    return data
+
+
+class Command(BaseCommand):
+    help = "Time and count queries for the hot pages / JSON endpoints; prints p50/p95 and can write a JSON report."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=10, help="Measured requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=1, help="Unmeasured requests per endpoint.")
+        parser.add_argument("--prefix", default="synth", help="Synthetic-data prefix to pick fixtures from.")
+        parser.add_argument("--character", type=int, help="Character id (default: highest-level synthetic character with class features).")
+        parser.add_argument("--campaign", type=int, help="Campaign id (default: synthetic campaign with the latest damage event).")
+        parser.add_argument("--only", default="", help="Comma-separated endpoint names to run.")
+        parser.add_argument("--json", dest="json_path", default="", help="Write the report here ('-' for stdout).")
+
+    def handle(self, *args, **opts):
+        runs, warmup = max(1, opts["runs"]), max(0, opts["warmup"])
+        prefix = opts["prefix"]
+
+        campaign_id = opts.get("campaign")
+        encounters = (Encounter.objects.filter(campaign_id=campaign_id) if campaign_id else
+                      Encounter.objects.filter(campaign__name__startswith=f"[{prefix}]"))
+        # the encounter with the most recent damage event (DESC puts NULLs first on Postgres)
+        encounter = (encounters.filter(damage_events__isnull=False).order_by("-damage_events__id").first()
+                     or encounters.order_by("id").first())
+        if not campaign_id:
+            if encounter is None:
+                raise CommandError("No synthetic campaign found; run generate_synthetic_data or pass --campaign.")
+            campaign_id = encounter.campaign_id
+        gm = CampaignMembership.objects.filter(campaign_id=campaign_id, role="gm").select_related("user").first()
+        if gm is None:
+            raise CommandError(f"Campaign {campaign_id} has no GM.")
+
+        # a character with class features, so the level-up planner has real rows to work through
+        qs = Character.objects.filter(pk=opts["character"]) if opts.get("character") else \
+            Character.objects.filter(user__username__startswith=f"{prefix}_", features__isnull=False) \
+            .distinct().order_by("-level", "id")
+        character = qs.select_related("user").first()
+        if character is None:
+            raise CommandError("No character found; run generate_synthetic_data or pass --character.")
+
+        hosts = [h for h in settings.ALLOWED_HOSTS if h and h != "*" and not h.startswith(".")]
+        host = hosts[0] if hosts else "localhost"
+        owner, gm_client = Client(HTTP_HOST=host), Client(HTTP_HOST=host)
+        owner.force_login(character.user)
+        gm_client.force_login(gm.user)
+
+        level_up = _level_up_payload(character)
+        preview = owner.post(reverse("characters:level_up_preview", args=[character.pk]), level_up).json()
+        if not preview.get("ok"):
+            problems = preview.get("form_errors") or (preview.get("plan") or {}).get("errors")
+            raise CommandError(f"Level-up payload for character {character.pk} is rejected: {problems}")
+
+        endpoints = [
+            ("character_detail", owner, "get", reverse("characters:character_detail", args=[character.pk]), None),
+            ("character_level_up", owner, "post", reverse("characters:character_detail", args=[character.pk]),
+             level_up),
+            ("create_character", owner, "get", reverse("characters:create_character"), None),
+            ("global_search", owner, "get", reverse("characters:global_search") + "?q=fire", None),
+            ("gm_dashboard", gm_client, "get", reverse("campaigns:gm_dashboard", args=[campaign_id]), None),
+            ("campaign_damage_stats", gm_client, "get", reverse("campaigns:campaign_damage_stats", args=[campaign_id]), None),
+            ("feat_data", owner, "get", reverse("characters:feat_data"), None),
+            ("mastery_data", owner, "get", reverse("characters:mastery_data"), None),
+            ("glossary_json", owner, "get", reverse("glossary_json"), None),
+        ]
+        if encounter is not None:
+            endpoints.insert(5, ("encounter_detail", gm_client, "get",
+                                 reverse("campaigns:encounter_detail", args=[campaign_id, encounter.pk]), None))
+        only = {s.strip() for s in opts["only"].split(",") if s.strip()}
+        if only:
+            endpoints = [e for e in endpoints if e[0] in only]
+
+        profiler = {**getattr(settings, "QUERY_PROFILER", {}), "RAISE_ON_BUDGET": False}
+        perf_log = logging.getLogger("perf.sql")
+        results = {}
+        with override_settings(QUERY_PROFILER=profiler):
+            perf_log.disabled = True
+            try:
+                for name, client, method, url, data in endpoints:
+                    results[name] = self._bench(client, method, url, data, runs, warmup)
+            finally:
+                perf_log.disabled = False
+
+        self.stdout.write(f"{'endpoint':<24} {'status':>6} {'p50 ms':>9} {'p95 ms':>9} {'p50 q':>7} {'p95 q':>7}")
+        for name, r in results.items():
+            self.stdout.write(f"{name:<24} {r['status']:>6} {r['ms']['p50']:>9.1f} {r['ms']['p95']:>9.1f} "
+                              f"{r['queries']['p50']:>7} {r['queries']['p95']:>7}")
+
+        if opts["json_path"]:
+            report = {
+                "meta": {
+                    "git": _git_rev(),
+                    "at": timezone.now().isoformat(),
+                    "db": connection.vendor,
+                    "python": platform.python_version(),
+                    "runs": runs,
+                    "character": character.pk,
+                    "campaign": campaign_id,
+                    "encounter": getattr(encounter, "pk", None),
+                },
+                "results": results,
+            }
+            text = json.dumps(report, indent=2, sort_keys=True)
+            if opts["json_path"] == "-":
+                self.stdout.write(text)
+            else:
+                with open(opts["json_path"], "w", encoding="utf-8") as fh:
+                    fh.write(text + "\n")
+                self.stdout.write(self.style.SUCCESS(f"✅ Report written to {opts['json_path']}"))
+
+    def _bench(self, client, method, url, data, runs, warmup):
+        times, counts, status = [], [], None
+        for i in range(warmup + runs):
+            try:
+                # POSTs (level-up) run inside a transaction that is always rolled back
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as q:
+                        t0 = time.perf_counter()
+                        resp = client.get(url) if method == "get" else client.post(url, data or {})
+                        dt = (time.perf_counter() - t0) * 1000.0
+                    if method != "get":
+                        raise _Rollback
+            except _Rollback:
+                pass
+            status = resp.status_code
+            if i >= warmup:
+                times.append(dt)
+                counts.append(len(q.captured_queries))
+        return {
+            "url": url,
+            "method": method.upper(),
+            "status": status,
+            "ms": {"p50": round(_pct(times, 50), 2), "p95": round(_pct(times, 95), 2),
+                   "mean": round(statistics.fmean(times), 2), "max": round(max(times), 2)},
+            "queries": {"p50": _pct(counts, 50), "p95": _pct(counts, 95), "max": max(counts)},
+        }
@@ -0,0 +1,65 @@
+# characters/management/commands/bench_rules_catalog.py
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from characters.models import Character, CharacterClass
+from characters.services import rules_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        "Query counts / timings for character_detail and class_detail with a cold "
+        "rules catalog (rebuilt for every request) vs. a warm one (loaded once per worker)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--character", type=int, help="Character id (default: first character).")
+        parser.add_argument("--class", dest="class_id", type=int, help="CharacterClass id (default: first class).")
+        parser.add_argument("--runs", type=int, default=5, help="Requests per mode.")
+
+    def handle(self, *args, **opts):
+        runs = max(1, int(opts["runs"] or 5))
+        character = (Character.objects.filter(pk=opts["character"]).first() if opts.get("character")
+                     else Character.objects.order_by("id").first())
+        cls = (CharacterClass.objects.filter(pk=opts["class_id"]).first() if opts.get("class_id")
+               else CharacterClass.objects.order_by("id").first())
+        if character is None or cls is None:
+            raise CommandError("Need at least one Character and one CharacterClass.")
+
+        hosts = [h for h in settings.ALLOWED_HOSTS if h and h != "*" and not h.startswith(".")]
+        client = Client(HTTP_HOST=hosts[0] if hosts else "localhost")
+        client.force_login(character.user)
+
+        urls = [
+            ("character_detail", reverse("characters:character_detail", args=[character.pk])),
+            ("class_detail", reverse("characters:class_detail", args=[cls.pk])),
+        ]
+
+        def _measure(url, cold):
+            queries = ms = 0.0
+            for _ in range(runs):
+                if cold:
+                    rules_catalog.clear_local()
+                with CaptureQueriesContext(connection) as q:
+                    t0 = time.perf_counter()
+                    resp = client.get(url)
+                    ms += (time.perf_counter() - t0) * 1000
+                if resp.status_code != 200:
+                    raise CommandError(f"GET {url} -> {resp.status_code}")
+                queries += len(q.captured_queries)
+            return queries / runs, ms / runs
+
+        self.stdout.write(f"{'view':<18} {'cold q':>8} {'warm q':>8} {'cold ms':>9} {'warm ms':>9}")
+        for name, url in urls:
+            client.get(url)  # warm templates / other per-process caches
+            cold_q, cold_ms = _measure(url, cold=True)
+            rules_catalog.get_catalog()
+            warm_q, warm_ms = _measure(url, cold=False)
+            self.stdout.write(f"{name:<18} {cold_q:>8.1f} {warm_q:>8.1f} {cold_ms:>9.1f} {warm_ms:>9.1f}")
@@ -0,0 +1,282 @@
+# characters/management/commands/generate_synthetic_data.py
+"""
+Load-shaped fake data for benchmarking (see bench_requests).
+
+Everything created here is tagged with --prefix (usernames, campaign names),
+so `--flush` removes exactly what a previous run created. Rules/catalog data
+from data.json or the sheets sync is reused when present; a small synthetic
+catalog is created only for the pieces that are missing.
+"""
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from campaigns.models import (
+    Campaign, CampaignMembership, DamageEvent, EnemyType, Encounter, EncounterEnemy, EncounterParticipant,
+)
+from characters.models import (
+    Character, CharacterClass, CharacterClassProgress, CharacterItem, CharacterKnownSpell,
+    CharacterPreparedSpell, CharacterPrestigeLevelChoice, ClassProficiencyProgress, ModelChangeLog,
+    PrestigeClass, ProficiencyTier, Spell, Weapon,
+)
+
+BATCH = 2000
+ORIGINS = ("arcane", "divine", "primal", "occult")
+ABILITIES = ("strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma")
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, multiclass characters (levels 1-20, prestige picks, known/prepared "
+        "spells, inventories), campaigns with encounters + damage logs and a large ModelChangeLog."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--characters-per-user", type=int, default=4)
+        parser.add_argument("--campaigns", type=int, default=10)
+        parser.add_argument("--encounters-per-campaign", type=int, default=8)
+        parser.add_argument("--damage-events", type=int, default=5000, help="Total DamageEvents across all encounters.")
+        parser.add_argument("--changelog", type=int, default=20000, help="ModelChangeLog rows to create.")
+        parser.add_argument("--prefix", default="synth", help="Tag for generated usernames / campaign names.")
+        parser.add_argument("--seed", type=int, default=1234)
+        parser.add_argument("--flush", action="store_true", help="Delete previously generated data with this prefix first.")
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(opts["seed"])
+        prefix = opts["prefix"].strip() or "synth"
+
+        if opts["flush"]:
+            self._flush(prefix)
+
+        with transaction.atomic():
+            catalog = self._ensure_catalog(prefix, rnd)
+            users = self._users(prefix, opts["users"])
+            characters = self._characters(users, opts["characters_per_user"], catalog, rnd)
+            self._spells_and_items(characters, catalog, rnd)
+            self._campaigns(prefix, users, characters, catalog, opts, rnd)
+            self._changelog(characters, users, opts["changelog"], rnd)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(users)} users, {len(characters)} characters, {opts['campaigns']} campaigns "
+            f"(prefix={prefix!r}, seed={opts['seed']})."
+        ))
+
+    # ── cleanup ──────────────────────────────────────────────────────────────
+    def _flush(self, prefix):
+        User = get_user_model()
+        ct = ContentType.objects.get_for_model(Character)
+        ids = list(Character.objects.filter(user__username__startswith=f"{prefix}_").values_list("id", flat=True))
+        ModelChangeLog.objects.filter(content_type=ct, object_id__in=ids).delete()
+        Campaign.objects.filter(name__startswith=f"[{prefix}]").delete()
+        deleted, _ = User.objects.filter(username__startswith=f"{prefix}_").delete()
+        self.stdout.write(f"🧹 Flushed {deleted} rows for prefix {prefix!r}.")
+
+    # ── catalog (reuse real data; fill gaps) ─────────────────────────────────
+    def _ensure_catalog(self, prefix, rnd):
+        tiers = list(ProficiencyTier.objects.order_by("bonus"))
+        if not tiers:
+            tiers = [ProficiencyTier.objects.create(name=n, bonus=i * 2)
+                     for i, n in enumerate(("Untrained", "Trained", "Expert", "Master", "Legendary"))]
+
+        classes = list(CharacterClass.objects.all())
+        if not classes:
+            for name, die in (("Fighter", 10), ("Wizard", 6), ("Cleric", 8), ("Rogue", 8)):
+                cls = CharacterClass.objects.create(name=f"{prefix} {name}", hit_die=die)
+                ClassProficiencyProgress.objects.bulk_create([
+                    ClassProficiencyProgress(character_class=cls, proficiency_type=code, at_level=lvl, tier=tiers[t])
+                    for code in ("dodge", "reflex", "fortitude", "will", "perception")
+                    for lvl, t in ((1, 1), (7, 2), (13, 3)) if t < len(tiers)
+                ])
+                classes.append(cls)
+
+        spells = list(Spell.objects.only("id", "level", "origin"))
+        if not spells:
+            Spell.objects.bulk_create([
+                Spell(name=f"{prefix} spell {i}", level=i % 11, origin=ORIGINS[i % len(ORIGINS)],
+                      description="Synthetic spell.", casting_time="1", duration="Instant",
+                      components="V", range="30 ft", target="1 creature")
+                for i in range(200)
+            ])
+            spells = list(Spell.objects.only("id", "level", "origin"))
+
+        weapons = list(Weapon.objects.all())
+        if not weapons:
+            weapons = [Weapon.objects.create(name=f"{prefix} weapon {i}", damage="1d8", category="martial")
+                       for i in range(12)]
+
+        enemy_types = list(EnemyType.objects.all()[:200])
+        if not enemy_types:
+            enemy_types = [EnemyType.objects.create(name=f"{prefix} foe {i}", level=i, hp=10 + i * 8)
+                           for i in range(20)]
+
+        prestige = list(PrestigeClass.objects.all())
+        return {"classes": classes, "spells": spells, "weapons": weapons,
+                "enemy_types": enemy_types, "prestige": prestige}
+
+    # ── people ───────────────────────────────────────────────────────────────
+    def _users(self, prefix, n):
+        User = get_user_model()
+        start = User.objects.filter(username__startswith=f"{prefix}_").count()
+        users = [User(username=f"{prefix}_{start + i}", email=f"{prefix}_{start + i}@example.invalid", is_active=True)
+                 for i in range(n)]
+        for u in users:
+            u.set_unusable_password()
+        User.objects.bulk_create(users, batch_size=BATCH)
+        return list(User.objects.filter(username__in=[u.username for u in users]).order_by("id"))
+
+    def _characters(self, users, per_user, catalog, rnd):
+        chars = []
+        for u in users:
+            for j in range(per_user):
+                # skew towards low/mid levels like a real table, but cover 1-20
+                level = min(20, max(1, int(rnd.triangular(1, 21, 6))))
+                scores = {a: rnd.randint(8, 18) for a in ABILITIES}
+                chars.append(Character(user=u, name=f"{u.username} hero {j}", level=level, **scores))
+        Character.objects.bulk_create(chars, batch_size=BATCH)
+        chars = list(Character.objects.filter(user__in=users).order_by("id"))
+
+        progress, prestige_rows = [], []
+        for ch in chars:
+            # 1-3 classes, levels split between them
+            n_classes = 1 if ch.level < 3 else rnd.choice((1, 1, 2, 2, 3))
+            picked = rnd.sample(catalog["classes"], min(n_classes, len(catalog["classes"])))
+            remaining = ch.level
+            for i, cls in enumerate(picked):
+                lv = remaining if i == len(picked) - 1 else rnd.randint(1, max(1, remaining - (len(picked) - i - 1)))
+                remaining -= lv
+                progress.append(CharacterClassProgress(character=ch, character_class=cls, levels=lv))
+
+            if catalog["prestige"] and ch.level >= 7 and rnd.random() < 0.3:
+                pc = rnd.choice(catalog["prestige"])
+                for p_lvl in range(2, min(ch.level - 5, 6) + 1):
+                    prestige_rows.append(CharacterPrestigeLevelChoice(
+                        character=ch, prestige_class=pc, prestige_level=p_lvl,
+                        char_level_at_gain=6 + p_lvl, counts_as=rnd.choice(picked),
+                    ))
+        CharacterClassProgress.objects.bulk_create(progress, batch_size=BATCH)
+        CharacterPrestigeLevelChoice.objects.bulk_create(prestige_rows, batch_size=BATCH)
+        return chars
+
+    def _spells_and_items(self, characters, catalog, rnd):
+        spells_by_origin = {}
+        for s in catalog["spells"]:
+            spells_by_origin.setdefault((s.origin or "").lower(), []).append(s)
+        origins = [o for o in spells_by_origin if o] or list(spells_by_origin)
+        weapon_ct = ContentType.objects.get_for_model(Weapon)
+
+        known, prepared, items = [], [], []
+        for ch in characters:
+            max_rank = (ch.level + 1) // 2
+            if origins and rnd.random() < 0.6:
+                origin = rnd.choice(origins)
+                pool = [s for s in spells_by_origin[origin] if (s.level or 0) <= max_rank]
+                picks = rnd.sample(pool, min(len(pool), 4 + ch.level))
+                for s in picks:
+                    known.append(CharacterKnownSpell(character=ch, spell=s, origin=origin, rank=s.level or 0))
+                for s in picks[: 2 + ch.level // 2]:
+                    prepared.append(CharacterPreparedSpell(character=ch, spell=s, origin=origin,
+                                                           rank=max(s.level or 0, min(max_rank, (s.level or 0) + 1))))
+
+            for w in rnd.sample(catalog["weapons"], min(len(catalog["weapons"]), rnd.randint(1, 3))):
+                items.append(CharacterItem(character=ch, item_content_type=weapon_ct, item_object_id=w.id,
+                                           name=w.name, quantity=1, is_equipped=rnd.random() < 0.5))
+            for k in range(rnd.randint(2, 12)):
+                items.append(CharacterItem(character=ch, is_custom=True, name=f"Trinket {k}",
+                                           quantity=rnd.randint(1, 5), description="Synthetic inventory item."))
+
+        CharacterKnownSpell.objects.bulk_create(known, batch_size=BATCH, ignore_conflicts=True)
+        CharacterPreparedSpell.objects.bulk_create(prepared, batch_size=BATCH, ignore_conflicts=True)
+        CharacterItem.objects.bulk_create(items, batch_size=BATCH)
+
+    # ── campaigns / encounters / damage ─────────────────────────────────────
+    def _campaigns(self, prefix, users, characters, catalog, opts, rnd):
+        n_campaigns = opts["campaigns"]
+        if not n_campaigns or not users:
+            return
+        chars_by_user = {}
+        for ch in characters:
+            chars_by_user.setdefault(ch.user_id, []).append(ch)
+
+        campaigns = Campaign.objects.bulk_create(
+            [Campaign(name=f"[{prefix}] Campaign {i}", description="Synthetic campaign.") for i in range(n_campaigns)]
+        )
+        campaigns = list(Campaign.objects.filter(name__startswith=f"[{prefix}] Campaign").order_by("-id")[:n_campaigns])
+
+        memberships, party_by_campaign = [], {}
+        for i, camp in enumerate(campaigns):
+            gm = users[i % len(users)]
+            players = [u for u in rnd.sample(users, min(len(users), 6)) if u.id != gm.id][:5]
+            memberships.append(CampaignMembership(user=gm, campaign=camp, role="gm"))
+            memberships += [CampaignMembership(user=u, campaign=camp, role="pc") for u in players]
+            party_by_campaign[camp.id] = [chars_by_user[u.id][0] for u in players if chars_by_user.get(u.id)]
+        CampaignMembership.objects.bulk_create(memberships, batch_size=BATCH, ignore_conflicts=True)
+
+        party_ids = [ch.id for party in party_by_campaign.values() for ch in party]
+        for camp_id, party in party_by_campaign.items():
+            Character.objects.filter(id__in=[c.id for c in party]).update(campaign_id=camp_id)
+
+        Encounter.objects.bulk_create([
+            Encounter(campaign=camp, name=f"Encounter {j}")
+            for camp in campaigns for j in range(opts["encounters_per_campaign"])
+        ], batch_size=BATCH)
+        encounters = list(Encounter.objects.filter(campaign__in=campaigns))
+
+        enemies, participants = [], []
+        for enc in encounters:
+            for k in range(rnd.randint(2, 8)):
+                et = rnd.choice(catalog["enemy_types"])
+                hp = max(1, et.hp)
+                enemies.append(EncounterEnemy(encounter=enc, enemy_type=et, max_hp=hp, current_hp=rnd.randint(0, hp),
+                                              initiative=rnd.randint(1, 25), side="enemy" if k else "neutral"))
+            for ch in party_by_campaign.get(enc.campaign_id, []):
+                participants.append(EncounterParticipant(encounter=enc, character=ch, initiative=rnd.randint(1, 25)))
+        EncounterEnemy.objects.bulk_create(enemies, batch_size=BATCH)
+        EncounterParticipant.objects.bulk_create(participants, batch_size=BATCH, ignore_conflicts=True)
+
+        enemies_by_enc, parts_by_enc = {}, {}
+        for e in EncounterEnemy.objects.filter(encounter__in=encounters).only("id", "encounter_id"):
+            enemies_by_enc.setdefault(e.encounter_id, []).append(e)
+        for p in EncounterParticipant.objects.filter(encounter__in=encounters).select_related("character").only(
+                "id", "encounter_id", "character__id", "character__user_id"):
+            parts_by_enc.setdefault(p.encounter_id, []).append(p)
+
+        events = []
+        for _ in range(opts["damage_events"] if encounters else 0):
+            enc = rnd.choice(encounters)
+            foes, pcs = enemies_by_enc.get(enc.id, []), parts_by_enc.get(enc.id, [])
+            kind = "heal" if rnd.random() < 0.15 else "dmg"
+            ev = DamageEvent(encounter=enc, kind=kind, amount=rnd.randint(1, 40), note="")
+            if pcs and foes and rnd.random() < 0.6:
+                p = rnd.choice(pcs)
+                ev.attacker_character, ev.attacker_user_id, ev.target_enemy = p.character, p.character.user_id, rnd.choice(foes)
+            elif pcs and foes:
+                ev.attacker_enemy, ev.target_character = rnd.choice(foes), rnd.choice(pcs).character
+            elif foes:
+                ev.target_enemy = rnd.choice(foes)
+            events.append(ev)
+        DamageEvent.objects.bulk_create(events, batch_size=BATCH)
+        self.stdout.write(f"  • {len(encounters)} encounters, {len(enemies)} enemies, {len(events)} damage events, "
+                          f"{len(party_ids)} party characters")
+
+    # ── audit history ───────────────────────────────────────────────────────
+    def _changelog(self, characters, users, n, rnd):
+        if not n or not characters:
+            return
+        ct = ContentType.objects.get_for_model(Character)
+        rows = []
+        for _ in range(n):
+            ch = rnd.choice(characters)
+            field = rnd.choice(ABILITIES + ("level", "gold", "HP"))
+            before = rnd.randint(0, 20)
+            rows.append(ModelChangeLog(
+                content_type=ct, object_id=ch.id, object_repr=ch.name[:200],
+                action=ModelChangeLog.ACTION_UPDATE, changed_by=rnd.choice(users),
+                request_path=f"/characters/{ch.id}/",
+                changes={field: {"before": before, "after": before + rnd.choice((-2, -1, 1, 2))}},
+            ))
+        ModelChangeLog.objects.bulk_create(rows, batch_size=BATCH)
+        self.stdout.write(f"  • {len(rows)} change log rows")
@@ -6,6 +6,7 @@ from django.db import transaction
 from django.db.models import Q
 
 from characters.models import ClassFeature
+from characters.services.bulk_writes import bulk_update_audited
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -456,6 +457,6 @@ class Command(BaseCommand):
             return
 
         with transaction.atomic():
-            ClassFeature.objects.bulk_update(changed, ["description"], batch_size=500)
+            bulk_update_audited(changed, ["description"], batch_size=500)
 
         self.stdout.write(self.style.SUCCESS(f"Updated {len(changed)} rows (description only)."))
@@ -0,0 +1,39 @@
+# characters/management/commands/rebuild_search_index.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from characters.services import search_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the SearchDocument table used by global search "
+        "(all searchable models, or only the ones given with --model)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model", action="append", default=[],
+                            help="Model name to reindex (e.g. Spell); repeatable. Default: all.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Rows per upsert batch.")
+
+    def handle(self, *args, **opts):
+        if not search_index.enabled():
+            raise CommandError("The search index needs PostgreSQL (tsvector + pg_trgm).")
+
+        by_name = {m.__name__.lower(): m for _, m in search_index.SEARCHABLES}
+        wanted = []
+        for name in opts["model"]:
+            model = by_name.get(name.strip().lower())
+            if model is None:
+                raise CommandError(f"Unknown model '{name}'. Choose from: {', '.join(sorted(by_name))}")
+            wanted.append(model)
+
+        t0 = time.perf_counter()
+        counts = search_index.rebuild(wanted or None, batch_size=max(1, opts["batch_size"]))
+        for label, n in counts.items():
+            self.stdout.write(f"  {label:<22} {n:>6}")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Indexed {sum(counts.values())} documents in {time.perf_counter() - t0:.1f}s."
+        ))
@@ -0,0 +1,42 @@
+# characters/management/commands/reindex_rulebook_terms.py
+
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from characters.services import rulebook_terms
+
+
+class Command(BaseCommand):
+    help = "Recompute RulebookPage.plain_text and the RulebookPageTerm glossary occurrence index."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stale-only", action="store_true",
+                            help="Only pages indexed with an older glossary version.")
+        parser.add_argument("--batch-size", type=int, default=rulebook_terms.BATCH_SIZE, help="Pages per batch.")
+        parser.add_argument("--watch", action="store_true",
+                            help="Keep polling for stale pages (implies --stale-only); run by the worker process.")
+        parser.add_argument("--interval", type=float, default=10.0,
+                            help="Seconds to sleep between polls with --watch.")
+
+    def handle(self, *args, **opts):
+        batch_size = max(1, opts["batch_size"])
+        if not opts["watch"]:
+            t0 = time.perf_counter()
+            n = rulebook_terms.reindex_all(batch_size, stale_only=opts["stale_only"])
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Reindexed {n} rulebook page(s) in {time.perf_counter() - t0:.1f}s."
+            ))
+            return
+
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        while not stopping:
+            close_old_connections()
+            t0 = time.perf_counter()
+            n = rulebook_terms.reindex_all(batch_size, stale_only=True)
+            if n:
+                self.stdout.write(f"📚 Reindexed {n} stale rulebook page(s) in {time.perf_counter() - t0:.1f}s")
+            time.sleep(opts["interval"])
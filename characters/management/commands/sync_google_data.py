@@ -1,16 +1,20 @@
 import os
 import json
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.exceptions import ImproperlyConfigured
 from django.core.management.base import BaseCommand
-from oauth2client.service_account import ServiceAccountCredentials
-import gspread
 
-from characters.models import Spell, ClassFeat
+from characters.models import Spell, ClassFeat, SheetSyncState
 from django.db import connection, transaction
 from django.db.models.deletion import ProtectedError
 from collections import defaultdict
 
 from django.contrib.auth import get_user_model
 from characters.audit_context import set_current_request, clear_current_request
+from characters.services.bulk_writes import bulk_create_audited, bulk_update_audited
+from characters.services.sheet_sources import get_source, write_fixtures
 SYNC_LOCK_KEY = 84261741  # any fixed integer is fine
 
 
@@ -33,6 +37,43 @@ def release_sync_lock() -> None:
     with connection.cursor() as cur:
         cur.execute("SELECT pg_advisory_unlock(%s)", [SYNC_LOCK_KEY])
 
+
+def sync_lock_held() -> bool:
+    """
+    True while this session still holds the advisory lock. The lock belongs to the
+    DB session, so a connection dropped while waiting on the network loses it.
+    """
+    engine = (connection.settings_dict.get("ENGINE") or "").lower()
+    if "postgresql" not in engine:
+        return True
+
+    with connection.cursor() as cur:
+        cur.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' AND granted"
+            " AND pid = pg_backend_pid() AND classid = 0 AND objid = %s AND objsubid = 1)",
+            [SYNC_LOCK_KEY],
+        )
+        return bool(cur.fetchone()[0])
+
+
+class StageClock:
+    """Wall-clock time per pipeline stage; lap(name) closes the stage that just ran."""
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.laps = []
+
+    def lap(self, name: str) -> None:
+        now = time.perf_counter()
+        self.laps.append((name, now - self.last))
+        print(f"⏱️  {name}: {now - self.last:.2f}s", flush=True)
+        self.last = now
+
+    def summary(self) -> str:
+        parts = [f"{name} {secs:.2f}s" for name, secs in self.laps]
+        return " · ".join(parts + [f"total {time.perf_counter() - self.started:.2f}s"])
+
+
 def get_feat_name_from_row(row: dict) -> str:
     """
     Return the feat name exactly as in the sheet (trim edges only).
@@ -81,6 +122,31 @@ def canonical_name(s: str) -> str:
     return " ".join(str(s).split()).strip()
 
 
+# ─── Change detection ─────────────────────────────────────────────────────────
+# Bump when the row normalization below changes, so every stored hash goes stale
+# and the next run re-diffs all rows.
+HASH_VERSION = 1
+
+
+def content_hash(*parts) -> str:
+    """Stable hash of JSON-able values (dict key order doesn't matter)."""
+    blob = json.dumps([HASH_VERSION, *parts], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def load_tab_hashes(book: str) -> dict:
+    return dict(SheetSyncState.objects.filter(book=book).values_list("worksheet", "content_hash"))
+
+
+def save_tab_hashes(book: str, tabs: dict) -> None:
+    """tabs: {worksheet title: (content hash, row count)}"""
+    for title, (tab_hash, rows) in tabs.items():
+        SheetSyncState.objects.update_or_create(
+            book=book, worksheet=title,
+            defaults={"content_hash": tab_hash, "row_count": rows},
+        )
+
+
 # ─── Constants ────────────────────────────────────────────────────────────────
 LEVEL_MAP = {
     'Cantrips': 0,
@@ -143,37 +209,51 @@ class Command(BaseCommand):
             help='Safety: require at least this many spell rows from the sheet before allowing deletion.'
         )
 
+        # Source / change detection
+        parser.add_argument(
+            '--fixtures',
+            metavar='DIR',
+            help='Read the books from a local fixture directory (<DIR>/spells/<tab>.json|csv, '
+                 '<DIR>/feats/Feats.json|csv) instead of Google Sheets.'
+        )
+        parser.add_argument(
+            '--dump-fixtures',
+            metavar='DIR',
+            help='Also write the fetched worksheets to DIR in the --fixtures layout.'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Ignore stored worksheet/row hashes and re-diff every row against the database.'
+        )
+
     def handle(self, *args, **options):
         # DB info
         print("📡 DB ENGINE:", connection.settings_dict['ENGINE'], flush=True)
         print("📡 DB NAME:  ", connection.settings_dict['NAME'],  flush=True)
         print("🟢 SYNC JOB STARTED", flush=True)
 
-        # --- AUDIT CONTEXT (so audit logger can attach changed_by/source) ---
-        User = get_user_model()
-        bot = User.objects.filter(username="gsheet_bot").first()
-        set_current_request(bot, "/mgmt/sync_google_sheets")
+        # The advisory lock covers the whole pipeline: fetch, diff, write, de-dupe and deletions.
+        if not acquire_sync_lock():
+            self.stderr.write("⛔ Another sync_google_sheets process is already running. Exiting.")
+            return
+        clock = StageClock()
 
-        got_lock = False
         try:
-            got_lock = acquire_sync_lock()
-            if not got_lock:
-                self.stderr.write("⛔ Another sync_google_sheets process is already running. Exiting.")
-                return
-            # Google creds
-            json_creds = os.environ.get("GOOGLE_SHEETS_CREDENTIALS_JSON")
-            if not json_creds:
-                self.stderr.write("❌ ERROR: GOOGLE_SHEETS_CREDENTIALS_JSON not set")
+            # --- AUDIT CONTEXT (so audit logger can attach changed_by/source) ---
+            User = get_user_model()
+            bot = User.objects.filter(username="gsheet_bot").first()
+            set_current_request(bot, "/mgmt/sync_google_sheets")
+
+            try:
+                source = get_source(options.get('fixtures'))
+            except ImproperlyConfigured as e:
+                self.stderr.write(f"❌ ERROR: {e}")
                 return
+            print(f"✅ Sheet source: {source.describe()}", flush=True)
 
-            creds_dict = json.loads(json_creds)
-            scope = [
-                "https://spreadsheets.google.com/feeds",
-                "https://www.googleapis.com/auth/drive",
-            ]
-            creds = ServiceAccountCredentials.from_json_keyfile_dict(creds_dict, scope)
-            client = gspread.authorize(creds)
-            print("✅ Google Sheets client initialized", flush=True)
+            full = bool(options.get('full'))
+            dump_dir = options.get('dump_fixtures')
 
             try:
                 # ─── SPELLS ─────────────────────────────────────────────────────
@@ -244,21 +324,6 @@ class Command(BaseCommand):
                     s = " ".join(s.split())
                     return _LEVEL_MAP.get(s, fallback)
 
-                # Index existing spells by canonical key
-                from collections import defaultdict as _dd
-                spell_by_key = _dd(list)
-                for r in Spell.objects.all().values('id', 'name'):
-                    key = canonical_spell_name(r['name']).lower()
-                    if key:
-                        spell_by_key[key].append(r['id'])
-
-                spell_keys = set()            # seen in sheet
-                spell_display_by_key = {}     # canonical key -> exact sheet display name
-                created, updated = 0, 0
-                sample = []
-
-                spell_book = client.open_by_key("1tUP5rXleImOKnrOVGBnmxNHHDAyU0HHxeuODgLDX8SM")
-
                 def normalize_tab_name(s: str) -> str:
                     # normalize whitespace + invisible chars in the TAB title
                     s2 = _clean_invisible_spaces(s or "")
@@ -266,20 +331,77 @@ class Command(BaseCommand):
 
                 valid_tabs = set(_LEVEL_MAP.keys())
 
-                for sheet in spell_book.worksheets():
-                    title_key = normalize_tab_name(sheet.title)
+                # ─── FETCH ──────────────────────────────────────────────────────
+                # All network reads happen here, before any row is processed: every level tab
+                # of the spell book in one batched request, the feats tab alongside it.
+                def fetch_spell_tabs():
+                    level_titles = []
+                    for title in source.titles("spells"):
+                        # IMPORTANT: skip any worksheet not explicitly mapped to a spell level
+                        if normalize_tab_name(title) in valid_tabs:
+                            level_titles.append(title)
+                        else:
+                            print(f"⏭️ Skipping non-level worksheet: {title!r}", flush=True)
+                    return source.fetch("spells", level_titles)
+
+                def fetch_feat_tab():
+                    titles = source.titles("feats")
+                    # Find the "Feats" tab robustly (trim spaces, case-insensitive)
+                    title = next((t for t in titles if t.strip().lower() == "feats"), None)
+                    return titles, title, (source.records("feats", title) if title is not None else None)
+
+                with ThreadPoolExecutor(max_workers=2) as pool:
+                    spell_fetch = pool.submit(fetch_spell_tabs)
+                    feat_fetch = pool.submit(fetch_feat_tab)
+                    spell_sheets = spell_fetch.result()
+                    feat_titles, feat_title, raw_feats = feat_fetch.result()
+
+                if dump_dir:
+                    write_fixtures(dump_dir, "spells", spell_sheets)
+                    if feat_title is not None:
+                        write_fixtures(dump_dir, "feats", {feat_title: raw_feats})
+                clock.lap("fetch")
+
+                if not sync_lock_held():
+                    self.stderr.write("⛔ Lost the sync lock while fetching (DB connection dropped?). Nothing written.")
+                    return
 
-                    # IMPORTANT: skip any worksheet not explicitly mapped to a spell level
-                    if title_key not in valid_tabs:
-                        print(f"⏭️ Skipping non-level worksheet: {sheet.title!r}", flush=True)
-                        continue
+                # Index existing spells by canonical key with their stored row hashes. Only rows
+                # whose sheet hash differs are loaded and diffed; they go out in one audited bulk update.
+                from collections import defaultdict as _dd
+                spell_by_key = _dd(list)
+                spell_hashes = {}             # id -> sync_hash
+                for sid, sname, shash in Spell.objects.values_list('id', 'name', 'sync_hash'):
+                    key = canonical_spell_name(sname).lower()
+                    if key:
+                        spell_by_key[key].append(sid)
+                    spell_hashes[sid] = shash
+                new_spells = {}               # canonical key -> unsaved Spell
+                pending_spells = {}           # id -> (sheet name, fields, row hash, tab title)
+                dirty_spells = {}             # id -> edited Spell
+                dirty_spell_fields = set()
+
+                spell_keys = set()            # seen in sheet
+                spell_display_by_key = {}     # canonical key -> exact sheet display name
+                created, updated = 0, 0
+                unchanged_rows = 0
+                sample = []
 
-                    tab_level = _LEVEL_MAP[title_key]
+                spell_tab_hashes = {} if full else load_tab_hashes("spells")
+                spell_tabs = {}               # title -> (tab hash, row count), stored after the write
 
-                    print(f"📘 Processing sheet: {sheet.title!r} → level={tab_level}", flush=True)
-                    raw_rows = sheet.get_all_records(default_blank="", head=1)
+                for title, raw_rows in spell_sheets.items():
+                    tab_level = _LEVEL_MAP[normalize_tab_name(title)]
 
+                    print(f"📘 Processing sheet: {title!r} → level={tab_level}", flush=True)
                     print(f"🔢 Found {len(raw_rows)} rows", flush=True)
+                    tab_hash = content_hash(raw_rows)
+                    spell_tabs[title] = (tab_hash, len(raw_rows))
+                    # An unchanged tab still yields its keys (deletion pass / de-dupe) and
+                    # re-creates rows missing from the DB, but existing rows are not re-diffed.
+                    tab_unchanged = spell_tab_hashes.get(title) == tab_hash
+                    if tab_unchanged:
+                        print("⏩ Worksheet unchanged since last sync", flush=True)
                     if not raw_rows:
                         continue
 
@@ -295,7 +417,6 @@ class Command(BaseCommand):
                         # normalize header keys
                         row = {(k.strip() if isinstance(k, str) else k): v for k, v in raw.items()}
 
-                        # 1) get the spell name from the row
                         # 1) spell name MUST come from the first column only (name_col)
                         name_sheet = canonical_spell_name(safe_str(row.get(name_col)))
                         if not is_valid_spell_name(name_sheet):
@@ -306,6 +427,11 @@ class Command(BaseCommand):
                         spell_keys.add(key)
                         spell_display_by_key[key] = name_sheet
 
+                        ids = spell_by_key.get(key, [])
+                        if tab_unchanged and ids:
+                            unchanged_rows += len(ids)
+                            continue
+
                         # 3) determine spell level: row override > tab level
                         row_level = parse_level(
                             first_nonempty(row, 'Level', 'Spell Level', 'Rank'),
@@ -330,46 +456,58 @@ class Command(BaseCommand):
                             mastery_req=rget(row, 'Mastery Req', 'Mastery Requirement'),
                             tags=rget(row, 'Other Tags', 'Tags'),
                         )
+                        row_hash = content_hash(name_sheet, fields)
 
                         # 5) create or update by canonical name key
-                        ids = spell_by_key.get(key, [])
                         if not ids:
-                            obj = Spell.objects.create(name=name_sheet, **fields)
-                            spell_by_key[key] = [obj.id]
-                            created += 1
-                            if len(sample) < 5:
-                                sample.append(('created', obj.id, name_sheet, row_level))
-                        else:
-                            # Use instance saves so Django signals fire (audit logging),
-                            # BUT skip saving if nothing changed (prevents empty audit entries).
-                            objs = Spell.objects.in_bulk(ids)
-
-                            for sid, obj in objs.items():
-                                changed_fields = []
-
-                                if obj.name != name_sheet:
-                                    obj.name = name_sheet
-                                    changed_fields.append("name")
-
-                                for k, v in fields.items():
-                                    if getattr(obj, k) != v:
-                                        setattr(obj, k, v)
-                                        changed_fields.append(k)
-
-                                if changed_fields:
-                                    if "level" in changed_fields:
-                                        print(
-                                            f"🔧 LEVEL CHANGE from tab={sheet.title!r}: spell id={obj.id} name={name_sheet!r} "
-                                            f"{getattr(obj, 'level', None)}",
-                                            flush=True
-                                        )
-                                    obj.save(update_fields=changed_fields)
-                                    updated += 1
-                                # else: do nothing
-
-
+                            # a repeated sheet row overwrites the pending create
+                            new_spells[key] = Spell(name=name_sheet, sync_hash=row_hash, **fields)
+                            continue
+                        for sid in ids:
+                            if spell_hashes[sid] == row_hash:
+                                pending_spells.pop(sid, None)   # a later identical row wins
+                                unchanged_rows += 1
+                            else:
+                                pending_spells[sid] = (name_sheet, fields, row_hash, title)
+
+                # Only rows that actually changed are written (and audited),
+                # so unchanged rows produce no empty change log entries.
+                spells_by_id = Spell.objects.in_bulk(list(pending_spells))
+                for sid, (name_sheet, fields, row_hash, title) in pending_spells.items():
+                    obj = spells_by_id.get(sid)
+                    if obj is None:
+                        continue
+                    changed_fields = ["sync_hash"]
+                    obj.sync_hash = row_hash
+
+                    if obj.name != name_sheet:
+                        obj.name = name_sheet
+                        changed_fields.append("name")
+
+                    for k, v in fields.items():
+                        if getattr(obj, k) != v:
+                            setattr(obj, k, v)
+                            changed_fields.append(k)
+
+                    if "level" in changed_fields:
+                        print(
+                            f"🔧 LEVEL CHANGE from tab={title!r}: spell id={obj.id} name={name_sheet!r} "
+                            f"{getattr(obj, 'level', None)}",
+                            flush=True
+                        )
+                    dirty_spells[sid] = obj
+                    dirty_spell_fields.update(changed_fields)
 
-                print(f"📦 Spells → created: {created}, updated rows: {updated}", flush=True)
+                with transaction.atomic():
+                    for obj in bulk_create_audited(new_spells.values()):
+                        if len(sample) < 5:
+                            sample.append(('created', obj.id, obj.name, obj.level))
+                    bulk_update_audited(dirty_spells.values(), sorted(dirty_spell_fields))
+                    save_tab_hashes("spells", spell_tabs)
+                created, updated = len(new_spells), len(dirty_spells)
+                clock.lap("spells: diff + write")
+
+                print(f"📦 Spells → created: {created}, updated rows: {updated}, unchanged (skipped): {unchanged_rows}", flush=True)
                 if sample:
                     for tag, sid, nm, lv in sample:
                         print(f"   • {tag:<7} id={sid} name={nm!r} level={lv}", flush=True)
@@ -486,26 +624,17 @@ class Command(BaseCommand):
                                 else:
                                     print("👍 No spells to delete; DB matches sheet (by canonical name).", flush=True)
 
+                clock.lap("spells: de-dupe + deletions")
+
                 # ─── FEATS ──────────────────────────────────────────────────────
-                feat_book = client.open_by_key("1-WHN5KXt7O7kRmgyOZ0rXKLA6s6CbaOWFmvPflzD5bQ")
-                # Find the "Feats" tab robustly (trim spaces, case-insensitive)
-                feat_sheet = None
-                all_ws = feat_book.worksheets()
-                for ws in all_ws:
-                    if ws.title.strip().lower() == "feats":
-                        feat_sheet = ws
-                        break
-
-                if feat_sheet is None:
-                    titles = [ws.title for ws in all_ws]
-                    self.stderr.write(f"❌ Worksheet 'Feats' not found (even after trimming). Available tabs: {titles}")
+                if feat_title is None:
+                    self.stderr.write(f"❌ Worksheet 'Feats' not found (even after trimming). Available tabs: {feat_titles}")
                     return
 
                 # Optional transparency if the tab had stray whitespace/casing
-                if feat_sheet.title != "Feats":
-                    print(f"⚠️ Using worksheet '{feat_sheet.title}' (normalized match for 'Feats').", flush=True)
+                if feat_title != "Feats":
+                    print(f"⚠️ Using worksheet '{feat_title}' (normalized match for 'Feats').", flush=True)
 
-                raw_feats = feat_sheet.get_all_records()
                 if raw_feats:
                     headers = [h.strip() for h in raw_feats[0].keys()]
                     print(f"🧾 Sheet headers: {headers}", flush=True)
@@ -521,13 +650,19 @@ class Command(BaseCommand):
 
                 verbosity = int(options.get('verbosity', 1))
 
-                # Build a case/space-insensitive index of existing feats so we can update ALL duplicates
-                existing_rows = list(ClassFeat.objects.all().values('id', 'name'))
+                # Build a case/space-insensitive index of existing feats (with their stored row
+                # hashes) so we can update ALL duplicates; only rows whose hash differs are loaded.
                 by_key = defaultdict(list)
-                for r in existing_rows:
-                    key = canonical_name(r['name']).lower()
+                feat_hashes = {}                # id -> sync_hash
+                for fid, fname, fhash in ClassFeat.objects.values_list('id', 'name', 'sync_hash'):
+                    key = canonical_name(fname).lower()
                     if key:
-                        by_key[key].append(r['id'])
+                        by_key[key].append(fid)
+                    feat_hashes[fid] = fhash
+                new_feats = {}                  # key -> unsaved ClassFeat
+                pending_feats = {}              # id -> (sheet name, fields, row hash)
+                dirty_feats = {}                # id -> edited ClassFeat
+                dirty_feat_fields = set()
 
                 sheet_keys = set()              # keys present in the sheet (for deletion pass)
                 display_by_key = dict()         # key -> exact display name from sheet (for dedupe keep-preference)
@@ -539,80 +674,95 @@ class Command(BaseCommand):
                         print(f"   {i:02d}. key='{k}' ids={ids}", flush=True)
 
                 created, updated = 0, 0
+                unchanged_rows = 0
                 sample_debug = []
 
-                with transaction.atomic():
-                    for idx, raw in enumerate(raw_feats, start=1):
-                        # Strip headers; keep values exactly.
-                        row = {k.strip(): v for k, v in raw.items()}
-
-                        # Feat name: store EXACTLY as the sheet has it (trim edges only).
-                        feat_name = get_feat_name_from_row(row)
-                        if not feat_name:
-                            if verbosity >= 1 and idx <= 5:
-                                print(f"⚠️ Skipping row with no resolvable feat name; headers={list(row.keys())}", flush=True)
-                            continue
+                feat_tab_hash = content_hash(raw_feats)
+                feat_tab_unchanged = not full and load_tab_hashes("feats").get(feat_title) == feat_tab_hash
+                if feat_tab_unchanged:
+                    print("⏩ Worksheet unchanged since last sync", flush=True)
 
-                        key = canonical_name(feat_name).lower()
-                        sheet_keys.add(key)
-                        # Remember the exact display name the sheet uses for this key
-                        display_by_key[key] = feat_name
+                for idx, raw in enumerate(raw_feats, start=1):
+                    # Strip headers; keep values exactly.
+                    row = {k.strip(): v for k, v in raw.items()}
 
-                        # Store column values AS-IS from the sheet (no normalization/re-ordering)
-                        feat_type_cell = row.get('Feat Type')
-                        fields = dict(
-                            description=safe_str(row.get('Description')),
-                            level_prerequisite=safe_str(row.get('Level Prerequisite')),
-                            feat_type='' if feat_type_cell is None else str(feat_type_cell),
-                            class_name=safe_str(row.get('Class')),
-                            race=safe_str(row.get('Race')),
-                            tags=safe_str(row.get('Tags')),
-                            # Use the exact canonical header used in the sheet for prerequisites:
-                            prerequisites=safe_str(row.get('Pre-req')),
-                        )
+                    # Feat name: store EXACTLY as the sheet has it (trim edges only).
+                    feat_name = get_feat_name_from_row(row)
+                    if not feat_name:
+                        if verbosity >= 1 and idx <= 5:
+                            print(f"⚠️ Skipping row with no resolvable feat name; headers={list(row.keys())}", flush=True)
+                        continue
 
-                        ids = by_key.get(key, [])
+                    key = canonical_name(feat_name).lower()
+                    sheet_keys.add(key)
+                    # Remember the exact display name the sheet uses for this key
+                    display_by_key[key] = feat_name
 
-                        if not ids:
-                            # Create new row (exact sheet values)
-                            obj = ClassFeat.objects.create(name=feat_name, **fields)
-                            by_key[key] = [obj.id]
-                            created += 1
-                            if len(sample_debug) < 5:
-                                sample_debug.append((feat_name, 'created', obj.id, fields['feat_type']))
+                    ids = by_key.get(key, [])
+                    if feat_tab_unchanged and ids:
+                        unchanged_rows += len(ids)
+                        continue
+
+                    # Store column values AS-IS from the sheet (no normalization/re-ordering)
+                    feat_type_cell = row.get('Feat Type')
+                    fields = dict(
+                        description=safe_str(row.get('Description')),
+                        level_prerequisite=safe_str(row.get('Level Prerequisite')),
+                        feat_type='' if feat_type_cell is None else str(feat_type_cell),
+                        class_name=safe_str(row.get('Class')),
+                        race=safe_str(row.get('Race')),
+                        tags=safe_str(row.get('Tags')),
+                        # Use the exact canonical header used in the sheet for prerequisites:
+                        prerequisites=safe_str(row.get('Pre-req')),
+                    )
+                    row_hash = content_hash(feat_name, fields)
+
+                    if not ids:
+                        # Create new row (exact sheet values); a repeated sheet row overwrites it
+                        new_feats[key] = ClassFeat(name=feat_name, sync_hash=row_hash, **fields)
+                        continue
+                    for fid in ids:
+                        if feat_hashes[fid] == row_hash:
+                            pending_feats.pop(fid, None)    # a later identical row wins
+                            unchanged_rows += 1
                         else:
-                            # Use instance saves so Django signals fire (audit logging),
-                            # BUT skip saving if nothing changed (prevents empty audit entries).
-                            objs = ClassFeat.objects.in_bulk(ids)
+                            pending_feats[fid] = (feat_name, fields, row_hash)
 
-                            for fid, obj in objs.items():
-                                changed_fields = []
+                    if verbosity >= 2 and len(ids) > 1:
+                        print(f"🔁 De-dup group for '{feat_name}': updated {len(ids)} rows (ids={ids})", flush=True)
 
-                                if obj.name != feat_name:
-                                    obj.name = feat_name
-                                    changed_fields.append("name")
+                # Only rows that actually changed are written (and audited),
+                # so unchanged rows produce no empty change log entries.
+                feats_by_id = ClassFeat.objects.in_bulk(list(pending_feats))
+                for fid, (feat_name, fields, row_hash) in pending_feats.items():
+                    obj = feats_by_id.get(fid)
+                    if obj is None:
+                        continue
+                    changed_fields = ["sync_hash"]
+                    obj.sync_hash = row_hash
 
-                                for k, v in fields.items():
-                                    if getattr(obj, k) != v:
-                                        setattr(obj, k, v)
-                                        changed_fields.append(k)
+                    if obj.name != feat_name:
+                        obj.name = feat_name
+                        changed_fields.append("name")
 
-                                if changed_fields:
-                                    if "level" in changed_fields:
-                                        print(
-                                            f"🔧 LEVEL CHANGE from tab={sheet.title!r}: spell id={obj.id} name={name_sheet!r} "
-                                            f"{getattr(obj, 'level', None)}",
-                                            flush=True
-                                        )
-                                    obj.save(update_fields=changed_fields)
-                                    updated += 1
-                                # else: do nothing
+                    for k, v in fields.items():
+                        if getattr(obj, k) != v:
+                            setattr(obj, k, v)
+                            changed_fields.append(k)
 
+                    dirty_feats[fid] = obj
+                    dirty_feat_fields.update(changed_fields)
 
-                            if verbosity >= 2 and len(ids) > 1:
-                                print(f"🔁 De-dup group for '{feat_name}': updated {len(ids)} rows (ids={ids})", flush=True)
+                with transaction.atomic():
+                    for obj in bulk_create_audited(new_feats.values()):
+                        if len(sample_debug) < 5:
+                            sample_debug.append((obj.name, 'created', obj.id, obj.feat_type))
+                    bulk_update_audited(dirty_feats.values(), sorted(dirty_feat_fields))
+                    save_tab_hashes("feats", {feat_title: (feat_tab_hash, len(raw_feats))})
+                created, updated = len(new_feats), len(dirty_feats)
+                clock.lap("feats: diff + write")
 
-                print(f"📦 Feats → created: {created}, updated rows: {updated}", flush=True)
+                print(f"📦 Feats → created: {created}, updated rows: {updated}, unchanged (skipped): {unchanged_rows}", flush=True)
 
                 # Post-sync duplicate report + HARD de-dupe (to mirror sheet 1:1)
                 existing_rows = list(ClassFeat.objects.all().values('id', 'name'))
@@ -733,12 +883,15 @@ class Command(BaseCommand):
                                     else:
                                         print("👍 No feats to delete; DB matches sheet (by canonical name).", flush=True)
 
+                clock.lap("feats: de-dupe + deletions")
+
                 # ─── Summary ───────────────────────────────────────────────────
                 total_spells = Spell.objects.count()
                 total_feats = ClassFeat.objects.count()
 
                 print(f"📦 Total spells: {total_spells}", flush=True)
                 print(f"📦 Total feats:  {total_feats}", flush=True)
+                print(f"⏱️  {clock.summary()}", flush=True)
                 print("✅ SYNC JOB DONE", flush=True)
                 self.stdout.write(
                     self.style.SUCCESS("Spells and Class Feats synced successfully.")
@@ -751,6 +904,5 @@ class Command(BaseCommand):
                 self.stderr.write(str(e))
 
         finally:
-            if got_lock:
-                release_sync_lock()
+            release_sync_lock()
             clear_current_request()
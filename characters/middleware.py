@@ -1,11 +1,22 @@
-import time
+# characters/middleware.py
+import hashlib
+import json
 import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core import mail
 from django.db import connection
 
-log = logging.getLogger("perf.sql")
-# characters/middleware.py
 from .audit_context import set_current_request, clear_current_request
 
+log = logging.getLogger("perf.sql")
+
 
 class AuditUserMiddleware:
     """
@@ -28,36 +39,169 @@ class AuditUserMiddleware:
 
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Query profiler
+# ──────────────────────────────────────────────────────────────────────────────
+_PROFILER_DEFAULTS = {
+    "PATH_PREFIXES": ("/characters/",),
+    "SLOW_REQUEST_MS": 300,
+    "TOP_SLOWEST": 15,
+    # the same fingerprint issued this many times from one call site = N+1
+    "N_PLUS_ONE_THRESHOLD": 5,
+    # {"app:view_name": {"queries": 120, "ms": 800}}; "*" applies to every other view
+    "BUDGETS": {},
+    # None: raise QueryBudgetExceeded under DEBUG or the test runner, and only
+    # mark the response (X-Query-Budget header) everywhere else
+    "RAISE_ON_BUDGET": None,
+}
+
+
+def _profiler_setting(name):
+    return getattr(settings, "QUERY_PROFILER", {}).get(name, _PROFILER_DEFAULTS[name])
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised in dev and tests when a view issues more queries than its budget allows."""
+
+
+def _raise_on_budget() -> bool:
+    flag = _profiler_setting("RAISE_ON_BUDGET")
+    if flag is None:
+        # setup_test_environment() installs mail.outbox for the test runner
+        return settings.DEBUG or hasattr(mail, "outbox")
+    return bool(flag)
+
+
+_STR_LIT_RE   = re.compile(r"'(?:[^']|'')*'")
+_NUM_LIT_RE   = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE   = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_WS_RE        = re.compile(r"\s+")
+
+
+def sql_fingerprint(sql: str) -> str:
+    """
+    Collapse a statement to its shape: literals and params become '?', IN lists
+    become 'IN (...)', so the 40 lookups of an N+1 all share one fingerprint.
+    """
+    s = _STR_LIT_RE.sub("?", sql or "")
+    s = _NUM_LIT_RE.sub("?", s)
+    s = s.replace("%s", "?")
+    s = _IN_LIST_RE.sub("IN (...)", s)
+    return _WS_RE.sub(" ", s).strip()
+
+
+def _fingerprint_id(fp: str) -> str:
+    return hashlib.sha1(fp.encode("utf-8")).hexdigest()[:12]
+
+
+_PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_SKIP_PARTS = (os.sep + "site-packages" + os.sep, os.sep + "dist-packages" + os.sep, __file__)
+
+
+def _call_site() -> str:
+    """First frame in our own code (not Django, not this module) that issued the query."""
+    f = sys._getframe(2)
+    while f is not None:
+        fn = f.f_code.co_filename
+        if fn.startswith(_PROJECT_DIR) and not any(p in fn for p in _SKIP_PARTS):
+            return f"{os.path.relpath(fn, _PROJECT_DIR)}:{f.f_lineno} in {f.f_code.co_name}"
+        f = f.f_back
+    return "?"
+
+
 class _QueryTimer:
     def __init__(self, out):
         self.out = out
 
     def __call__(self, execute, sql, params, many, context):
+        site = _call_site()
         start = time.perf_counter()
         try:
             return execute(sql, params, many, context)
         finally:
             ms = (time.perf_counter() - start) * 1000.0
-            self.out.append((ms, sql, params))
+            self.out.append((ms, sql, site))
+
+
+# per-worker running totals per resolved view name
+_view_stats = defaultdict(lambda: {"requests": 0, "queries": 0, "ms": 0.0, "max_queries": 0, "max_ms": 0.0})
+_view_stats_lock = threading.Lock()
+
+
+def _record_view(view: str, n_queries: int, total_ms: float) -> dict:
+    with _view_stats_lock:
+        st = _view_stats[view]
+        st["requests"] += 1
+        st["queries"] += n_queries
+        st["ms"] += total_ms
+        st["max_queries"] = max(st["max_queries"], n_queries)
+        st["max_ms"] = max(st["max_ms"], total_ms)
+        return {
+            "requests": st["requests"],
+            "avg_queries": round(st["queries"] / st["requests"], 1),
+            "avg_ms": round(st["ms"] / st["requests"], 1),
+            "max_queries": st["max_queries"],
+            "max_ms": round(st["max_ms"], 1),
+        }
+
+
+def view_stats() -> dict:
+    """Snapshot of the per-view aggregates collected by this worker."""
+    with _view_stats_lock:
+        return {k: dict(v) for k, v in _view_stats.items()}
+
+
+def _budget_for(view: str):
+    budgets = _profiler_setting("BUDGETS") or {}
+    return budgets.get(view) or budgets.get("*") or {}
+
+
+def _n_plus_one(queries, threshold):
+    """Fingerprints repeated >= threshold times from the same call site."""
+    groups = defaultdict(lambda: {"count": 0, "ms": 0.0, "sql": ""})
+    for ms, sql, site in queries:
+        fp = sql_fingerprint(sql)
+        g = groups[(fp, site)]
+        g["count"] += 1
+        g["ms"] += ms
+        g["sql"] = fp
+    out = [
+        {
+            "fingerprint": _fingerprint_id(fp),
+            "site": site,
+            "count": g["count"],
+            "ms": round(g["ms"], 2),
+            "sql": g["sql"][:500],
+        }
+        for (fp, site), g in groups.items() if g["count"] >= threshold
+    ]
+    return sorted(out, key=lambda r: r["count"], reverse=True)
 
-def _safe_params(params):
-    if params is None:
-        return None
-    try:
-        s = str(params)
-        return s if len(s) <= 300 else (s[:300] + "...<truncated>")
-    except Exception:
-        return "<unprintable>"
 
 class LogSlowQueriesMiddleware:
     """
-    Logs the slowest SQL statements per request.
-    Uses execute_wrapper so it works even when DEBUG=False.
+    Per-request SQL profiler (uses execute_wrapper so it works even when DEBUG=False).
+
+    For watched paths it writes ONE JSON line to the "perf.sql" logger when the
+    request was slow, issued an N+1 pattern, or went over its view's budget:
+    the slowest statements, repeated fingerprints with the call site in our code
+    that issued them, and running per-view aggregates. Statements are logged by
+    shape only (sql_fingerprint), never with their parameters.
+
+    Going over the query-count budget raises QueryBudgetExceeded under DEBUG
+    and the test runner, so an N+1 regression fails there. In production the
+    response is never failed after the view has run: it gets an X-Query-Budget
+    header instead. The wall-time budget only logs and marks the header, since
+    timings are too noisy to fail a build on. See QUERY_PROFILER in settings
+    for thresholds and budgets.
     """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
+        if not request.path.startswith(tuple(_profiler_setting("PATH_PREFIXES"))):
+            return self.get_response(request)
+
         queries = []
         start = time.perf_counter()
 
@@ -65,17 +209,47 @@ class LogSlowQueriesMiddleware:
             response = self.get_response(request)
 
         total_ms = (time.perf_counter() - start) * 1000.0
-
-        # only log your slow page(s)
-        if request.path.startswith("/characters/") and total_ms >= 300:
-            queries_sorted = sorted(queries, key=lambda x: x[0], reverse=True)
-            sql_total = sum(q[0] for q in queries)
-            log.info(
-                "%s %s -> %s | %.1fms total | %.1fms SQL | %d queries",
-                request.method, request.path, getattr(response, "status_code", "?"),
-                total_ms, sql_total, len(queries),
-            )
-            for ms, sql, params in queries_sorted[:15]:
-                log.info("  %.1fms | %s | params=%s", ms, sql, _safe_params(params))
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name if match else "") or "?"
+        sql_total = sum(q[0] for q in queries)
+
+        aggregate = _record_view(view, len(queries), total_ms)
+        n_plus_one = _n_plus_one(queries, int(_profiler_setting("N_PLUS_ONE_THRESHOLD")))
+
+        budget = _budget_for(view)
+        over = []
+        over_queries = budget.get("queries") is not None and len(queries) > budget["queries"]
+        if over_queries:
+            over.append(f"queries {len(queries)} > {budget['queries']}")
+        if budget.get("ms") is not None and total_ms > budget["ms"]:
+            over.append(f"time {total_ms:.0f}ms > {budget['ms']}ms")
+
+        slow = total_ms >= float(_profiler_setting("SLOW_REQUEST_MS"))
+        if slow or n_plus_one or over:
+            top = sorted(queries, key=lambda x: x[0], reverse=True)[: int(_profiler_setting("TOP_SLOWEST"))]
+            (log.warning if over else log.info)(json.dumps({
+                "ts": round(time.time(), 3),
+                "method": request.method,
+                "path": request.path,
+                "view": view,
+                "status": getattr(response, "status_code", None),
+                "total_ms": round(total_ms, 1),
+                "sql_ms": round(sql_total, 1),
+                "queries": len(queries),
+                "distinct": len(Counter(sql_fingerprint(q[1]) for q in queries)),
+                "budget": budget or None,
+                "over_budget": over,
+                "n_plus_one": n_plus_one,
+                "slowest": [
+                    {"ms": round(ms, 2), "site": site, "sql": sql_fingerprint(sql)[:500]}
+                    for ms, sql, site in top
+                ],
+                "view_stats": aggregate,
+            }, default=str))
+
+        if over:
+            if over_queries and _raise_on_budget():
+                raise QueryBudgetExceeded(f"{view}: " + "; ".join(over))
+            response["X-Query-Budget"] = "; ".join(over)
 
         return response
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.6 on 2026-10-18 08:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0077_alter_weapon_category_alter_weapon_damage_types'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CharacterSheetSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('revision', models.PositiveIntegerField(default=1)),
+                ('built_revision', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+                ('character', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sheet_snapshot', to='characters.character')),
+            ],
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:14
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.operations
+import django.contrib.postgres.search
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0079_rulescatalogversion'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        django.contrib.postgres.operations.TrigramExtension(),
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('section', models.CharField(db_index=True, max_length=64)),
+                ('title', models.CharField(max_length=255)),
+                ('code', models.CharField(blank=True, max_length=255)),
+                ('body', models.TextField(blank=True)),
+                ('url', models.CharField(blank=True, max_length=500)),
+                ('fields', models.JSONField(blank=True, default=list)),
+                ('search_vector', django.contrib.postgres.search.SearchVectorField(editable=False, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='searchdoc_vector_gin'), django.contrib.postgres.indexes.GinIndex(fields=['title'], name='searchdoc_title_trgm', opclasses=['gin_trgm_ops']), django.contrib.postgres.indexes.GinIndex(fields=['code'], name='searchdoc_code_trgm', opclasses=['gin_trgm_ops']), django.contrib.postgres.indexes.GinIndex(fields=['body'], name='searchdoc_body_trgm', opclasses=['gin_trgm_ops'])],
+                'unique_together': {('content_type', 'object_id')},
+            },
+        ),
+    ]
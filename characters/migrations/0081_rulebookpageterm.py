@@ -0,0 +1,38 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0080_searchdocument'),
+        ('glossary', '0002_glossaryversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rulebookpage',
+            name='glossary_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='rulebookpage',
+            name='plain_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.CreateModel(
+            name='RulebookPageTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_hits', to='characters.rulebookpage')),
+                ('term', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='page_hits', to='glossary.glossaryterm')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'page'], name='characters__term_id_b402e1_idx')],
+                'unique_together': {('page', 'term')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:20
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def fill_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    from django.contrib.postgres.search import SearchVector
+    RulebookPage = apps.get_model("characters", "RulebookPage")
+    RulebookPage.objects.update(
+        search_vector=SearchVector("title", weight="A", config="simple")
+        + SearchVector("plain_text", weight="B", config="simple")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0081_rulebookpageterm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rulebookpage',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='rulebookpage',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='rulebookpage_vector_gin'),
+        ),
+        migrations.RunPython(fill_vectors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:26
+
+import re
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# frozen copies of the splitting rules as of this migration; don't import them from models
+SPELL_CELL_SPLIT_RE = re.compile(r"\s*[,;/|]\s*")
+SPELL_TAG_SPLIT_RE = re.compile(r"\s*,\s*")
+
+
+def split_cell_tokens(value, split_re):
+    out = []
+    for tok in split_re.split(value or ""):
+        tok = tok.strip().lower()
+        if tok and tok not in out:
+            out.append(tok)
+    return out
+
+
+def fill_tokens(apps, schema_editor):
+    Spell = apps.get_model("characters", "Spell")
+    spells = list(Spell.objects.only("id", "origin", "classification", "tags"))
+    for sp in spells:
+        sp.origin_tokens = split_cell_tokens(sp.origin, SPELL_CELL_SPLIT_RE)
+        sp.classification_tokens = split_cell_tokens(sp.classification, SPELL_CELL_SPLIT_RE)
+        sp.tag_tokens = split_cell_tokens(sp.tags, SPELL_TAG_SPLIT_RE)
+    Spell.objects.bulk_update(spells, ["origin_tokens", "classification_tokens", "tag_tokens"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0082_rulebookpage_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spell',
+            name='classification_tokens',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='spell',
+            name='origin_tokens',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='spell',
+            name='tag_tokens',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='spell',
+            index=models.Index(fields=['level', 'name', 'id'], name='spell_level_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spell',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['origin_tokens'], name='spell_origin_tokens_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='spell',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['classification_tokens'], name='spell_class_tokens_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='spell',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_tokens'], name='spell_tag_tokens_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='spell',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('name'), name='gin_trgm_ops'), name='spell_name_trgm'),
+        ),
+        migrations.RunPython(fill_tokens, migrations.RunPython.noop),
+    ]
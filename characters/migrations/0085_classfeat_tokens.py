@@ -0,0 +1,82 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:28
+
+import re
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+# frozen copies of the splitting rules as of this migration; don't import them from models
+CELL_SPLIT_RE = re.compile(r"\s*[,;/|]\s*")
+COMMA_SPLIT_RE = re.compile(r"\s*,\s*")
+TOKEN_SOURCES = {
+    "feat_type_tokens": ("feat_type", COMMA_SPLIT_RE),
+    "class_tokens": ("class_name", CELL_SPLIT_RE),
+    "race_tokens": ("race", CELL_SPLIT_RE),
+    "tag_tokens": ("tags", COMMA_SPLIT_RE),
+}
+
+
+def split_cell_tokens(value, split_re):
+    out = []
+    for tok in split_re.split(value or ""):
+        tok = tok.strip()
+        if tok and tok not in out:
+            out.append(tok)
+    return out
+
+
+def fill_tokens(apps, schema_editor):
+    ClassFeat = apps.get_model("characters", "ClassFeat")
+    feats = list(ClassFeat.objects.only("id", "feat_type", "class_name", "race", "tags"))
+    for feat in feats:
+        for field, (source, split_re) in TOKEN_SOURCES.items():
+            setattr(feat, field, split_cell_tokens(getattr(feat, source), split_re))
+    ClassFeat.objects.bulk_update(feats, list(TOKEN_SOURCES), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0084_searchdocument_upper_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classfeat',
+            name='class_tokens',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='classfeat',
+            name='feat_type_tokens',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='classfeat',
+            name='race_tokens',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddField(
+            model_name='classfeat',
+            name='tag_tokens',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, editable=False, size=None),
+        ),
+        migrations.AddIndex(
+            model_name='classfeat',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['feat_type_tokens'], name='feat_type_tokens_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='classfeat',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['class_tokens'], name='feat_class_tokens_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='classfeat',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['race_tokens'], name='feat_race_tokens_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='classfeat',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tag_tokens'], name='feat_tag_tokens_gin'),
+        ),
+        migrations.RunPython(fill_tokens, migrations.RunPython.noop),
+    ]
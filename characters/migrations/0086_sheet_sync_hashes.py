@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0085_classfeat_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classfeat',
+            name='sync_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='spell',
+            name='sync_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=40),
+        ),
+        migrations.CreateModel(
+            name='SheetSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('book', models.CharField(max_length=32)),
+                ('worksheet', models.CharField(max_length=255)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('row_count', models.PositiveIntegerField(default=0)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('book', 'worksheet')},
+            },
+        ),
+    ]
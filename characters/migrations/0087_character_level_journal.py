@@ -0,0 +1,33 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0086_sheet_sync_hashes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CharacterLevelJournal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('level', models.PositiveIntegerField(help_text='Character level this level-up reached')),
+                ('track', models.CharField(choices=[('base', 'Base class'), ('prestige', 'Prestige class')], default='base', max_length=10)),
+                ('created', models.JSONField(blank=True, default=dict)),
+                ('changed', models.JSONField(blank=True, default=dict)),
+                ('removed', models.JSONField(blank=True, default=dict)),
+                ('skill_points', models.IntegerField(default=0, help_text='Skill points awarded by this level')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('character', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='level_journal', to='characters.character')),
+                ('character_class', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='characters.characterclass')),
+            ],
+            options={
+                'ordering': ['character', 'level'],
+                'unique_together': {('character', 'level')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.6 on 2026-10-18 14:05
+
+import re
+
+from django.db import migrations
+
+# frozen copy of rulebook_terms.strip_html as of this migration; don't import it from services
+TAG_RE = re.compile(r"<[^>]*>")
+
+BATCH_SIZE = 200
+
+
+def fill_plain_text(apps, schema_editor):
+    """0081 added plain_text empty and 0082 built the vectors from it; fill both in properly."""
+    RulebookPage = apps.get_model("characters", "RulebookPage")
+    batch = []
+    for page in RulebookPage.objects.only("pk", "title", "content").iterator(chunk_size=BATCH_SIZE):
+        page.plain_text = TAG_RE.sub(" ", f"{page.title or ''} {page.content or ''}")
+        batch.append(page)
+        if len(batch) >= BATCH_SIZE:
+            RulebookPage.objects.bulk_update(batch, ["plain_text"])
+            batch = []
+    if batch:
+        RulebookPage.objects.bulk_update(batch, ["plain_text"])
+
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    from django.contrib.postgres.search import SearchVector
+    RulebookPage.objects.update(
+        search_vector=SearchVector("title", weight="A", config="simple")
+        + SearchVector("plain_text", weight="B", config="simple")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('characters', '0087_character_level_journal'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_plain_text, migrations.RunPython.noop),
+    ]
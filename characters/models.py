@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from django.db.models import Q
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Max, Sum, Q
+from django.utils.functional import cached_property
 from django.contrib.contenttypes.fields import GenericForeignKey
 # ------------------------------------------------------------------------------
 # Constants
@@ -345,6 +346,9 @@ class LoremasterImage(models.Model):
         return self.caption or f"Image #{self.pk}"
 
 
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+
 
 class RulebookPage(models.Model):
     rulebook = models.ForeignKey(
@@ -361,14 +365,36 @@ class RulebookPage(models.Model):
         blank=True, null=True
     )
 
+    # Maintained by services/rulebook_terms.py: title + content without HTML, and the
+    # glossary version the page's RulebookPageTerm rows were computed with.
+    plain_text       = models.TextField(blank=True, editable=False)
+    glossary_version = models.PositiveBigIntegerField(default=0, editable=False)
+    # title (A) + plain_text (B), refreshed together with plain_text (PostgreSQL only)
+    search_vector    = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering        = ["rulebook__name", "order"]
         unique_together = ("rulebook", "order")
+        indexes         = [GinIndex(fields=["search_vector"], name="rulebookpage_vector_gin")]
 
     def __str__(self):
         return f"{self.rulebook.name} → {self.title}"
 
 
+class RulebookPageTerm(models.Model):
+    """How often a glossary term (or one of its aliases) occurs on a rulebook page."""
+    page = models.ForeignKey(RulebookPage, on_delete=models.CASCADE, related_name="term_hits")
+    term = models.ForeignKey("glossary.GlossaryTerm", on_delete=models.CASCADE, related_name="page_hits")
+    hits = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("page", "term")
+        indexes = [models.Index(fields=("term", "page"))]
+
+    def __str__(self):
+        return f"{self.term_id} on page {self.page_id} ×{self.hits}"
+
+
 class Background(models.Model):
     code        = models.SlugField(max_length=50, unique=True)
     name        = models.CharField(max_length=100)
@@ -628,68 +654,48 @@ class Character(models.Model):
                 campaign_id=self.campaign_id, user=user, role="gm"
             ).exists()
         return False
+    @cached_property
+    def proficiency_resolver(self):
+        """
+        Batched proficiency data for this character (see services/proficiency.py),
+        loaded once per instance so the defense/save properties share it.
+        Dropped by save(), refresh_from_db() and clear_proficiency_cache().
+        """
+        from .services.proficiency import ProficiencyResolver
+        return ProficiencyResolver.for_character(self)
+
+    def clear_proficiency_cache(self):
+        """Forget the loaded proficiency data after writing rows it was built from."""
+        self.__dict__.pop("proficiency_resolver", None)
+
+    def save(self, *args, **kwargs):
+        self.clear_proficiency_cache()
+        super().save(*args, **kwargs)
+
+    def refresh_from_db(self, *args, **kwargs):
+        self.clear_proficiency_cache()
+        super().refresh_from_db(*args, **kwargs)
+
     def _base_prof_bonus(self, code: str) -> int:
         """
         Read the highest proficiency tier (bonus) this character reaches for `code`
         from class progression rows. We look across ALL classes the character has,
         using their current level in each class.
         """
-        from .models import ClassProficiencyProgress, ProficiencyTier, CharacterClassProgress
-        best = 0
-        for cp in CharacterClassProgress.objects.filter(character=self).select_related("character_class"):
-            if cp.levels <= 0:
-                continue
-            # generic (non-weapon/non-armor group) rows for this progression
-            rows = (ClassProficiencyProgress.objects
-                    .filter(character_class=cp.character_class,
-                            proficiency_type=code,
-                            at_level__lte=cp.levels,
-                            armor_group__isnull=True,
-                            weapon_group__isnull=True)
-                    .select_related("tier"))
-            if rows.exists():
-                best = max(best, max(r.tier.bonus for r in rows if r.tier and isinstance(r.tier.bonus, int)))
-        return int(best)
+        return int(self.proficiency_resolver.class_bonus(self.pk, code))
 
     def _feature_or_item_prof_override(self, code: str) -> int:
         """
         If any ClassFeature (kind=modify_proficiency) or active item trait sets a tier,
         use the highest bonus among them. (Treat as override, not a stack.)
         """
-        from .models import SpecialItemTraitValue, SpecialItem, CharacterFeature
-        best = 0
-
-        # from features
-        feats = (self.features
-                .filter(feature__kind="modify_proficiency",
-                        feature__modify_proficiency_target=code,
-                        feature__modify_proficiency_amount__isnull=False)
-                .select_related("feature__modify_proficiency_amount"))
-        for cf in feats:
-            t = cf.feature.modify_proficiency_amount
-            if t and isinstance(t.bonus, int):
-                best = max(best, t.bonus)
-
-        # from active special items (if you toggle them with CharacterActivation)
-        si_ct = ContentType.objects.get_for_model(SpecialItem)
-        active_item_ids = list(self.activations.filter(content_type=si_ct, is_active=True)
-                            .values_list("object_id", flat=True))
-        if active_item_ids:
-            for tv in SpecialItemTraitValue.objects.filter(
-                special_item_id__in=active_item_ids,
-                modify_proficiency_target=code
-            ):
-                try:
-                    best = max(best, int(tv.modify_proficiency_amount))
-                except (TypeError, ValueError):
-                    pass
-        return int(best)
+        return int(self.proficiency_resolver.override_bonus(self.pk, code))
 
     def _prof_bonus(self, code: str) -> int:
         """
         Final proficiency bonus for `code`: max(class progression, feature/item override).
         """
-        return max(self._base_prof_bonus(code), self._feature_or_item_prof_override(code))
+        return int(self.proficiency_resolver.bonus(self.pk, code))
 
     def skill_total(self, skill_name: str) -> int:
         """
@@ -715,6 +721,7 @@ class Character(models.Model):
             total += int(rating.bonus_points or 0)
         return total
 
+    def _half_level_up(self) -> int:
         # ceil(level/2)
         return (int(self.level or 0) + 1) // 2
 
@@ -1440,6 +1447,36 @@ class CharacterClassProgress(models.Model):
     def __str__(self):
         return f"{self.character.name} – {self.character_class.name} L{self.levels}"
 
+
+class CharacterLevelJournal(models.Model):
+    """
+    What one level-up wrote, so level_down can undo it without re-deriving it
+    from the rules (see services/level_up.py):
+
+      created  {"app_label.model": [ids]} of every row the level-up inserted
+      changed  {"character": {field: [before, after]},
+                "characterclassprogress": {id: {"levels": [before, after]}}}
+      removed  rows the level-up deleted, e.g. the hp_max override
+    """
+    TRACK_CHOICES = [("base", "Base class"), ("prestige", "Prestige class")]
+
+    character       = models.ForeignKey(Character, on_delete=models.CASCADE, related_name="level_journal")
+    level           = models.PositiveIntegerField(help_text="Character level this level-up reached")
+    track           = models.CharField(max_length=10, choices=TRACK_CHOICES, default="base")
+    character_class = models.ForeignKey(CharacterClass, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    created         = models.JSONField(default=dict, blank=True)
+    changed         = models.JSONField(default=dict, blank=True)
+    removed         = models.JSONField(default=dict, blank=True)
+    skill_points    = models.IntegerField(default=0, help_text="Skill points awarded by this level")
+    created_at      = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ("character", "level")
+        ordering = ["character", "level"]
+
+    def __str__(self):
+        return f"{self.character.name} L{self.level} ({self.track})"
+
 # models.py
 
 class WeaponTrait(models.Model):
@@ -2960,7 +2997,54 @@ class ClassSkillFeatGrant(models.Model):
 
 from django.db import models
 
-class Spell(models.Model):
+import re
+
+from django.contrib.postgres.indexes import OpClass
+from django.db.models.functions import Upper
+
+# Multi-value sheet cells ("Arcane, Divine", "Wizard; Fighter") -> token arrays
+CELL_SPLIT_RE = re.compile(r"\s*[,;/|]\s*")   # same separators the codex grids accept
+COMMA_SPLIT_RE = re.compile(r"\s*,\s*")
+
+
+def split_cell_tokens(value, split_re=CELL_SPLIT_RE, *, lower=True):
+    """'Arcane; Divine' -> ['arcane', 'divine'] (stripped, de-duplicated, in order)."""
+    out = []
+    for tok in split_re.split(value or ""):
+        tok = tok.strip()
+        if lower:
+            tok = tok.lower()
+        if tok and tok not in out:
+            out.append(tok)
+    return out
+
+
+class CellTokensMixin:
+    """
+    Keeps ArrayField copies of multi-value text columns in sync on save().
+
+    TOKEN_SOURCES maps array field -> (source column, split regex); TOKENS_LOWER
+    decides whether tokens are lower-cased (filter-only) or keep their spelling
+    (also used as facet labels).
+    """
+    TOKEN_SOURCES = {}
+    TOKENS_LOWER = True
+
+    def refresh_tokens(self):
+        for field, (source, split_re) in self.TOKEN_SOURCES.items():
+            setattr(self, field, split_cell_tokens(getattr(self, source), split_re, lower=self.TOKENS_LOWER))
+
+    def save(self, *args, **kwargs):
+        self.refresh_tokens()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            sources = {source for source, _re in self.TOKEN_SOURCES.values()}
+            if sources & set(update_fields):
+                kwargs["update_fields"] = set(update_fields) | set(self.TOKEN_SOURCES)
+        super().save(*args, **kwargs)
+
+
+class Spell(CellTokensMixin, models.Model):
     name = models.CharField(max_length=501)
     level = models.IntegerField()  # 0 = Cantrip
     classification = models.CharField(max_length=512, blank=True)
@@ -2978,6 +3062,8 @@ class Spell(models.Model):
     mastery_req = models.CharField(max_length=512, blank=True)
     tags = models.TextField(blank=True)
     last_synced = models.DateTimeField(auto_now=True)
+    # Content hash of the sheet row last written here (sync_google_data skips rows whose hash matches).
+    sync_hash = models.CharField(max_length=40, blank=True, default="", editable=False)
     class_feature = models.OneToOneField(
         "characters.ClassFeature",
         on_delete=models.CASCADE,
@@ -2986,11 +3072,35 @@ class Spell(models.Model):
         null=True,
         help_text="If this is an inherent‐spell feature, store its full Spell here."
     )
+
+    # Lower-cased cell tokens ("Arcane, Divine" -> ["arcane", "divine"]) for the indexed
+    # filters of the spell catalog API; recomputed by save() from the source columns.
+    origin_tokens         = ArrayField(models.TextField(), default=list, blank=True, editable=False)
+    classification_tokens = ArrayField(models.TextField(), default=list, blank=True, editable=False)
+    tag_tokens            = ArrayField(models.TextField(), default=list, blank=True, editable=False)
+
+    TOKEN_SOURCES = {
+        "origin_tokens": ("origin", CELL_SPLIT_RE),
+        "classification_tokens": ("classification", CELL_SPLIT_RE),
+        "tag_tokens": ("tags", COMMA_SPLIT_RE),
+    }
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["level", "name", "id"], name="spell_level_name_idx"),
+            GinIndex(fields=["origin_tokens"], name="spell_origin_tokens_gin"),
+            GinIndex(fields=["classification_tokens"], name="spell_class_tokens_gin"),
+            GinIndex(fields=["tag_tokens"], name="spell_tag_tokens_gin"),
+            # icontains compiles to UPPER(name) LIKE UPPER(...), so index that expression
+            GinIndex(OpClass(Upper("name"), name="gin_trgm_ops"), name="spell_name_trgm"),
+        ]
+
     def __str__(self):
         if self.level == 0:
             return f"{self.name} (Cantrip)"
         return f"{self.name} (L{self.level})"
-class ClassFeat(models.Model):
+
+class ClassFeat(CellTokensMixin, models.Model):
     name = models.CharField(max_length=512)
     description = models.TextField()
     level_prerequisite = models.CharField(max_length=512, blank=True)
@@ -3000,10 +3110,50 @@ class ClassFeat(models.Model):
     tags = models.TextField(blank=True)
     prerequisites = models.TextField(blank=True)
     last_synced = models.DateTimeField(auto_now=True)
+    # Content hash of the sheet row last written here (sync_google_data skips rows whose hash matches).
+    sync_hash = models.CharField(max_length=40, blank=True, default="", editable=False)
+
+    # The CSV columns above as token arrays (spelling kept: they double as facet labels),
+    # recomputed by save(); the feat codex filters and counts facets on these.
+    feat_type_tokens = ArrayField(models.TextField(), default=list, blank=True, editable=False)
+    class_tokens     = ArrayField(models.TextField(), default=list, blank=True, editable=False)
+    race_tokens      = ArrayField(models.TextField(), default=list, blank=True, editable=False)
+    tag_tokens       = ArrayField(models.TextField(), default=list, blank=True, editable=False)
+
+    TOKEN_SOURCES = {
+        "feat_type_tokens": ("feat_type", COMMA_SPLIT_RE),
+        "class_tokens": ("class_name", CELL_SPLIT_RE),
+        "race_tokens": ("race", CELL_SPLIT_RE),
+        "tag_tokens": ("tags", COMMA_SPLIT_RE),
+    }
+    TOKENS_LOWER = False
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["feat_type_tokens"], name="feat_type_tokens_gin"),
+            GinIndex(fields=["class_tokens"], name="feat_class_tokens_gin"),
+            GinIndex(fields=["race_tokens"], name="feat_race_tokens_gin"),
+            GinIndex(fields=["tag_tokens"], name="feat_tag_tokens_gin"),
+        ]
 
     def __str__(self):
         # show just the name (you can append level_prerequisite if you like)
         return self.name
+
+
+class SheetSyncState(models.Model):
+    """Content hash of each worksheet as of the last sync; unchanged tabs are skipped."""
+    book = models.CharField(max_length=32)
+    worksheet = models.CharField(max_length=255)
+    content_hash = models.CharField(max_length=40)
+    row_count = models.PositiveIntegerField(default=0)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("book", "worksheet")
+
+    def __str__(self):
+        return f"{self.book}/{self.worksheet}"
     
 # --- New: which weapons a character has equipped (2 simple slots) ---
 class CharacterWeaponEquip(models.Model):
@@ -3340,3 +3490,80 @@ class PrestigeFeature(models.Model):
             raise ValidationError({"at_prestige_level": "Prestige 1 is a dead level; do not add features here."})
 
 
+
+
+class CharacterSheetSnapshot(models.Model):
+    """
+    Materialized derived numbers for one character's sheet (HP max, proficiencies,
+    spell slots), stamped with the rules catalog version they were built from.
+
+    `revision` is bumped by characters/snapshot_signals.py whenever something the
+    sheet depends on changes; `built_revision` is the revision `data` was computed
+    from. The snapshot is stale whenever the two differ.
+    """
+    character = models.OneToOneField(
+        "characters.Character",
+        on_delete=models.CASCADE,
+        related_name="sheet_snapshot",
+    )
+    data = models.JSONField(default=dict, blank=True)
+    revision = models.PositiveIntegerField(default=1)
+    built_revision = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def is_stale(self) -> bool:
+        return self.built_revision != self.revision
+
+    def __str__(self):
+        return f"{self.character} sheet r{self.revision}"
+
+
+class RulesCatalogVersion(models.Model):
+    """
+    Single-row counter for the in-process rules catalog (characters/services/rules_catalog.py).
+
+    Every save/delete of a rules model bumps `version`; each worker compares it with
+    the version its cached catalog was built from and reloads when they differ.
+    """
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"rules catalog v{self.version}"
+
+
+class SearchDocument(models.Model):
+    """
+    One row per searchable codex object (feature, spell, weapon, rulebook page …),
+    maintained by search_signals.py and the rebuild_search_index command.
+
+    global_search answers from this table in one ranked query: `search_vector`
+    (title/code weight A, body weight C) backs full-text matches; the pg_trgm
+    indexes on title/code/body back prefix, substring and fuzzy matches.
+    """
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    section = models.CharField(max_length=64, db_index=True)   # "Spells", "Weapons", …
+    title = models.CharField(max_length=255)
+    code = models.CharField(max_length=255, blank=True)
+    body = models.TextField(blank=True)
+    url = models.CharField(max_length=500, blank=True)
+    fields = models.JSONField(default=list, blank=True)   # [{field, label, value}] shown under "Show all fields"
+    search_vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("content_type", "object_id")
+        indexes = [
+            GinIndex(fields=["search_vector"], name="searchdoc_vector_gin"),
+            # title % query (fuzzy)
+            GinIndex(fields=["title"], name="searchdoc_title_trgm", opclasses=["gin_trgm_ops"]),
+            # icontains / istartswith compile to UPPER(col) LIKE UPPER(...)
+            GinIndex(OpClass(Upper("title"), name="gin_trgm_ops"), name="searchdoc_title_up_trgm"),
+            GinIndex(OpClass(Upper("code"), name="gin_trgm_ops"), name="searchdoc_code_trgm"),
+            GinIndex(OpClass(Upper("body"), name="gin_trgm_ops"), name="searchdoc_body_trgm"),
+        ]
+
+    def __str__(self):
+        return f"{self.section}: {self.title}"
@@ -0,0 +1,16 @@
+# characters/rulebook_signals.py
+from __future__ import annotations
+
+from django.db.models.signals import post_save
+
+from .models import RulebookPage
+from .services.rulebook_terms import schedule_page_reindex
+
+
+def _page_saved(sender, instance, raw=False, **kwargs):
+    if raw:  # loaddata
+        return
+    schedule_page_reindex(instance.pk)
+
+
+post_save.connect(_page_saved, sender=RulebookPage, dispatch_uid="rulebook_terms:page_save")
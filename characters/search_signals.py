@@ -0,0 +1,38 @@
+# characters/search_signals.py
+from __future__ import annotations
+
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from .services.bulk_writes import bulk_saved
+from .services.search_index import SEARCHABLES, queue_reindex
+
+
+def _doc_changed(sender, instance, raw=False, **kwargs):
+    if raw:  # loaddata
+        return
+    queue_reindex(sender, instance.pk)
+
+
+def _docs_bulk_saved(sender, instances, **kwargs):
+    for obj in instances:
+        queue_reindex(sender, obj.pk)
+
+
+def _m2m_changed(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        queue_reindex(type(instance), instance.pk)
+    else:
+        # e.g. trait.weapons.add(...): the searchable rows are on the other side
+        for pk in pk_set or ():
+            queue_reindex(model, pk)
+
+
+for _label, _model in SEARCHABLES:
+    post_save.connect(_doc_changed, sender=_model, dispatch_uid=f"search_index:{_model.__name__}:save")
+    post_delete.connect(_doc_changed, sender=_model, dispatch_uid=f"search_index:{_model.__name__}:delete")
+    bulk_saved.connect(_docs_bulk_saved, sender=_model, dispatch_uid=f"search_index:{_model.__name__}:bulk")
+    for _f in _model._meta.many_to_many:
+        m2m_changed.connect(_m2m_changed, sender=_f.remote_field.through,
+                            dispatch_uid=f"search_index:{_model.__name__}.{_f.name}")
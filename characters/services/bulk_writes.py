@@ -0,0 +1,76 @@
+# characters/services/bulk_writes.py
+"""
+Audited bulk writes for batch jobs (sync_google_data, normalize_feature_bonuses,
+recalc_weapon_ranges).
+
+QuerySet.bulk_update / bulk_create skip the model signals, so they also skip
+the ModelChangeLog rows behind the public changelog, the rules catalog
+version, the search index and sheet snapshot invalidation. These helpers
+keep the batched statements and do that work in bulk instead:
+
+  - field diffs are computed in memory against the values each row held when
+    it was loaded (audit_signals' from_db snapshot), honouring the
+    AuditTrackedModel include / exclude config; change rows are written with
+    one bulk_create when the transaction commits;
+  - CellTokensMixin token arrays are refreshed when their source column is
+    written;
+  - `bulk_saved` is sent once per call, so catalog / search / snapshot
+    receivers bump or queue once for the whole batch instead of per row.
+"""
+from django.db import transaction
+from django.dispatch import Signal
+
+from characters import audit_signals
+from characters.models import CellTokensMixin, ModelChangeLog
+
+BATCH_SIZE = 500
+
+# sender=model class, instances=[...], created=bool, update_fields=frozenset | None
+bulk_saved = Signal()
+
+
+def _with_token_fields(model, objs, fields):
+    if not issubclass(model, CellTokensMixin):
+        return fields
+    if fields is not None:
+        sources = {source for source, _re in model.TOKEN_SOURCES.values()}
+        if not sources & set(fields):
+            return fields
+    for obj in objs:
+        obj.refresh_tokens()
+    if fields is None:
+        return fields
+    return list(fields) + [f for f in model.TOKEN_SOURCES if f not in fields]
+
+
+def bulk_update_audited(objs, fields, *, batch_size=BATCH_SIZE) -> int:
+    """QuerySet.bulk_update(objs, fields) plus change log rows for what actually changed; returns rows matched."""
+    objs = list(objs)
+    if not objs:
+        return 0
+    model = type(objs[0])
+    fields = _with_token_fields(model, objs, list(fields))
+
+    with transaction.atomic():
+        changes = audit_signals.update_changes(model, objs, fields)
+        n = model.objects.bulk_update(objs, fields, batch_size=batch_size)
+        audit_signals.record_changes(model, ModelChangeLog.ACTION_UPDATE, changes)
+        audit_signals.remember_written(model, objs, fields)
+        bulk_saved.send(sender=model, instances=objs, created=False, update_fields=frozenset(fields))
+    return n
+
+
+def bulk_create_audited(objs, *, batch_size=BATCH_SIZE) -> list:
+    """QuerySet.bulk_create(objs) plus a "create" change log row per new row; returns the created objects."""
+    objs = list(objs)
+    if not objs:
+        return []
+    model = type(objs[0])
+    _with_token_fields(model, objs, None)
+
+    with transaction.atomic():
+        created = model.objects.bulk_create(objs, batch_size=batch_size)
+        audit_signals.record_changes(model, ModelChangeLog.ACTION_CREATE, audit_signals.create_changes(model, created))
+        audit_signals.remember_written(model, created)
+        bulk_saved.send(sender=model, instances=created, created=True, update_fields=None)
+    return created
@@ -0,0 +1,91 @@
+# characters/services/codex_cache.py
+"""
+Conditional (ETag / Last-Modified) and server-cached responses for the codex.
+
+Codex data only changes when an admin edits it or sync_google_data runs, and
+every such write moves a single-row version counter (RulesCatalogVersion via
+catalog_signals.py, GlossaryVersion via glossary/signals.py). A view wrapped
+in @codex_response(stamp) gets:
+
+  - a strong ETag over (view, host, normalized query string, version) and a
+    Last-Modified from the counter's updated_at, so a browser revalidating an
+    unchanged page gets a 304 without the view running at all;
+  - for shared data endpoints (JSON), the rendered response cached under the
+    same key, so the first worker to serve a version serializes it once.
+
+HTML pages carry the user's menu and CSRF token, so they are wrapped with
+shared=False: the ETag also covers the user and CSRF cookie, the response is
+`Cache-Control: private` and the body is never stored server-side.
+"""
+import hashlib
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+CACHE_ALIAS = getattr(settings, "CODEX_CACHE_ALIAS", "default")
+CACHE_SECONDS = getattr(settings, "CODEX_CACHE_SECONDS", 60 * 60)
+
+# query parameters that never change the response (jQuery cache busters)
+IGNORED_PARAMS = {"_"}
+
+
+def normalized_query(request) -> str:
+    """The query string with keys sorted and cache-buster params dropped."""
+    items = sorted((k, v) for k, v in request.GET.lists() if k not in IGNORED_PARAMS)
+    return urlencode(items, doseq=True)
+
+
+def _digest(*parts) -> str:
+    return hashlib.sha1("\x1f".join(str(p) for p in parts).encode()).hexdigest()
+
+
+def codex_response(stamp, *, shared=True, timeout=CACHE_SECONDS):
+    """
+    stamp:   callable returning (version, updated_at), e.g. rules_catalog.version_stamp.
+    shared:  True when the body is the same for every user (cache it server-side).
+    """
+    def decorator(view):
+        name = f"{view.__module__}.{view.__qualname__}"
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            version, updated_at = stamp()
+            key = _digest(name, request.get_host(), normalized_query(request), args,
+                          sorted(kwargs.items()), version)
+            if not shared:
+                key = _digest(key, getattr(request.user, "pk", None),
+                              request.COOKIES.get(settings.CSRF_COOKIE_NAME, ""))
+            etag = f'"{key}"'
+            last_modified = int(updated_at.timestamp()) if updated_at else None
+
+            not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if not_modified is not None:
+                return not_modified
+
+            cache_key = f"codex:{name}:{key}"
+            cache = caches[CACHE_ALIAS]
+            response = cache.get(cache_key) if shared else None
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != 200 or response.streaming:
+                    return response
+                response["ETag"] = etag
+                if last_modified is not None:
+                    response["Last-Modified"] = http_date(last_modified)
+                if shared:
+                    patch_cache_control(response, no_cache=True)
+                else:
+                    patch_cache_control(response, no_cache=True, private=True)
+                if shared and not response.cookies:
+                    cache.set(cache_key, response, timeout)
+            return response
+
+        return wrapped
+    return decorator
@@ -0,0 +1,97 @@
+# characters/services/feat_facets.py
+"""
+Feat codex filters and facet counts on the ClassFeat token arrays.
+
+ClassFeat keeps feat_type / class_name / race / tags as GIN-indexed token
+arrays (CellTokensMixin), so:
+
+  - a filter is an array overlap (feat_type_tokens && ARRAY['Class', ...])
+    instead of a word-boundary regex over the CSV text;
+  - facet counts are one GROUP BY over unnest() of every array, cached per
+    catalog version (catalog_signals bumps it on every ClassFeat write).
+
+Tokens keep their sheet spelling (they are the facet labels); a requested
+value is matched case-insensitively by expanding it to the spellings the
+facets know about.
+"""
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import Q
+
+from characters.models import ClassFeat
+from characters.services.codex_cache import CACHE_ALIAS, CACHE_SECONDS
+from characters.services.rules_catalog import version_stamp
+from characters.services.search_index import enabled
+
+# query param -> token array
+FACETS = {
+    "type": "feat_type_tokens",
+    "class": "class_tokens",
+    "race": "race_tokens",
+    "tag": "tag_tokens",
+}
+
+
+def _counts_sql():
+    table = connection.ops.quote_name(ClassFeat._meta.db_table)
+    parts = []
+    for param, field in FACETS.items():
+        column = connection.ops.quote_name(ClassFeat._meta.get_field(field).column)
+        parts.append(f"SELECT %s, tok, COUNT(*) FROM {table} "
+                     f"CROSS JOIN LATERAL unnest({column}) AS tok GROUP BY tok")
+    return " UNION ALL ".join(parts), list(FACETS)
+
+
+def compute_facets() -> dict:
+    """{param: [(label, feat count), ...] sorted by label} over every feat."""
+    out = {param: [] for param in FACETS}
+    if enabled():
+        sql, params = _counts_sql()
+        with connection.cursor() as cur:
+            cur.execute(sql, params)
+            for param, label, n in cur.fetchall():
+                out[param].append((label, n))
+    else:
+        counts = {param: {} for param in FACETS}
+        for row in ClassFeat.objects.values_list(*FACETS.values()):
+            for param, tokens in zip(FACETS, row):
+                for tok in tokens or ():
+                    counts[param][tok] = counts[param].get(tok, 0) + 1
+        for param, c in counts.items():
+            out[param] = list(c.items())
+    for values in out.values():
+        values.sort(key=lambda lv: (lv[0].lower(), lv[0]))
+    return out
+
+
+def get_facets() -> dict:
+    """compute_facets() for the current catalog version (shared through the Django cache)."""
+    version, _updated = version_stamp()
+    key = f"feat_facets:v{version}"
+    cache = caches[CACHE_ALIAS]
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets()
+        cache.set(key, facets, CACHE_SECONDS)
+    return facets
+
+
+def spellings(param, wanted, facets=None) -> list:
+    """Every spelling of `wanted` (case-insensitive) among the param's facet labels."""
+    facets = facets or get_facets()
+    low = [w.strip().lower() for w in wanted if w and w.strip()]
+    found = [label for label, _n in facets.get(param, ()) if label.lower() in low]
+    return found or [w.strip() for w in wanted if w and w.strip()]
+
+
+def filter_feats(qs, *, q="", types=(), classes=(), races=(), tags=()):
+    """Name/tag text search plus ANY-of membership per facet, all index-backed."""
+    if q:
+        qs = qs.filter(Q(name__icontains=q) | Q(tags__icontains=q))
+    facets = None
+    for param, wanted in (("type", types), ("class", classes), ("race", races), ("tag", tags)):
+        wanted = [w for w in wanted if w and w.strip()]
+        if wanted:
+            facets = facets or get_facets()
+            qs = qs.filter(**{f"{FACETS[param]}__overlap": spellings(param, wanted, facets)})
+    return qs
@@ -0,0 +1,267 @@
+# characters/services/formulas.py
+"""
+One formula engine for every rules/override formula on the site
+(cantrips_formula, spells_known_formula, martial_points_formula,
+starting_skills_formula, sheet "formula:" overrides, …).
+
+Each distinct expression is normalized, parsed and validated once, then
+compiled into a tree of closures that is kept in a bounded LRU cache.
+Evaluating it is just calling those closures against a dict of variables.
+"""
+import ast
+import math
+import operator
+import re
+from functools import lru_cache
+
+FORMULA_CACHE_SIZE = 2048
+
+# Functions callers are allowed to use in formulas (a formula's own variables win on clashes)
+DEFAULT_FUNCS = {
+    "floor": math.floor, "ceil": math.ceil, "round": round,
+    "min": min, "max": max, "int": int, "abs": abs,
+    # friendly aliases people type in your data
+    "round_up": math.ceil, "roundup": math.ceil, "ceiling": math.ceil,
+    "round_down": math.floor, "rounddown": math.floor,
+}
+
+
+class FormulaError(ValueError):
+    """Bad syntax, a disallowed construct, an unknown name or a math error."""
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def normalize_formula(expr: str) -> str:
+    """Make stored formulas Pythonic: 'round up(x)' -> 'ceil(x)', '^' -> '**', etc."""
+    if not expr:
+        return ""
+    e = expr.strip()
+
+    # caret to Python power
+    e = e.replace("^", "**")
+
+    # 'round up(' / 'round down(' → ceil/floor
+    # phrase forms -> real functions (handles "round up(x)" and "… round up")
+    e = re.sub(r"\bround\s*up\b",   "ceil",  e, flags=re.IGNORECASE)
+    e = re.sub(r"\bround\s*down\b", "floor", e, flags=re.IGNORECASE)
+
+    # Allow postfix '(... ) ceil' / '(... ) floor'
+    e = re.sub(r"\(\s*([^()]+?)\s*\)\s*ceil\b",  r"ceil(\1)",  e, flags=re.I)
+    e = re.sub(r"\(\s*([^()]+?)\s*\)\s*floor\b", r"floor(\1)", e, flags=re.I)
+
+    # Allow 'x / n ceil' → 'ceil(x/n)' (and floor)
+    e = re.sub(r"(.+?)\s*/\s*([0-9]+)\s*ceil\b",  r"ceil((\1)/\2)",  e, flags=re.I)
+    e = re.sub(r"(.+?)\s*/\s*([0-9]+)\s*floor\b", r"floor((\1)/\2)", e, flags=re.I)
+
+    return e
+
+
+# ── AST → closures ────────────────────────────────────────────────────────────
+_BIN_OPS = {
+    ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul,
+    ast.Div: operator.truediv, ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod, ast.Pow: operator.pow,
+}
+_UNARY_OPS = {ast.UAdd: operator.pos, ast.USub: operator.neg, ast.Not: operator.not_}
+_CMP_OPS = {
+    ast.Eq: operator.eq, ast.NotEq: operator.ne, ast.Lt: operator.lt,
+    ast.LtE: operator.le, ast.Gt: operator.gt, ast.GtE: operator.ge,
+}
+_MAX_POW_EXPONENT = 64
+_MAX_POW_BITS = 128     # |result| < 2**128; nested powers can't grow a huge int either
+
+
+def _pow(a, b):
+    if abs(b) > _MAX_POW_EXPONENT:
+        raise FormulaError("Exponent too large")
+    if isinstance(a, int) and isinstance(b, int):
+        if b > 0 and abs(a).bit_length() * b > _MAX_POW_BITS:
+            raise FormulaError("Power result too large")
+        return a ** b
+    try:
+        result = a ** b
+    except OverflowError:
+        raise FormulaError("Power result too large") from None
+    if isinstance(result, complex):
+        raise FormulaError("Fractional power of a negative number")
+    if abs(result) >= 2.0 ** _MAX_POW_BITS:
+        raise FormulaError("Power result too large")
+    return result
+
+
+def _lookup(name):
+    def load(env):
+        try:
+            return env[name]
+        except KeyError:
+            pass
+        try:
+            return DEFAULT_FUNCS[name]
+        except KeyError:
+            raise FormulaError(f"Unknown variable {name!r}") from None
+    return load
+
+
+def _build(node, names: set):
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, str) or not isinstance(value, (int, float)):
+            raise FormulaError("Only numbers are allowed as literals")
+        return lambda env: value
+
+    if isinstance(node, ast.Name):
+        names.add(node.id)
+        return _lookup(node.id)
+
+    if isinstance(node, ast.BinOp):
+        op = _BIN_OPS.get(type(node.op))
+        if op is None:
+            raise FormulaError(f"Operator {type(node.op).__name__} is not allowed")
+        if op is operator.pow:
+            op = _pow
+        left, right = _build(node.left, names), _build(node.right, names)
+        return lambda env: op(left(env), right(env))
+
+    if isinstance(node, ast.UnaryOp):
+        op = _UNARY_OPS.get(type(node.op))
+        if op is None:
+            raise FormulaError(f"Operator {type(node.op).__name__} is not allowed")
+        operand = _build(node.operand, names)
+        return lambda env: op(operand(env))
+
+    if isinstance(node, ast.BoolOp):
+        parts = [_build(v, names) for v in node.values]
+        if isinstance(node.op, ast.And):
+            def _and(env):
+                val = True
+                for p in parts:
+                    val = p(env)
+                    if not val:
+                        return val
+                return val
+            return _and
+
+        def _or(env):
+            val = False
+            for p in parts:
+                val = p(env)
+                if val:
+                    return val
+            return val
+        return _or
+
+    if isinstance(node, ast.Compare):
+        first = _build(node.left, names)
+        ops = []
+        for op_node, comparator in zip(node.ops, node.comparators):
+            op = _CMP_OPS.get(type(op_node))
+            if op is None:
+                raise FormulaError(f"Comparison {type(op_node).__name__} is not allowed")
+            ops.append((op, _build(comparator, names)))
+
+        def _cmp(env):
+            left = first(env)
+            for op, right_fn in ops:
+                right = right_fn(env)
+                if not op(left, right):
+                    return False
+                left = right
+            return True
+        return _cmp
+
+    if isinstance(node, ast.IfExp):
+        test, body, orelse = (_build(node.test, names), _build(node.body, names), _build(node.orelse, names))
+        return lambda env: body(env) if test(env) else orelse(env)
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            raise FormulaError("Only plain function calls like floor(x) are allowed")
+        if any(isinstance(a, ast.Starred) for a in node.args):
+            raise FormulaError("Only plain function calls like floor(x) are allowed")
+        fn = _lookup(node.func.id)
+        args = [_build(a, names) for a in node.args]
+
+        def _call(env):
+            f = fn(env)
+            if not callable(f):
+                raise FormulaError(f"{node.func.id!r} is not a function")
+            return f(*[a(env) for a in args])
+        return _call
+
+    raise FormulaError(f"{type(node).__name__} is not allowed in formulas")
+
+
+class CompiledFormula:
+    """A validated, pre-built formula. Call it with a variables dict."""
+    __slots__ = ("source", "names", "_fn")
+
+    def __init__(self, source: str, fn, names: frozenset):
+        self.source = source
+        self.names = names
+        self._fn = fn
+
+    def __call__(self, variables):
+        try:
+            return self._fn(variables)
+        except FormulaError:
+            raise
+        except (ArithmeticError, TypeError, ValueError) as e:
+            raise FormulaError(f"Could not evaluate {self.source!r}: {e}") from e
+
+    def __repr__(self):
+        return f"<CompiledFormula {self.source!r}>"
+
+
+@lru_cache(maxsize=FORMULA_CACHE_SIZE)
+def _compile_normalized(source: str) -> CompiledFormula:
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula {source!r}: {e.msg}") from None
+    names = set()
+    fn = _build(tree.body, names)
+    return CompiledFormula(source, fn, frozenset(names))
+
+
+def compile_formula(expr: str, *, normalize: bool = True) -> CompiledFormula:
+    """Parse + validate once; later calls with the same (normalized) source hit the cache."""
+    source = normalize_formula(expr) if normalize else (expr or "").strip()
+    if not source:
+        raise FormulaError("Empty formula")
+    return _compile_normalized(source)
+
+
+def evaluate(expr: str, variables=None, *, normalize: bool = True):
+    """Evaluate `expr` against `variables`; raises FormulaError on any problem."""
+    return compile_formula(expr, normalize=normalize)(variables if variables is not None else {})
+
+
+def evaluate_int(expr: str, variables=None, default=0, *, normalize: bool = True):
+    """int(evaluate(...)), or `default` for blank/bad formulas (the sheet never 500s on data)."""
+    if not expr or not str(expr).strip():
+        return default
+    try:
+        return int(evaluate(str(expr), variables, normalize=normalize))
+    except (FormulaError, TypeError, ValueError, OverflowError):
+        return default
+
+
+def evaluate_many(exprs, variables=None, default=0, *, normalize: bool = True) -> dict:
+    """
+    Batch mode: evaluate a {key: expr} mapping against ONE variables dict.
+    Blank or bad formulas yield `default` for their key.
+    """
+    env = variables if variables is not None else {}
+    out = {}
+    for key, expr in exprs.items():
+        out[key] = evaluate_int(expr, env, default, normalize=normalize)
+    return out
+
+
+def cache_info():
+    return {"normalize": normalize_formula.cache_info(), "compile": _compile_normalized.cache_info()}
+
+
+def clear_cache():
+    normalize_formula.cache_clear()
+    _compile_normalized.cache_clear()
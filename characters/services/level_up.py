@@ -0,0 +1,1222 @@
+# characters/services/level_up.py
+"""
+Level-up rules and the plan-then-apply engine behind character_level_up.
+
+LevelUpPlanner turns a level-up submission into a LevelUpPlan: the class
+progress bump, ability increases and every CharacterFeature / CharacterFeat /
+CharacterSkillProficiency / CharacterSkillPointTx / prestige choice row the
+level grants, held in memory as unsaved instances. Planning never writes,
+so the same plan backs
+
+  - the level-up preview endpoint, which returns plan.as_dict(), and
+  - apply(), which persists it in one transaction with one bulk insert per
+    table (bulk_writes' audited helpers, so the change log and sheet
+    snapshot invalidation still see the rows).
+
+The planner reads what it needs once (owned features and feats, the class
+level's features with their subclasses and options, skill grants), so the
+query count of a level-up doesn't grow with the number of features the level
+grants. A rule broken by the submission is an entry in plan.errors instead of
+a level that stops half-way through its writes.
+
+apply() also writes a CharacterLevelJournal entry (ids created, fields changed
+with their previous values, rows removed, skill points awarded). level_down()
+replays those entries backwards, so taking a level off, or several at once,
+is a few bulk deletes and updates in one transaction rather than a re-run of
+the rules; levels from before the journal go through legacy_level_down().
+
+The subclass / race / starting-skill rules below are shared with
+character_detail's level-up modal.
+"""
+import copy
+import re
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F, Q
+
+from characters.models import (
+    CharacterClassProgress, CharacterFeat, CharacterFeature, CharacterFieldNote,
+    CharacterFieldOverride, CharacterLevelJournal, CharacterPrestigeLevelChoice, CharacterSkillPointTx,
+    CharacterSkillProficiency, ClassFeat, ClassFeature, ClassLevel,
+    ClassSkillFeatGrant, PrestigeClass,
+    PrestigeFeature, PrestigeLevel, ProficiencyLevel, Skill, SubclassGroup,
+    SubSkill, UniversalLevelFeature,
+)
+from characters.services.bulk_writes import bulk_create_audited, bulk_update_audited
+from characters.services.formulas import FormulaError, evaluate
+
+ABILITY_FIELDS = ("strength", "dexterity", "constitution", "intelligence", "wisdom", "charisma")
+PRESTIGE_MIN_LEVEL = 7
+
+CLASS_LEVEL_PREFETCH = (
+    "features__subclasses",
+    "features__subclass_group__subclasses",
+    "features__options__grants_feature",
+)
+
+
+# ── race matching ─────────────────────────────────────────────────────────────
+def normalize_race_token(raw: str) -> str:
+    """
+    Normalize a race token so that:
+      - Casing / punctuation noise is stripped
+      - Common plurals are collapsed to a singular-ish form
+      - Noise words like 'only' are removed
+    """
+    t = str(raw or "").strip().lower()
+
+    # strip common noise words
+    t = re.sub(r"\b(only|heritage|ancestry|subrace)\b", "", t)
+
+    # keep letters, digits, spaces and hyphens
+    t = re.sub(r"[^\w\s\-]", "", t)
+    t = re.sub(r"\s+", " ", t).strip()
+
+    # irregular / common plurals -> singular
+    repl = {
+        "elves": "elf",
+        "dwarves": "dwarf",
+        "halflings": "halfling",
+        "humans": "human",
+        "gnomes": "gnome",
+        "orcs": "orc",
+        "tieflings": "tiefling",
+        "dragonborns": "dragonborn",
+        "half elves": "half elf",
+    }
+    for plural, sing in repl.items():
+        t = re.sub(rf"\b{plural}\b", sing, t)
+
+    # generic “ends with s” plural (goliaths -> goliath, tabaxi stays tabaxi)
+    if len(t) > 3 and t.endswith("s"):
+        t = t[:-1]
+
+    return t
+
+
+def split_race_tokens(raw: str) -> list[str]:
+    """
+    Split a race string into logical tokens.
+
+    Examples:
+      'Gnome, Halfling' -> ['gnome', 'halfling']
+      'Tiefling, Lizardfolk, Tabaxi, Kitsune, Dragonborn'
+          -> ['tiefling','lizardfolk','tabaxi','kitsune','dragonborn']
+      'Elf, Half-Elf' -> ['elf','half-elf']
+      'High Elves' -> ['high elf']
+    """
+    if not raw:
+        return []
+
+    parts = re.split(r"[,\;/]", str(raw))
+    tokens: list[str] = []
+    for p in parts:
+        t = normalize_race_token(p)
+        if t:
+            tokens.append(t)
+    return tokens
+
+
+def feat_matches_character_race(feat_race: str, character) -> bool:
+    """
+    Returns True if this feat's race string should apply to this character.
+
+    Rules:
+      • Blank / null feat.race => always allowed (generic feat).
+      • Otherwise, build tokens for:
+          - character race + subrace
+          - feat.race
+        Then return True if ANY (ct, ft) satisfies:
+          ct == ft OR ct in ft OR ft in ct
+        after normalization.
+
+      So:
+        - 'Goliath' matches 'Goliath, Tabaxi'
+        - 'Goliath' matches 'Goliaths only'
+        - 'Elf'     matches 'Elf, Half-Elf', 'High Elves', 'Elves'
+    """
+    # Generic feats: no race restriction
+    if not feat_race or not str(feat_race).strip():
+        return True
+
+    # Character race / subrace names
+    char_names: list[str] = []
+    if getattr(character, "race", None) and getattr(character.race, "name", None):
+        char_names.append(character.race.name)
+    if getattr(character, "subrace", None) and getattr(character.subrace, "name", None):
+        char_names.append(character.subrace.name)
+
+    if not char_names:
+        # character has no race info → race-locked feats do NOT apply
+        return False
+
+    # Normalize + split the character side
+    char_tokens: list[str] = []
+    for raw in char_names:
+        char_tokens.extend(split_race_tokens(raw))
+
+    # Normalize + split the feat side
+    feat_tokens = split_race_tokens(feat_race)
+
+    if not feat_tokens:
+        # weird junk but effectively “no restriction”
+        return True
+
+    for ct in char_tokens:
+        for ft in feat_tokens:
+            if not ct or not ft:
+                continue
+            if ct == ft or ct in ft or ft in ct:
+                return True
+
+    return False
+
+
+# ── class / subclass rules ────────────────────────────────────────────────────
+def class_level_token(name) -> str:
+    return re.sub(r'[^a-z0-9_]', '', (name or '').strip().lower().replace(' ', '_'))
+
+
+def starting_skills_cap(character, cls_obj, class_levels=None):
+    """
+    How many starting skills `cls_obj`'s formula allows (ability MODIFIERS and
+    <class>_level tokens), or None when the class has no formula (no cap).
+
+    `class_levels` ({class name: levels}) replaces the saved class progress, so
+    a planned level can be counted before it is written. Raises FormulaError
+    when the formula can't be evaluated.
+    """
+    expr = (getattr(cls_obj, "starting_skills_formula", "") or "").strip()
+    if not expr:
+        return None
+
+    def _abil(score: int) -> int:
+        return (score - 10) // 2
+
+    # IMPORTANT: short names -> MODIFIERS
+    ctx = {
+        # modifiers (primary names)
+        "strength": _abil(character.strength), "dexterity": _abil(character.dexterity),
+        "constitution": _abil(character.constitution), "intelligence": _abil(character.intelligence),
+        "wisdom": _abil(character.wisdom), "charisma": _abil(character.charisma),
+
+        # explicit *_mod aliases (same values as above)
+        "str_mod": _abil(character.strength), "dex_mod": _abil(character.dexterity),
+        "con_mod": _abil(character.constitution), "int_mod": _abil(character.intelligence),
+        "wis_mod": _abil(character.wisdom), "cha_mod": _abil(character.charisma),
+
+        # scores (only if you want them available explicitly)
+        "strength_score": character.strength, "dexterity_score": character.dexterity,
+        "constitution_score": character.constitution, "intelligence_score": character.intelligence,
+        "wisdom_score": character.wisdom, "charisma_score": character.charisma,
+    }
+
+    # <class>_level tokens (wizard_level, fighter_level, ...)
+    if class_levels is None:
+        class_levels = dict(character.class_progress.values_list('character_class__name', 'levels'))
+    for name, levels in class_levels.items():
+        token = class_level_token(name)
+        if token:
+            ctx[f"{token}_level"] = int(levels or 0)
+
+    try:
+        return max(0, int(evaluate(expr, ctx)))
+    except (FormulaError, TypeError, ValueError, OverflowError) as e:
+        raise FormulaError(f"Starting skills formula for {cls_obj.name}: {e}") from e
+
+
+def picks_for_trigger(trigger, base_cls, cls_level):
+    """
+    'Choices granted at this level' → how many modules the player picks now.
+    Prefers the pivot (ClassLevelFeature.choices_granted), falls back to
+    trigger.choices_granted on the feature.
+    """
+    try:
+        cl = ClassLevel.objects.get(character_class=base_cls, level=cls_level)
+    except ClassLevel.DoesNotExist:
+        return int(getattr(trigger, "choices_granted", 1) or 1)
+
+    # Try the through model if it exists
+    try:
+        from characters.models import ClassLevelFeature  # your M2M through that stores choices_granted
+        clf = ClassLevelFeature.objects.filter(class_level=cl, feature=trigger).first()
+        if clf and getattr(clf, "choices_granted", None) not in (None, ""):
+            return int(clf.choices_granted)
+    except Exception:
+        pass
+
+    # Fallback to the feature field itself
+    return int(getattr(trigger, "choices_granted", 1) or 1)
+
+
+def unlocked_tiers(group, new_cls_level):
+    """
+    Which tiers are unlocked for this SubclassGroup at the given class-level?
+    Uses SubclassTierLevel rows. If none exist, falls back to 'all tiers ≤ class level'.
+    """
+    tiers = set(
+        group.tier_levels.filter(unlock_level__lte=new_cls_level)
+                         .values_list("tier", flat=True)
+    )
+    if tiers:
+        return tiers
+    # Fallback: allow tiers up to class level (you can pick a stricter rule if you like)
+    return set(range(1, new_cls_level + 1))
+
+
+def is_subclass_bound_feature(f) -> bool:
+    scope = (getattr(f, "scope", "") or "").strip().lower()
+
+    try:
+        has_subclasses = f.subclasses.exists()   # answered from the cache when prefetched
+    except Exception:
+        has_subclasses = False
+
+    return bool(
+        scope in {"subclass_feat", "subclass_choice"}
+        or getattr(f, "subclass_group_id", None)
+        or has_subclasses
+    )
+
+
+def is_auto_granted_feature(f) -> bool:
+    scope = (getattr(f, "scope", "") or "").strip().lower()
+    kind = (getattr(f, "kind", "") or "").strip().lower()
+
+    if scope == "class_feat":
+        return True
+
+    if kind == "spell_table" and not is_subclass_bound_feature(f):
+        return True
+
+    return False
+
+
+def active_subclass_for_group(character, grp, level_form=None, base_feats=None):
+    """
+    Returns the chosen Subclass for `grp` using (in order):
+    1) the POSTed choice this request (if present),
+    2) the last saved 'subclass_choice' CharacterFeature,
+    3) the last saved 'subclass_feat' (infers subclass),
+    4) an explicit override 'subclass_choice:<grp.id>' if you use that,
+    else None.
+    """
+    # 0) if this request posts a subclass choice field, use it
+    if level_form is not None and getattr(level_form, "is_bound", False):
+        base_feats = list(base_feats or [])
+        sc_choices = [
+            f for f in base_feats
+            if isinstance(f, ClassFeature)
+            and getattr(f, "scope", "") == "subclass_choice"
+            and getattr(f, "subclass_group_id", None) == grp.id
+        ]
+        for f in sc_choices:
+            key = f"feat_{f.pk}_subclass"
+            raw = (level_form.data.get(key) or "").strip()
+            if raw.isdigit():
+                try:
+                    return grp.subclasses.get(pk=int(raw))
+                except grp.subclasses.model.DoesNotExist:
+                    pass
+
+    # 1) last explicitly saved subclass choice
+    row = (CharacterFeature.objects
+        .filter(character=character,
+                feature__scope="subclass_choice",
+                feature__subclass_group=grp)
+        .exclude(subclass__isnull=True)
+        .order_by("-level", "-id")
+        .first())
+    if row and row.subclass_id:
+        return row.subclass
+
+    # 2) infer from owned subclass features
+    row = (CharacterFeature.objects
+        .filter(character=character,
+                feature__scope="subclass_feat",
+                feature__subclass_group=grp)
+        .exclude(subclass__isnull=True)
+        .order_by("-level", "-id")
+        .first())
+    if row and row.subclass_id:
+        return row.subclass
+
+    # 3) optional manual override
+    ov = CharacterFieldOverride.objects.filter(character=character, key=f"subclass_choice:{grp.id}").first()
+    if ov and str(ov.value).strip().isdigit():
+        try:
+            return grp.subclasses.get(pk=int(ov.value))
+        except grp.subclasses.model.DoesNotExist:
+            pass
+
+    return None
+
+
+def linear_feats_for_level(cls_obj, grp, subclass, cls_level, base_feats=None):
+    """Subclass features a LINEAR `subclass` gains at `cls_level` (from the level's features, else by level gates)."""
+    if not subclass:
+        return []
+
+    feats = []
+    for f in (base_feats or []):
+        if (getattr(f, "scope", "") == "subclass_feat"
+            and getattr(f, "subclass_group_id", None) == grp.id
+            and (subclass in f.subclasses.all())):
+            lr = getattr(f, "level_required", None)
+            ml = getattr(f, "min_level", None)
+            if (ml is None or int(ml) <= int(cls_level)) and (lr is None or int(lr) <= int(cls_level)):
+                feats.append(f)
+
+    if feats:
+        return feats
+
+    # Fallback: only when nothing is attached to this level (avoid leaking ungated L1 features)
+    return list(
+        ClassFeature.objects
+            .filter(scope="subclass_feat", subclasses=subclass)
+            .filter(
+                Q(subclass_group=grp) |              # if ClassFeature has FK subclass_group
+                Q(subclasses__group=grp)             # if we must hop via Subclass.group
+            )
+            .filter(
+                Q(level_required=cls_level) |
+                Q(level_required__isnull=True, min_level__lte=cls_level)
+            )
+            .exclude(level_required__isnull=True, min_level__isnull=True)
+            .distinct()
+    )
+
+
+# ── the plan ──────────────────────────────────────────────────────────────────
+class LevelUpPlan:
+    """Everything one level-up writes, as unsaved instances; see LevelUpPlanner."""
+
+    def __init__(self, character, track, *, owned_features=(), owned_feats=()):
+        self.character = character
+        self.track = track                  # "base" | "prestige"
+        self.level = int(character.level or 0) + 1
+        self.errors = []
+        self.messages = []                  # success messages once applied
+
+        self.character_class = None         # class advanced (counts-as class on prestige levels)
+        self.class_level = None             # its class level after this level-up
+        self.progress = None                # CharacterClassProgress with levels already bumped
+        self.ability_changes = {}           # {"strength": +1, ...}
+        self.features = []                  # CharacterFeature
+        self.feats = []                     # CharacterFeat
+        self.skill_proficiencies = []       # CharacterSkillProficiency
+        self.skill_points = None            # CharacterSkillPointTx
+        self.prestige_choice = None         # CharacterPrestigeLevelChoice
+        self.journal = None                 # CharacterLevelJournal, once applied
+
+        # what get_or_create used to look up: (feature_id, subclass_id) and feat ids
+        self._feature_keys = {(fid, sid) for fid, sid in owned_features}
+        self._feat_ids = set(owned_feats)
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def error(self, message):
+        self.errors.append(message)
+        return self
+
+    def add_feature(self, feature=None, *, subclass=None, option=None, once=False):
+        """Queue a CharacterFeature; with once=True skip it when the character has (or is getting) it already."""
+        if once:
+            key = (feature.pk, getattr(subclass, "pk", None))
+            if key in self._feature_keys:
+                return None
+            self._feature_keys.add(key)
+        row = CharacterFeature(
+            character=self.character, feature=feature, subclass=subclass, option=option, level=self.level,
+        )
+        self.features.append(row)
+        return row
+
+    def add_feat(self, feat):
+        if feat is None or feat.pk in self._feat_ids:
+            return None
+        self._feat_ids.add(feat.pk)
+        row = CharacterFeat(character=self.character, feat=feat, level=self.level)
+        self.feats.append(row)
+        return row
+
+    def add_asi(self, mode, a, b):
+        """Record an ability score increase; returns False (with an error) when the payload is invalid."""
+        a = (a or "").strip().lower()
+        b = (b or "").strip().lower()
+        if a not in ABILITY_FIELDS or (b and b not in ABILITY_FIELDS):
+            self.error("Invalid Ability Score field(s).")
+            return False
+        if mode == "1+1":
+            if not b or b == a:
+                self.error("ASI mode 1+1 requires two different abilities.")
+                return False
+            bumps = {a: 1, b: 1}
+        elif mode == "1":
+            bumps = {a: 1}
+        elif mode == "2":
+            # two different fields with mode "2" is normalized to +1/+1
+            bumps = {a: 1, b: 1} if b and b != a else {a: 2}
+        else:
+            self.error("Invalid ASI mode.")
+            return False
+        for field, n in bumps.items():
+            self.ability_changes[field] = self.ability_changes.get(field, 0) + n
+        # marker row: "an ASI happened this level"
+        self.add_feature(None)
+        return True
+
+    def character_after(self):
+        """A copy of the character with this plan's ability changes applied (nothing saved)."""
+        after = copy.copy(self.character)
+        for field, n in self.ability_changes.items():
+            setattr(after, field, getattr(after, field) + n)
+        return after
+
+    def as_dict(self) -> dict:
+        def _feature(row):
+            f = row.feature
+            return {
+                "feature_id": row.feature_id,
+                "name": f.name if f else None,      # ASI / martial mastery marker rows
+                "code": getattr(f, "code", "") if f else "",
+                "kind": getattr(f, "kind", "") if f else "",
+                "scope": getattr(f, "scope", "") if f else "",
+                "subclass": row.subclass.name if row.subclass_id else None,
+                "option": row.option.label if row.option_id else None,
+            }
+
+        return {
+            "track": self.track,
+            "level": self.level,
+            "class": getattr(self.character_class, "name", None),
+            "class_level": self.class_level,
+            "abilities": {
+                field: {"from": getattr(self.character, field), "to": getattr(self.character, field) + n}
+                for field, n in self.ability_changes.items()
+            },
+            "features": [_feature(row) for row in self.features],
+            "spell_tables": [row.feature.name for row in self.features
+                             if row.feature_id and (row.feature.kind or "") == "spell_table"],
+            "feats": [{"feat_id": row.feat_id, "name": row.feat.name, "type": row.feat.feat_type}
+                      for row in self.feats],
+            "skill_proficiencies": [
+                {"type": row.selected_skill_type.model, "id": row.selected_skill_id,
+                 "proficiency": row.proficiency.name}
+                for row in self.skill_proficiencies
+            ],
+            "skill_points": self.skill_points.amount if self.skill_points else 0,
+            "prestige": None if self.prestige_choice is None else {
+                "class": self.prestige_choice.prestige_class.name,
+                "level": self.prestige_choice.prestige_level,
+                "counts_as": getattr(self.prestige_choice.counts_as, "name", None),
+            },
+            "errors": list(self.errors),
+        }
+
+
+# ── the planner ───────────────────────────────────────────────────────────────
+class LevelUpPlanner:
+    """Plans (plan_base / plan_prestige) and applies (apply) one level-up for `character`."""
+
+    def __init__(self, character):
+        self.character = character
+        self._level_features = {}
+        self._owned_features = None
+        self._owned_feat_ids = None
+        self._class_progress = None
+        self._universal_rows = {}
+        self._skill_feat_grants = {}
+
+    # reads (each done once per planner; LevelUpForm and the view share them)
+    def class_progress(self) -> list:
+        """The character's saved CharacterClassProgress rows, class selected."""
+        if self._class_progress is None:
+            self._class_progress = list(
+                self.character.class_progress.select_related("character_class").order_by("id")
+            )
+        return self._class_progress
+
+    def progress_for(self, cls_obj):
+        cls_id = getattr(cls_obj, "pk", None)
+        return next((cp for cp in self.class_progress() if cp.character_class_id == cls_id), None)
+
+    def class_level_after(self, cls_obj) -> int:
+        """Class level in `cls_obj` after this level-up."""
+        prog = self.progress_for(cls_obj)
+        return (int(prog.levels or 0) if prog else 0) + 1
+
+    def class_levels(self) -> dict:
+        """{class name: saved levels}, for <class>_level formula tokens."""
+        return {cp.character_class.name: int(cp.levels or 0) for cp in self.class_progress()}
+
+    def universal_features(self, level) -> list:
+        """UniversalLevelFeature rows for character level `level`."""
+        if level not in self._universal_rows:
+            self._universal_rows[level] = list(UniversalLevelFeature.objects.filter(level=level).order_by("id"))
+        return self._universal_rows[level]
+
+    def skill_feat_grant(self, cls_obj, cls_level):
+        key = (getattr(cls_obj, "pk", None), int(cls_level))
+        if key not in self._skill_feat_grants:
+            self._skill_feat_grants[key] = (ClassSkillFeatGrant.objects
+                                            .filter(character_class=cls_obj, at_level=cls_level).first())
+        return self._skill_feat_grants[key]
+
+    def level_features(self, cls_obj, cls_level) -> list:
+        """ClassFeatures of (class, level) with subclasses / group / options prefetched."""
+        key = (getattr(cls_obj, "pk", None), int(cls_level))
+        if key not in self._level_features:
+            cl = (ClassLevel.objects
+                  .prefetch_related(*CLASS_LEVEL_PREFETCH)
+                  .filter(character_class=cls_obj, level=cls_level)
+                  .first())
+            self._level_features[key] = list(cl.features.all()) if cl else []
+        return self._level_features[key]
+
+    def owned_features(self) -> list:
+        """(id, feature_id, subclass_id, level, scope, subclass_group_id) for every CharacterFeature owned."""
+        if self._owned_features is None:
+            self._owned_features = list(
+                CharacterFeature.objects
+                .filter(character=self.character)
+                .values_list("id", "feature_id", "subclass_id", "level",
+                             "feature__scope", "feature__subclass_group_id")
+            )
+        return self._owned_features
+
+    def owned_feat_ids(self) -> set:
+        if self._owned_feat_ids is None:
+            self._owned_feat_ids = set(
+                CharacterFeat.objects.filter(character=self.character).values_list("feat_id", flat=True)
+            )
+        return self._owned_feat_ids
+
+    def _new_plan(self, track):
+        return LevelUpPlan(
+            self.character, track,
+            owned_features=[(fid, sid) for _id, fid, sid, *_rest in self.owned_features() if fid],
+            owned_feats=self.owned_feat_ids(),
+        )
+
+    def _saved_subclass_id(self, grp):
+        """active_subclass_for_group() on the rows already loaded (saved choice, then owned subclass features)."""
+        rows = sorted(self.owned_features(), key=lambda r: (r[3], r[0]), reverse=True)
+        for scope in ("subclass_choice", "subclass_feat"):
+            for _id, _fid, sid, _lvl, f_scope, f_grp in rows:
+                if sid and f_scope == scope and f_grp == grp.id:
+                    return sid
+        ov = CharacterFieldOverride.objects.filter(character=self.character, key=f"subclass_choice:{grp.id}").first()
+        if ov and str(ov.value).strip().isdigit():
+            return int(ov.value)
+        return None
+
+    def _universal(self, plan, data, *, race_checked):
+        """General feat + ASI granted at this character level by UniversalLevelFeature (any track)."""
+        uni = self.universal_features(plan.level)
+        if any(u.grants_general_feat for u in uni):
+            raw = (data.get("general_feat") or "").strip()
+            if not raw.isdigit():
+                return plan.error("This level grants a General Feat. Select one.")
+            feat = ClassFeat.objects.filter(pk=int(raw), feat_type__iexact="General").first()
+            if not feat or (race_checked and not feat_matches_character_race(feat.race, self.character)):
+                return plan.error("Invalid General Feat selection for this character.")
+            plan.add_feat(feat)
+        if any(u.grants_asi for u in uni):
+            mode = (data.get("asi_mode") or "").strip()
+            if not mode or not (data.get("asi_a") or "").strip():
+                return plan.error("This level grants an Ability Score Increase. Choose it.")
+            plan.add_asi(mode, data.get("asi_a"), data.get("asi_b"))
+        return plan
+
+    # base class levels
+    def plan_base(self, cleaned_data, data) -> LevelUpPlan:
+        """
+        Plan a base-class level from LevelUpForm.cleaned_data (plus the raw POST
+        `data` for the pickers that aren't form fields: skill feats, starting skills).
+        """
+        plan = self._new_plan("base")
+        character = self.character
+        cls = cleaned_data["base_class"]
+
+        saved = self.progress_for(cls)
+        # a copy: the cached row keeps its saved level for the form / other reads
+        progress = (copy.copy(saved) if saved is not None
+                    else CharacterClassProgress(character=character, character_class=cls, levels=0))
+        progress.levels = int(progress.levels or 0) + 1
+        cls_level = progress.levels
+        plan.progress, plan.character_class, plan.class_level = progress, cls, cls_level
+
+        level_feats = self.level_features(cls, cls_level)
+
+        # auto-granted class features (class_feat, spell tables)
+        for f in level_feats:
+            if is_auto_granted_feature(f):
+                plan.add_feature(f)
+
+        # LINEAR subclasses: this level's features for the subclass chosen earlier
+        linear_groups = list(cls.subclass_groups.filter(system_type=SubclassGroup.SYSTEM_LINEAR)
+                             .prefetch_related("subclasses"))
+        for grp in linear_groups:
+            sid = self._saved_subclass_id(grp)
+            sub = next((s for s in grp.subclasses.all() if s.pk == sid), None)
+            for sf in linear_feats_for_level(cls, grp, sub, cls_level, level_feats):
+                plan.add_feature(sf, subclass=sub, once=True)
+
+        # general feat + ASI (the form already validated and race-filtered the feat)
+        plan.add_feat(cleaned_data.get("general_feat"))
+        asi_mode = cleaned_data.get("asi_mode")
+        if asi_mode:
+            plan.add_asi(asi_mode, cleaned_data.get("asi_a"), cleaned_data.get("asi_b"))
+
+        self._plan_feature_choices(plan, cleaned_data, cls, cls_level, level_feats)
+
+        plan.add_feat(cleaned_data.get("class_feat_pick"))
+        self._plan_skill_feats(plan, cleaned_data, data, cls, cls_level)
+
+        if cleaned_data.get("martial_mastery"):
+            plan.add_feature(None)
+
+        if cls_level == 1:
+            self._plan_starting_skills(plan, data, cls)
+
+        points = {}
+        for g in cls.skill_point_grants.all():
+            lvl = int(g.at_level or 0)
+            if lvl > 0 and g.points_awarded:
+                points[lvl] = points.get(lvl, 0) + int(g.points_awarded)
+        pts = points.get(cls_level, int(getattr(cls, "skill_points_per_level", 0) or 0))
+        if pts:
+            plan.skill_points = CharacterSkillPointTx(
+                character=character,
+                amount=pts,
+                source="level_award",
+                reason=f"{cls.name} L{cls_level}",
+                at_level=plan.level,        # total character level
+                awarded_class=cls,
+            )
+            plan.messages.append(f"Gained {pts} skill point(s) from {cls.name}.")
+        return plan
+
+    def _plan_feature_choices(self, plan, cleaned_data, cls, cls_level, level_feats):
+        """feat_<pk>_subclass / _option / _subfeats fields: subclass choices, feature options, module picks."""
+        picked = [(name, val) for name, val in cleaned_data.items() if name.startswith("feat_") and val]
+        if not picked:
+            return
+        # the fields are built from this level's features, so they are normally
+        # all in level_feats already (group subclasses and options prefetched)
+        features = {f.pk: f for f in level_feats if isinstance(f, ClassFeature)}
+        missing = {int(name.split("_")[1]) for name, _val in picked} - features.keys()
+        if missing:
+            features.update(ClassFeature.objects
+                            .select_related("subclass_group")
+                            .prefetch_related("subclass_group__subclasses", "options")
+                            .in_bulk(missing))
+
+        def _pick(rows, raw):
+            return next((r for r in rows if str(r.pk) == str(raw).strip()), None)
+
+        for name, val in picked:
+            cf = features.get(int(name.split("_")[1]))
+            if cf is None:
+                plan.error("Unknown feature choice.")
+                continue
+
+            if name.endswith("_subclass"):
+                grp = cf.subclass_group
+                sub = _pick(grp.subclasses.all(), val) if grp is not None else None
+                if grp is None or sub is None:
+                    plan.error(f"Invalid subclass choice for {cf.name}.")
+                    continue
+                # 1) record the *choice* feature
+                plan.add_feature(cf, subclass=sub)
+                # 2) grant the subclass features that unlock *at this level*
+                if grp.system_type == SubclassGroup.SYSTEM_MODULAR_LINEAR:
+                    grant = (ClassFeature.objects
+                             .filter(scope="subclass_feat", subclass_group=grp, subclasses=sub,
+                                     tier__in=unlocked_tiers(grp, cls_level))
+                             .filter(Q(level_required__isnull=True) | Q(level_required__lte=cls_level))
+                             .filter(Q(min_level__isnull=True) | Q(min_level__lte=cls_level)))
+                else:
+                    grant = linear_feats_for_level(cls, grp, sub, cls_level, level_feats)
+                for sf in grant:
+                    plan.add_feature(sf, subclass=sub, once=True)
+
+            elif name.endswith("_option"):
+                opt = _pick(cf.options.all(), val)
+                if opt is None:
+                    plan.error(f"Invalid option for {cf.name}.")
+                    continue
+                plan.add_feature(cf, option=opt)
+
+            elif name.endswith("_subfeats"):
+                self._plan_mastery_picks(plan, cf, val, cls, cls_level)
+
+    def _plan_mastery_picks(self, plan, trigger, picks, cls, cls_level):
+        grp = trigger.subclass_group
+        per = max(1, int(getattr(grp, "modules_per_mastery", 2)))
+        picks_per_trigger = picks_for_trigger(trigger, cls, cls_level)
+        gainer_cap = int(getattr(trigger, "mastery_rank", 0) or 0)
+
+        picked = list(ClassFeature.objects.filter(pk__in=[f.pk for f in picks]).prefetch_related("subclasses"))
+        if len(picked) != picks_per_trigger:
+            plan.error(f"Pick exactly {picks_per_trigger} feature(s) for {grp.name}.")
+            return
+
+        # current (0-based) mastery tier per subclass: every `per` modules taken = +1
+        group_rows = [r for r in self.owned_features() if r[4] == "subclass_feat" and r[5] == grp.pk]
+        taken_by_sub = {}
+        for _id, _fid, sid, *_rest in group_rows:
+            taken_by_sub[sid] = taken_by_sub.get(sid, 0) + 1
+        owned_ids = {fid for _id, fid, *_rest in group_rows}
+
+        for sf in picked:
+            subs = [s for s in sf.subclasses.all() if s.group_id == grp.pk]
+            if len(subs) != 1:
+                plan.error(f"Feature “{sf.name}” is not tied to exactly one subclass.")
+                continue
+            sub = subs[0]
+            if sf.pk in owned_ids:
+                plan.error(f"You already own “{sf.name}”.")
+                continue
+            allowed_cap = taken_by_sub.get(sub.pk, 0) // per
+            if gainer_cap:
+                allowed_cap = min(allowed_cap, gainer_cap)
+            mr = getattr(sf, "mastery_rank", None)
+            # enforce mastery_rank even if 0; only ignore when it's truly unset/None
+            if mr is not None and int(mr) > int(allowed_cap):
+                plan.error(f"“{sf.name}” requires tier {mr}, but your allowed tier for {sub.name} is {allowed_cap}.")
+                continue
+            plan.add_feature(sf, subclass=sub, once=True)
+
+    def _plan_skill_feats(self, plan, cleaned_data, data, cls, cls_level):
+        """Skill feat picks; ClassSkillFeatGrant.num_picks at the new class level must be met exactly."""
+        grant = self.skill_feat_grant(cls, cls_level)
+        chosen = cleaned_data.get("skill_feat_pick")
+        if chosen is None:
+            raw_ids = (data.getlist("skill_feat_pick")
+                       or data.getlist("skill_feat_pick[]")
+                       or data.getlist("pick[]"))
+            raw_ids = [x.split("|", 1)[0] for x in raw_ids if x]
+            raw_ids = [int(x) for x in raw_ids if x.isdigit()]
+            chosen = list(ClassFeat.objects.filter(pk__in=raw_ids, feat_type__iexact="Skill")) if raw_ids else []
+        elif not (hasattr(chosen, "__iter__") and not isinstance(chosen, (str, bytes))):
+            chosen = [chosen]
+        chosen = list(chosen)
+
+        need = int(getattr(grant, "num_picks", 0) or 0)
+        if need > 0 and len(chosen) != need:
+            plan.error(f"You must pick exactly {need} Skill Feat{'s' if need != 1 else ''}.")
+            return
+        for feat in chosen:
+            if (feat.feat_type or "").strip().lower() == "skill":
+                plan.add_feat(feat)
+
+    def _plan_starting_skills(self, plan, data, cls):
+        """First level in a class: Trained in the picked skills (sk_<id> / sub_<id>), capped by the class formula."""
+        trained = ProficiencyLevel.objects.filter(name__iexact="Trained").order_by("bonus").first()
+        if not trained:
+            plan.error("Missing proficiency levels (need at least ‘Trained’). Please seed the tiers and try again.")
+            return
+        raw_picks = data.getlist("starting_skill_picks")
+        # saved levels plus this plan's (not yet written) class progress
+        class_levels = self.class_levels()
+        class_levels[cls.name] = plan.progress.levels
+        try:
+            cap = starting_skills_cap(plan.character_after(), cls, class_levels)
+        except FormulaError as e:
+            plan.error(f"Could not work out the starting skill limit ({e}).")
+            return
+        if cap is not None and len(raw_picks) > cap:
+            raw_picks = raw_picks[:cap]
+        if not raw_picks:
+            return
+
+        ct_skill = ContentType.objects.get_for_model(Skill)
+        ct_sub = ContentType.objects.get_for_model(SubSkill)
+        have = set(
+            CharacterSkillProficiency.objects
+            .filter(character=self.character)
+            .values_list("selected_skill_type_id", "selected_skill_id")
+        )
+        for token in raw_picks:
+            if token.startswith("sk_") and token[3:].isdigit():
+                ct, sid = ct_skill, int(token[3:])
+            elif token.startswith("sub_") and token[4:].isdigit():
+                ct, sid = ct_sub, int(token[4:])
+            else:
+                continue
+            if (ct.pk, sid) in have:
+                continue
+            have.add((ct.pk, sid))
+            plan.skill_proficiencies.append(CharacterSkillProficiency(
+                character=self.character, selected_skill_type=ct, selected_skill_id=sid, proficiency=trained,
+            ))
+
+    # prestige levels
+    def plan_prestige(self, data) -> LevelUpPlan:
+        """Plan a prestige level from the posted prestige_class / prestige_counts_as (+ universal picks)."""
+        plan = self._new_plan("prestige")
+        if plan.level < PRESTIGE_MIN_LEVEL:
+            return plan.error(f"You must be level {PRESTIGE_MIN_LEVEL}+ to take a prestige level.")
+
+        raw_pc_id = (data.get("prestige_class") or "").strip()
+        if not raw_pc_id.isdigit():
+            return plan.error("Pick a prestige class.")
+        prestige_cls = PrestigeClass.objects.filter(pk=int(raw_pc_id)).first()
+        if not prestige_cls:
+            return plan.error("Invalid prestige class selection.")
+
+        # single prestige class per character
+        taken = list(CharacterPrestigeLevelChoice.objects.filter(character=self.character)
+                     .order_by("id").values_list("prestige_class_id", flat=True))
+        if taken and taken[0] != prestige_cls.pk:
+            return plan.error("You already chose a different prestige class for this character.")
+        p_level = taken.count(prestige_cls.pk) + 1
+
+        pl = (PrestigeLevel.objects.select_related("fixed_counts_as")
+              .filter(prestige_class=prestige_cls, level=p_level).first())
+        if pl is None:
+            return plan.error("PrestigeLevel row not configured for this prestige level.")
+
+        if pl.counts_as_mode == PrestigeLevel.MODE_FIXED:
+            counts_as = pl.fixed_counts_as
+        else:
+            allowed = list(pl.allowed_counts_as.all())
+            raw = (data.get("prestige_counts_as") or "").strip()
+            counts_as = next((c for c in allowed if raw.isdigit() and c.pk == int(raw)), None)
+            # nothing valid posted but exactly one legal option: take it
+            if counts_as is None and len(allowed) == 1:
+                counts_as = allowed[0]
+            if counts_as is None:
+                return plan.error("Pick a valid counts-as class for this prestige level.")
+
+        self._universal(plan, data, race_checked=True)
+        if plan.errors:
+            return plan
+
+        plan.character_class = counts_as
+        plan.prestige_choice = CharacterPrestigeLevelChoice(
+            character=self.character,
+            prestige_class=prestige_cls,
+            prestige_level=p_level,            # 1,2,3...
+            char_level_at_gain=plan.level,     # character level gained at
+            counts_as=counts_as,
+        )
+        granted = 0
+        for pf in (PrestigeFeature.objects.select_related("grants_class_feature")
+                   .filter(prestige_class=prestige_cls, at_prestige_level=p_level)):
+            if pf.grants_class_feature:
+                plan.add_feature(pf.grants_class_feature, once=True)
+                granted += 1
+        plan.messages.append(
+            f"Advanced in {prestige_cls.name} (Prestige {p_level}). "
+            + (f"Granted {granted} feature(s)." if granted else "No mapped features configured for this prestige level.")
+        )
+        return plan
+
+    # writes
+    @transaction.atomic
+    def apply(self, plan) -> LevelUpPlan:
+        """Persist `plan` in one transaction and journal it; the planned rows get their ids."""
+        if plan.errors:
+            raise ValidationError(plan.errors)
+        character = plan.character
+        changed = {"character": {"level": [int(character.level or 0), plan.level]}}
+        created = {}
+
+        if plan.progress is not None:
+            progress_is_new = plan.progress.pk is None
+            plan.progress.save()
+            if progress_is_new:
+                created[_label(CharacterClassProgress)] = [plan.progress.pk]
+            else:
+                changed["characterclassprogress"] = {
+                    str(plan.progress.pk): {"levels": [plan.progress.levels - 1, plan.progress.levels]},
+                }
+        for field, n in plan.ability_changes.items():
+            before = getattr(character, field)
+            changed["character"][field] = [before, before + n]
+            setattr(character, field, before + n)
+        character.level = plan.level
+        character.save()
+
+        # HP max must be recalculated from formula after level-up
+        overrides = CharacterFieldOverride.objects.filter(character=character, key="hp_max")
+        removed = {_label(CharacterFieldOverride): list(overrides.values("key", "value"))}
+        overrides.delete()
+
+        if plan.prestige_choice is not None:
+            plan.prestige_choice.save()
+        plan.features = bulk_create_audited(plan.features)
+        plan.feats = bulk_create_audited(plan.feats)
+        plan.skill_proficiencies = bulk_create_audited(plan.skill_proficiencies)
+        if plan.skill_points is not None:
+            plan.skill_points.save()
+
+        for rows in (plan.features, plan.feats, plan.skill_proficiencies,
+                     [plan.skill_points] if plan.skill_points else [],
+                     [plan.prestige_choice] if plan.prestige_choice else []):
+            if rows:
+                created.setdefault(_label(type(rows[0])), []).extend(row.pk for row in rows)
+
+        # a stale entry at or above this level (rows rolled back by hand) no longer describes anything
+        CharacterLevelJournal.objects.filter(character=character, level__gte=plan.level).delete()
+        plan.journal = CharacterLevelJournal.objects.create(
+            character=character,
+            level=plan.level,
+            track=plan.track,
+            character_class=plan.character_class,
+            created=created,
+            changed=changed,
+            removed={k: v for k, v in removed.items() if v},
+            skill_points=plan.skill_points.amount if plan.skill_points else 0,
+        )
+        character.clear_proficiency_cache()
+        return plan
+
+
+def _label(model) -> str:
+    return model._meta.label_lower
+
+
+# ── level down ────────────────────────────────────────────────────────────────
+# Children before parents; CharacterClassProgress last.
+JOURNALED_MODELS = (
+    CharacterFeature,
+    CharacterFeat,
+    CharacterSkillProficiency,
+    CharacterSkillPointTx,
+    CharacterPrestigeLevelChoice,
+    CharacterClassProgress,
+)
+
+# LOR rules: Trained@0, Expert@3, Master@7, Legendary@14
+LOR_TIER_ORDER = ["Untrained", "Trained", "Expert", "Master", "Legendary"]
+LOR_MIN_LEVEL_FOR = {"Trained": 0, "Expert": 3, "Master": 7, "Legendary": 14}
+# refund gained when stepping a proficiency down one tier
+TIER_REFUND = {"Legendary": 8, "Master": 4, "Expert": 2, "Trained": 1}
+
+
+@transaction.atomic
+def level_down(character, to_level=None) -> int:
+    """
+    Undo level-ups until `character` is at `to_level` (default: one level
+    down), in one transaction; returns the new level.
+
+    Levels with a CharacterLevelJournal entry are undone by replaying the
+    entries backwards (a bulk delete per table, one progress / character
+    update), without looking at the rules again. Levels gained before the
+    journal existed fall back to legacy_level_down(), one level at a time.
+    """
+    current = int(character.level or 0)
+    target = current - 1 if to_level is None else max(0, int(to_level))
+    if current <= 0 or target >= current:
+        return current
+
+    entries = {
+        e.level: e
+        for e in CharacterLevelJournal.objects.filter(character=character, level__gt=target, level__lte=current)
+    }
+    level = current
+    while level > target:
+        run = []
+        while level > target and level in entries:
+            run.append(entries[level])
+            level -= 1
+        if run:
+            undo_journal(character, run, level)
+        else:
+            legacy_level_down(character)
+            level -= 1
+
+    CharacterLevelJournal.objects.filter(character=character, level__gt=target).delete()
+    clean_up_after_level_down(character)
+    character.clear_proficiency_cache()
+    return character.level
+
+
+def undo_journal(character, entries, new_level) -> None:
+    """Reverse consecutive journal `entries` (newest first) leaving `character` at `new_level`."""
+    created = {}
+    deltas = {}
+    progress_deltas = {}
+    for entry in entries:
+        for label, ids in (entry.created or {}).items():
+            created.setdefault(label, set()).update(ids)
+        for field, (before, after) in (entry.changed or {}).get("character", {}).items():
+            if field != "level":
+                deltas[field] = deltas.get(field, 0) + (after - before)
+        for pk, fields in (entry.changed or {}).get("characterclassprogress", {}).items():
+            before, after = fields["levels"]
+            progress_deltas[int(pk)] = progress_deltas.get(int(pk), 0) + (after - before)
+
+    for model in JOURNALED_MODELS:
+        ids = created.get(_label(model))
+        if ids:
+            model.objects.filter(character=character, pk__in=ids).delete()
+
+    stepped = []
+    for progress in CharacterClassProgress.objects.filter(pk__in=list(progress_deltas)):
+        progress.levels = max(0, int(progress.levels or 0) - progress_deltas[progress.pk])
+        stepped.append(progress)
+    bulk_update_audited(stepped, ["levels"])
+
+    character.level = new_level
+    for field, n in deltas.items():
+        setattr(character, field, getattr(character, field) - n)
+    character.save(update_fields=["level", *deltas])
+
+    # rows the oldest level-up removed are the state from before the whole run
+    restore = (entries[-1].removed or {}).get(_label(CharacterFieldOverride)) or []
+    if restore:
+        CharacterFieldOverride.objects.filter(character=character, key__in=[r["key"] for r in restore]).delete()
+        CharacterFieldOverride.objects.bulk_create(
+            [CharacterFieldOverride(character=character, key=r["key"], value=r["value"]) for r in restore]
+        )
+
+
+def legacy_level_down(character) -> None:
+    """One level down for a level without a journal entry: work out from the rows what that level granted."""
+    lvl = character.level
+
+    # --- Detect if this character level was a prestige level -------------
+    last_prestige = (
+        CharacterPrestigeLevelChoice.objects
+        .filter(character=character, char_level_at_gain=lvl)
+        .order_by("-prestige_level", "-id")
+        .first()
+    )
+    is_prestige_level = last_prestige is not None
+
+    # (A) Snapshot rows for this level BEFORE deleting
+    cf_qs = (CharacterFeature.objects
+             .filter(character=character, level=lvl)
+             .select_related('feature', 'feature__character_class'))
+    feat_qs = CharacterFeat.objects.filter(character=character, level=lvl)
+
+    # Which class was actually leveled at this character level?
+    cp = None
+    if not is_prestige_level:
+        last_cls_id = (
+            cf_qs.filter(feature__character_class__isnull=False)
+                 .order_by('-id')
+                 .values_list('feature__character_class_id', flat=True)
+                 .first()
+        )
+
+        if last_cls_id:
+            cp = CharacterClassProgress.objects.filter(
+                character=character,
+                character_class_id=last_cls_id
+            ).first()
+        else:
+            # Fallback if we have no evidence (dirty data / L1 hiccups)
+            cp = character.class_progress.order_by('-levels', '-id').first()
+
+    # (B) Now delete everything granted at this character level
+    cf_qs.delete()
+    feat_qs.delete()
+
+    # (C) Decrement either prestige progression OR base-class progress
+    if is_prestige_level:
+        # Remove the prestige level record instead of touching base classes
+        last_prestige.delete()
+    elif cp:
+        cp.levels = F('levels') - 1
+        cp.save(update_fields=['levels'])
+        cp.refresh_from_db()
+        if cp.levels <= 0:
+            cp.delete()
+
+    # (D) Decrement overall character level
+    character.level = lvl - 1
+    character.save(update_fields=['level'])
+
+
+def clean_up_after_level_down(character) -> None:
+    """Rows above the new level, skill point awards / spends, proficiency tiers and SP balance."""
+    # Safety net: purge anything that somehow sits above new level
+    CharacterFeature.objects.filter(character=character, level__gt=character.level).delete()
+    CharacterFeat.objects.filter(character=character, level__gt=character.level).delete()
+    CharacterClassProgress.objects.filter(character=character, levels__lte=0).delete()
+
+    # Remove skill-point awards/spends that sit above the new level
+    CharacterSkillPointTx.objects.filter(character=character, at_level__gt=character.level).delete()
+
+    # If we hit level 0, nuke all skill state (back to fresh, level-0)
+    if character.level <= 0:
+        # These rows being absent means "Untrained" everywhere in the UI
+        CharacterSkillProficiency.objects.filter(character=character).delete()
+
+        # Clear any per-skill overrides/deltas/history so nothing lingers
+        CharacterFieldOverride.objects.filter(
+            character=character,
+            key__regex=r'^(formula:skill:|final:skill:|skill_delta:)'
+        ).delete()
+        CharacterFieldNote.objects.filter(
+            character=character,
+            key__regex=r'^(skill_prof:|skill_prof_hist:|skill_delta:|formula:skill:|final:skill:)'
+        ).delete()
+        return
+
+    levels_by_name = {(pl.name or "").title(): pl for pl in ProficiencyLevel.objects.all()}
+
+    def _idx(sp):
+        name = (sp.proficiency.name if sp.proficiency_id else "Untrained").title()
+        return LOR_TIER_ORDER.index(name) if name in LOR_TIER_ORDER else 0
+
+    # Clamp prof tiers that are illegal at the new total level
+    allowed_idx = max(i for i, name in enumerate(LOR_TIER_ORDER)
+                      if name == "Untrained" or character.level >= LOR_MIN_LEVEL_FOR[name])
+    profs = list(CharacterSkillProficiency.objects.select_related("proficiency").filter(character=character))
+    dropped, clamped = [], []
+    for sp in profs:
+        if _idx(sp) <= allowed_idx:
+            continue
+        new_pl = levels_by_name.get(LOR_TIER_ORDER[allowed_idx])
+        if allowed_idx == 0:
+            # Clean slate = delete row to render as Untrained
+            dropped.append(sp.pk)
+        elif new_pl:
+            sp.proficiency = new_pl
+            clamped.append(sp)
+
+    # Ensure the remaining SP balance is not negative after level-down:
+    # greedily step the highest tiers down (refunding their cost) until it is.
+    balance = CharacterSkillPointTx.balance_for(character)
+    notes = []
+    if balance < 0:
+        kept = sorted((sp for sp in profs if sp.pk not in dropped and sp.proficiency_id),
+                      key=_idx, reverse=True)
+        for sp in kept:
+            i = _idx(sp)
+            while i > 0 and balance < 0:
+                balance += TIER_REFUND[LOR_TIER_ORDER[i]]
+                i -= 1
+            if i == _idx(sp):
+                continue
+            if i == 0 or LOR_TIER_ORDER[i] not in levels_by_name:
+                dropped.append(sp.pk)
+                notes.append("Skill → Untrained (auto-downgrade)")
+            else:
+                sp.proficiency = levels_by_name[LOR_TIER_ORDER[i]]
+                if sp not in clamped:
+                    clamped.append(sp)
+                notes.append(f"Skill → {LOR_TIER_ORDER[i]} (auto-downgrade)")
+            if balance >= 0:
+                break
+
+    if dropped:
+        CharacterSkillProficiency.objects.filter(pk__in=dropped).delete()
+    bulk_update_audited([sp for sp in clamped if sp.pk not in dropped], ["proficiency"])
+    if notes:
+        CharacterFieldNote.objects.update_or_create(
+            character=character,
+            key="skill_prof_hist:auto_downgrade",
+            defaults={"note": "Auto-downgraded after level down to fit SP balance: " + "; ".join(notes)},
+        )
@@ -0,0 +1,87 @@
+# characters/services/mastery_cards.py
+"""
+Card projection for the codex masteries grid.
+
+Each card is the fully serialized grid row for one MartialMastery: class
+names, restriction summary strings (first few weapon / trait names plus a
+"+N more" count) and the detail URL. All cards are built in one pass over
+prefetched relations (four queries in total) and cached per catalog version;
+catalog_signals bumps that version on every MartialMastery, Weapon,
+WeaponTrait or CharacterClass write and on the mastery m2m tables, so the
+cached cards never outlive the rows they summarize.
+
+mastery_data then only runs its filter query for the matching ids and picks
+the cards out of the cache.
+"""
+from django.core.cache import caches
+from django.db.models import Prefetch
+from django.urls import reverse
+
+from characters.models import CharacterClass, MartialMastery, Weapon, WeaponTrait
+from characters.services.codex_cache import CACHE_ALIAS, CACHE_SECONDS
+from characters.services.rules_catalog import version_stamp
+
+SUMMARY_NAMES = 6   # names listed per restriction before "(+N more)"
+
+
+def _summary(label, names) -> str:
+    shown = names[:SUMMARY_NAMES]
+    extra = len(names) - len(shown)
+    return f"{label}: " + ", ".join(shown) + (f" (+{extra} more)" if extra > 0 else "")
+
+
+def build_cards() -> list:
+    """Every mastery as a grid row, ordered by (level_required, name)."""
+    qs = (MartialMastery.objects
+          .prefetch_related(
+              Prefetch("classes", queryset=CharacterClass.objects.only("id", "name")),
+              Prefetch("allowed_weapons", queryset=Weapon.objects.only("id", "name").order_by("name")),
+              Prefetch("allowed_traits", queryset=WeaponTrait.objects.only("id", "name").order_by("name")),
+          )
+          .order_by("level_required", "name"))
+
+    # one reverse() for the whole grid; only the pk differs between rows
+    url_prefix = reverse("characters:mastery_detail", args=[0])[:-len("0/")]
+
+    cards = []
+    for m in qs:
+        restrict_bits = []
+        if m.restrict_to_range:
+            restrict_bits.append(f"Range: {', '.join(m.allowed_range_types or [])}")
+        if m.restrict_to_weapons:
+            restrict_bits.append(_summary("Weapons", [w.name for w in m.allowed_weapons.all()]))
+        if m.restrict_to_traits:
+            mode = "ALL" if (m.trait_match_mode or "").lower() == "all" else "ANY"
+            restrict_bits.append(_summary(f"Traits ({mode})", [t.name for t in m.allowed_traits.all()]))
+        if m.restrict_to_damage:
+            restrict_bits.append("Damage: " + ", ".join(m.allowed_damage_types or []))
+
+        cards.append({
+            "id": m.id,
+            "name": m.name,
+            "level": m.level_required,
+            "cost": m.points_cost,
+            "action": m.get_action_cost_display() if m.action_cost else "—",
+            "rare": m.is_rare,
+            "ability_req": {
+                "on": m.restrict_by_ability,
+                "ability": m.get_required_ability_display() if m.required_ability else None,
+                "score": m.required_ability_score,
+            },
+            "classes": [c.name for c in m.classes.all()],
+            "restrictions": restrict_bits,
+            "url": f"{url_prefix}{m.pk}/",   # site-relative; the view makes it absolute
+        })
+    return cards
+
+
+def get_cards() -> dict:
+    """{mastery id: card} for the current catalog version (shared through the Django cache)."""
+    version, _updated = version_stamp()
+    key = f"mastery_cards:v{version}"
+    cache = caches[CACHE_ALIAS]
+    cards = cache.get(key)
+    if cards is None:
+        cards = {card["id"]: card for card in build_cards()}
+        cache.set(key, cards, CACHE_SECONDS)
+    return cards
@@ -0,0 +1,157 @@
+# characters/services/party_stats.py
+"""
+Campaign-wide stat rows for the GM dashboards and the encounter tracker.
+
+PartyStats takes every character at the table and answers defence / armor /
+skill questions for all of them from a handful of grouped fetches keyed by
+character_id, instead of several queries per character per stat:
+
+  - ProficiencyResolver (class levels, prestige, feature + item overrides)
+  - SpecialItem -> armor for the active items the resolver already found
+  - CharacterSkillProficiency / CharacterSkillRating for the skills asked for
+
+The query count depends on the number of skills requested, not on the size
+of the party.
+"""
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+
+from characters.models import (
+    CharacterSkillProficiency, CharacterSkillRating, Skill, SpecialItem,
+)
+from characters.services.proficiency import ProficiencyResolver
+from characters.services.rules_catalog import get_catalog
+
+DEFENCE_ABILITIES = {
+    "dodge": "dexterity",
+    "reflex": "dexterity",
+    "fortitude": "constitution",
+    "will": "wisdom",
+}
+
+
+def ability_mod(score) -> int:
+    try:
+        return (int(score) - 10) // 2
+    except (TypeError, ValueError):
+        return 0
+
+
+def half_level_up(level) -> int:
+    return (int(level or 0) + 1) // 2  # ceil(level/2)
+
+
+class PartyStats:
+    def __init__(self, characters, *, skills=(), class_only=False, catalog=None):
+        """
+        characters: Character instances (select_related user/race/subrace if you render them).
+        skills:     skill names to preload for skill_total().
+        class_only: proficiency from class progression only (the campaign
+                    dashboard's rule) instead of class + feature/item override.
+        """
+        self.characters = list(characters)
+        self.class_only = class_only
+        self.catalog = catalog or get_catalog()
+        self.resolver = ProficiencyResolver(self.characters, catalog=self.catalog)
+        ids = self.resolver.ids
+
+        # armor: best armor_value among active SpecialItems that carry an Armor
+        self.armor = {}
+        item_ids = {i for items in self.resolver.active_items.values() for i in items}
+        if item_ids:
+            armor_by_item = {}
+            for item_id, armor_id in (SpecialItem.objects
+                                      .filter(id__in=item_ids, armor__isnull=False)
+                                      .values_list("id", "armor_id")):
+                a = self.catalog.armors.get(armor_id)
+                if a is not None and a.armor_value is not None:
+                    armor_by_item[item_id] = int(a.armor_value)
+            for char_id, items in self.resolver.active_items.items():
+                self.armor[char_id] = max([0] + [armor_by_item[i] for i in items if i in armor_by_item])
+
+        # skills: {name_lower: Skill}, {(char_id, skill_id): prof bonus}, {(char_id, skill_id): points}
+        self.skills = {}
+        self.skill_prof = {}
+        self.skill_points = defaultdict(int)
+        names = [n.strip() for n in skills if n and n.strip()]
+        if names:
+            q = Skill.objects.none()
+            for n in names:
+                q = q | Skill.objects.filter(name__iexact=n)
+            self.skills = {sk.name.lower(): sk for sk in q}
+        if self.skills:
+            skill_ids = [sk.id for sk in self.skills.values()]
+            skill_ct = ContentType.objects.get_for_model(Skill)
+            for char_id, skill_id, bonus in (CharacterSkillProficiency.objects
+                                             .filter(character_id__in=ids, selected_skill_type=skill_ct,
+                                                     selected_skill_id__in=skill_ids)
+                                             .order_by("id")
+                                             .values_list("character_id", "selected_skill_id",
+                                                          "proficiency__bonus")):
+                # first row wins, like .first() did
+                self.skill_prof.setdefault((char_id, skill_id), bonus)
+            for char_id, skill_id, points in (CharacterSkillRating.objects
+                                              .filter(character_id__in=ids, skill_id__in=skill_ids)
+                                              .values_list("character_id", "skill_id", "bonus_points")):
+                try:
+                    self.skill_points[(char_id, skill_id)] += int(points or 0)
+                except (TypeError, ValueError):
+                    pass
+
+    # ── single stats ─────────────────────────────────────────────────────────
+    def prof_bonus(self, character, code) -> int:
+        if self.class_only:
+            return int(self.resolver.class_bonus(character.pk, code))
+        return int(self.resolver.bonus(character.pk, code))
+
+    def armor_value(self, character) -> int:
+        return int(self.armor.get(character.pk, 0))
+
+    def skill_total(self, character, skill_name) -> int:
+        """Governing ability mod + skill proficiency bonus + allocated points (0 for unknown skills)."""
+        sk = self.skills.get((skill_name or "").strip().lower())
+        if sk is None:
+            return 0
+        total = ability_mod(getattr(character, sk.ability, 10))
+        try:
+            total += int(self.skill_prof.get((character.pk, sk.id)) or 0)
+        except (TypeError, ValueError):
+            pass
+        return int(total + self.skill_points.get((character.pk, sk.id), 0))
+
+    def defence(self, character, code) -> int:
+        """Dodge / reflex / fortitude / will: ability + prof + half level (when trained); dodge adds 10."""
+        prof = self.prof_bonus(character, code)
+        value = ability_mod(getattr(character, DEFENCE_ABILITIES[code], 10)) + prof
+        if prof > 0:
+            value += half_level_up(character.level)
+        return value + (10 if code == "dodge" else 0)
+
+    def passive_perception(self, character) -> int:
+        """10 + WIS + half level + perception proficiency (no skill table lookups)."""
+        return (10 + ability_mod(character.wisdom) + half_level_up(character.level)
+                + self.prof_bonus(character, "perception"))
+
+    # ── rows ─────────────────────────────────────────────────────────────────
+    def row(self, c) -> dict:
+        """One GM dashboard row (same keys campaigns/gm_dashboard.html reads)."""
+        return {
+            "id": c.id,
+            "name": c.name,
+            "player": getattr(c.user, "username", "—"),
+            "level": c.level,
+            "speed": c.effective_speed if hasattr(c, "effective_speed") else 30,
+            "hp": int(c.HP or 0),
+            "temp": int(c.temp_HP or 0),
+            "pp": int(self.passive_perception(c)),
+            "dodge": int(self.defence(c, "dodge")),
+            "armor": self.armor_value(c),
+            "reflex": int(self.defence(c, "reflex")),
+            "fortitude": int(self.defence(c, "fortitude")),
+            "will": int(self.defence(c, "will")),
+            "race": str(c.race) if c.race_id else "—",
+        }
+
+    def rows(self) -> list:
+        return [self.row(c) for c in self.characters]
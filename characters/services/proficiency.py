@@ -0,0 +1,200 @@
+# characters/services/proficiency.py
+"""
+Batched proficiency lookups.
+
+ProficiencyResolver loads, for one character or a whole party, everything a
+proficiency answer depends on in a fixed number of queries:
+
+  1. CharacterClassProgress rows (base class levels)
+  2. CharacterPrestigeLevelChoice rows with counts_as (effective levels)
+  3. modify_proficiency CharacterFeatures (feature overrides)
+  4. active SpecialItem activations
+  5. SpecialItemTraitValues of those items (item overrides)
+
+Class progression rows and tiers come from the rules catalog, so any
+(code, armor_group, weapon_group, item) question after that is answered
+from memory.
+"""
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+
+from characters.models import (
+    CharacterActivation, CharacterClassProgress, CharacterFeature,
+    CharacterPrestigeLevelChoice, SpecialItem, SpecialItemTraitValue,
+)
+from characters.services.rules_catalog import get_catalog
+
+# Adjust this to 2 only if P1 should NOT count-as (mirrors views._effective_class_levels).
+COUNTS_AS_START_LEVEL = 1
+
+
+def _norm(s):
+    return (str(s or "").strip().lower()
+            .replace(" ", "_").replace("-", "_"))
+
+
+def _to_int(v, default=0):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return default
+
+
+class ProficiencyResolver:
+    def __init__(self, characters, *, catalog=None):
+        if not isinstance(characters, (list, tuple, set)) and not hasattr(characters, "model"):
+            characters = [characters]
+        self.ids = [getattr(c, "pk", c) for c in characters]
+        self.catalog = catalog or get_catalog()
+
+        # 1) base class levels
+        self.base_levels = defaultdict(dict)        # char_id -> {class_id: levels}
+        for char_id, class_id, levels in (CharacterClassProgress.objects
+                                          .filter(character_id__in=self.ids)
+                                          .values_list("character_id", "character_class_id", "levels")):
+            self.base_levels[char_id][class_id] = self.base_levels[char_id].get(class_id, 0) + _to_int(levels)
+
+        # 2) base + prestige counts-as
+        self.effective_levels = {cid: dict(lv) for cid, lv in self.base_levels.items()}
+        for char_id, class_id, p_lvl in (CharacterPrestigeLevelChoice.objects
+                                         .filter(character_id__in=self.ids, counts_as__isnull=False)
+                                         .values_list("character_id", "counts_as_id", "prestige_level")):
+            if _to_int(p_lvl) >= COUNTS_AS_START_LEVEL:
+                lv = self.effective_levels.setdefault(char_id, {})
+                lv[class_id] = lv.get(class_id, 0) + 1
+
+        # 3) feature overrides: char_id -> {code: best bonus}
+        self.feature_overrides = defaultdict(dict)
+        for char_id, code, bonus in (CharacterFeature.objects
+                                     .filter(character_id__in=self.ids,
+                                             feature__kind="modify_proficiency",
+                                             feature__modify_proficiency_amount__isnull=False)
+                                     .values_list("character_id",
+                                                  "feature__modify_proficiency_target",
+                                                  "feature__modify_proficiency_amount__bonus")):
+            if isinstance(bonus, int):
+                cur = self.feature_overrides[char_id]
+                cur[code] = max(cur.get(code, 0), bonus)
+
+        # 4 + 5) active special item overrides
+        self.item_overrides = defaultdict(dict)
+        si_ct = ContentType.objects.get_for_model(SpecialItem)
+        active = defaultdict(set)                    # item_id -> {char_id}
+        self.active_items = defaultdict(set)         # char_id -> {item_id}
+        for char_id, obj_id in (CharacterActivation.objects
+                                .filter(character_id__in=self.ids, content_type=si_ct, is_active=True)
+                                .values_list("character_id", "object_id")):
+            active[obj_id].add(char_id)
+            self.active_items[char_id].add(obj_id)
+        if active:
+            for item_id, code, amount in (SpecialItemTraitValue.objects
+                                          .filter(special_item_id__in=list(active),
+                                                  modify_proficiency_target__isnull=False)
+                                          .values_list("special_item_id",
+                                                       "modify_proficiency_target",
+                                                       "modify_proficiency_amount")):
+                try:
+                    amount = int(amount)
+                except (TypeError, ValueError):
+                    continue
+                for char_id in active[item_id]:
+                    cur = self.item_overrides[char_id]
+                    cur[code] = max(cur.get(code, 0), amount)
+
+    @classmethod
+    def for_character(cls, character, **kwargs):
+        return cls([character], **kwargs)
+
+    # ── class progression ────────────────────────────────────────────────────
+    def _levels(self, char_id, effective):
+        return (self.effective_levels if effective else self.base_levels).get(char_id, {})
+
+    def class_rows(self, char_id, *, code=None, effective=False, generic_only=False, match=None):
+        """Unlocked ClassProficiencyProgress rows across the character's classes."""
+        rows = []
+        for class_id, lvl in self._levels(char_id, effective).items():
+            if lvl <= 0:
+                continue
+            for r in self.catalog.prof_rows(class_id, code=code, upto_level=lvl, generic_only=generic_only):
+                if match is None or match(r):
+                    rows.append(r)
+        return rows
+
+    def best_class_row(self, char_id, code, *, effective=False):
+        """(row, tier) with the highest tier bonus for `code` (any group), or (None, None)."""
+        best = None
+        for r in self.class_rows(char_id, code=code, effective=effective):
+            if best is None or r.tier.bonus > best.tier.bonus:
+                best = r
+        return (best, best.tier) if best else (None, None)
+
+    def class_bonus(self, char_id, code, *, effective=False) -> int:
+        """Best generic (no armor/weapon group) class tier bonus for `code`."""
+        bonuses = [r.tier.bonus for r in self.class_rows(char_id, code=code, effective=effective, generic_only=True)
+                   if isinstance(r.tier.bonus, int)]
+        return max([0] + bonuses)
+
+    # ── overrides ────────────────────────────────────────────────────────────
+    def override_bonus(self, char_id, code) -> int:
+        """Highest feature / active-item tier set on `code` (treated as override, not a stack)."""
+        return max(self.feature_overrides.get(char_id, {}).get(code, 0),
+                   self.item_overrides.get(char_id, {}).get(code, 0))
+
+    def bonus(self, char_id, code, *, effective=False) -> int:
+        """Final bonus: max(class progression, feature/item override)."""
+        return max(self.class_bonus(char_id, code, effective=effective), self.override_bonus(char_id, code))
+
+    # ── armor / weapons ──────────────────────────────────────────────────────
+    def for_item(self, char_id, prof_type, *, armor_group=None, armor_item_id=None,
+                 weapon_group=None, weapon_item_id=None):
+        """
+        Best class tier for an armor/weapon. Accepts both styles:
+          A) proficiency_type="weapon" + weapon_group="martial"
+          B) proficiency_type="weapon:martial"
+        A specific-item row wins over group rows. Always returns a dict.
+        """
+        if prof_type == "weapon":
+            namespaced = f"weapon:{_norm(weapon_group)}" if weapon_group else None
+            if namespaced:
+                wanted = lambda r: r.proficiency_type in ("weapon", namespaced)
+            else:
+                wanted = lambda r: r.proficiency_type.startswith("weapon")
+        else:
+            wanted = lambda r: r.proficiency_type == prof_type
+        rows = self.class_rows(char_id, match=wanted)
+
+        def _best(rs):
+            tiers = [r.tier for r in rs if r.tier]
+            return max(tiers, key=lambda t: _to_int(t.bonus), default=None)
+
+        item_rows = []
+        if prof_type == "armor" and armor_item_id:
+            item_rows = [r for r in rows if r.armor_item_id == armor_item_id]
+        elif prof_type == "weapon" and weapon_item_id:
+            item_rows = [r for r in rows if r.weapon_item_id == weapon_item_id]
+
+        if item_rows:
+            best = _best(item_rows)
+        else:
+            grp_rows = []
+            if prof_type == "armor" and armor_group:
+                g = _norm(armor_group)
+                grp_rows = [r for r in rows if _norm(r.armor_group) == g]
+            if prof_type == "weapon" and weapon_group:
+                g = _norm(weapon_group)
+
+                def _matches(r):
+                    # namespaced type e.g. "weapon:martial"
+                    t = _norm(r.proficiency_type)
+                    if t.startswith("weapon:"):
+                        return t.split(":", 1)[1] == g
+                    # legacy: "weapon" + separate group column
+                    return t == "weapon" and _norm(r.weapon_group) == g
+                grp_rows = [r for r in rows if _matches(r)]
+            best = _best(grp_rows)
+
+        name = best.name if best and best.name else "Untrained"
+        bonus = _to_int(getattr(best, "bonus", 0))
+        is_prof = (name.strip().lower() != "untrained") and (bonus != 0)
+        return {"tier": best, "bonus": bonus, "name": name, "is_proficient": is_prof}
@@ -0,0 +1,65 @@
+# characters/services/rulebook_search.py
+"""
+Page-level rulebook search.
+
+Each RulebookPage carries a tsvector over its title (weight A) and the
+HTML-stripped plain_text (weight B) kept by services/rulebook_terms.py, so a
+query is one ranked GIN lookup and the snippet is cut by ts_headline in the
+same statement, only for the pages actually shown.
+
+On other backends (and for queries without any word characters) pages are
+matched with icontains on the cached plain_text instead of the raw HTML, and
+the view builds snippets from that text.
+"""
+from django.contrib.postgres.search import SearchHeadline, SearchRank, SearchVector
+from django.db.models import F, Q
+
+from characters.models import Rulebook, RulebookPage
+from characters.services.search_index import SEARCH_CONFIG, enabled, prefix_query
+
+HEADLINE_OPTIONS = dict(
+    start_sel="<mark>", stop_sel="</mark>",
+    min_words=15, max_words=35, max_fragments=2, fragment_delimiter=" … ",
+)
+
+
+def page_vector():
+    return (SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("plain_text", weight="B", config=SEARCH_CONFIG))
+
+
+def refresh_vectors(page_ids) -> None:
+    if enabled() and page_ids:
+        RulebookPage.objects.filter(pk__in=list(page_ids)).update(search_vector=page_vector())
+
+
+def search_pages(query: str):
+    """
+    Matching pages, best first, with `rulebook` selected and the raw HTML deferred.
+    On PostgreSQL each row is annotated with `rank` and a highlighted `snippet`.
+    """
+    query = (query or "").strip()
+    qs = RulebookPage.objects.select_related("rulebook").defer("content", "search_vector")
+    if not query:
+        return qs.none()
+
+    tsq = prefix_query(query)
+    if tsq is None or not enabled():
+        return (qs.filter(Q(title__icontains=query) | Q(plain_text__icontains=query))
+                  .order_by("rulebook__name", "order"))
+
+    return (qs.defer("plain_text")
+              .filter(search_vector=tsq)
+              .annotate(rank=SearchRank(F("search_vector"), tsq),
+                        snippet=SearchHeadline("plain_text", tsq, config=SEARCH_CONFIG, **HEADLINE_OPTIONS))
+              .order_by("-rank", "rulebook__name", "order"))
+
+
+def search_rulebooks(query: str):
+    """Rulebooks whose name or description contains `query` (a handful of rows)."""
+    query = (query or "").strip()
+    if not query:
+        return Rulebook.objects.none()
+    return (Rulebook.objects
+            .filter(Q(name__icontains=query) | Q(description__icontains=query))
+            .order_by("name"))
@@ -0,0 +1,89 @@
+# characters/services/rulebook_terms.py
+"""
+Rulebook page -> glossary term occurrence index.
+
+Each RulebookPage keeps a plain-text copy of its title + content (plus the
+search tsvector built from it, see rulebook_search.py) and one RulebookPageTerm
+row (page, term, hits) per glossary term found on it, so the per-rulebook
+glossary is a join instead of a scan over every page.
+
+  - a page is reindexed (after commit) when it is saved;
+  - a GlossaryTerm change moves GlossaryVersion, which leaves every page whose
+    glossary_version lags behind stale. Reads keep serving the rows they
+    have; `manage.py reindex_rulebook_terms --stale-only --watch`, run by the
+    worker process (start.sh), catches the stale pages up in batches. Nothing
+    is reindexed inside a web request;
+  - without --stale-only the command rebuilds everything.
+
+index_pages locks the pages it rewrites, so two indexers working on the same
+page (a save and the worker, say) take turns instead of colliding on the
+unique (page, term) constraint.
+"""
+import logging
+import re
+from collections import Counter
+
+from django.db import transaction
+
+from glossary.matcher import get_matcher
+
+from characters.models import RulebookPage, RulebookPageTerm
+from characters.services.rulebook_search import refresh_vectors
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 200
+
+
+def strip_html(s: str) -> str:
+    # cheap/fast tag stripper; good enough for matching terms in rich text
+    return re.sub(r"<[^>]*>", " ", s or "")
+
+
+def page_plain_text(page) -> str:
+    return strip_html(f"{page.title or ''} {page.content or ''}")
+
+
+def index_pages(pages, matcher=None) -> int:
+    """Recompute plain_text, search_vector + RulebookPageTerm rows for `pages`; returns the number of rows written."""
+    pages = list(pages)
+    if not pages:
+        return 0
+    matcher = matcher or get_matcher()
+    rows = []
+    for page in pages:
+        page.plain_text = page_plain_text(page)
+        page.glossary_version = matcher.version
+        counts = Counter(term_id for _s, _e, term_id in matcher.finditer(page.plain_text))
+        rows.extend(RulebookPageTerm(page_id=page.pk, term_id=term_id, hits=n) for term_id, n in counts.items())
+    page_ids = [p.pk for p in pages]
+    with transaction.atomic():
+        # a concurrent indexer of any of these pages waits here until we commit
+        list(RulebookPage.objects.select_for_update().filter(pk__in=page_ids).order_by("pk").values_list("pk"))
+        RulebookPageTerm.objects.filter(page__in=page_ids).delete()
+        RulebookPageTerm.objects.bulk_create(rows, batch_size=1000)
+        RulebookPage.objects.bulk_update(pages, ["plain_text", "glossary_version"], batch_size=BATCH_SIZE)
+        refresh_vectors(page_ids)
+    return len(rows)
+
+
+def reindex_all(batch_size=BATCH_SIZE, *, stale_only=False) -> int:
+    """Reindex every page (or only stale ones) in batches; returns the number of pages done."""
+    matcher = get_matcher()
+    qs = RulebookPage.objects.order_by("pk").only("pk", "title", "content")
+    if stale_only:
+        qs = qs.exclude(glossary_version=matcher.version)
+    done, last_pk = 0, 0
+    while True:
+        batch = list(qs.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return done
+        index_pages(batch, matcher)
+        done += len(batch)
+        last_pk = batch[-1].pk
+
+
+def schedule_page_reindex(page_id) -> None:
+    def _reindex():
+        index_pages(RulebookPage.objects.filter(pk=page_id).only("pk", "title", "content"))
+    transaction.on_commit(_reindex)
@@ -0,0 +1,256 @@
+# characters/services/rules_catalog.py
+"""
+Per-worker, read-only snapshot of the rules tables (classes, features, class
+levels, proficiency progression, spell slot tables, subclass groups, martial
+masteries, weapons, armor).
+
+Rules rows change only through the admin or the Google sheets sync, but the
+sheet and level-up views used to query them on every request. get_catalog()
+loads them once per worker and keeps them until the version in
+RulesCatalogVersion moves. catalog_signals.py bumps that version on every
+save/delete, so all gunicorn workers pick up the change. The same version
+(via version_stamp()) validates the cached codex responses, so it also moves
+for the codex-only models (spells, feats, races, ...).
+
+Treat everything in the catalog as read-only: the objects are shared by every
+request the worker serves.
+"""
+from array import array
+from collections import defaultdict
+
+from django.conf import settings
+
+from characters.models import (
+    Armor, CharacterClass, ClassFeature, ClassLevel, ClassLevelFeature,
+    ClassProficiencyProgress, MartialMastery, ProficiencyTier, RulesCatalogVersion,
+    SpellSlotRow, SubclassGroup, SubclassTierLevel, Weapon, WeaponTraitValue,
+)
+from characters.services.versioned_cache import VersionedCache
+
+# How long a worker trusts its catalog before re-reading the version row (seconds).
+CHECK_INTERVAL = getattr(settings, "RULES_CATALOG_CHECK_SECONDS", 2.0)
+
+_SLOT_FIELDS = tuple(f"slot{i}" for i in range(1, 11))
+RANKS = len(_SLOT_FIELDS)
+_ZERO_SLOTS = (0,) * RANKS
+
+
+def _group(rows, key):
+    out = defaultdict(list)
+    for r in rows:
+        out[key(r)].append(r)
+    return {k: tuple(v) for k, v in out.items()}
+
+
+class SlotMatrix:
+    """
+    One spell-table feature's SpellSlotRows as a dense level x rank int matrix.
+
+    Row `level` lives at data[level*RANKS : (level+1)*RANKS]; `floor[level]` is
+    the highest defined level <= level (-1 if none), so "the row at or below
+    this level" is a lookup too.
+    """
+    __slots__ = ("feature_id", "max_level", "data", "defined", "floor")
+
+    def __init__(self, feature_id, rows):
+        self.feature_id = feature_id
+        self.max_level = max((int(r.level) for r in rows), default=0)
+        n = self.max_level + 1
+        self.data = array("i", bytes(4 * n * RANKS))
+        self.defined = bytearray(n)
+        self.floor = array("i", [-1] * n)
+        for r in rows:
+            lvl = int(r.level)
+            if lvl < 0:
+                continue
+            self.defined[lvl] = 1
+            base = lvl * RANKS
+            for i, f in enumerate(_SLOT_FIELDS):
+                self.data[base + i] = int(getattr(r, f) or 0)
+        last = -1
+        for lvl in range(n):
+            if self.defined[lvl]:
+                last = lvl
+            self.floor[lvl] = last
+
+    def _row(self, lvl):
+        base = lvl * RANKS
+        return tuple(self.data[base:base + RANKS])
+
+    def exact(self, level):
+        """(slot1, …, slot10) of the row at exactly `level`, or None when there is no such row."""
+        lvl = int(level or 0)
+        if 0 <= lvl <= self.max_level and self.defined[lvl]:
+            return self._row(lvl)
+        return None
+
+    def at(self, level) -> tuple:
+        """Like exact() but zeros when the row is missing."""
+        return self.exact(level) or _ZERO_SLOTS
+
+    def at_or_below(self, level):
+        """The highest defined row with level <= `level`, or None."""
+        lvl = min(int(level or 0), self.max_level)
+        if lvl < 0:
+            return None
+        f = self.floor[lvl]
+        return self._row(f) if f >= 0 else None
+
+
+def highest_rank(vec) -> int:
+    """Highest rank (1-based) with at least one slot; 0 for an empty / missing row."""
+    return max((i + 1 for i, n in enumerate(vec or ()) if n > 0), default=0)
+
+
+def add_slots(totals, vec):
+    """totals[rank] += vec[rank-1] for every non-zero rank; `totals` is a rank -> int mapping."""
+    for i, n in enumerate(vec or ()):
+        if n:
+            totals[i + 1] += n
+    return totals
+
+
+class RulesCatalog:
+    """Everything is keyed by id (or code); collections are tuples."""
+
+    def __init__(self, version: int):
+        self.version = version
+
+        self.tiers = {t.id: t for t in ProficiencyTier.objects.all()}
+        self.classes = {c.id: c for c in CharacterClass.objects.all()}
+        self.classes_by_name = {c.name.lower(): c for c in self.classes.values()}
+
+        self.features = {f.id: f for f in ClassFeature.objects.all()}
+        self.features_by_code = {f.code: f for f in self.features.values() if f.code}
+
+        self.weapons = {w.id: w for w in Weapon.objects.all()}
+        self.armors = {a.id: a for a in Armor.objects.prefetch_related("traits")}
+        self.weapon_traits = _group(
+            WeaponTraitValue.objects.select_related("trait").order_by("weapon_id", "trait__name"),
+            lambda tv: tv.weapon_id,
+        )
+
+        progress = list(ClassProficiencyProgress.objects.order_by(
+            "character_class_id", "proficiency_type", "at_level", "id",
+        ))
+        for p in progress:
+            # wire FKs to the shared instances so p.tier / p.weapon_item never query
+            p.tier = self.tiers[p.tier_id]
+            p.character_class = self.classes[p.character_class_id]
+            p.armor_item = self.armors.get(p.armor_item_id)
+            p.weapon_item = self.weapons.get(p.weapon_item_id)
+        self.prof_progress = _group(progress, lambda p: p.character_class_id)
+
+        levels = list(ClassLevel.objects.order_by("character_class_id", "level"))
+        self.class_levels = _group(levels, lambda cl: cl.character_class_id)
+        self.class_level_features = _group(
+            ClassLevelFeature.objects.order_by("class_level_id", "id"),
+            lambda clf: clf.class_level_id,
+        )
+
+        self.spell_slot_rows = _group(
+            SpellSlotRow.objects.order_by("feature_id", "level"),
+            lambda r: r.feature_id,
+        )
+        self.slot_matrices = {fid: SlotMatrix(fid, rows) for fid, rows in self.spell_slot_rows.items()}
+
+        self.subclass_groups = _group(
+            SubclassGroup.objects.order_by("character_class_id", "name"),
+            lambda g: g.character_class_id,
+        )
+        self.subclass_tier_levels = _group(
+            SubclassTierLevel.objects.order_by("subclass_group_id", "tier"),
+            lambda t: t.subclass_group_id,
+        )
+
+        self.martial_masteries = {
+            m.id: m for m in MartialMastery.objects.order_by("id")
+            .prefetch_related("classes", "allowed_weapons", "allowed_traits")
+        }
+
+    # ── lookups ───────────────────────────────────────────────────────────────
+    def prof_rows(self, class_id, *, code=None, upto_level=None, generic_only=False):
+        """ClassProficiencyProgress rows for one class (tier already attached)."""
+        rows = self.prof_progress.get(class_id, ())
+        if code is not None:
+            rows = [r for r in rows if r.proficiency_type == code]
+        if upto_level is not None:
+            rows = [r for r in rows if r.at_level <= upto_level]
+        if generic_only:
+            rows = [r for r in rows if not r.armor_group and not r.weapon_group]
+        return tuple(rows)
+
+    def slot_row(self, feature_id, level):
+        """The SpellSlotRow for a spell-table feature at a level, or None."""
+        for r in self.spell_slot_rows.get(feature_id, ()):
+            if r.level == level:
+                return r
+        return None
+
+    def slot_matrix(self, feature_id):
+        """SlotMatrix for a spell-table feature, or None when it has no rows."""
+        return self.slot_matrices.get(feature_id)
+
+    def slots(self, feature_id, level) -> tuple:
+        """(slot1, …, slot10) for a spell-table feature at a level; zeros when missing."""
+        m = self.slot_matrices.get(feature_id)
+        return m.at(level) if m else _ZERO_SLOTS
+
+    def slots_exact(self, feature_id, level):
+        """(slot1, …, slot10) at exactly `level`, or None when that row doesn't exist."""
+        m = self.slot_matrices.get(feature_id)
+        return m.exact(level) if m else None
+
+    def slots_at_or_below(self, feature_id, level):
+        """(slot1, …, slot10) of the highest row with level <= `level`, or None."""
+        m = self.slot_matrices.get(feature_id)
+        return m.at_or_below(level) if m else None
+
+    def features_at(self, class_id, level):
+        """ClassFeatures granted by ClassLevel(class, level)."""
+        for cl in self.class_levels.get(class_id, ()):
+            if cl.level == level:
+                return tuple(self.features[clf.feature_id]
+                             for clf in self.class_level_features.get(cl.id, ())
+                             if clf.feature_id in self.features)
+        return ()
+
+
+# ── worker cache ──────────────────────────────────────────────────────────────
+_cache = VersionedCache(RulesCatalogVersion, RulesCatalog, CHECK_INTERVAL)
+
+
+def current_version() -> int:
+    return _cache.current_version()
+
+
+def get_catalog() -> RulesCatalog:
+    """The current rules catalog; costs at most one tiny query per CHECK_INTERVAL."""
+    return _cache.get()
+
+
+def version_stamp():
+    """
+    (version, updated_at) of the catalog counter, for ETag / Last-Modified on codex
+    views (services/codex_cache.py). Like get_catalog(), re-read at most once per
+    CHECK_INTERVAL, but never builds the catalog itself.
+    """
+    return _cache.stamp()
+
+
+def invalidate_local() -> None:
+    """Force this worker to re-check the version on the next get_catalog() / version_stamp()."""
+    _cache.invalidate_local()
+
+
+def clear_local() -> None:
+    """Drop this worker's catalog entirely (benchmarks / shell)."""
+    _cache.clear_local()
+
+
+def bump_catalog_version() -> None:
+    """
+    Called from catalog_signals after a rules row is saved/deleted. A sync that
+    touches thousands of rows in one transaction still bumps the version once.
+    """
+    _cache.bump()
@@ -0,0 +1,362 @@
+# characters/services/search_index.py
+"""
+Global search index.
+
+Every searchable codex object gets one SearchDocument row (title, code, body
+text, URL and the field dump shown under "Show all fields"). global_search
+answers a query from that table in a single ranked SQL statement instead of
+three ILIKE passes over every text column of 23 models:
+
+  tier     0 = title/code equal to the query, 1 = starts with it, 2 = anything else
+  rank     ts_rank over the weighted tsvector (title/code A, body C), prefix terms
+  sim      pg_trgm similarity of the title, for typos
+
+Rows are kept in sync by search_signals.py (batched per transaction) and can
+be rebuilt from scratch with `manage.py rebuild_search_index`.
+
+Only PostgreSQL is supported; on any other backend (and while the index is
+still empty) search() returns None and the view falls back to the old scans.
+"""
+import datetime
+import logging
+import re
+import threading
+from collections import defaultdict
+from urllib.parse import urlencode
+
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection, models, transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When, Window
+from django.db.models.functions import Lower, RowNumber
+from django.urls import reverse
+from django.utils.html import strip_tags
+
+from characters.models import (
+    Armor, ArmorTrait, Background, CharacterClass, ClassFeat, ClassFeature, ClassSubclass,
+    Language, LoremasterArticle, MartialMastery, Race, ResourceType, Rulebook, RulebookPage,
+    SearchDocument, Skill, SpecialItem, Spell, SubclassGroup, Subrace, SubSkill, Weapon,
+    WeaponTrait, WearableSlot,
+)
+from characters.services.versioned_cache import on_commit_once
+
+logger = logging.getLogger(__name__)
+
+# What global search covers, in display order: (section label, model)
+SEARCHABLES = (
+    ("Features",            ClassFeature),
+    ("Classes",             CharacterClass),
+    ("Subclass Groups",     SubclassGroup),
+    ("Subclasses",          ClassSubclass),
+    ("Races",               Race),
+    ("Subraces",            Subrace),
+    ("Backgrounds",         Background),
+    ("Languages",           Language),
+    ("Resource Types",      ResourceType),
+    ("Wearable Slots",      WearableSlot),
+    ("Skills",              Skill),
+    ("Sub-skills",          SubSkill),
+    ("Weapons",             Weapon),
+    ("Armor",               Armor),
+    ("Weapon Traits",       WeaponTrait),
+    ("Armor Traits",        ArmorTrait),
+    ("Spells",              Spell),
+    ("Special Equipment",   SpecialItem),
+    ("Feats",               ClassFeat),
+    ("Martial Masteries",   MartialMastery),
+    ("Rulebooks",           Rulebook),
+    ("Rulebook Pages",      RulebookPage),
+    ("Loremaster Articles", LoremasterArticle),
+)
+SECTION_FOR_MODEL = {model: label for label, model in SEARCHABLES}
+
+SEARCH_CONFIG = "simple"    # rules text is full of names / jargon; no stemming
+TRIGRAM_MIN_QUERY = 3       # fuzzy title matching only kicks in from this length
+
+_TEXT_FIELDS = (models.CharField, models.TextField, models.SlugField, models.EmailField, models.URLField)
+# Common text-ish field names we traverse one hop for relations (FK/M2M).
+COMMON_RELATED_TEXT_NAMES = ["name", "title", "code", "slug", "description", "label", "caption",
+                             "excerpt", "content", "notes", "summary"]
+
+
+def enabled() -> bool:
+    return connection.vendor == "postgresql"
+
+
+# ── what to index per model ───────────────────────────────────────────────────
+def text_names_for(related_model):
+    """The subset of COMMON_RELATED_TEXT_NAMES that exist on related_model and are texty."""
+    if not related_model:
+        return []
+    return sorted({rf.name for rf in related_model._meta.get_fields()
+                   if getattr(rf, "concrete", False) and isinstance(rf, _TEXT_FIELDS)
+                   and rf.name in COMMON_RELATED_TEXT_NAMES})
+
+
+def collect_search_targets(model):
+    """
+    Return (text_fields, cast_fields, related_lookups) for a model.
+
+    - text_fields: direct Char/Text-like field names
+    - cast_fields: every other concrete field name (ints, dates, bool, JSON, Array, FK id)
+    - related_lookups: one-hop lookups into common text fields of related objects
+                       (e.g. 'character_class__name', 'tags__name')
+    """
+    text_fields, cast_fields, related_lookups = [], [], []
+
+    for f in model._meta.get_fields():
+        if not getattr(f, "concrete", False):
+            continue
+        # derived / bookkeeping columns (timestamps, cached plain text …)
+        if not f.is_relation and not f.editable and not f.primary_key:
+            continue
+
+        # M2M: the related object's usual text fields
+        if f.many_to_many and getattr(f, "related_model", None):
+            related_lookups.extend([f"{f.name}__{n}" for n in text_names_for(f.related_model)])
+            continue
+
+        # FKs / O2Os: related text fields, plus the raw *_id
+        if f.is_relation and getattr(f, "related_model", None):
+            related_lookups.extend([f"{f.name}__{n}" for n in text_names_for(f.related_model)])
+            if hasattr(f, "attname"):
+                cast_fields.append(f.attname)
+            continue
+
+        if isinstance(f, _TEXT_FIELDS):
+            text_fields.append(f.name)
+        else:
+            cast_fields.append(f.name)
+
+    return text_fields, cast_fields, related_lookups
+
+
+def display_text(obj):
+    # Prefer human-friendly main field
+    for attr in ("name", "title"):
+        if hasattr(obj, attr) and getattr(obj, attr):
+            return getattr(obj, attr)
+    return str(obj)
+
+
+def code_text(obj):
+    # A sensible "code-like" field if present
+    for attr in ("code", "class_ID", "slug"):
+        if hasattr(obj, attr) and getattr(obj, attr):
+            return getattr(obj, attr)
+    return ""
+
+
+def detail_url(obj):
+    # Detail pages where we have them; otherwise a Codex list pre-filtered with ?q=...
+    try:
+        if isinstance(obj, CharacterClass):
+            return reverse("characters:class_detail", kwargs={"pk": obj.pk})
+        if isinstance(obj, Race):
+            return reverse("characters:race_detail", kwargs={"pk": obj.pk})
+        if isinstance(obj, Rulebook):
+            return reverse("characters:rulebook_detail", kwargs={"pk": obj.pk})
+        if isinstance(obj, RulebookPage):
+            return reverse("characters:rulebook_page_detail",
+                           kwargs={"rulebook_pk": obj.rulebook_id, "pk": obj.pk})
+        if isinstance(obj, LoremasterArticle):
+            return obj.get_absolute_url()
+
+        name_qs = urlencode({"q": display_text(obj)})
+        if isinstance(obj, Weapon):
+            return reverse("characters:codex_weapons") + f"?{name_qs}"
+        if isinstance(obj, Armor):
+            return reverse("characters:codex_armor") + f"?{name_qs}"
+        if isinstance(obj, Spell):
+            return reverse("characters:codex_spells") + f"?{name_qs}"
+        if isinstance(obj, ClassFeat):
+            return reverse("characters:codex_feats") + f"?{name_qs}"
+        return None
+    except Exception:
+        return None
+
+
+def _label(name: str) -> str:
+    return name.replace("_", " ").title()
+
+
+def _nonempty(v):
+    return v not in (None, "", [], {}, ())
+
+
+# ── building documents ────────────────────────────────────────────────────────
+def build_documents(model, pks=None):
+    """
+    Unsaved SearchDocuments for `model` (all rows, or just `pks`).
+
+    1 query for the objects, 1 for FK text lookups, 1 per M2M lookup - never per object.
+    """
+    section = SECTION_FOR_MODEL[model]
+    ct = ContentType.objects.get_for_model(model)
+    text_fields, cast_fields, related = collect_search_targets(model)
+    m2m_names = {f.name for f in model._meta.many_to_many}
+
+    qs = model.objects.all()
+    if pks is not None:
+        qs = qs.filter(pk__in=list(pks))
+    objs = list(qs.order_by("pk"))
+    if not objs:
+        return []
+    ids = [o.pk for o in objs]
+
+    rel_values = defaultdict(lambda: defaultdict(list))    # pk -> lookup -> [values]
+    single = [lk for lk in related if lk.split("__", 1)[0] not in m2m_names]
+    if single:
+        for row in model.objects.filter(pk__in=ids).values_list("pk", *single):
+            for lk, v in zip(single, row[1:]):
+                if _nonempty(v):
+                    rel_values[row[0]][lk].append(str(v))
+    for lk in (lk for lk in related if lk.split("__", 1)[0] in m2m_names):
+        for pk, v in model.objects.filter(pk__in=ids).values_list("pk", lk):
+            if _nonempty(v) and str(v) not in rel_values[pk][lk]:
+                rel_values[pk][lk].append(str(v))
+
+    docs = []
+    for obj in objs:
+        title = str(display_text(obj) or "")[:255]
+        code = str(code_text(obj) or "")[:255]
+        kv, body = [], []
+        for name in text_fields:
+            v = getattr(obj, name, None)
+            if _nonempty(v):
+                kv.append({"field": name, "label": _label(name), "value": str(v)})
+                if str(v) not in (title, code):
+                    body.append(strip_tags(str(v)))
+        for name in cast_fields:
+            v = getattr(obj, name, None)
+            if not _nonempty(v):
+                continue
+            kv.append({"field": name, "label": _label(name), "value": str(v)})
+            if not isinstance(v, (bool, datetime.date)) and not name.endswith("_id") and name != "id":
+                body.append(" ".join(map(str, v)) if isinstance(v, (list, tuple)) else str(v))
+        for lk in related:
+            vals = rel_values[obj.pk].get(lk)
+            if vals:
+                value = ", ".join(vals[:10]) + (" …" if len(vals) > 10 else "")
+                kv.append({"field": lk, "label": _label(lk.replace("__", " ")), "value": value})
+                body.append(strip_tags(" ".join(vals)))
+        docs.append(SearchDocument(
+            content_type=ct, object_id=obj.pk, section=section,
+            title=title, code=code, body="\n".join(body),
+            url=detail_url(obj) or "", fields=kv,
+        ))
+    return docs
+
+
+def _vector():
+    return (SearchVector("title", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("code", weight="A", config=SEARCH_CONFIG)
+            + SearchVector("body", weight="C", config=SEARCH_CONFIG))
+
+
+def index_objects(model, pks=None, *, batch_size=500) -> int:
+    """
+    Upsert the documents for `model` (all rows or `pks`), refresh their tsvector and
+    drop documents whose object is gone. Returns the number of documents written.
+    """
+    ct = ContentType.objects.get_for_model(model)
+    docs = build_documents(model, pks)
+    with transaction.atomic():
+        SearchDocument.objects.bulk_create(
+            docs, batch_size=batch_size,
+            update_conflicts=True, unique_fields=["content_type", "object_id"],
+            update_fields=["section", "title", "code", "body", "url", "fields", "updated_at"],
+        )
+        found = [d.object_id for d in docs]
+        stale = SearchDocument.objects.filter(content_type=ct)
+        if pks is not None:
+            stale = stale.filter(object_id__in=list(pks))
+        stale.exclude(object_id__in=found).delete()
+        fresh = SearchDocument.objects.filter(content_type=ct)
+        if pks is not None:
+            fresh = fresh.filter(object_id__in=found)
+        fresh.update(search_vector=_vector())
+    return len(docs)
+
+
+def rebuild(models_=None, *, batch_size=500) -> dict:
+    """Reindex every searchable model (or just `models_`); returns {section: count}."""
+    targets = [(label, m) for label, m in SEARCHABLES if not models_ or m in models_]
+    out = {}
+    for label, model in targets:
+        out[label] = index_objects(model, batch_size=batch_size)
+    if not models_:
+        known = [ContentType.objects.get_for_model(m).pk for _, m in SEARCHABLES]
+        SearchDocument.objects.exclude(content_type_id__in=known).delete()
+    return out
+
+
+# ── incremental updates (signals) ─────────────────────────────────────────────
+_local = threading.local()
+
+
+def _flush():
+    pending, _local.pending = getattr(_local, "pending", None) or {}, defaultdict(set)
+    for model, pks in pending.items():
+        try:
+            index_objects(model, pks)
+        except Exception:
+            # never let the search index break a save; rebuild_search_index repairs it
+            logger.exception("search index update failed for %s %s", model.__name__, sorted(pks)[:20])
+
+
+def queue_reindex(model, pk) -> None:
+    """Reindex (model, pk) once the current transaction commits; one flush per transaction."""
+    if not enabled() or model not in SECTION_FOR_MODEL or pk is None:
+        return
+    pending = getattr(_local, "pending", None)
+    if pending is None:
+        pending = _local.pending = defaultdict(set)
+    pending[model].add(pk)
+    on_commit_once(_flush)
+
+
+# ── querying ──────────────────────────────────────────────────────────────────
+def prefix_query(query: str):
+    """Prefix AND query over the words in `query` ('fire bo' -> 'fire:* & bo:*'), or None."""
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+    return SearchQuery(" & ".join(f"{w}:*" for w in words), search_type="raw", config=SEARCH_CONFIG)
+
+
+def search(query: str, *, limit_each=30):
+    """
+    Ranked hits as dicts (section, object_id, title, code, url, fields, tier), at most
+    `limit_each` per section, in one statement. None when the index can't answer.
+    """
+    query = (query or "").strip()
+    if not query or not enabled():
+        return None
+    if not SearchDocument.objects.exists():
+        return None
+
+    tsq = prefix_query(query)
+    match = Q(title__icontains=query) | Q(code__icontains=query) | Q(body__icontains=query)
+    if tsq is not None:
+        match |= Q(search_vector=tsq)
+    if len(query) >= TRIGRAM_MIN_QUERY:
+        match |= Q(title__trigram_similar=query)
+
+    tier = Case(
+        When(Q(title__iexact=query) | Q(code__iexact=query), then=Value(0)),
+        When(Q(title__istartswith=query) | Q(code__istartswith=query), then=Value(1)),
+        default=Value(2),
+        output_field=IntegerField(),
+    )
+    qs = (SearchDocument.objects
+          .filter(match)
+          .annotate(tier=tier,
+                    rank=SearchRank(F("search_vector"), tsq) if tsq is not None else Value(0.0),
+                    sim=TrigramSimilarity("title", query))
+          .annotate(pos=Window(RowNumber(), partition_by=[F("section")],
+                               order_by=[F("tier").asc(), F("rank").desc(), F("sim").desc(), Lower("title").asc()]))
+          .filter(pos__lte=limit_each)
+          .order_by("section", "pos")
+          .values("section", "object_id", "title", "code", "url", "fields", "tier"))
+    return list(qs)
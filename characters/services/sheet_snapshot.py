@@ -0,0 +1,82 @@
+# characters/services/sheet_snapshot.py
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from characters.models import Character, CharacterSheetSnapshot
+from characters.services import rules_catalog
+
+# Bump when the shape of `data` changes so old rows rebuild themselves.
+SNAPSHOT_SCHEMA = 2
+
+
+def compute_sheet_values(character: Character, *, catalog_version: int | None = None) -> dict:
+    """
+    Build the derived numbers the sheet reads from the snapshot: HP max,
+    proficiency rows and owned spell slots per rank. Everything returned must be
+    JSON-serializable (it goes into a JSONField).
+
+    `catalog_version` is the rules version the caller just read from the DB; if
+    this worker's catalog lags behind it, the catalog is reloaded first so the
+    values are never built from older rules than they are stamped with.
+    """
+    # the sheet helpers still live in the (huge) views module
+    from characters import views as sheet
+
+    if catalog_version is not None and rules_catalog.get_catalog().version != catalog_version:
+        rules_catalog.invalidate_local()
+    catalog = rules_catalog.get_catalog()
+
+    class_progress = list(character.class_progress.select_related("character_class"))
+    return {
+        "schema": SNAPSHOT_SCHEMA,
+        "catalog_version": catalog.version,
+        "hp_max": int(sheet._character_hp_max(character, class_progress)),
+        "proficiencies": sheet._current_proficiencies_for_character(character),
+        "spell_slots_by_rank": {
+            str(r): int(n) for r, n in sheet._owned_spell_slots_by_rank(character, class_progress).items()
+        },
+    }
+
+
+def get_sheet_snapshot(character: Character) -> dict:
+    """
+    Return the materialized sheet values, rebuilding them only when the
+    snapshot row is missing, stale, from an older schema, or built against a
+    different rules catalog version.
+    """
+    snap, _ = CharacterSheetSnapshot.objects.get_or_create(character=character)
+    catalog_version = rules_catalog.current_version()
+    data = snap.data or {}
+    if (not snap.is_stale and data.get("schema") == SNAPSHOT_SCHEMA
+            and data.get("catalog_version") == catalog_version):
+        return data
+
+    rev = snap.revision
+    data = compute_sheet_values(character, catalog_version=catalog_version)
+    # Only store if nobody invalidated the row while we were computing;
+    # otherwise the next read rebuilds again.
+    CharacterSheetSnapshot.objects.filter(pk=snap.pk, revision=rev).update(
+        data=data, built_revision=rev, computed_at=timezone.now(),
+    )
+    return data
+
+
+def mark_sheet_stale(character_id) -> None:
+    if not character_id:
+        return
+    transaction.on_commit(
+        lambda: CharacterSheetSnapshot.objects
+        .filter(character_id=character_id)
+        .update(revision=F("revision") + 1)
+    )
+
+
+def slots_by_rank(data: dict) -> dict:
+    """JSON keys come back as strings; the sheet code expects int ranks."""
+    return {int(r): int(n) for r, n in (data.get("spell_slots_by_rank") or {}).items()}
+
+
+def prof_rows_by_code(data: dict) -> dict:
+    return {r["type_code"]: dict(r) for r in data.get("proficiencies") or []}
@@ -0,0 +1,165 @@
+# characters/services/sheet_sources.py
+"""
+Where sync_google_data reads its worksheets from.
+
+A source exposes the two rules books by alias ("spells", "feats") as
+worksheet titles plus each tab's records, a list of {header: cell} dicts
+shaped like gspread's get_all_records(). fetch() reads several tabs of a
+book at once; by default on a small thread pool (the time goes into waiting
+on the network, not into Python). Two implementations:
+
+  - GoogleSheetsSource: the live books through gspread with the service
+    account in GOOGLE_SHEETS_CREDENTIALS_JSON (gspread / oauth2client are
+    only imported here, so offline runs don't need them). fetch() asks for
+    all requested tabs in one values:batchGet call and turns each range into
+    records the way get_all_records() does;
+  - FixtureSource: a local directory with one file per tab,
+    <root>/<alias>/<tab title>.json (a list of objects) or .csv (header row
+    first), for offline sync runs and benchmarks. write_fixtures() dumps
+    fetched tabs in that layout.
+"""
+import csv
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.core.exceptions import ImproperlyConfigured
+
+BOOK_KEYS = {
+    "spells": "1tUP5rXleImOKnrOVGBnmxNHHDAyU0HHxeuODgLDX8SM",
+    "feats": "1-WHN5KXt7O7kRmgyOZ0rXKLA6s6CbaOWFmvPflzD5bQ",
+}
+
+FIXTURE_SUFFIXES = (".json", ".csv")
+FETCH_WORKERS = 4      # concurrent worksheet reads when a source can't batch them
+
+logger = logging.getLogger(__name__)
+
+
+class SheetSource:
+    """Interface: worksheet titles and records per book alias."""
+
+    name = "source"
+
+    def titles(self, book: str) -> list:
+        raise NotImplementedError
+
+    def records(self, book: str, title: str) -> list:
+        raise NotImplementedError
+
+    def fetch(self, book: str, titles) -> dict:
+        """{title: records} for several tabs of one book, in the order given."""
+        titles = list(titles)
+        if len(titles) <= 1:
+            return {title: self.records(book, title) for title in titles}
+        with ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(titles))) as pool:
+            return dict(zip(titles, pool.map(lambda title: self.records(book, title), titles)))
+
+    def describe(self) -> str:
+        return self.name
+
+
+class GoogleSheetsSource(SheetSource):
+    name = "google"
+
+    SCOPE = [
+        "https://spreadsheets.google.com/feeds",
+        "https://www.googleapis.com/auth/drive",
+    ]
+
+    def __init__(self, credentials_json=None):
+        json_creds = credentials_json or os.environ.get("GOOGLE_SHEETS_CREDENTIALS_JSON")
+        if not json_creds:
+            raise ImproperlyConfigured("GOOGLE_SHEETS_CREDENTIALS_JSON not set")
+
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+
+        creds = ServiceAccountCredentials.from_json_keyfile_dict(json.loads(json_creds), self.SCOPE)
+        self.client = gspread.authorize(creds)
+        self._books = {}
+        self._worksheets = {}
+
+    def _book(self, book):
+        if book not in self._books:
+            self._books[book] = self.client.open_by_key(BOOK_KEYS[book])
+        return self._books[book]
+
+    def _tabs(self, book):
+        if book not in self._worksheets:
+            self._worksheets[book] = {ws.title: ws for ws in self._book(book).worksheets()}
+        return self._worksheets[book]
+
+    def titles(self, book):
+        return list(self._tabs(book))
+
+    def records(self, book, title):
+        return self._tabs(book)[title].get_all_records(default_blank="", head=1)
+
+    def fetch(self, book, titles):
+        titles = list(titles)
+        if len(titles) <= 1:
+            return super().fetch(book, titles)
+
+        from gspread.exceptions import APIError
+        from gspread.utils import absolute_range_name, fill_gaps, numericise_all, to_records
+
+        try:
+            resp = self._book(book).values_batch_get([absolute_range_name(title) for title in titles])
+        except APIError as e:
+            logger.warning("values_batch_get on %s failed (%s); reading tabs one by one", book, e)
+            return super().fetch(book, titles)
+
+        out = {}
+        for title, value_range in zip(titles, resp.get("valueRanges") or []):
+            values = fill_gaps(value_range.get("values") or [[]])
+            if values == [[]]:
+                out[title] = []
+                continue
+            rows = [numericise_all(row, False, "") for row in values[1:]]
+            out[title] = to_records(values[0], rows)
+        return out
+
+
+class FixtureSource(SheetSource):
+    name = "fixtures"
+
+    def __init__(self, root):
+        self.root = Path(root)
+        if not self.root.is_dir():
+            raise ImproperlyConfigured(f"Fixture directory not found: {self.root}")
+
+    def describe(self):
+        return f"{self.name} ({self.root})"
+
+    def _files(self, book):
+        folder = self.root / book
+        if not folder.is_dir():
+            return {}
+        return {p.stem: p for p in sorted(folder.iterdir()) if p.suffix.lower() in FIXTURE_SUFFIXES}
+
+    def titles(self, book):
+        return list(self._files(book))
+
+    def records(self, book, title):
+        path = self._files(book)[title]
+        if path.suffix.lower() == ".json":
+            with path.open(encoding="utf-8") as fh:
+                return json.load(fh)
+        with path.open(encoding="utf-8", newline="") as fh:
+            return [dict(row) for row in csv.DictReader(fh)]
+
+
+def write_fixtures(root, book: str, tabs: dict) -> None:
+    """Write {title: records} as <root>/<book>/<title>.json (FixtureSource's layout)."""
+    folder = Path(root) / book
+    folder.mkdir(parents=True, exist_ok=True)
+    for title, records in tabs.items():
+        with (folder / f"{title}.json").open("w", encoding="utf-8") as fh:
+            json.dump(records, fh, ensure_ascii=False, indent=1)
+
+
+def get_source(fixtures=None) -> SheetSource:
+    return FixtureSource(fixtures) if fixtures else GoogleSheetsSource()
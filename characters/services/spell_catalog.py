@@ -0,0 +1,155 @@
+# characters/services/spell_catalog.py
+"""
+Server side of the spell codex grid.
+
+The grid used to receive every Spell (full effect / upcast text included) as
+one JSON blob and filter it in the browser. It now asks for one page at a
+time:
+
+  - filters run in SQL: level via (level, name, id), origin / classification /
+    tags via the GIN-indexed token arrays (Spell.*_tokens, membership = ANY of
+    the ticked values), free-text "contains" filters via ILIKE;
+  - pages are keyset-paginated on (name, id): the cursor is the last row's
+    sort key, so page N costs the same as page 1;
+  - list rows carry only the grid columns; the drawer fetches the long text
+    fields for one spell when it opens.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+from characters.models import Spell
+
+LIST_FIELDS = ("id", "name", "level", "origin", "classification", "tags",
+               "casting_time", "duration", "components", "range", "target")
+DETAIL_FIELDS = LIST_FIELDS + ("sub_origin", "saving_throw", "effect", "upcast_effect", "last_synced")
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+
+# query param -> column(s) matched with icontains
+CONTAINS_FILTERS = {
+    "name": ("name",),
+    "casting_time": ("casting_time",),
+    "duration": ("duration",),
+    "components": ("components",),
+    "range_target": ("range", "target"),
+    "save": ("saving_throw",),
+}
+# query param (repeatable) -> token array, matched with overlap (any of)
+TOKEN_FILTERS = {
+    "origin": "origin_tokens",
+    "classification": "classification_tokens",
+    "tag": "tag_tokens",
+}
+
+
+class BadCursor(ValueError):
+    pass
+
+
+def _int(value, default=None):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def encode_cursor(row) -> str:
+    raw = json.dumps([row["name"], row["id"]], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        name, pk = json.loads(raw)
+        return str(name), int(pk)
+    except (ValueError, TypeError) as exc:
+        raise BadCursor(cursor) from exc
+
+
+def filter_spells(params, qs=None):
+    """Apply the grid's filters from a QueryDict (request.GET) to `qs` (all spells by default)."""
+    qs = Spell.objects.all() if qs is None else qs
+
+    level = _int(params.get("level"))
+    if level is not None:
+        qs = qs.filter(level=level)
+    level_max = _int(params.get("level_max"))
+    if level_max is not None:
+        qs = qs.filter(level__lte=level_max)
+
+    q = (params.get("q") or "").strip()
+    if q:
+        qs = qs.filter(Q(name__icontains=q) | Q(tags__icontains=q)
+                       | Q(effect__icontains=q) | Q(upcast_effect__icontains=q))
+
+    for param, columns in CONTAINS_FILTERS.items():
+        value = (params.get(param) or "").strip()
+        if value:
+            match = Q()
+            for col in columns:
+                match |= Q(**{f"{col}__icontains": value})
+            qs = qs.filter(match)
+
+    for param, field in TOKEN_FILTERS.items():
+        values = sorted({v.strip().lower() for v in params.getlist(param) if v.strip()})
+        if values:
+            qs = qs.filter(**{f"{field}__overlap": values})
+    return qs
+
+
+def list_page(params):
+    """
+    {"results": [...], "next": cursor | None} (+ "total" on the first page) for the
+    filters in `params`; `after` is the previous page's cursor, `limit` the page size.
+    """
+    limit = min(max(_int(params.get("limit"), DEFAULT_LIMIT), 1), MAX_LIMIT)
+    qs = filter_spells(params)
+    payload = {}
+
+    after = params.get("after")
+    if after:
+        name, pk = decode_cursor(after)
+        page_qs = qs.filter(Q(name__gt=name) | Q(name=name, id__gt=pk))
+    else:
+        page_qs = qs
+        payload["total"] = qs.count()
+
+    rows = list(page_qs.order_by("name", "id").values(*LIST_FIELDS)[:limit + 1])
+    more = len(rows) > limit
+    rows = rows[:limit]
+    for r in rows:
+        r["tags"] = [t.strip() for t in (r["tags"] or "").split(",") if t.strip()]
+    payload["results"] = rows
+    payload["next"] = encode_cursor(rows[-1]) if more else None
+    return payload
+
+
+def spell_detail(pk):
+    """Every field the drawer shows, or None."""
+    row = Spell.objects.filter(pk=pk).values(*DETAIL_FIELDS).first()
+    if row is None:
+        return None
+    row["tags"] = [t.strip() for t in (row["tags"] or "").split(",") if t.strip()]
+    row["last_synced"] = row["last_synced"].isoformat() if row["last_synced"] else ""
+    return row
+
+
+def facets():
+    """Values for the origin / classification / tag menus: [{value, label}] sorted by label."""
+    seen = {field: {} for field in TOKEN_FILTERS.values()}
+    for field, (source, split_re) in Spell.TOKEN_SOURCES.items():
+        # a few dozen distinct cells per column, not one row per spell
+        cells = Spell.objects.order_by(source).values_list(source, flat=True).distinct()
+        for cell in cells:
+            for label in (t.strip() for t in split_re.split(cell or "")):
+                if label:
+                    seen[field].setdefault(label.lower(), label)   # first spelling wins as the label
+    return {
+        param: sorted(({"value": v, "label": label} for v, label in seen[field].items()),
+                      key=lambda d: d["label"].lower())
+        for param, field in TOKEN_FILTERS.items()
+    }
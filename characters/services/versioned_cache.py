@@ -0,0 +1,131 @@
+# characters/services/versioned_cache.py
+"""
+Shared plumbing for the per-worker caches that follow a version row in the DB
+(rules_catalog.RulesCatalogVersion, glossary.GlossaryVersion).
+
+VersionedCache keeps one built object per worker and rebuilds it when the
+row's version moves; it re-reads the row at most once per check interval.
+bump() moves the version once per transaction, after commit, so every worker
+picks the change up.
+
+on_commit_once() is the "queue this callback unless it is already queued"
+check those bumps (and search_index's flush) need. The queued callback is only
+held strongly by the connection's on_commit list: when a rollback discards it,
+its entry in the per-thread pending map goes with it, and when it runs it
+removes itself first.
+"""
+import threading
+import time
+import weakref
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+_pending_local = threading.local()
+
+
+def _pending() -> weakref.WeakValueDictionary:
+    pending = getattr(_pending_local, "callbacks", None)
+    if pending is None:
+        pending = _pending_local.callbacks = weakref.WeakValueDictionary()
+    return pending
+
+
+class _Once:
+    def __init__(self, key, func):
+        self.key = key
+        self.func = func
+
+    def __call__(self):
+        pending = _pending()
+        if pending.get(self.key) is self:
+            del pending[self.key]
+        self.func()
+
+
+def on_commit_once(func, using=None) -> None:
+    """transaction.on_commit(func), unless func is already waiting for this transaction."""
+    conn = transaction.get_connection(using)
+    if not conn.in_atomic_block:
+        func()
+        return
+    key = (conn.alias, func)
+    pending = _pending()
+    if key in pending:
+        return
+    pending[key] = callback = _Once(key, func)
+    transaction.on_commit(callback, using=using)
+
+
+class VersionedCache:
+    """
+    `build(version)` -> object with a .version attribute, cached per worker
+    until `model`'s pk=1 row moves. `check_interval` (seconds) is how long a
+    worker trusts what it has before re-reading that row.
+    """
+
+    def __init__(self, model, build, check_interval: float):
+        self.model = model
+        self.build = build
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._value = None
+        self._checked_at = 0.0
+        self._stamp = None
+        self._stamp_at = 0.0
+
+    def current_version(self) -> int:
+        row = self.model.objects.filter(pk=1).values_list("version", flat=True).first()
+        if row is None:
+            row = self.model.objects.get_or_create(pk=1)[0].version
+        return int(row)
+
+    def get(self):
+        now = time.monotonic()
+        value = self._value
+        if value is not None and now - self._checked_at < self.check_interval:
+            return value
+
+        with self._lock:
+            version = self.current_version()
+            if self._value is None or self._value.version != version:
+                self._value = self.build(version)
+            self._checked_at = time.monotonic()
+            return self._value
+
+    def stamp(self):
+        """(version, updated_at) of the row, re-read at most once per check interval; never builds."""
+        now = time.monotonic()
+        stamp = self._stamp
+        if stamp is not None and now - self._stamp_at < self.check_interval:
+            return stamp
+        row = self.model.objects.filter(pk=1).values_list("version", "updated_at").first()
+        if row is None:
+            obj = self.model.objects.get_or_create(pk=1)[0]
+            row = (obj.version, obj.updated_at)
+        self._stamp, self._stamp_at = (int(row[0]), row[1]), now
+        return self._stamp
+
+    def invalidate_local(self) -> None:
+        """Re-check the version on the next get() / stamp()."""
+        self._checked_at = 0.0
+        self._stamp_at = 0.0
+
+    def clear_local(self) -> None:
+        """Drop the cached object entirely (benchmarks / shell)."""
+        with self._lock:
+            self._value = None
+            self._checked_at = 0.0
+            self._stamp = None
+
+    def _bump(self) -> None:
+        # .update() skips auto_now; updated_at feeds Last-Modified in codex_cache
+        updated = self.model.objects.filter(pk=1).update(version=F("version") + 1, updated_at=timezone.now())
+        if not updated:
+            self.model.objects.get_or_create(pk=1, defaults={"version": 2})
+        self.invalidate_local()
+
+    def bump(self) -> None:
+        """Move the version once the current transaction commits; once per transaction."""
+        on_commit_once(self._bump)
@@ -0,0 +1,58 @@
+# characters/snapshot_signals.py
+from __future__ import annotations
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Character, CharacterClassProgress, CharacterFeature, CharacterPrestigeLevelChoice,
+    CharacterFieldOverride, CharacterItem, CharacterWeaponEquip, CharacterWearable,
+    CharacterActivation, CharacterMartialMastery, CharacterSkillProficiency,
+)
+from .services.bulk_writes import bulk_saved
+from .services.sheet_snapshot import mark_sheet_stale
+
+
+# Rows that belong to one character: only that character's sheet goes stale.
+CHARACTER_SCOPED_MODELS = (
+    CharacterClassProgress,
+    CharacterFeature,
+    CharacterPrestigeLevelChoice,
+    CharacterFieldOverride,
+    CharacterItem,
+    CharacterWeaponEquip,
+    CharacterWearable,
+    CharacterActivation,
+    CharacterMartialMastery,
+    CharacterSkillProficiency,
+)
+
+# Rules edits need no hook here: they move the catalog version (catalog_signals.py),
+# and a snapshot built against an older version is rebuilt on its next read.
+
+
+@receiver(post_save, sender=Character)
+@receiver(post_delete, sender=Character)
+def _character_changed(sender, instance, **kwargs):
+    mark_sheet_stale(instance.pk)
+
+
+@receiver(bulk_saved, sender=Character)
+def _characters_bulk_saved(sender, instances, **kwargs):
+    for obj in instances:
+        mark_sheet_stale(obj.pk)
+
+
+def _character_row_changed(sender, instance, **kwargs):
+    mark_sheet_stale(getattr(instance, "character_id", None))
+
+
+def _character_rows_bulk_saved(sender, instances, **kwargs):
+    for character_id in {getattr(obj, "character_id", None) for obj in instances}:
+        mark_sheet_stale(character_id)
+
+
+for _model in CHARACTER_SCOPED_MODELS:
+    post_save.connect(_character_row_changed, sender=_model, dispatch_uid=f"sheet_snapshot:{_model.__name__}:save")
+    post_delete.connect(_character_row_changed, sender=_model, dispatch_uid=f"sheet_snapshot:{_model.__name__}:delete")
+    bulk_saved.connect(_character_rows_bulk_saved, sender=_model, dispatch_uid=f"sheet_snapshot:{_model.__name__}:bulk")
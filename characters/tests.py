@@ -1,3 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.http import QueryDict
 from django.test import TestCase
 
-# Create your tests here.
+from characters.models import (
+    Character, CharacterClass, CharacterClassProgress, CharacterFeat, CharacterFeature,
+    CharacterFieldOverride, CharacterLevelJournal, CharacterSkillPointTx, ClassFeat, ClassFeature,
+    ClassLevel, ClassLevelFeature,
+)
+from characters.services.level_up import LevelUpPlanner, level_down
+
+
+class LevelUpRoundTripTests(TestCase):
+    """A level-2 Fighter without journal entries (levels gained before the journal existed)."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user("levelup-tests", password="x")
+        self.cls = CharacterClass.objects.create(name="Test Fighter", skill_points_per_level=2)
+        self.features = {}
+        for level in (1, 2, 3):
+            feature = ClassFeature.objects.create(
+                character_class=self.cls, code=f"tf_{level}", name=f"Test Feature {level}", scope="class_feat",
+            )
+            cl = ClassLevel.objects.create(character_class=self.cls, level=level)
+            ClassLevelFeature.objects.create(class_level=cl, feature=feature)
+            self.features[level] = feature
+        self.feat = ClassFeat.objects.create(name="Test Toughness", description="-", feat_type="General")
+
+        self.character = Character.objects.create(user=user, name="Round Trip", level=2, strength=12, dexterity=10)
+        CharacterClassProgress.objects.create(character=self.character, character_class=self.cls, levels=2)
+        for level in (1, 2):
+            CharacterFeature.objects.create(character=self.character, feature=self.features[level], level=level)
+        CharacterFieldOverride.objects.create(character=self.character, key="hp_max", value="33")
+
+    def _state(self):
+        self.character.refresh_from_db()
+        return {
+            "level": self.character.level,
+            "abilities": (self.character.strength, self.character.dexterity),
+            "progress": list(self.character.class_progress.values_list("character_class_id", "levels")),
+            "features": list(CharacterFeature.objects.filter(character=self.character)
+                             .order_by("level", "feature_id").values_list("feature_id", "level")),
+            "feats": list(CharacterFeat.objects.filter(character=self.character).values_list("feat_id", "level")),
+            "skill_points": CharacterSkillPointTx.objects.filter(character=self.character).count(),
+            "overrides": list(CharacterFieldOverride.objects.filter(character=self.character)
+                              .values_list("key", "value")),
+        }
+
+    def _level_up(self):
+        planner = LevelUpPlanner(self.character)
+        plan = planner.plan_base(
+            {"base_class": self.cls, "general_feat": self.feat,
+             "asi_mode": "1+1", "asi_a": "strength", "asi_b": "dexterity"},
+            QueryDict(""),
+        )
+        self.assertEqual(plan.errors, [])
+        return planner.apply(plan)
+
+    def test_planned_level_is_applied_and_journaled(self):
+        plan = self._level_up()
+
+        after = self._state()
+        self.assertEqual(after["level"], 3)
+        self.assertEqual(after["abilities"], (13, 11))
+        self.assertEqual(after["progress"], [(self.cls.pk, 3)])
+        self.assertIn((self.features[3].pk, 3), after["features"])
+        self.assertEqual(after["feats"], [(self.feat.pk, 3)])
+        self.assertEqual(after["skill_points"], 1)
+        self.assertEqual(after["overrides"], [])
+        self.assertEqual(plan.journal.level, 3)
+        self.assertEqual(plan.journal.removed, {"characters.characterfieldoverride": [{"key": "hp_max", "value": "33"}]})
+
+    def test_level_down_restores_the_planned_level(self):
+        before = self._state()
+        self._level_up()
+
+        self.assertEqual(level_down(self.character, to_level=2), 2)
+
+        self.assertEqual(self._state(), before)
+        self.assertFalse(CharacterLevelJournal.objects.filter(character=self.character).exists())
+
+    def test_legacy_level_without_journal_is_undone_too(self):
+        self._level_up()
+        self.assertEqual(list(CharacterLevelJournal.objects.filter(character=self.character)
+                              .values_list("level", flat=True)), [3])
+
+        # level 3 comes off through the journal, level 2 from the rows it left
+        self.assertEqual(level_down(self.character, to_level=1), 1)
+
+        state = self._state()
+        self.assertEqual(state["abilities"], (12, 10))
+        self.assertEqual(state["progress"], [(self.cls.pk, 1)])
+        self.assertEqual(state["features"], [(self.features[1].pk, 1)])
+        self.assertEqual(state["feats"], [])
+        self.assertEqual(state["skill_points"], 0)
+        self.assertEqual(state["overrides"], [("hp_max", "33")])
@@ -9,6 +9,8 @@ urlpatterns = [
     path("", views.character_list, name="character_list"),
     path("create/", views.create_character, name="create_character"),
     path("<int:pk>/", views.character_detail, name="character_detail"),
+    path("<int:pk>/tab/<slug:name>/", views.character_tab, name="character_tab"),
+    path("<int:pk>/level-up/preview/", views.character_level_up_preview, name="level_up_preview"),
     path("<int:pk>/level-down/", views.level_down, name="level_down"),
     path("<int:pk>/delete/", views.delete_character, name="delete_character"),
     path("bulk-delete/", views.bulk_delete_characters, name="bulk_delete_characters"),
@@ -42,6 +44,9 @@ path("<int:pk>/set-armor/", views.set_armor_choice, name="set_armor_choice"),
     # Codex
     path("codex/", views.codex_index, name="codex_index"),
     path("codex/spells/", views.spell_list, name="codex_spells"),
+    path("codex/spells/api/", views.spell_api, name="codex_spells_api"),
+    path("codex/spells/api/facets/", views.spell_facets, name="codex_spells_facets"),
+    path("codex/spells/api/<int:pk>/", views.spell_api_detail, name="codex_spell_api_detail"),
     path("codex/feats/", views.feat_list, name="codex_feats"),
     path("codex/feats/data/", views.feat_data, name="feat_data"),
     path("codex/classes/", views.class_list, name="codex_classes"),
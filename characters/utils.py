@@ -4,6 +4,7 @@ import re
 import random
 from django.core.exceptions import ValidationError
 from .models import Character  # adjust the import if your model is elsewhere
+from .services.formulas import DEFAULT_FUNCS, FormulaError, compile_formula
 
 # only allow these operators and tokens
 _VALID_RE = re.compile(
@@ -11,87 +12,109 @@ _VALID_RE = re.compile(
     flags=re.IGNORECASE
 )
 _DICE_RE = re.compile(r'(\d+)d(4|6|8|10|12|20)')      # match “2d6”, “1d10”, etc
-_VAR_RE  = re.compile(r'\b([A-Za-z_]\w*)\b')            # match identifiers
 
-def parse_formula(formula: str, character: Character) -> int:
+# formula variable -> Character attribute (read only when a formula uses it)
+_CHARACTER_VARS = {
+    "level": "level",
+    "reflex_save": "reflex_save",
+    "fortitude_save": "fortitude_save",
+    "will_save": "will_save",
+    "initiative": "initiative",
+    "perception": "perception",
+    "dodge": "dodge",
+    "spell_attack": "spell_attack",
+    "spell_dc": "spell_dc",
+    "weapon_attack": "weapon_attack",
+    "hp": "HP",
+    "temp_hp": "temp_HP",
+    "strength": "strength",
+    "dexterity": "dexterity",
+    "constitution": "constitution",
+    "intelligence": "intelligence",
+    "wisdom": "wisdom",
+    "charisma": "charisma",
+}
+
+
+def _roll(n, faces):
+    return sum(random.randint(1, int(faces)) for _ in range(int(n)))
+
+def prepare_formula(formula: str, character: Character = None) -> str:
     """
-    Turn a string like "1d10+level" or "proficiency_modifier/2 round up"
-    into an integer, looking up `level`, `proficiency_modifier`,
-    any `<classname>_level`, saving throws, etc. on the given character.
+    Normalize a dice formula into something the formula engine can compile:
+    dynamic "D"/"2D" becomes the character's hit die and "2d6" becomes roll(2, 6).
+    Without a character (admin validation) a bare "D" is checked as a d8.
     """
-
-    f = formula.strip().lower()
+    f = (formula or "").strip().lower()
 
     # ─── DYNAMIC “D” EXPANSION ────────────────────────────────────────────────
     # turn “D” or “2D” etc into real dice of whatever this character’s hit_die is
-    def _expand_dynamic_D(m):
-        count = m.group(1) or "1"
-        faces = character.class_progress.first().character_class.hit_die
-        return f"{count}d{faces}"
-    # \b(\d*)d\b matches “d” or “2d” with no faces …
-    f = re.sub(r"\b(\d*)d\b", _expand_dynamic_D, f, flags=re.IGNORECASE)
+    if re.search(r"\b\d*d\b", f):
+        faces = 8
+        if character is not None:
+            prog = character.class_progress.select_related("character_class").first()
+            if prog is not None:
+                faces = prog.character_class.hit_die
+        f = re.sub(r"\b(\d*)d\b", lambda m: f"{m.group(1) or '1'}d{faces}", f)
     # ───────────────────────────────────────────────────────────────────────────
 
     if not f:
-        return 0
+        return ""
 
-    # 1) Basic whitelist check
+    # Basic whitelist check
     if not _VALID_RE.match(f):
         raise ValidationError(f"Illegal characters in formula: {formula!r}")
 
-    # 2) Roll all dice
-    def _roll_dice(m):
-        n, faces = int(m.group(1)), int(m.group(2))
-        return str(sum(random.randint(1, faces) for _ in range(n)))
-    f = _DICE_RE.sub(_roll_dice, f)
-
-    # 3) Substitute variables
-    def _var_replace(m):
-        name = m.group(1)
-        # map the name to an integer from the character
-        # you can expand this mapping with any stats you need
-        lookup = {
-            "level": character.level,
-                                    "reflex_save": character.reflex_save,
-            "fortitude_save": character.fortitude_save,
-            "will_save": character.will_save,
-            "initiative": character.initiative,
-            "perception": character.perception,
-            "dodge": character.dodge,
-            "spell_attack": character.spell_attack,
-            "spell_dc": character.spell_dc,
-            "weapon_attack": character.weapon_attack,
-                "strength":     character.strength,
-                    "hp": character.HP,               # provide these properties/fields
-    "temp_hp": character.temp_HP,
-    "dexterity":    character.dexterity,
-    "constitution": character.constitution,
-    "intelligence": character.intelligence,
-    "wisdom":       character.wisdom,
-    "charisma":     character.charisma,
-        }
-        # also pull in each class’s own level, e.g. fighter_level, wizard_level, etc:
-        for prog in character.class_progress.all():
-            lookup[f"{prog.character_class.name.lower()}_level"] = prog.levels
-
-        if name not in lookup:
-            raise ValidationError(f"Unknown variable in formula: {name!r}")
-        return str(lookup[name])
-
-    f = _VAR_RE.sub(_var_replace, f)
-
-    # 4) Handle “round up” / “round down”
-    # e.g. transform “… /2 round up” → “math.ceil(…/2)”
-    # (import math inside the eval namespace)
-    f = re.sub(r'round\s+up', 'ceil', f)
-    f = re.sub(r'round\s+down', 'floor', f)
-
-    # 5) Safe eval
+    # Dice become calls so the compiled formula stays cacheable
+    return _DICE_RE.sub(r"roll(\1, \2)", f)
+
+
+def compile_dice_formula(formula: str, character: Character = None):
+    """Validate + compile (cached) a dice formula; raises ValidationError."""
+    f = prepare_formula(formula, character)
+    if not f:
+        return None
     try:
-        # only expose math.ceil/floor
-        from math import ceil, floor
-        result = eval(f, {"__builtins__": None}, {"ceil": ceil, "floor": floor})
-    except Exception as e:
-        raise ValidationError(f"Could not evaluate formula {formula!r}: {e}")
+        compiled = compile_formula(f)
+    except FormulaError as e:
+        raise ValidationError(str(e))
+    unknown = [
+        n for n in compiled.names
+        if n != "roll" and n not in _CHARACTER_VARS and n not in DEFAULT_FUNCS and not n.endswith("_level")
+    ]
+    if unknown:
+        raise ValidationError(f"Unknown variable in formula: {sorted(unknown)[0]!r}")
+    return compiled
 
-    return int(result)
+
+def parse_formula(formula: str, character: Character) -> int:
+    """
+    Turn a string like "1d10+level" or "proficiency_modifier/2 round up"
+    into an integer, looking up `level`, any `<classname>_level`,
+    saving throws, etc. on the given character.
+    """
+    compiled = compile_dice_formula(formula, character)
+    if compiled is None:
+        return 0
+
+    # only read the character attributes this formula actually uses
+    env = {"roll": _roll}
+    class_levels = None
+    for name in compiled.names:
+        if name in _CHARACTER_VARS:
+            env[name] = getattr(character, _CHARACTER_VARS[name], 0) or 0
+        elif name.endswith("_level") and name not in DEFAULT_FUNCS:
+            # each class’s own level, e.g. fighter_level, wizard_level, etc
+            if class_levels is None:
+                class_levels = {
+                    f"{prog.character_class.name.lower()}_level": prog.levels
+                    for prog in character.class_progress.select_related("character_class")
+                }
+            if name not in class_levels:
+                raise ValidationError(f"Unknown variable in formula: {name!r}")
+            env[name] = class_levels[name]
+
+    try:
+        return int(compiled(env))
+    except FormulaError as e:
+        raise ValidationError(f"Could not evaluate formula {formula!r}: {e}")
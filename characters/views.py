@@ -68,6 +68,37 @@ from django.shortcuts import redirect   # if not already imported
 from .models import RollModifier        # ADD this with your other model imports
 
 from .utils import parse_formula
+from .services.formulas import (
+    DEFAULT_FUNCS, FormulaError, evaluate, evaluate_int, evaluate_many,
+    normalize_formula as _normalize_formula,
+)
+from .services.sheet_snapshot import (
+    get_sheet_snapshot,
+    slots_by_rank as snapshot_slots_by_rank,
+    prof_rows_by_code as snapshot_prof_rows_by_code,
+)
+from .services.rules_catalog import add_slots, get_catalog, highest_rank, version_stamp as catalog_stamp
+from .services.codex_cache import codex_response
+from .services.level_up import (
+    LevelUpPlanner,
+    level_down as rollback_levels,
+    active_subclass_for_group as _active_subclass_for_group,
+    feat_matches_character_race as _feat_matches_character_race,
+    is_auto_granted_feature as _is_auto_granted_feature,
+    linear_feats_for_level as _linear_feats_for_level,
+    picks_for_trigger as _picks_for_trigger,
+    starting_skills_cap as _starting_skills_cap_for,
+    unlocked_tiers as _unlocked_tiers,
+)
+from .services import feat_facets, mastery_cards, spell_catalog
+from .services import search_index
+from .services.search_index import (
+    SEARCHABLES,
+    code_text as _code_text,
+    collect_search_targets as _collect_search_targets,
+    detail_url as _detail_url,
+    display_text as _display_text,
+)
 
 import re
 from collections import defaultdict
@@ -76,11 +107,9 @@ from django.db.models import Q
 from django.views.generic import DetailView
 
 from glossary.models import GlossaryTerm  # adjust app name if yours differs
-from .models import Rulebook
+from .services.rulebook_search import search_pages as search_rulebook_pages, search_rulebooks
+from .models import Rulebook, RulebookPageTerm
 
-def _strip_html(s: str) -> str:
-    # cheap/fast tag stripper; good enough for matching terms in rich text
-    return re.sub(r"<[^>]*>", " ", s or "")
 def _load_character_and_perms(request, pk):
     character = get_object_or_404(Character, pk=pk)
 
@@ -102,75 +131,7 @@ def _load_character_and_perms(request, pk):
         or getattr(request.user, "is_superuser", False)
     )
     return character, can_edit, None
-def _matches_term(text: str, text_lower: str, term: GlossaryTerm) -> bool:
-    """
-    Returns True if ANY of (term.term + aliases) appear in text,
-    respecting case_sensitive + whole_word.
-    """
-    for w in term.terms_list():
-        if not w:
-            continue
-
-        if term.whole_word:
-            # whole-word-ish boundary that works better than \b for punctuation
-            pattern = r"(?<!\w)" + re.escape(w) + r"(?!\w)"
-            flags = 0 if term.case_sensitive else re.IGNORECASE
-            if re.search(pattern, text, flags=flags):
-                return True
-        else:
-            if term.case_sensitive:
-                if w in text:
-                    return True
-            else:
-                if w.lower() in text_lower:
-                    return True
-
-    return False
-
-def _starting_skills_cap_for(character, cls_obj, class_progress):
-    expr = (getattr(cls_obj, "starting_skills_formula", "") or "").strip()
-    if not expr:
-        return 0
-
-
-    def _abil(score: int) -> int:
-        return (score - 10) // 2
-
-    # IMPORTANT: short names -> MODIFIERS
-    ctx = {
-        # modifiers (primary names)
-        "strength": _abil(character.strength), "dexterity": _abil(character.dexterity),
-        "constitution": _abil(character.constitution), "intelligence": _abil(character.intelligence),
-        "wisdom": _abil(character.wisdom), "charisma": _abil(character.charisma),
-
-        # explicit *_mod aliases (same values as above)
-        "str_mod": _abil(character.strength), "dex_mod": _abil(character.dexterity),
-        "con_mod": _abil(character.constitution), "int_mod": _abil(character.intelligence),
-        "wis_mod": _abil(character.wisdom), "cha_mod": _abil(character.charisma),
-
-        # scores (only if you want them available explicitly)
-        "strength_score": character.strength, "dexterity_score": character.dexterity,
-        "constitution_score": character.constitution, "intelligence_score": character.intelligence,
-        "wisdom_score": character.wisdom, "charisma_score": character.charisma,
-
-        # math/helpers
-        "floor": math.floor, "ceil": math.ceil, "min": min, "max": max,
-        "int": int, "round": round,
-    }
-
-    # <class>_level tokens (wizard_level, fighter_level, ...)
-    for prog in character.class_progress.select_related('character_class'):
-        token = re.sub(r'[^a-z0-9_]', '', (prog.character_class.name or '')
-                    .strip().lower().replace(' ', '_'))
-        if token:
-            ctx[f"{token}_level"] = int(prog.levels or 0)
 
-    try:
-        val = eval(_normalize_formula(expr), {"__builtins__": {}}, ctx)
-        return max(0, int(val))
-    except Exception:
-        return 0
-    
 
 class RulebookGlossaryView(DetailView):
     model = Rulebook
@@ -183,19 +144,6 @@ class RulebookGlossaryView(DetailView):
         q = (self.request.GET.get("q") or "").strip()
         show_all = (self.request.GET.get("all") or "").strip() in ("1", "true", "yes")
 
-        # Pull all pages for matching
-        pages = self.object.pages.all().only("title", "content")
-
-        # Combine title + content for matching; strip HTML so terms across tags still match
-        combined = []
-        for p in pages:
-            combined.append(p.title or "")
-            combined.append(p.content or "")
-
-        raw_text = " ".join(combined)
-        text = _strip_html(raw_text)
-        text_lower = text.lower()
-
         # Start glossary queryset
         terms_qs = GlossaryTerm.objects.filter(active=True)
 
@@ -207,14 +155,23 @@ class RulebookGlossaryView(DetailView):
                 Q(definition__icontains=q)
             )
 
+        # Occurrences come from the RulebookPageTerm index; after a glossary edit
+        # they lag until the worker's reindex_rulebook_terms catches up.
+        mentions = defaultdict(list)
+        for term_id, page_id, title, hits in (RulebookPageTerm.objects
+                                              .filter(page__rulebook=self.object, term__active=True)
+                                              .order_by("page__order")
+                                              .values_list("term_id", "page_id", "page__title", "hits")):
+            mentions[term_id].append({"id": page_id, "title": title, "hits": hits})
+
         # If show_all=1, don’t filter by “appears in rulebook”
         if show_all:
             matched_terms = list(terms_qs.order_by("-priority", "term"))
         else:
-            matched_terms = []
-            for t in terms_qs.order_by("-priority", "term"):
-                if _matches_term(text, text_lower, t):
-                    matched_terms.append(t)
+            matched_terms = list(terms_qs.filter(page_hits__page__rulebook=self.object)
+                                 .distinct().order_by("-priority", "term"))
+        for t in matched_terms:
+            t.mentioned_on = mentions.get(t.pk, [])
 
         # Group A-Z for nicer display
         grouped = defaultdict(list)
@@ -256,129 +213,8 @@ def ensure_character_mastery(character, mastery_or_id, level=None):
     )
 import re
 
-def _normalize_race_token(raw: str) -> str:
-    """
-    Normalize a race token so that:
-      - Casing / punctuation noise is stripped
-      - Common plurals are collapsed to a singular-ish form
-      - Noise words like 'only' are removed
-    """
-    t = str(raw or "").strip().lower()
-
-    # strip common noise words
-    t = re.sub(r"\b(only|heritage|ancestry|subrace)\b", "", t)
-
-    # keep letters, digits, spaces and hyphens
-    t = re.sub(r"[^\w\s\-]", "", t)
-    t = re.sub(r"\s+", " ", t).strip()
-
-    # irregular / common plurals -> singular
-    repl = {
-        "elves": "elf",
-        "dwarves": "dwarf",
-        "halflings": "halfling",
-        "humans": "human",
-        "gnomes": "gnome",
-        "orcs": "orc",
-        "tieflings": "tiefling",
-        "dragonborns": "dragonborn",
-        "half elves": "half elf",
-    }
-    for plural, sing in repl.items():
-        t = re.sub(rf"\b{plural}\b", sing, t)
-
-    # generic “ends with s” plural (goliaths -> goliath, tabaxi stays tabaxi)
-    if len(t) > 3 and t.endswith("s"):
-        t = t[:-1]
-
-    return t
-
-
-def _split_race_tokens(raw: str) -> list[str]:
-    """
-    Split a race string into logical tokens.
-
-    Examples:
-      'Gnome, Halfling' -> ['gnome', 'halfling']
-      'Tiefling, Lizardfolk, Tabaxi, Kitsune, Dragonborn'
-          -> ['tiefling','lizardfolk','tabaxi','kitsune','dragonborn']
-      'Elf, Half-Elf' -> ['elf','half-elf']
-      'High Elves' -> ['high elf']
-    """
-    if not raw:
-        return []
-
-    parts = re.split(r"[,\;/]", str(raw))
-    tokens: list[str] = []
-    for p in parts:
-        t = _normalize_race_token(p)
-        if t:
-            tokens.append(t)
-    return tokens
-
-
-def _feat_matches_character_race(feat_race: str, character) -> bool:
-    """
-    Returns True if this feat's race string should apply to this character.
-
-    Rules:
-      • Blank / null feat.race => always allowed (generic feat).
-      • Otherwise, build tokens for:
-          - character race + subrace
-          - feat.race
-        Then return True if ANY (ct, ft) satisfies:
-          ct == ft OR ct in ft OR ft in ct
-        after normalization.
-
-      So:
-        - 'Goliath' matches 'Goliath, Tabaxi'
-        - 'Goliath' matches 'Goliaths only'
-        - 'Elf'     matches 'Elf, Half-Elf', 'High Elves', 'Elves'
-    """
-    # Generic feats: no race restriction
-    if not feat_race or not str(feat_race).strip():
-        return True
-
-    # Character race / subrace names
-    char_names: list[str] = []
-    if getattr(character, "race", None) and getattr(character.race, "name", None):
-        char_names.append(character.race.name)
-    if getattr(character, "subrace", None) and getattr(character.subrace, "name", None):
-        char_names.append(character.subrace.name)
-
-    if not char_names:
-        # character has no race info → race-locked feats do NOT apply
-        return False
-
-    # Normalize + split the character side
-    char_tokens: list[str] = []
-    for raw in char_names:
-        char_tokens.extend(_split_race_tokens(raw))
-
-    # Normalize + split the feat side
-    feat_tokens = _split_race_tokens(feat_race)
-
-    if not feat_tokens:
-        # weird junk but effectively “no restriction”
-        return True
-
-    for ct in char_tokens:
-        for ft in feat_tokens:
-            if not ct or not ft:
-                continue
-            if ct == ft or ct in ft or ft in ct:
-                return True
-
-    return False
-
 # Functions callers are allowed to use in formulas
-_ALLOWED_FUNCS = {
-    "floor": math.floor, "ceil": math.ceil, "round": round,
-    "min": min, "max": max, "int": int, "abs": abs,
-    # friendly aliases people type in your data
-    "round_up": math.ceil, "roundup": math.ceil, "ceiling": math.ceil,
-    "round_down": math.floor, "rounddown": math.floor,
-}
+_ALLOWED_FUNCS = DEFAULT_FUNCS
 def eligible_prestige_qs(character, class_progress=None):
     """
     Return ALL prestige classes the character is allowed to see in the UI
@@ -395,31 +231,6 @@ def eligible_prestige_qs(character, class_progress=None):
     return PrestigeClass.objects.filter(
         min_entry_level__lte=next_level
     ).order_by("name")
-def _normalize_formula(expr: str) -> str:
-    """Make stored formulas Pythonic: 'round up(x)' -> 'ceil(x)', '^' -> '**', etc."""
-    if not expr:
-        return ""
-    e = expr.strip()
-
-    # caret to Python power
-    e = e.replace("^", "**")
-
-    # 'round up(' / 'round down(' → ceil/floor
-    # phrase forms -> real functions (handles "round up(x)" and "… round up")
-    e = re.sub(r"\bround\s*up\b",   "ceil",  e, flags=re.IGNORECASE)
-    e = re.sub(r"\bround\s*down\b", "floor", e, flags=re.IGNORECASE)
-
-    e = re.sub(r"\bround\s+up\b", "ceil", e)    # simple alias safety
-    e = re.sub(r"\bround\s+down\b", "floor", e)
-    # Allow postfix '(... ) ceil' / '(... ) floor'
-    e = re.sub(r"\(\s*([^()]+?)\s*\)\s*ceil\b",  r"ceil(\1)",  e, flags=re.I)
-    e = re.sub(r"\(\s*([^()]+?)\s*\)\s*floor\b", r"floor(\1)", e, flags=re.I)
-
-    # Allow 'x / n ceil' → 'ceil(x/n)' (and floor)
-    e = re.sub(r"(.+?)\s*/\s*([0-9]+)\s*ceil\b",  r"ceil((\1)/\2)",  e, flags=re.I)
-    e = re.sub(r"(.+?)\s*/\s*([0-9]+)\s*floor\b", r"floor((\1)/\2)", e, flags=re.I)
-
-    return e
 def _mm_cost(m) -> int:
     """Return the point cost for a mastery (fallback 1)."""
     raw = getattr(m, "points_cost", None)
@@ -542,107 +353,6 @@ def _mm_details(m):
 
 # put near the top of views.py (import re if not already)
 import re, math
-# Common text-ish field names we’ll traverse one hop for relations (FK/M2M).
-_COMMON_RELATED_TEXT_NAMES = ["name","title","code","slug","description","label","caption","excerpt","content","notes","summary"]
-def _text_names_for(related_model):
-    """
-    Return the subset of our 'common' names that actually exist on related_model
-    and are texty (Char/Text/Slug/Email/URL).
-    """
-    ok = set()
-    if not related_model:  # safety
-        return []
-    for rf in related_model._meta.get_fields():
-        if not getattr(rf, "concrete", False):
-            continue
-        from django.db import models as _m
-        if isinstance(
-            rf,
-            (_m.CharField, _m.TextField, _m.SlugField, _m.EmailField, _m.URLField),
-        ):
-            if rf.name in _COMMON_RELATED_TEXT_NAMES:
-                ok.add(rf.name)
-    return sorted(ok)
-
-def _collect_search_targets(model):
-    """
-    Return (text_fields, cast_fields, related_lookups) for a model.
-
-    - text_fields: direct Char/Text-like field names (searchable with __i* lookups)
-    - cast_fields: every other concrete field name (ints, dates, bool, JSON, Array, FK id)
-                   we will Cast() to text so we can __icontains them
-    - related_lookups: one-hop lookups into common text fields of related objects
-                       (e.g. 'character_class__name', 'tags__name')
-    """
-    text_fields, cast_fields, related_lookups = [], [], []
-
-    for f in model._meta.get_fields():
-        # skip reverse/auto non-concrete artifacts
-        if getattr(f, "auto_created", False) and not getattr(f, "concrete", False):
-            continue
-        if not getattr(f, "concrete", False):
-            continue
-
-        # M2M: allow searching the related object's usual text fields
-        if f.many_to_many and getattr(f, "related_model", None):
-            names = _text_names_for(f.related_model)
-            related_lookups.extend([f"{f.name}__{n}" for n in names])
-            continue
-
-        # FKs / O2Os: search only fields that actually exist on the related model,
-        # and also allow filtering on the raw *_id via cast.
-        if f.is_relation and getattr(f, "related_model", None):
-            names = _text_names_for(f.related_model)
-            related_lookups.extend([f"{f.name}__{n}" for n in names])
-            if hasattr(f, "attname"):  # e.g., character_class_id
-                cast_fields.append(f.attname)
-            continue
-
-        # Direct field types
-        if isinstance(
-            f,
-            (
-                models.CharField,
-                models.TextField,
-                models.SlugField,
-                models.EmailField,
-                models.URLField,
-            ),
-        ):
-            text_fields.append(f.name)
-        else:
-            # everything else: ints, dates, bool, JSONField, ArrayField, etc.
-            cast_fields.append(f.name)
-
-    return text_fields, cast_fields, related_lookups
-
-
-
-def _picks_for_trigger(trigger, base_cls, cls_level):
-    """
-    'Choices granted at this level' → how many modules the player picks now.
-    Prefers the pivot (ClassLevelFeature.choices_granted), falls back to
-    trigger.choices_granted on the feature.
-    """
-    from .models import ClassLevel
-    try:
-        cl = ClassLevel.objects.get(character_class=base_cls, level=cls_level)
-    except ClassLevel.DoesNotExist:
-        return int(getattr(trigger, "choices_granted", 1) or 1)
-
-    # Try the through model if it exists
-    try:
-        from .models import ClassLevelFeature  # your M2M through that stores choices_granted
-        clf = ClassLevelFeature.objects.filter(class_level=cl, feature=trigger).first()
-        if clf and getattr(clf, "choices_granted", None) not in (None, ""):
-            return int(clf.choices_granted)
-    except Exception:
-        pass
-
-    # Fallback to the feature field itself
-    return int(getattr(trigger, "choices_granted", 1) or 1)
-
-
 def _allowed_rank_from_trigger(trigger):
     """
     'Mastery Rank' on the gain_subclass_feat feature → max rank the player may
@@ -869,52 +579,6 @@ def _object_field_dump(obj):
         uniq.append(d)
     return uniq
 
-def _display_text(obj):
-    # Prefer human-friendly main field
-    for attr in ("name", "title"):
-        if hasattr(obj, attr) and getattr(obj, attr):
-            return getattr(obj, attr)
-    return str(obj)
-
-def _code_text(obj):
-    # Collect a sensible “code-like” field if present
-    for attr in ("code", "class_ID", "slug"):
-        if hasattr(obj, attr) and getattr(obj, attr):
-            return getattr(obj, attr)
-    return ""
-
-def _detail_url(obj):
-    # Link where we know we have detail pages;
-    # otherwise send users to a Codex list with a pre-filled query (?q=...)
-    try:
-        if isinstance(obj, CharacterClass):
-            return reverse("characters:class_detail", kwargs={"pk": obj.pk})
-        if isinstance(obj, Race):
-            return reverse("characters:race_detail", kwargs={"pk": obj.pk})
-        if isinstance(obj, Rulebook):
-            return reverse("characters:rulebook_detail", kwargs={"pk": obj.pk})
-        if isinstance(obj, RulebookPage):
-            return reverse("characters:rulebook_page_detail",
-                           kwargs={"rulebook_pk": obj.rulebook_id, "pk": obj.pk})
-        if isinstance(obj, LoremasterArticle):
-            return obj.get_absolute_url()  # already defined in your model
-
-        # Codex list pages – we pass a ?q=... so users land filtered
-        name_qs = urlencode({"q": _display_text(obj)})
-        if isinstance(obj, Weapon):
-            return reverse("characters:codex_weapons") + f"?{name_qs}"
-        if isinstance(obj, Armor):
-            return reverse("characters:codex_armor") + f"?{name_qs}"
-        if isinstance(obj, Spell):
-            return reverse("characters:codex_spells") + f"?{name_qs}"
-        if isinstance(obj, ClassFeat):
-            return reverse("characters:codex_feats") + f"?{name_qs}"
-
-        # Fallback: None (still listed, just no link)
-        return None
-    except Exception:
-        return None
-
 def _search_model(model, query, limit_each=30):
     """
     Rank order within a model:
@@ -1006,41 +670,49 @@ def _search_model(model, query, limit_each=30):
     items.sort(key=lambda x: (x["rank"], x["display"].lower()))
     return items
 
+def _indexed_item(hit, query):
+    """A SearchDocument hit shaped like _search_model's items (matched_in / kv_all from the stored dump)."""
+    tier = hit["tier"]
+    q_lc = query.lower()
+    matched, kv_all = [], []
+    for row in hit["fields"] or []:
+        val_lc = str(row["value"]).lower()
+        if tier == 0 and val_lc == q_lc:
+            matched.append({"field": row["field"], "label": row["label"], "match": "exact"})
+        elif tier == 1 and val_lc.startswith(q_lc):
+            matched.append({"field": row["field"], "label": row["label"], "match": "starts-with"})
+        elif tier == 2 and q_lc in val_lc:
+            matched.append({"field": row["field"], "label": row["label"], "match": "contains"})
+        kv_all.append(dict(row, render=_safe_highlight(row["value"], query)))
+    return {
+        "pk": hit["object_id"],
+        "display": hit["title"],
+        "code": hit["code"],
+        "url": hit["url"] or None,
+        "rank": tier,
+        "matched_in": matched,
+        "kv_all": kv_all,
+    }
+
+
 def global_search(request):
     query = (request.GET.get("q") or "").strip()
 
-    # What we search (easy to extend)
-    SEARCHABLES = [
-        # label, model
-        ("Features",            ClassFeature),
-        ("Classes",             CharacterClass),
-        ("Subclass Groups",     SubclassGroup),
-        ("Subclasses",          ClassSubclass),
-        ("Races",               Race),
-        ("Subraces",            Subrace),
-        ("Backgrounds",         Background),
-        ("Languages",           Language),
-        ("Resource Types",      ResourceType),
-        ("Wearable Slots",      WearableSlot),
-        ("Skills",              Skill),
-        ("Sub-skills",          SubSkill),
-        ("Weapons",             Weapon),
-        ("Armor",               Armor),
-        ("Weapon Traits",       WeaponTrait),
-        ("Armor Traits",        ArmorTrait),
-        ("Spells",              Spell),
-        ("Special Equipment",   SpecialItem),
-        ("Feats",               ClassFeat),
-        ("Martial Masteries",   MartialMastery),
-        ("Rulebooks",           Rulebook),
-        ("Rulebook Pages",      RulebookPage),
-        ("Loremaster Articles", LoremasterArticle),
-    ]
-
     results = []
     total_count = 0
 
-    if query:
+    # One ranked query against the SearchDocument index; the per-model scans are
+    # only the fallback for non-Postgres databases / an index that was never built.
+    hits = search_index.search(query, limit_each=30) if query else None
+    if hits is not None:
+        by_section = defaultdict(list)
+        for hit in hits:
+            by_section[hit["section"]].append(_indexed_item(hit, query))
+        for label, _model in SEARCHABLES:
+            if by_section.get(label):
+                results.append({"label": label, "items": by_section[label]})
+                total_count += len(by_section[label])
+    elif query:
         for label, model, *_ in SEARCHABLES:  # *_ keeps backward-compat if any tuples still longer
             model_items = _search_model(model, query, limit_each=30)
             if model_items:
@@ -1094,14 +766,11 @@ def mastery_list(request):
 
 
 # ---- Data endpoint for dynamic filtering ------------------------------------
+@codex_response(catalog_stamp)
 def mastery_data(request):
-    qs = (MartialMastery.objects
-          .prefetch_related(
-              "classes",
-              "allowed_weapons",
-              "allowed_traits",
-          )
-          .order_by("level_required", "name"))
+    # Filters run in SQL for ids only; the rows come from the cached card projection
+    # (services/mastery_cards.py), so the grid costs the same however many masteries match.
+    qs = MartialMastery.objects.order_by("level_required", "name")
 
     # Text search
     q = (request.GET.get("q") or "").strip()
@@ -1166,41 +835,13 @@ def mastery_data(request):
         qs = qs.filter(points_cost__lte=cost_max)
 
     # Serialize
-    data = []
-    for m in qs:
-        restrict_bits = []
-        if m.restrict_to_range:
-            restrict_bits.append(f"Range: {', '.join(m.allowed_range_types or [])}")
-        if m.restrict_to_weapons:
-            names = list(m.allowed_weapons.values_list("name", flat=True)[:6])
-            extra = m.allowed_weapons.count() - len(names)
-            restrict_bits.append("Weapons: " + ", ".join(names) + (f" (+{extra} more)" if extra>0 else ""))
-        if m.restrict_to_traits:
-            names = list(m.allowed_traits.values_list("name", flat=True)[:6])
-            extra = m.allowed_traits.count() - len(names)
-            mode  = "ALL" if (m.trait_match_mode or "").lower()=="all" else "ANY"
-            restrict_bits.append(f"Traits ({mode}): " + ", ".join(names) + (f" (+{extra} more)" if extra>0 else ""))
-        if getattr(m, "restrict_to_damage", False):
-            restrict_bits.append("Damage: " + ", ".join(m.allowed_damage_types or []))
-
-        data.append({
-            "id": m.id,
-            "name": m.name,
-            "level": m.level_required,
-            "cost": m.points_cost,
-            "action": m.get_action_cost_display() if m.action_cost else "—",
-            "rare": m.is_rare,
-            "ability_req": {
-                "on": m.restrict_by_ability,
-                "ability": m.get_required_ability_display() if m.required_ability else None,
-                "score": m.required_ability_score,
-            },
-            "classes": list(m.classes.values_list("name", flat=True)),
-            "restrictions": restrict_bits,
-            "url":  request.build_absolute_uri(
-                        reverse("characters:mastery_detail", args=[m.pk])
-                    ),
-        })
+    cards = mastery_cards.get_cards()
+    root = request.build_absolute_uri("/")[:-1]
+    data = [
+        {**cards[pk], "url": root + cards[pk]["url"]}
+        for pk in qs.values_list("pk", flat=True)
+        if pk in cards
+    ]
     return JsonResponse({"results": data})
 
 
@@ -1216,6 +857,7 @@ def mastery_detail(request, pk):
 
 @require_GET
 @login_required
+@codex_response(catalog_stamp)
 def race_features_data(request):
     race_id    = request.GET.get("race")
     subrace_id = request.GET.get("subrace")
@@ -1346,11 +988,7 @@ def _nonempty(val):
     if isinstance(val, (list, dict, tuple, set)): return bool(val)
     return val not in (None, "")
 def _eval_formula(expr, ctx):
-    if not expr: return None
-    try:
-        return int(eval(expr, {"__builtins__": {}}, ctx))
-    except Exception:
-        return None
+    return evaluate_int(expr, ctx, None)
 # views.py
 
 HIDE_LABELS = {"Scope", "Kind", "Activity", "Activity Type"}  # anything we never want to show
@@ -2219,24 +1857,10 @@ def _current_proficiencies_for_character(character):
     """
     out = []
     label_by_code = dict(PROFICIENCY_TYPES)
-    cps = (character.class_progress
-                      .select_related('character_class')
-                      .all())
+    resolver = character.proficiency_resolver
 
     for code in label_by_code.keys():
-        best_tier = None
-        best_row  = None
-        for cp in cps:
-            qs = (ClassProficiencyProgress.objects
-                    .select_related('tier')
-                    .filter(character_class=cp.character_class,
-                            proficiency_type=code,
-                            at_level__lte=cp.levels))
-            for row in qs:
-                t = row.tier
-                if (best_tier is None) or (t.bonus > best_tier.bonus):
-                    best_tier = t
-                    best_row  = row
+        best_row, best_tier = resolver.best_class_row(character.pk, code)
 
         out.append({
             "type_code":  code,
@@ -2304,63 +1928,11 @@ def _char_or_403(request, pk: int) -> Character:
 import ast, math
 from typing import Any, Dict
 
-_ALLOWED_FUNCS: Dict[str, Any] = {
-    "min": min, "max": max, "floor": math.floor, "ceil": math.ceil,
-    "round": round, "int": int, "abs": abs,
-    "round_up": math.ceil, "roundup": math.ceil, "ceiling": math.ceil,
-    "round_down": math.floor, "rounddown": math.floor,
-}
-
 def _safe_eval(expr: str, vars: Dict[str, Any]) -> int:
+    """Strict evaluation: raises FormulaError (a ValueError) on bad formulas."""
     if not expr:
         return 0
-
-    expr = _normalize_formula(expr)  # ← MUST happen *before* ast.parse
-
-    node = ast.parse(expr, mode="eval")
-    allowed = (
-        ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Load,
-        ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
-        ast.UAdd, ast.USub, ast.Name, ast.Num, ast.Constant
-    )
-
-    def _walk(n: ast.AST) -> None:
-        if not isinstance(n, allowed):
-            raise ValueError("Illegal expression")
-        for c in ast.iter_child_nodes(n):
-            _walk(c)
-    _walk(node)
-
-    scope = {**vars, **_ALLOWED_FUNCS}
-
-    def _eval(n: ast.AST):
-        if isinstance(n, ast.Expression): return _eval(n.body)
-        if isinstance(n, ast.Constant):   return n.value
-        if isinstance(n, ast.Num):        return n.n
-        if isinstance(n, ast.UnaryOp):
-            v = _eval(n.operand)
-            if isinstance(n.op, ast.UAdd): return +v
-            if isinstance(n.op, ast.USub): return -v
-        if isinstance(n, ast.BinOp):
-            l, r = _eval(n.left), _eval(n.right)
-            if isinstance(n.op, ast.Add):      return l + r
-            if isinstance(n.op, ast.Sub):      return l - r
-            if isinstance(n.op, ast.Mult):     return l * r
-            if isinstance(n.op, ast.Div):      return l / r
-            if isinstance(n.op, ast.FloorDiv): return l // r
-            if isinstance(n.op, ast.Mod):      return l % r
-            if isinstance(n.op, ast.Pow):      return l ** r
-        if isinstance(n, ast.Name):
-            if n.id not in scope:
-                raise ValueError(f"Unknown var {n.id}")
-            return scope[n.id]
-        if isinstance(n, ast.Call):
-            fn = _eval(n.func)
-            args = [_eval(a) for a in n.args]
-            return fn(*args)
-        raise ValueError("Bad expression")
-
-    return int(_eval(node))
+    return int(evaluate(expr, vars))
 
 def _ability_mod(score: int) -> int:
     try:
@@ -2435,7 +2007,7 @@ def _active_spell_tables(char: Character):
             feature__character_class_id__in=class_levels.keys(),
         )
         .select_related("feature", "feature__character_class", "subclass")
-        .prefetch_related("feature__subclasses", "feature__spell_slot_rows")
+        .prefetch_related("feature__subclasses")
         .order_by("feature__character_class__name", "feature__id", "id")
     )
 
@@ -2474,18 +2046,13 @@ def _active_spell_tables(char: Character):
 
 def _slot_totals_by_origin_and_rank(char):
     out = {o: {r: 0 for r in RANKS} for o in ORIGINS}
+    catalog = get_catalog()
     for feature, _cls, cls_level in _active_spell_tables(char):
         origin = (feature.spell_list or "").lower()
         if origin not in ORIGINS:
             continue
-        row = (feature.spell_slot_rows
-                 .filter(level__lte=cls_level)
-                 .order_by('-level')
-                 .first())
-        if not row:
-            continue
-        for r in range(1, 11):
-            out[origin][r] += getattr(row, f"slot{r}", 0) or 0
+        # highest table row at or below the class level
+        add_slots(out[origin], catalog.slots_at_or_below(feature.id, cls_level))
     return out
 
 
@@ -2580,13 +2147,12 @@ def _spellcasting_context(char):
 
     # 3) Slots by origin/rank from your active spell tables (if you have them)
     slots_by_origin_rank = defaultdict(dict)
+    catalog = get_catalog()
     for feature, cls, _cls_level in _active_spell_tables(char):  # keep your existing helper
         token = _okey(getattr(feature, "get_spell_list_display", lambda: None)() or feature.spell_list)
-        row = feature.spell_slot_rows.filter(level=_cls_level).first()
-        if not row:
+        slots = catalog.slots_exact(feature.id, _cls_level)
+        if not slots:
             continue
-        slots = [row.slot1,row.slot2,row.slot3,row.slot4,row.slot5,
-                 row.slot6,row.slot7,row.slot8,row.slot9,row.slot10]
         for i, s in enumerate(slots, start=1):
             if s:
                 slots_by_origin_rank[token][i] = int(s)
@@ -2659,25 +2225,22 @@ def feat_list(request):
         "data_url": reverse("feat_data"),
     })
 
+@codex_response(catalog_stamp)
 def feat_data(request):
     """
     Lightweight JSON for client-side filtering.
-    Tokenizes class_name and race columns so filters match each value correctly.
+    Facet values come from the token arrays ClassFeat keeps in step with its CSV columns.
     """
     rows = []
     for f in ClassFeat.objects.all().order_by("name"):
-        feat_types = [t.strip() for t in (f.feat_type or "").split(",") if t.strip()]
-        class_vals = _tokens(f.class_name)
-        race_vals  = _tokens(f.race)
-        tag_vals   = [t.strip() for t in (f.tags or "").split(",") if t.strip()]
         rows.append({
             "id": f.id,
             "name": f.name or "",
             "feat_type_raw": f.feat_type or "",
-            "feat_types": feat_types,                 # e.g. ["Class"]
-            "class_tokens": class_vals,               # ["Wizard","Fighter","Ranger"]
-            "race_tokens": race_vals,                 # ["Elf","Dwarf"]
-            "tags": tag_vals,                         # ["Focus","Defense"]
+            "feat_types": f.feat_type_tokens,         # e.g. ["Class"]
+            "class_tokens": f.class_tokens,           # ["Wizard","Fighter","Ranger"]
+            "race_tokens": f.race_tokens,             # ["Elf","Dwarf"]
+            "tags": f.tag_tokens,                     # ["Focus","Defense"]
             "level_req_num": parse_req_level(getattr(f, "level_prerequisite", "")),
             "level_prereq_raw": getattr(f, "level_prerequisite", "") or "",
             "prerequisites": getattr(f, "prerequisites", "") or "",
@@ -2700,40 +2263,45 @@ from .models import Spell
 ORIGINS = ["arcane", "divine", "primal", "occult"]
 
 @login_required
+@codex_response(catalog_stamp, shared=False)
 def spell_list(request):
-    qs = Spell.objects.all().order_by("level", "name")
-
-    # Build JSON rows for the client grid (drawer + per-column filters)
-    spells_json = []
-    for s in qs:
-        # tags split once here so the template doesn't need custom filters
-        tag_list = [t.strip() for t in (s.tags or "").split(",") if t.strip()]
-        spells_json.append({
-            "id": s.id,
-            "name": s.name or "",
-            "level": int(s.level or 0),
-            "origin": (s.origin or "").strip(),         # keep raw; JS will tokenize
-            "classification": (s.classification or "").strip(),
-            "tags": tag_list,
-            "casting_time": s.casting_time or "",
-            "duration": s.duration or "",
-            "components": s.components or "",
-            "range": s.range or "",
-            "target": s.target or "",
-            "sub_origin": s.sub_origin or "",
-            "saving_throw": s.saving_throw or "",
-            "effect": s.effect or "",
-            "upcast_effect": s.upcast_effect or "",
-            "last_synced": (s.last_synced.isoformat() if getattr(s, "last_synced", None) else ""),
-        })
-
+    # The grid pages through spell_api (see services/spell_catalog.py); nothing is embedded.
     return render(request, "codex/spell_list.html", {
-        "spells_json": spells_json,
         "levels": list(range(0, 11)),   # Cantrip (0) … 10
-        "origins": ORIGINS,             # seed only; menus populate from data too
+        "origins": ORIGINS,             # seed only; menus populate from spell_facets too
     })
 
 
+@require_GET
+@login_required
+@codex_response(catalog_stamp)
+def spell_api(request):
+    """Filtered, keyset-paginated lean spell rows for the codex grid."""
+    try:
+        return JsonResponse(spell_catalog.list_page(request.GET))
+    except spell_catalog.BadCursor:
+        return HttpResponseBadRequest("Invalid cursor")
+
+
+@require_GET
+@login_required
+@codex_response(catalog_stamp)
+def spell_api_detail(request, pk):
+    """Full text of one spell for the grid's drawer."""
+    row = spell_catalog.spell_detail(pk)
+    if row is None:
+        raise Http404("No such spell")
+    return JsonResponse(row)
+
+
+@require_GET
+@login_required
+@codex_response(catalog_stamp)
+def spell_facets(request):
+    """Origin / classification / tag values for the grid's column menus."""
+    return JsonResponse(spell_catalog.facets())
+
+
 
 
 # --------------------------- AJAX mutations -------------------------------
@@ -2944,20 +2512,6 @@ def parse_req_level(txt: str | None) -> int:
         return 0
     nums = [int(n) for n in LEVEL_NUM_RE.findall(txt)]
     return min(nums) if nums else 0
-def _unlocked_tiers(group, new_cls_level):
-    """
-    Which tiers are unlocked for this SubclassGroup at the given class-level?
-    Uses SubclassTierLevel rows. If none exist, falls back to 'all tiers ≤ class level'.
-    """
-    tiers = set(
-        group.tier_levels.filter(unlock_level__lte=new_cls_level)
-                         .values_list("tier", flat=True)
-    )
-    if tiers:
-        return tiers
-    # Fallback: allow tiers up to class level (you can pick a stricter rule if you like)
-    return set(range(1, new_cls_level + 1))
-
 def _taken_tier_by_subclass(character, group):
     """
     For each subclass in this group, what's the highest tier the character already has?
@@ -2981,72 +2535,40 @@ def _taken_tier_by_subclass(character, group):
 
 
 
-WORD_BOUNDARY = r'\b{}\b'
-
+@codex_response(catalog_stamp, shared=False)
 def feat_list(request):
-    feats = ClassFeat.objects.all()
-
+    # Filters are array overlaps on the GIN-indexed ClassFeat token columns and the
+    # facet menus come from one cached GROUP BY (see services/feat_facets.py).
     q = (request.GET.get('q') or '').strip()
-    if q:
-        feats = feats.filter(Q(name__icontains=q) | Q(tags__icontains=q))
-
     type_vals = [t.strip() for t in request.GET.getlist('type') if t.strip()]
-    if type_vals:
-        ors = [Q(feat_type__iregex=WORD_BOUNDARY.format(re.escape(t))) for t in type_vals]
-        from functools import reduce
-        feats = feats.filter(reduce(lambda a, b: a | b, ors))
-
     cls = (request.GET.get('class') or '').strip()
-    if cls:
-        feats = feats.filter(class_name__iregex=WORD_BOUNDARY.format(re.escape(cls)))
-
     rc = (request.GET.get('race') or '').strip()
-    if rc:
-        feats = feats.filter(race__iregex=WORD_BOUNDARY.format(re.escape(rc)))
 
-    feats = list(feats.order_by('name'))
+    feats = list(
+        feat_facets.filter_feats(ClassFeat.objects.all(), q=q, types=type_vals,
+                                 classes=[cls], races=[rc])
+        .order_by('name')
+    )
 
     # Provide a pre-split tag list for pills (avoids .split in template)
     for f in feats:
-        f.tag_list = [t.strip() for t in (f.tags or '').split(',') if t.strip()]
+        f.tag_list = f.tag_tokens
 
     # Also provide a plain list for the three feat-type checkboxes
     feat_type_options = ["General", "Class", "Skill"]
 
-    # (unchanged helper sets, optional for other UI pieces)
     types = sorted(set(cf.feat_type for cf in feats if cf.feat_type))
 
-    raw_feat_types = [cf.feat_type or "" for cf in feats]
-    feat_types = sorted({
-        part.strip()
-        for full in raw_feat_types
-        for part in full.split(',')
-        if part.strip()
-    })
-
-    raw_classes = [cf.class_name or "" for cf in feats]
-    class_names = sorted({
-        part.strip()
-        for full in raw_classes
-        for part in full.split(',')
-        if part.strip()
-    })
-
-    raw_races = [cf.race or "" for cf in feats]
-    race_names = sorted({
-        part.strip()
-        for full in raw_races
-        for part in full.split(',')
-        if part.strip()
-    })
-
+    facets = feat_facets.get_facets()
     return render(request, 'codex/feat_list.html', {
+        'data_url': reverse('characters:feat_data'),
         'feats': feats,
         'types': types,
-        'feat_types': feat_types,
-        'class_names': class_names,
-        'race_names': race_names,
-        'feat_type_options': feat_type_options,   # ← NEW
+        'feat_types': [label for label, _n in facets['type']],
+        'class_names': [label for label, _n in facets['class']],
+        'race_names': [label for label, _n in facets['race']],
+        'facets': facets,                          # {param: [(label, count)]}
+        'feat_type_options': feat_type_options,
         'selected_types': type_vals,
         'selected_class': cls,
         'selected_race': rc,
@@ -3136,6 +2658,7 @@ def prestige_class_detail(request, code):
 
 
 
+@codex_response(catalog_stamp, shared=False)
 def class_list(request):
     classes = (
         CharacterClass.objects
@@ -3426,6 +2949,7 @@ def subclass_group_list(request):
 
 from collections import OrderedDict
 
+@codex_response(catalog_stamp, shared=False)
 def weapon_list(request):
     trait_values_qs = WeaponTraitValue.objects.select_related("trait").order_by("trait__name")
     weapons = (
@@ -3437,6 +2961,7 @@ def weapon_list(request):
     return render(request, "codex/codex_weapons.html", {"weapons": weapons})
 
 # armor: sort by type → armor_value → name (table looks nicer this way)
+@codex_response(catalog_stamp, shared=False)
 def armor_list(request):
     armor_items = (
         Armor.objects
@@ -3449,32 +2974,41 @@ def armor_list(request):
 
 from django.db.models import Prefetch,Max
 def class_detail(request, pk):
-    cls = get_object_or_404(CharacterClass, pk=pk)
+    catalog = get_catalog()
+    cls = catalog.classes.get(pk)
+    if cls is None:
+        raise Http404("No CharacterClass matches the given query.")
 
     # ── 1) Proficiency pivot ────────────────────────────────────────────────────
-    base_profs_qs = (
-        cls.prof_progress
-           .select_related("tier")
-           .order_by("proficiency_type", "armor_group", "weapon_group", "tier__bonus")
+    def _nulls_last(v):
+        return (v is None, v or "")
+
+    base_profs = sorted(
+        catalog.prof_rows(cls.pk),
+        key=lambda p: (p.proficiency_type, _nulls_last(p.armor_group), _nulls_last(p.weapon_group), p.tier.bonus),
     )
 
     # Baseline armor / weapon profs: earliest level rows only, shown as text, not in the table
     weapon_baseline = []
     armor_baseline  = []
 
-    weapon_qs = base_profs_qs.filter(proficiency_type="weapon")
-    if weapon_qs.exists():
-        base_lvl = weapon_qs.aggregate(Min("at_level"))["at_level__min"]
-        for p in weapon_qs.filter(at_level=base_lvl):
+    weapon_rows = [p for p in base_profs if p.proficiency_type == "weapon"]
+    if weapon_rows:
+        base_lvl = min(p.at_level for p in weapon_rows)
+        for p in weapon_rows:
+            if p.at_level != base_lvl:
+                continue
             if p.weapon_group:
                 weapon_baseline.append(p.get_weapon_group_display())
             elif p.weapon_item:
                 weapon_baseline.append(p.weapon_item.name)
 
-    armor_qs = base_profs_qs.filter(proficiency_type="armor")
-    if armor_qs.exists():
-        base_lvl = armor_qs.aggregate(Min("at_level"))["at_level__min"]
-        for p in armor_qs.filter(at_level=base_lvl):
+    armor_rows = [p for p in base_profs if p.proficiency_type == "armor"]
+    if armor_rows:
+        base_lvl = min(p.at_level for p in armor_rows)
+        for p in armor_rows:
+            if p.at_level != base_lvl:
+                continue
             if p.armor_group:
                 armor_baseline.append(p.get_armor_group_display())
             elif p.armor_item:
@@ -3483,19 +3017,11 @@ def class_detail(request, pk):
     # Now build the pivot table:
     #  - include generic Armor/Weapon rows
     #  - EXCLUDE specific armor/weapon groups or items
-    profs = list(
-        base_profs_qs.filter(
-            Q(
-                proficiency_type__in=["armor", "weapon"],
-                armor_group__isnull=True,
-                armor_item__isnull=True,
-                weapon_group__isnull=True,
-                weapon_item__isnull=True,
-            )
-            |
-            ~Q(proficiency_type__in=["armor", "weapon"])
-        )
-    )
+    profs = [
+        p for p in base_profs
+        if p.proficiency_type not in ("armor", "weapon")
+        or not (p.armor_group or p.armor_item_id or p.weapon_group or p.weapon_item_id)
+    ]
 
 
     tiers = sorted({p.tier for p in profs}, key=lambda t: t.bonus) if profs else []
@@ -3593,7 +3119,7 @@ def class_detail(request, pk):
         if group.system_type == SubclassGroup.SYSTEM_MODULAR_LINEAR:
             tier_map = {
                 tl.tier: tl.unlock_level
-                for tl in group.tier_levels.all()
+                for tl in catalog.subclass_tier_levels.get(group.id, ())
             }
 
         for sub in group.subclasses.all():
@@ -3882,63 +3408,43 @@ def make_snippet(text: str, query: str, radius: int = 50) -> str:
     return mark_safe(snippet)
 
 class RulebookListView(ListView):
+    """
+    Without ?q: the rulebooks, alphabetically. With ?q: matching rulebook pages,
+    ranked, 10 per page (see services/rulebook_search.py), plus the rulebooks whose
+    name/description match on the first page.
+    """
     model               = Rulebook
     template_name       = "rulebook/list.html"
     context_object_name = "rulebooks"
     paginate_by         = 10
 
+    def get_query(self):
+        return self.request.GET.get("q", "").strip()
+
     def get_queryset(self):
-        qs = super().get_queryset()
-        q  = self.request.GET.get("q", "").strip()
+        q = self.get_query()
         if q:
-            qs = (
-                qs.filter(
-                    Q(name__icontains=q)         |
-                    Q(description__icontains=q)  |
-                    Q(pages__title__icontains=q) |
-                    Q(pages__content__icontains=q)
-                )
-                .distinct()
-            )
-        return qs.order_by("name")
+            return search_rulebook_pages(q)
+        return super().get_queryset().order_by("name")
+
+    def get_context_object_name(self, object_list):
+        return "hits" if self.get_query() else self.context_object_name
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        q = self.request.GET.get("q", "").strip()
-        results = []
+        q = self.get_query()
         if q:
-            for rb in ctx["rulebooks"]:
-                matches = []
-                # 1) rulebook.name
-                if q.lower() in rb.name.lower():
-                    matches.append({
-                        "field": "Rulebook Title",
-                        "snippet": make_snippet(rb.name, q)
-                    })
-                # 2) rulebook.description
-                if q.lower() in rb.description.lower():
-                    matches.append({
-                        "field": "Rulebook Description",
-                        "snippet": make_snippet(rb.description, q)
-                    })
-                # 3) each page
-                for page in rb.pages.all():
-                    if q.lower() in page.title.lower():
-                        matches.append({
-                            "field": f"Page Title ({page.title})",
-                            "snippet": make_snippet(page.title, q)
-                        })
-                    if q.lower() in page.content.lower():
-                        matches.append({
-                            "field": f"Page Content ({page.title})",
-                            "snippet": make_snippet(page.content, q)
-                        })
-                if matches:
-                    results.append({
-                        "rulebook": rb,
-                        "matches": matches
-                    })
-        ctx["results"] = results
+            for hit in ctx["hits"]:
+                # PostgreSQL annotated ts_headline already; otherwise cut it from the cached text
+                if getattr(hit, "snippet", None) is None:
+                    hit.snippet = make_snippet(hit.plain_text or hit.title, q)
+            matches = []
+            if ctx["page_obj"].number == 1:
+                for rb in search_rulebooks(q):
+                    field, text = (("Rulebook Title", rb.name) if q.lower() in rb.name.lower()
+                                   else ("Rulebook Description", rb.description))
+                    matches.append({"rulebook": rb, "field": field, "snippet": make_snippet(text, q)})
+            ctx["rulebook_matches"] = matches
         ctx["query"] = q
         return ctx
 import re
@@ -4001,223 +3507,30 @@ class RulebookDetailView(DetailView):
 
 
 
-from django.db import transaction
-
 @login_required
 def level_down(request, pk):
+    """
+    GET: confirmation page for taking the last level off (or every level above
+    ?to=N). POST: do it and go back to the sheet; see services.level_up.level_down.
+    """
     character = get_object_or_404(Character, pk=pk, user=request.user)
     if character.level <= 0:
         return redirect('characters:character_detail', pk=pk)
 
-    lvl = character.level
-
-    with transaction.atomic():
-        # --- Detect if this character level was a prestige level -------------
-        from django.apps import apps
-        PrestigeChoice = apps.get_model("characters", "CharacterPrestigeLevelChoice")
-
-        last_prestige = (
-            PrestigeChoice.objects
-            .filter(character=character, char_level_at_gain=lvl)
-            .order_by("-prestige_level", "-id")
-            .first()
-        )
-        is_prestige_level = last_prestige is not None
-
-        # (A) Snapshot rows for this level BEFORE deleting
-        cf_qs = (CharacterFeature.objects
-                 .filter(character=character, level=lvl)
-                 .select_related('feature', 'feature__character_class'))
-        feat_qs = CharacterFeat.objects.filter(character=character, level=lvl)
-
-
-        # Which class was actually leveled at this character level?
-        cp = None
-        if not is_prestige_level:
-            last_cls_id = (
-                cf_qs.filter(feature__character_class__isnull=False)
-                     .order_by('-id')
-                     .values_list('feature__character_class_id', flat=True)
-                     .first()
-            )
-
-            if last_cls_id:
-                cp = CharacterClassProgress.objects.filter(
-                    character=character,
-                    character_class_id=last_cls_id
-                ).first()
-            else:
-                # Fallback if we have no evidence (dirty data / L1 hiccups)
-                cp = character.class_progress.order_by('-levels', '-id').first()
-
-        # (B) Now delete everything granted at this character level
-        cf_qs.delete()
-        feat_qs.delete()
-
-        # (C) Decrement either prestige progression OR base-class progress
-        if is_prestige_level:
-            # Remove the prestige level record instead of touching base classes
-            last_prestige.delete()
-        elif cp:
-            cp.levels = models.F('levels') - 1
-            cp.save(update_fields=['levels'])
-            cp.refresh_from_db()
-            if cp.levels <= 0:
-                cp.delete()
-
-        # (D) Decrement overall character level
-        character.level = lvl - 1
-        character.save(update_fields=['level'])
-
-        # (E) Safety net: purge anything that somehow sits above new level
-        CharacterFeature.objects.filter(character=character, level__gt=character.level).delete()
-        CharacterFeat.objects.filter(character=character, level__gt=character.level).delete()
-        # (F) Skills rollback/reset
-        # 1) Remove skill-point awards that sit above the new level
-        CharacterSkillPointTx.objects.filter(
-            character=character, at_level__gt=character.level
-        ).delete()
-
-        # 2) If we hit level 0, nuke all skill state (back to fresh, level-0)
-        if character.level <= 0:
-            # These rows being absent means "Untrained" everywhere in your UI
-            CharacterSkillProficiency.objects.filter(character=character).delete()
-
-            # Clear any per-skill overrides/deltas/history so nothing lingers
-            CharacterFieldOverride.objects.filter(
-                character=character,
-                key__regex=r'^(formula:skill:|final:skill:|skill_delta:)'
-            ).delete()
-            CharacterFieldNote.objects.filter(
-                character=character,
-                key__regex=r'^(skill_prof:|skill_prof_hist:|skill_delta:|formula:skill:|final:skill:)'
-            ).delete()
-
-        else:
-            # 3) Clamp prof tiers that are illegal at the new total level
-            #    LOR rules: Trained@0, Expert@3, Master@7, Legendary@14
-            LOR_TIER_ORDER   = ["Untrained","Trained","Expert","Master","Legendary"]
-            LOR_MIN_LEVEL_FOR = {"Trained":0, "Expert":3, "Master":7, "Legendary":14}
-
-            # Build a quick name→row map (case-insensitive)
-            all_pl = { (pl.name or "").title(): pl
-                       for pl in ProficiencyLevel.objects.all() }
-
-            def _max_allowed_tier_name(lvl: int) -> str:
-                allowed = "Untrained"
-                for name in LOR_TIER_ORDER[1:]:
-                    if lvl >= LOR_MIN_LEVEL_FOR[name]:
-                        allowed = name
-                return allowed
-
-            allowed_name = _max_allowed_tier_name(character.level)
-            allowed_idx  = LOR_TIER_ORDER.index(allowed_name)
-
-            for sp in CharacterSkillProficiency.objects.select_related("proficiency").filter(character=character):
-                curr_name = (sp.proficiency.name if sp.proficiency_id else "Untrained").title()
-                curr_idx  = LOR_TIER_ORDER.index(curr_name) if curr_name in LOR_TIER_ORDER else 0
-
-                if curr_idx > allowed_idx:
-                    # Drop to the highest legal tier for the new level
-                    if allowed_name == "Untrained":
-                        # Clean slate = delete row to render as Untrained
-                        sp.delete()
-                    else:
-                        # Set to allowed tier (pick any matching row for that tier name)
-                        new_pl = all_pl.get(allowed_name)
-                        if new_pl:
-                            sp.proficiency = new_pl
-                            sp.save(update_fields=["proficiency"])
-        # (F) Skills rollback/reset
-        # 1) Remove skill-point awards/spends that sit above the new level
-        CharacterSkillPointTx.objects.filter(
-            character=character, at_level__gt=character.level
-        ).delete()
-
-        # 1b) (Optional) If you ever created SP tx exactly at this level for the
-        #     "level up" we just rolled back, also purge those issued at the
-        #     previous top level (lvl). Comment this in if that's your data model.
-        # CharacterSkillPointTx.objects.filter(
-        #     character=character, at_level=lvl
-        # ).delete()
-
-        # 2) If we hit level 0, nuke all skill state (back to fresh, level-0)
-        if character.level <= 0:
-            ...
-        else:
-            # 3) Clamp prof tiers that are illegal at the new total level
-            ...
-            # (existing tier-gate clamp code stays as-is)
-
-            # 4) Ensure the remaining SP balance is not negative after level-down.
-            #    If it is, greedily downgrade highest tiers until balance >= 0.
-
-            # ---- helpers: cost tables (upgrade costs → refunds on downgrade)
-            UPGRADE_COST = {"Untrained": 0, "Trained": 1, "Expert": 2, "Master": 4, "Legendary": 8}
-            ORDER = ["Untrained", "Trained", "Expert", "Master", "Legendary"]
-            REFUND = {  # refund gained when stepping down one tier
-                ("Legendary", "Master"): 8,
-                ("Master", "Expert"): 4,
-                ("Expert", "Trained"): 2,
-                ("Trained", "Untrained"): 1,
-            }
-
-            # ---- current SP balance after removing tx > new level
-            # NOTE: assumes CharacterSkillPointTx has signed "amount" (+awards, -spends).
-            sp_balance = (CharacterSkillPointTx.objects
-                          .filter(character=character)
-                          .aggregate(models.Sum('amount'))['amount__sum']) or 0
-
-            if sp_balance < 0:
-                # Build a mutable list of profs we can downgrade (above Untrained)
-                profs = list(
-                    CharacterSkillProficiency.objects
-                    .select_related('proficiency')
-                    .filter(character=character, proficiency__isnull=False)
-                )
+    raw_to = (request.POST.get("to") or request.GET.get("to") or "").strip()
+    to_level = int(raw_to) if raw_to.isdigit() else None
+    target = character.level - 1 if to_level is None else to_level
+    if target >= character.level:
+        return redirect('characters:character_detail', pk=pk)
 
-                # Sort by *highest* tier first so we refund big chunks early.
-                def tier_idx(pl_name: str) -> int:
-                    nm = (pl_name or "Untrained").title()
-                    return ORDER.index(nm) if nm in ORDER else 0
-
-                profs.sort(key=lambda sp: tier_idx(sp.proficiency.name), reverse=True)
-
-                # Greedily downgrade until balance >= 0 or everything is Untrained
-                notes = []
-                for sp in profs:
-                    if sp_balance >= 0:
-                        break
-
-                    curr_name = (sp.proficiency.name or "Untrained").title()
-                    curr_i = tier_idx(curr_name)
-                    while curr_i > 0 and sp_balance < 0:
-                        # step down one tier
-                        next_name = ORDER[curr_i - 1]
-                        sp_balance += REFUND[(ORDER[curr_i], next_name)]  # refund
-                        curr_i -= 1
-
-                        if curr_i == 0:
-                            # Drop row entirely to represent Untrained
-                            sp.delete()
-                            notes.append(f"{sp.skill.name if hasattr(sp, 'skill') else 'Skill'} → Untrained (auto-downgrade)")
-                            break
-                        else:
-                            # Set to the new allowed tier
-                            new_pl = ProficiencyLevel.objects.filter(name__iexact=ORDER[curr_i]).first()
-                            if new_pl:
-                                sp.proficiency = new_pl
-                                sp.save(update_fields=["proficiency"])
-                                notes.append(f"{sp.skill.name if hasattr(sp, 'skill') else 'Skill'} → {ORDER[curr_i]} (auto-downgrade)")
-
-                # Optional: store a single note explaining what happened
-                if notes:
-                    CharacterFieldNote.objects.create(
-                        character=character,
-                        key="skill_prof_hist:auto_downgrade",
-                        note=f"Auto-downgraded after level down to fit SP balance: " + "; ".join(notes)
-                    )
+    if request.method != "POST":
+        return render(request, "forge/level_down_confirm.html", {
+            "character": character,
+            "to_level": target,
+            "levels_removed": range(character.level, target, -1),
+        })
 
+    rollback_levels(character, to_level)
     return redirect('characters:character_detail', pk=pk)
 
 class RulebookPageDetailView(DetailView):
@@ -4641,10 +3954,6 @@ def propose_background_inline(request):
     pb = form.save(requested_by=request.user)
     messages.success(request, f"Background '{pb.name}' submitted to {pb.campaign.name} for GM approval.")
     return redirect("characters:create_character")
-def _best_tier_obj(tiers):
-    tiers = [t for t in tiers if t]
-    return max(tiers, key=lambda t: int(getattr(t, "bonus", 0) or 0), default=None)
-
 def _effective_class_prof_for_item(character, prof_type, *, armor_group=None, armor_item_id=None,
                                    weapon_group=None, weapon_item_id=None):
     """
@@ -4653,61 +3962,11 @@ def _effective_class_prof_for_item(character, prof_type, *, armor_group=None, ar
       B) proficiency_type="weapon:martial"
     Always returns a dict (never None).
     """
-    def _norm(s):
-        return (str(s or "").strip().lower()
-                .replace(" ", "_").replace("-", "_"))
-
-    rows = []
-    for cp in character.class_progress.select_related("character_class").all():
-        base_q = ClassProficiencyProgress.objects.filter(
-            character_class=cp.character_class,
-            at_level__lte=int(cp.levels or 0),
-        ).select_related("tier")
-
-        if prof_type == "weapon":
-            # include both base “weapon” and namespaced “weapon:<group>”
-            namespaced = f"weapon:{_norm(weapon_group)}" if weapon_group else None
-            if namespaced:
-                base_q = base_q.filter(proficiency_type__in=["weapon", namespaced])
-            else:
-                base_q = base_q.filter(proficiency_type__startswith="weapon")
-        else:
-            base_q = base_q.filter(proficiency_type=prof_type)
-
-        rows.extend(base_q)
-
-    # strongest: specific item
-    item_rows = []
-    if prof_type == "armor" and armor_item_id:
-        item_rows = [r for r in rows if getattr(r, "armor_item_id", None) == armor_item_id]
-    elif prof_type == "weapon" and weapon_item_id:
-        item_rows = [r for r in rows if getattr(r, "weapon_item_id", None) == weapon_item_id]
-
-    best = None
-    if item_rows:
-        best = _best_tier_obj([r.tier for r in item_rows])
-    else:
-        grp_rows = []
-        if prof_type == "armor" and armor_group:
-            g = _norm(armor_group)
-            grp_rows = [r for r in rows if _norm(getattr(r, "armor_group", None)) == g]
-        if prof_type == "weapon" and weapon_group:
-            g = _norm(weapon_group)
-            def _matches(r):
-                # namespaced type e.g. "weapon:martial"
-                t = _norm(getattr(r, "proficiency_type", ""))
-                if t.startswith("weapon:"):
-                    return t.split(":", 1)[1] == g
-                # legacy: "weapon" + separate group column
-                return t == "weapon" and _norm(getattr(r, "weapon_group", None)) == g
-            grp_rows = [r for r in rows if _matches(r)]
-        best = _best_tier_obj([r.tier for r in grp_rows])
-
-    name     = (best.name if best and getattr(best, "name", None) else "Untrained")
-    bonus    = int(getattr(best, "bonus", 0) or 0)
-    is_prof  = (name.strip().lower() != "untrained") and (bonus != 0)
-
-    return {"tier": best, "bonus": bonus, "name": name, "is_proficient": is_prof}
+    return character.proficiency_resolver.for_item(
+        character.pk, prof_type,
+        armor_group=armor_group, armor_item_id=armor_item_id,
+        weapon_group=weapon_group, weapon_item_id=weapon_item_id,
+    )
 
 def _armor_group_for(armor_obj):
     # Your Armor model uses .type (you already sort by it elsewhere)
@@ -4731,6 +3990,7 @@ def _build_spell_tab(request, owned_feature_ids, character, class_progress, can_
     Returns:
         (spellcasting_blocks, spell_selection_blocks, post_redirect_or_none)
     """
+    catalog = get_catalog()
 
     _OVERCAST_STEP_RE = re.compile(r'(?P<start>\d+)\s*\(\s*\+\s*(?P<step>\d+)\s*\)')
 
@@ -4789,8 +4049,6 @@ def _build_spell_tab(request, owned_feature_ids, character, class_progress, can_
             )
 
             for ft_ in tables_:
-                row_ = ft_.spell_slot_rows.filter(level=cp_.levels).first()
-
                 # context for formula eval (mirrors code below)
                 def _abil(v): return (v - 10) // 2
                 ctx_ = {}
@@ -4812,16 +4070,16 @@ def _build_spell_tab(request, owned_feature_ids, character, class_progress, can_
                     "floor": math.floor, "min": min, "max": max, "int": int, "round": round,
                 })
                 def _eval_(expr: str):
-                    if not expr:
-                        return None
-                    try:
-                        return int(eval(_normalize_formula(expr), {"__builtins__": {}}, ctx_))
-                    except Exception:
-                        return None
+                    return evaluate_int(expr, ctx_, None)
 
-                can_max = _eval_(getattr(ft_, "cantrips_formula", None)) or 0
-                kn_max  = _eval_(getattr(ft_, "spells_known_formula", None))
-                pr_max  = _eval_(getattr(ft_, "spells_prepared_formula", None))
+                caps_ = evaluate_many({
+                    "cantrips": getattr(ft_, "cantrips_formula", None),
+                    "known":    getattr(ft_, "spells_known_formula", None),
+                    "prepared": getattr(ft_, "spells_prepared_formula", None),
+                }, ctx_, None)
+                can_max = caps_["cantrips"] or 0
+                kn_max  = caps_["known"]
+                pr_max  = caps_["prepared"]
 
                 # formula overrides
                 def _ov_expr_(key):
@@ -4921,15 +4179,14 @@ def _build_spell_tab(request, owned_feature_ids, character, class_progress, can_
         best_vec = None
         best_r = 0
         for ft in spell_tables_by_class.get(highest_prepared_id, []):
-            row = ft.spell_slot_rows.filter(level=primary_considered).first() or \
-                ft.spell_slot_rows.filter(level=highest_prepared_level).first()
-            if not row:
+            vec = catalog.slots_exact(ft.id, primary_considered) or \
+                catalog.slots_exact(ft.id, highest_prepared_level)
+            if not vec:
                 continue
-            vec = [row.slot1,row.slot2,row.slot3,row.slot4,row.slot5,row.slot6,row.slot7,row.slot8,row.slot9,row.slot10]
-            r = max((i+1 for i, s in enumerate(vec) if (s or 0) > 0), default=0)
+            r = highest_rank(vec)
             if r > best_r:
                 best_r = r
-                best_vec = [int(s or 0) for s in vec[:r]]
+                best_vec = list(vec[:r])
         if best_vec:
             prepared_primary_slots = {i+1: v for i, v in enumerate(best_vec)}
         for tok in origin_tokens_by_class.get(highest_prepared_id, set()):
@@ -4942,12 +4199,11 @@ def _build_spell_tab(request, owned_feature_ids, character, class_progress, can_
             considered = int(eff_levels.get(cid, 0)) + (highest_prepared_level // 2)
             cap_r = 0
             for ft in spell_tables_by_class.get(cid, []):
-                row = ft.spell_slot_rows.filter(level=considered).first() or \
-                    ft.spell_slot_rows.filter(level=int(eff_levels.get(cid, 0))).first()
-                if not row:
+                vec = catalog.slots_exact(ft.id, considered) or \
+                    catalog.slots_exact(ft.id, int(eff_levels.get(cid, 0)))
+                if not vec:
                     continue
-                vec = [row.slot1,row.slot2,row.slot3,row.slot4,row.slot5,row.slot6,row.slot7,row.slot8,row.slot9,row.slot10]
-                cap_r = max(cap_r, max((i+1 for i, s in enumerate(vec) if (s or 0) > 0), default=0))
+                cap_r = max(cap_r, highest_rank(vec))
             for tok in origin_tokens_by_class.get(cid, set()):
                 prepared_caps_by_token[tok] = max(prepared_caps_by_token.get(tok, 0), cap_r)
 
@@ -5001,7 +4257,7 @@ def _build_spell_tab(request, owned_feature_ids, character, class_progress, can_
             return out
         # --- COLLECT per-feature pieces into by_origin ---
         for ft in owned_tables:
-            row = ft.spell_slot_rows.filter(level=cp.levels).first()
+            slots_vec = list(catalog.slots_exact(ft.id, cp.levels) or ())
 
             # safe eval helpers / context (unchanged)
             def _abil(score: int) -> int: return (score - 10) // 2
@@ -5025,21 +4281,11 @@ def _build_spell_tab(request, owned_feature_ids, character, class_progress, can_
                 "floor": math.floor, "min": min, "max": max, "int": int, "round": round,
             })
             def _eval(expr: str):
-                if not expr:
-                    return None
-                try:
-                    expr = _normalize_formula(expr)
-                    return int(eval(expr, {"__builtins__": {}}, ctx))
-                except Exception:
-                    return None
+                return evaluate_int(expr, ctx, None)
 
             # per-feature slots vector + max rank
             # per-feature slots vector + max rank
-            slots_vec = []
-            if row:
-                slots_vec = [row.slot1,row.slot2,row.slot3,row.slot4,row.slot5,
-                             row.slot6,row.slot7,row.slot8,row.slot9,row.slot10]
-            max_rank_from_slots = max((i+1 for i, s in enumerate(slots_vec) if (s or 0) > 0), default=0)
+            max_rank_from_slots = highest_rank(slots_vec)
 
             # 🔹 NEW: push a DISPLAY block for THIS feature's slot table
             origin_label = (getattr(ft, "get_spell_list_display", lambda: None)() or ft.spell_list or "").strip()
@@ -5057,9 +4303,14 @@ def _build_spell_tab(request, owned_feature_ids, character, class_progress, can_
             })
 
             # --- evaluate caps for THIS feature (formulas → formula overrides → numeric overrides) ---
-            cantrips_max  = _eval(getattr(ft, "cantrips_formula", None)) or 0
-            known_max     = _eval(getattr(ft, "spells_known_formula", None))
-            prepared_max  = _eval(getattr(ft, "spells_prepared_formula", None))
+            caps = evaluate_many({
+                "cantrips": getattr(ft, "cantrips_formula", None),
+                "known":    getattr(ft, "spells_known_formula", None),
+                "prepared": getattr(ft, "spells_prepared_formula", None),
+            }, ctx, None)
+            cantrips_max  = caps["cantrips"] or 0
+            known_max     = caps["known"]
+            prepared_max  = caps["prepared"]
 
             def _ov_expr(key):
                 rowx = CharacterFieldOverride.objects.filter(character=character, key=key).first()
@@ -5677,12 +4928,7 @@ def _abil_mod(score: int) -> int:
 
 def _safe_eval_int(expr: str, ctx: dict) -> int:
     """Evaluate a tiny arithmetic formula to an int; return 0 on any error."""
-    if not expr:
-        return 0
-    try:
-        return int(eval(str(expr), {"__builtins__": {}}, dict(ctx)))
-    except Exception:
-        return 0
+    return evaluate_int(expr, ctx, 0)
 
 def _class_level_tokens(character) -> dict:
     """
@@ -6118,13 +5364,7 @@ def build_martial_mastery_context(character, class_progress) -> Dict[str, Any]:
             return e
 
         def _eval(expr: str):
-            if not expr:
-                return 0
-            try:
-                expr = _normalize_formula(expr)
-                return int(eval(expr, {"__builtins__": {}}, ctx))
-            except Exception:
-                return 0
+            return evaluate_int(_normalize_formula(expr), ctx, 0)
 
         pf = (getattr(f, "martial_points_formula", "") or "").strip()
         kf = (getattr(f, "available_masteries_formula", "") or "").strip()
@@ -6220,11 +5460,9 @@ def build_martial_mastery_context(character, class_progress) -> Dict[str, Any]:
     show_tab = (active_mm_features > 0 and (tot_points > 0 or tot_known > 0))
     # 2) What is already known?
     # Always resolve to MartialMastery rows
-    known_qs = (
-        MartialMastery.objects
-        .filter(id__in=character.martial_masteries.values_list("mastery_id", flat=True))
-        .prefetch_related("classes", "allowed_weapons", "allowed_traits")
-    )
+    catalog = get_catalog()
+    known_mastery_ids = set(character.martial_masteries.values_list("mastery_id", flat=True))
+    known_qs = [mm for mid, mm in catalog.martial_masteries.items() if mid in known_mastery_ids]
 
 
     known_rows = []
@@ -6276,30 +5514,20 @@ def build_martial_mastery_context(character, class_progress) -> Dict[str, Any]:
 
 
 
-    pool = (
-        MartialMastery.objects
-        .exclude(id__in=known_ids)
-        .prefetch_related("classes", "allowed_weapons", "allowed_traits")
-    )
-
-    # Filter by required level in SQL if the field exists
-    try:
-        # allow NULL/0 meaning "no level requirement"
-        pool = pool.filter(Q(level_required__isnull=True) | Q(level_required__lte=total_level))
-    except Exception:
-        # if your model doesn't have level_required, keep pool unfiltered and we’ll gate in Python below
-        pass
-
-    # Filter by class restriction in SQL:
-    # - if mastery has no classes linked => allowed for all (classes__isnull=True)
+    # Filter the cached catalog:
+    # - level_required NULL/0 means "no level requirement"
+    # - if mastery has no classes linked => allowed for all
     # - else it must match one of the character's classes
-    try:
-        if char_class_ids:
-            pool = pool.filter(Q(classes__isnull=True) | Q(classes__id__in=char_class_ids)).distinct()
-        else:
-            pool = pool.filter(classes__isnull=True).distinct()
-    except Exception:
-        pass
+    pool = []
+    for mm in catalog.martial_masteries.values():
+        if mm.id in known_ids:
+            continue
+        if mm.level_required and mm.level_required > total_level:
+            continue
+        mm_class_ids = {c.id for c in mm.classes.all()}
+        if mm_class_ids and not (mm_class_ids & char_class_ids):
+            continue
+        pool.append(mm)
 
     available_rows = []
     for mm in pool:
@@ -6529,6 +5757,90 @@ class AdvanceForm(forms.Form):
                 "level_row": sel_pc.levels.filter(level=nxt).first(),
             }
 
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+
+# ── Lazy sheet tabs ─────────────────────────────────────────────────────────────
+# Tabs listed here are left empty in the first character_detail response and
+# fetched from character_tab when the user opens them. The other registered
+# tabs still render inline (their data feeds other parts of the sheet), but
+# can be re-fetched on their own after an AJAX action.
+LAZY_SHEET_TABS = ("inventory", "notes")
+
+
+def _lazy_tabs_for(request) -> set[str]:
+    # ?tab=<name> (or a non-GET request) asks for that tab inline, e.g. no-JS fallbacks
+    if request.method != "GET" or request.GET.get("tabs") == "all":
+        return set()
+    return set(LAZY_SHEET_TABS) - {(request.GET.get("tab") or "").strip()}
+
+
+def _notes_context(character):
+    note_categories = NoteCategory.objects.filter(character=character).order_by("name")
+    notes_qs = (
+        CharacterNote.objects.filter(character=character)
+        .select_related("category")
+        .order_by("category__name", "-created_at", "title")
+    )
+    notes_by_category = {}
+    for n in notes_qs:
+        notes_by_category.setdefault(n.category_id, []).append(n)
+    return {"note_categories": note_categories, "notes_by_category": notes_by_category}
+
+
+def _spellcasting_tab_context(request, character, can_edit):
+    class_progress = character.class_progress.select_related("character_class")
+    owned_feature_ids = set(
+        CharacterFeature.objects.filter(character=character).values_list("feature_id", flat=True)
+    )
+    spellcasting_blocks, spell_selection_blocks, _ = _build_spell_tab(
+        request, owned_feature_ids, character, class_progress, can_edit, pk=character.pk
+    )
+    # same cantrip back-fill character_detail applies before rendering
+    totals = _formula_totals(character)
+    for b in spellcasting_blocks:
+        origin_key = (b.get("list") or b.get("origin") or "").lower()
+        fill = totals.get(origin_key, {}).get("cantrips_known")
+        if fill is not None and int(b.get("cantrips", 0) or 0) == 0:
+            b["cantrips"] = int(fill)
+    return {"spellcasting_blocks": spellcasting_blocks, "spell_selection_blocks": spell_selection_blocks}
+
+
+SHEET_TABS = {
+    "inventory": ("forge/tabs/_inventory.html",
+                  lambda request, character, can_edit: _inventory_context(character)),
+    "notes": ("forge/tabs/_notes.html",
+              lambda request, character, can_edit: _notes_context(character)),
+    "martial-mastery": ("forge/tabs/_martial_mastery.html",
+                        lambda request, character, can_edit: build_martial_mastery_context(
+                            character, character.class_progress.select_related("character_class"))),
+    "spellcasting": ("forge/tabs/_spellcasting.html", _spellcasting_tab_context),
+}
+
+
+@login_required
+@require_GET
+def character_tab(request, pk, name):
+    """
+    One sheet tab as an HTML fragment: JSON {"ok", "tab", "html"} for AJAX,
+    the bare fragment otherwise.
+    """
+    character, can_edit, denied = _load_character_and_perms(request, pk)
+    if denied:
+        return denied
+    try:
+        template_name, build = SHEET_TABS[name]
+    except KeyError:
+        raise Http404("Unknown tab")
+
+    ctx = {"character": character, "can_edit": can_edit}
+    ctx.update(build(request, character, can_edit))
+    html = render_to_string(template_name, ctx, request=request)
+    if _is_ajax(request):
+        return JsonResponse({"ok": True, "tab": name, "html": html})
+    return HttpResponse(html)
+
+
 @login_required
 def character_detail(request, pk):
     # ── 1) Load character & basic sheet context ─────────────────────────────
@@ -6540,6 +5852,9 @@ def character_detail(request, pk):
     if request.method == "POST" and "level_up_submit" in request.POST:
         return character_level_up(request, pk)
 
+    # Tabs the first response leaves empty; the browser pulls them from character_tab on click.
+    lazy_tabs = _lazy_tabs_for(request)
+
     # NEW: users you can add (site-registered)
     U = get_user_model()
     existing_ids = set(character.viewers.values_list("user_id", flat=True)) | {character.user_id}
@@ -6705,61 +6020,6 @@ def character_detail(request, pk):
                         continue
                 return val
         return default
-    def _effective_spell_slots_by_rank(character, class_progress):
-        """
-        Sum spell slots by rank using EFFECTIVE class levels,
-        but only for spell_table features the character actually owns.
-        """
-        from collections import defaultdict
-
-        totals = defaultdict(int)
-        eff_levels, _classes_by_id = _effective_class_levels(character, class_progress)
-
-        owned_rows = (
-            CharacterFeature.objects
-            .filter(character=character, feature__kind="spell_table")
-            .select_related("feature", "feature__character_class", "subclass")
-            .prefetch_related("feature__subclasses", "feature__spell_slot_rows")
-        )
-
-        seen = set()
-
-        for cf in owned_rows:
-            ft = cf.feature
-            cls = ft.character_class
-            if not cls:
-                continue
-
-            eff_lvl = int(eff_levels.get(int(cls.id), 0) or 0)
-            if eff_lvl <= 0:
-                continue
-
-            allowed_sub_ids = set(ft.subclasses.values_list("id", flat=True))
-            if allowed_sub_ids and cf.subclass_id not in allowed_sub_ids:
-                continue
-
-            key = (ft.id, cf.subclass_id)
-            if key in seen:
-                continue
-            seen.add(key)
-
-            row = ft.spell_slot_rows.filter(level=eff_lvl).first()
-            if not row:
-                continue
-
-            vec = [
-                row.slot1, row.slot2, row.slot3, row.slot4, row.slot5,
-                row.slot6, row.slot7, row.slot8, row.slot9, row.slot10,
-            ]
-            for r, n in enumerate(vec, start=1):
-                if n:
-                    totals[r] += int(n or 0)
-
-        return dict(totals)
-
-
-
-
     def _traits_list(obj):
         # tries several likely relations; silently ignores if missing
         names = set()
@@ -7288,10 +6548,10 @@ def character_detail(request, pk):
                     "floor": math.floor, "ceil": math.ceil, "min": min, "max": max, "int": int, "round": round,
                 }
                 if s[:1] in {"+", "-"}:
-                    adj = int(eval(_normalize_formula(s), {"__builtins__": {}}, ctx))
+                    adj = int(evaluate(s, ctx))
                     score = int(base) + adj
                 else:
-                    score = int(eval(_normalize_formula(s), {"__builtins__": {}}, ctx))
+                    score = int(evaluate(s, ctx))
             except Exception:
                 # ignore bad formula; keep system value
                 pass
@@ -7331,6 +6591,8 @@ def character_detail(request, pk):
     CharacterClass = apps.get_model("characters", "CharacterClass")
 
     class_progress  = character.class_progress.select_related('character_class')
+    # Materialized derived numbers (HP max, profs, slots…); rebuilt only when stale.
+    sheet_values    = get_sheet_snapshot(character)
     racial_features = character.race.features.all() if character.race else []
 
     universal_feats = UniversalLevelFeature.objects.filter(level=character.level)
@@ -7383,7 +6645,12 @@ def character_detail(request, pk):
 
     if show_starting_skill_picker:
         # compute cap for the PREVIEWED class (GET)
-        starting_skill_max = _starting_skills_cap_for(character, preview_cls, class_progress)
+        class_levels = dict(character.class_progress.values_list('character_class__name', 'levels'))
+        class_levels[preview_cls.name] = cls_level_after
+        try:
+            starting_skill_max = _starting_skills_cap_for(character, preview_cls, class_levels) or 0
+        except FormulaError:
+            starting_skill_max = 0
 
 
         ct_skill = ContentType.objects.get_for_model(Skill)
@@ -7696,9 +6963,8 @@ def character_detail(request, pk):
 
     for f in auto_feats:
         if getattr(f, "kind", "") == "spell_table":
-            row = f.spell_slot_rows.filter(level=cls_level_after).first()
-            # attach so the template can render it
-            f.spell_row_next = row
+            # attach so the template can render it (shared catalog row; read-only)
+            f.spell_row_next = get_catalog().slot_row(f.id, cls_level_after)
     # universal‐level trigger (combine all rows for that level)
     uni_qs = UniversalLevelFeature.objects.filter(level=next_level)
     uni = uni_qs.first()
@@ -7723,7 +6989,7 @@ def character_detail(request, pk):
             updates[r] = n
 
         # NEW: totals based on EFFECTIVE (counts-as) levels
-        sum_slots_by_rank_current = _effective_spell_slots_by_rank(character, class_progress)
+        sum_slots_by_rank_current = snapshot_slots_by_rank(sheet_values)
 
         for r, n in updates.items():
             total_slots = int(sum_slots_by_rank_current.get(r, 0) or 0)
@@ -7741,10 +7007,9 @@ def character_detail(request, pk):
         return redirect('characters:character_detail', pk=pk)
 
     # ── 3) PROFICIENCY TABLE FOR preview_cls ────────────────────────────────
-    profs = list(
-        preview_cls.prof_progress
-                   .select_related('tier')
-                   .order_by('proficiency_type','tier__bonus')
+    profs = sorted(
+        get_catalog().prof_rows(preview_cls.id),
+        key=lambda p: (p.proficiency_type, p.tier.bonus),
     )
     tiers      = sorted({p.tier for p in profs}, key=lambda t: t.bonus)
     tier_names = [t.name for t in tiers]
@@ -7849,7 +7114,7 @@ def character_detail(request, pk):
                 messages.error(request, "Reason is required for a speed adjustment.")
                 return redirect('characters:character_detail', pk=pk)
             try:
-                delta = int(eval(_normalize_formula(delta_s), {"__builtins__": {}}, {}))
+                delta = int(evaluate(delta_s, {}))
             except Exception:
                 messages.error(request, "Adjustment must be a whole number (e.g., -5, +10).")
                 return redirect('characters:character_detail', pk=pk)
@@ -7975,7 +7240,7 @@ def character_detail(request, pk):
                 messages.error(request, "Reason is required.")
                 return redirect('characters:character_detail', pk=pk)
             try:
-                delta = int(eval(delta_s, {"__builtins__": {}}, {}))
+                delta = int(evaluate(delta_s, {}))
             except Exception:
                 messages.error(request, "Adjustment must be a whole number (e.g., -1, 0, +2).")
                 return redirect('characters:character_detail', pk=pk)
@@ -8690,100 +7955,6 @@ def character_detail(request, pk):
         if isinstance(f, ClassFeature) and f.scope == 'gain_subclass_feat'
     ]
 
-    def _active_subclass_for_group(character, grp, level_form=None, base_feats=None):
-        """
-        Returns the chosen Subclass for `grp` using (in order):
-        1) the POSTed choice this request (if present),
-        2) the last saved 'subclass_choice' CharacterFeature,
-        3) the last saved 'subclass_feat' (infers subclass),
-        4) an explicit override 'subclass_choice:<grp.id>' if you use that,
-        else None.
-        """
-        # 0) if this request posts a subclass choice field, use it
-        if level_form is not None and getattr(level_form, "is_bound", False):
-            base_feats = list(base_feats or [])
-            sc_choices = [
-                f for f in base_feats
-                if isinstance(f, ClassFeature)
-                and getattr(f, "scope", "") == "subclass_choice"
-                and getattr(f, "subclass_group_id", None) == grp.id
-            ]
-            for f in sc_choices:
-                key = f"feat_{f.pk}_subclass"
-                raw = (level_form.data.get(key) or "").strip()
-                if raw.isdigit():
-                    try:
-                        return grp.subclasses.get(pk=int(raw))
-                    except grp.subclasses.model.DoesNotExist:
-                        pass
-
-        # 1) last explicitly saved subclass choice
-        row = (CharacterFeature.objects
-            .filter(character=character,
-                    feature__scope="subclass_choice",
-                    feature__subclass_group=grp)
-            .exclude(subclass__isnull=True)
-            .order_by("-level", "-id")
-            .first())
-        if row and row.subclass_id:
-            return row.subclass
-
-        # 2) infer from owned subclass features
-        row = (CharacterFeature.objects
-            .filter(character=character,
-                    feature__scope="subclass_feat",
-                    feature__subclass_group=grp)
-            .exclude(subclass__isnull=True)
-            .order_by("-level", "-id")
-            .first())
-        if row and row.subclass_id:
-            return row.subclass
-
-        # 3) optional manual override
-        ov = CharacterFieldOverride.objects.filter(character=character, key=f"subclass_choice:{grp.id}").first()
-        if ov and str(ov.value).strip().isdigit():
-            try:
-                return grp.subclasses.get(pk=int(ov.value))
-            except grp.subclasses.model.DoesNotExist:
-                pass
-
-        return None
-    def _linear_feats_for_level(cls_obj, grp, subclass, cls_level, base_feats=None):
-
-        if not subclass:
-            return []
-
-        feats = []
-        for f in (base_feats or []):
-            if (getattr(f, "scope", "") == "subclass_feat"
-                and getattr(f, "subclass_group_id", None) == grp.id
-                and (subclass in f.subclasses.all())):
-                lr = getattr(f, "level_required", None)
-                ml = getattr(f, "min_level", None)
-                if (ml is None or int(ml) <= int(cls_level)) and (lr is None or int(lr) <= int(cls_level)):
-                    feats.append(f)
-
-        if feats:
-            return feats
-
-        # Fallback: only when nothing is attached to this level (avoid leaking ungated L1 features)
-        return list(
-            ClassFeature.objects
-                .filter(scope="subclass_feat", subclasses=subclass)
-                .filter(
-                    Q(subclass_group=grp) |              # if ClassFeature has FK subclass_group
-                    Q(subclasses__group=grp)             # if we must hop via Subclass.group
-                )
-                .filter(
-                    Q(level_required=cls_level) |
-                    Q(level_required__isnull=True, min_level__lte=cls_level)
-                )
-                .exclude(level_required__isnull=True, min_level__isnull=True)
-        )
-
-
-
-
     for trigger in gain_sub_feat_triggers:
         grp = trigger.subclass_group
         if not grp:
@@ -9592,7 +8763,7 @@ def character_detail(request, pk):
 
 
     # Base profs from your resolver
-    prof_by_code = {r["type_code"]: r for r in _current_proficiencies_for_character(character)}
+    prof_by_code = snapshot_prof_rows_by_code(sheet_values)
     # --- Ensure a DODGE proficiency row exists and backfill from class progress ---
     if "dodge" not in prof_by_code:
         prof_by_code["dodge"] = {
@@ -9613,7 +8784,7 @@ def character_detail(request, pk):
             CharacterClass = apps.get_model("characters", "CharacterClass")
             cls = CharacterClass.objects.get(pk=class_id)
 
-        for p in cls.prof_progress.select_related('tier'):
+        for p in get_catalog().prof_rows(cls.id):
             if int(getattr(p, "at_level", 0) or 0) > int(lvl):
                 continue
             raw = getattr(p, "type_code", None) or getattr(p, "proficiency_type", None) or ""
@@ -9685,7 +8856,7 @@ def character_detail(request, pk):
         eq_level  = int(base_lvl + (other_sum // 2))  # floor
 
         # Map equalised level onto the BASE CLASS's DC progression
-        prog = [p for p in base_cls.prof_progress.select_related("tier").all()
+        prog = [p for p in get_catalog().prof_rows(base_cls.id)
                 if (str(getattr(p, "type_code", "") or getattr(p, "proficiency_type", "")).lower() == "dc")]
         tier = None
         for p in prog:
@@ -9754,7 +8925,7 @@ def character_detail(request, pk):
     for cp in class_progress:  # character.class_progress already loaded
         cls = cp.character_class
         lvl = int(cp.levels or 0)
-        for p in cls.prof_progress.select_related("tier"):
+        for p in get_catalog().prof_rows(cls.id):
             if int(getattr(p, "at_level", 0)) > lvl:
                 continue
             # Handle either a 'type_code' field or a choices field named 'proficiency_type'
@@ -10018,7 +9189,7 @@ def character_detail(request, pk):
     prof_weapon     = prof_by_code.get("weapon",    {"modifier": 0})["modifier"]
 
     # HP / Temp HP
-    hp_max_calc = _character_hp_max(character, class_progress)
+    hp_max_calc = int(sheet_values["hp_max"])
 
     def _int_or_zero(v):
         try:
@@ -10220,7 +9391,7 @@ def character_detail(request, pk):
         try:
             expr = _formula_override(f"prof:{code}")
             if expr:
-                total_calc = int(eval(expr, {"__builtins__": {}}, ctx))
+                total_calc = int(evaluate(expr, ctx))
                 used_formula = expr
         except Exception:
             pass
@@ -10678,11 +9849,11 @@ def character_detail(request, pk):
                 n = _note_for(f"formula:{key1}")
                 try:
                     if s[0:1] in {"+", "-"}:
-                        adj = int(eval(_normalize_formula(s), {"__builtins__": {}}, ctx))
+                        adj = int(evaluate(s, ctx))
                         row["total1"] = sys1 + adj
                         row["formula1"] = f"{row['formula1']} {s}{f' ({n})' if n else ''}"
                     else:
-                        val = int(eval(_normalize_formula(s), {"__builtins__": {}}, ctx))
+                        val = int(evaluate(s, ctx))
                         row["total1"] = val
                         row["formula1"] = f"{s}{f' ({n})' if n else ''}"
                 except Exception:
@@ -10703,11 +9874,11 @@ def character_detail(request, pk):
                     n = _note_for(f"formula:{key2}")
                     try:
                         if s[0:1] in {"+", "-"}:
-                            adj = int(eval(_normalize_formula(s), {"__builtins__": {}}, ctx))
+                            adj = int(evaluate(s, ctx))
                             row["total2"] = (sys2 or 0) + adj
                             row["formula2"] = f"{row['formula2']} {s}{f' ({n})' if n else ''}"
                         else:
-                            val = int(eval(_normalize_formula(s), {"__builtins__": {}}, ctx))
+                            val = int(evaluate(s, ctx))
                             row["total2"] = val
                             row["formula2"] = f"{s}{f' ({n})' if n else ''}"
                     except Exception:
@@ -11994,7 +11165,7 @@ def character_detail(request, pk):
     # Your model shows something like Class.prof_progress with fields:
     #   proficiency_type, tier, at_level
     # We assume weapon groups are encoded as type_code like "weapon:simple" etc.
-    for p in preview_cls.prof_progress.select_related("tier"):
+    for p in get_catalog().prof_rows(preview_cls.id):
         tcode = (getattr(p, "proficiency_type", "") or getattr(p, "type_code", "") or "").lower()
         if not tcode.startswith("weapon:"):
             continue
@@ -12467,16 +11638,10 @@ def character_detail(request, pk):
             messages.success(request, "Note moved.")
             return redirect("characters:character_detail", pk=pk)
 
-    # Build Notes context for GET (and after POST redirects)
-    note_categories = NoteCategory.objects.filter(character=character).order_by("name")
-    notes_qs = (
-        CharacterNote.objects.filter(character=character)
-        .select_related("category")
-        .order_by("category__name", "-created_at", "title")
-    )
-    notes_by_category = {}
-    for n in notes_qs:
-        notes_by_category.setdefault(n.category_id, []).append(n)
+    # Build Notes context for GET (and after POST redirects); lazy tabs fetch it later.
+    notes_ctx = {} if "notes" in lazy_tabs else _notes_context(character)
+    note_categories = notes_ctx.get("note_categories")
+    notes_by_category = notes_ctx.get("notes_by_category")
 
 
     current_level = total_level or 0
@@ -12548,7 +11713,7 @@ def character_detail(request, pk):
 
             # Make spell tables behave like base classes in preview
             if getattr(cf, "kind", "") == "spell_table":
-                cf.spell_row_next = cf.spell_slot_rows.filter(level=next_char_level).first()
+                cf.spell_row_next = get_catalog().slot_row(cf.id, next_char_level)
 
             prestige_feats.append(cf)
 
@@ -12792,7 +11957,7 @@ def character_detail(request, pk):
         )
 
 
-    inventory_ctx = _inventory_context(character)
+    inventory_ctx = {} if "inventory" in lazy_tabs else _inventory_context(character)
 
 
     # Build rows for “Manually Added Feats”
@@ -12925,6 +12090,7 @@ def character_detail(request, pk):
         'share_invites': active_invites,
         'shared_viewers': shared_viewers,
         'track': track,
+        'lazy_tabs': lazy_tabs,
         'class_summary': class_summary,
         'prestige_summary': prestige_summary,
         "crit_threshold_calc": crit_threshold_calc,
@@ -13063,14 +12229,58 @@ def character_detail(request, pk):
         "roll_mod_data_json": roll_mod_data_json,
     })
 
+def _owned_spell_slots_by_rank(character, class_progress):
+    """
+    Sum spell slots by rank using EFFECTIVE class levels,
+    but only for spell_table features the character actually owns.
+    """
+    from collections import defaultdict
+
+    totals = defaultdict(int)
+    eff_levels, _classes_by_id = _effective_class_levels(character, class_progress)
+    catalog = get_catalog()
+
+    owned_rows = (
+        CharacterFeature.objects
+        .filter(character=character, feature__kind="spell_table")
+        .select_related("feature", "feature__character_class", "subclass")
+        .prefetch_related("feature__subclasses")
+    )
+
+    seen = set()
+
+    for cf in owned_rows:
+        ft = cf.feature
+        cls = ft.character_class
+        if not cls:
+            continue
+
+        eff_lvl = int(eff_levels.get(int(cls.id), 0) or 0)
+        if eff_lvl <= 0:
+            continue
+
+        allowed_sub_ids = {s.id for s in ft.subclasses.all()}
+        if allowed_sub_ids and cf.subclass_id not in allowed_sub_ids:
+            continue
+
+        key = (ft.id, cf.subclass_id)
+        if key in seen:
+            continue
+        seen.add(key)
+
+        add_slots(totals, catalog.slots(ft.id, eff_lvl))
+
+    return dict(totals)
+
+
 def _effective_spell_slots_by_rank(character, class_progress):
     """
     Sum spell slots by rank using EFFECTIVE (counts-as) class levels.
     Returns {rank: total_slots}.
     """
     from collections import defaultdict
-    ClassFeature = apps.get_model("characters", "ClassFeature")
 
+    catalog = get_catalog()
     totals = defaultdict(int)
     eff_levels, classes_by_id = _effective_class_levels(character, class_progress)
 
@@ -13082,17 +12292,9 @@ def _effective_spell_slots_by_rank(character, class_progress):
             continue
 
         # All spell-table features for this class, at the *effective* level
-        for ft in ClassFeature.objects.filter(kind="spell_table", character_class=cls).distinct():
-            row = ft.spell_slot_rows.filter(level=int(eff_lvl)).first()
-            if not row:
-                continue
-            vec = [
-                row.slot1, row.slot2, row.slot3, row.slot4, row.slot5,
-                row.slot6, row.slot7, row.slot8, row.slot9, row.slot10
-            ]
-            for r, n in enumerate(vec, start=1):
-                if n:
-                    totals[r] += int(n or 0)
+        for ft in catalog.features.values():
+            if ft.kind == "spell_table" and ft.character_class_id == class_id:
+                add_slots(totals, catalog.slots_exact(ft.id, int(eff_lvl)))
 
     return dict(totals)
 
@@ -13130,132 +12332,69 @@ def character_level_up(request, pk):
     Handles ONLY the level-up POST flow, then redirects back to character_detail.
     HTML stays the same: forms still post to 'characters:character_detail';
     character_detail() will delegate here when it sees 'level_up_submit' in POST.
-    """
-    CharacterClassModel    = apps.get_model("characters", "CharacterClass")
-    CharacterFeature       = apps.get_model("characters", "CharacterFeature")
 
+    The submission is planned first (services.level_up.LevelUpPlanner) and
+    only written, in one transaction, when the whole plan is valid.
+    """
     if request.method != "POST" or "level_up_submit" not in request.POST:
         return redirect('characters:character_detail', pk=pk)
 
-    # DEBUG: see what actually arrived
-    print("DEBUG: character_level_up POST:", dict(request.POST))
-    # ── (A) Copy the SAME permission logic from character_detail ─────────────
-    # PASTE: from character_detail — the block that loads `character`, computes
-    # is_gm_for_campaign, enforces permission, and sets `can_edit`.
     character, can_edit, denied = _load_character_and_perms(request, pk)
     if denied:
         return denied
     if not can_edit:
         return HttpResponseForbidden("Not allowed.")
 
-    try:
-        from django.http import QueryDict
-    except Exception:
-        QueryDict = None
-    data = request.POST.copy() if request.method == "POST" else (QueryDict("", mutable=True) if QueryDict else {})
-    is_details_submit = (request.method == "POST" and "edit_character_submit" in request.POST)    
-    if not can_edit:
-        return HttpResponseForbidden("Not allowed.")
-
-    # ── (B) Local helpers needed by the POST branch (copy verbatim) ──────────
-    # PASTE the THREE helper defs from character_detail that the level-up POST uses:
-
-    def _active_subclass_for_group(character, grp, level_form=None, base_feats=None):
-        """
-        Returns the chosen Subclass for `grp` using (in order):
-        1) the POSTed choice this request (if present),
-        2) the last saved 'subclass_choice' CharacterFeature,
-        3) the last saved 'subclass_feat' (infers subclass),
-        4) an explicit override 'subclass_choice:<grp.id>' if you use that,
-        else None.
-        """
-        # 0) if this request posts a subclass choice field, use it
-        if level_form is not None and getattr(level_form, "is_bound", False):
-            base_feats = list(base_feats or [])
-            sc_choices = [
-                f for f in base_feats
-                if isinstance(f, ClassFeature)
-                and getattr(f, "scope", "") == "subclass_choice"
-                and getattr(f, "subclass_group_id", None) == grp.id
-            ]
-            for f in sc_choices:
-                key = f"feat_{f.pk}_subclass"
-                raw = (level_form.data.get(key) or "").strip()
-                if raw.isdigit():
-                    try:
-                        return grp.subclasses.get(pk=int(raw))
-                    except grp.subclasses.model.DoesNotExist:
-                        pass
-
-        # 1) last explicitly saved subclass choice
-        row = (CharacterFeature.objects
-            .filter(character=character,
-                    feature__scope="subclass_choice",
-                    feature__subclass_group=grp)
-            .exclude(subclass__isnull=True)
-            .order_by("-level", "-id")
-            .first())
-        if row and row.subclass_id:
-            return row.subclass
-
-        # 2) infer from owned subclass features
-        row = (CharacterFeature.objects
-            .filter(character=character,
-                    feature__scope="subclass_feat",
-                    feature__subclass_group=grp)
-            .exclude(subclass__isnull=True)
-            .order_by("-level", "-id")
-            .first())
-        if row and row.subclass_id:
-            return row.subclass
-
-        # 3) optional manual override
-        ov = CharacterFieldOverride.objects.filter(character=character, key=f"subclass_choice:{grp.id}").first()
-        if ov and str(ov.value).strip().isdigit():
-            try:
-                return grp.subclasses.get(pk=int(ov.value))
-            except grp.subclasses.model.DoesNotExist:
-                pass
+    planner = LevelUpPlanner(character)
+    plan, form_errors = _plan_level_up(request, character, planner)
+    if form_errors:
+        lines = [f"• <strong>{label}</strong>: {'; '.join(errs)}" for label, errs in form_errors]
+        messages.error(request, mark_safe("Level up couldn’t be applied.<br>" + "<br>".join(lines)))
+        # Don’t force the #levelUpModal hash in the URL
+        return redirect('characters:character_detail', pk=pk)
+    if plan.errors:
+        for msg in plan.errors:
+            messages.error(request, msg)
+        return redirect('characters:character_detail', pk=pk)
 
-        return None
-    def _linear_feats_for_level(cls_obj, grp, subclass, cls_level, base_feats=None):
+    planner.apply(plan)
+    for msg in plan.messages:
+        messages.success(request, msg)
+    return redirect('characters:character_detail', pk=pk)
 
-        if not subclass:
-            return []
 
-        feats = []
-        for f in (base_feats or []):
-            if (getattr(f, "scope", "") == "subclass_feat"
-                and getattr(f, "subclass_group_id", None) == grp.id
-                and (subclass in f.subclasses.all())):
-                lr = getattr(f, "level_required", None)
-                ml = getattr(f, "min_level", None)
-                if (ml is None or int(ml) <= int(cls_level)) and (lr is None or int(lr) <= int(cls_level)):
-                    feats.append(f)
-
-        if feats:
-            return feats
-
-        # Fallback: only when nothing is attached to this level (avoid leaking ungated L1 features)
-        return list(
-            ClassFeature.objects
-                .filter(scope="subclass_feat", subclass_group=grp, subclasses=subclass)
-                .filter(
-                    Q(level_required=cls_level) |
-                    Q(level_required__isnull=True, min_level__lte=cls_level)
-                )
-                .exclude(level_required__isnull=True, min_level__isnull=True)
-        )
-    #
-    # (Keep their bodies exactly the same as in your current function.)
+@login_required
+def character_level_up_preview(request, pk):
+    """
+    Dry run of the level-up modal: takes the same fields character_level_up
+    does (POST body or query string) and returns the plan as JSON. Nothing is
+    written.
+    """
+    character, can_edit, denied = _load_character_and_perms(request, pk)
+    if denied:
+        return denied
+    if not can_edit:
+        return JsonResponse({"ok": False, "error": "Not allowed."}, status=403)
+    if request.method != "POST":
+        request.POST = request.GET.copy()
 
+    plan, form_errors = _plan_level_up(request, character, LevelUpPlanner(character))
+    if form_errors:
+        return JsonResponse({"ok": False, "form_errors": [{"field": label, "errors": errs} for label, errs in form_errors]})
+    return JsonResponse({"ok": plan.ok, "plan": plan.as_dict()})
 
 
+def _plan_level_up(request, character, planner):
+    """
+    Bind and validate a level-up submission (request.POST) with the same dynamic
+    fields the modal renders, then plan it. Returns (plan, form_errors):
+    form_errors is [(label, [errors])] and plan None when the form is invalid.
+    """
     # ── (C) Recreate the same context the POST branch assumes ───────────────
-    class_progress = character.class_progress.select_related('character_class')
+    class_progress = planner.class_progress()
     total_level = character.level
     next_level = total_level + 1
-    first_prog = class_progress.first()
+    first_prog = class_progress[0] if class_progress else None
     default_cls = first_prog.character_class if first_prog else CharacterClass.objects.order_by("name").first()
 
     # >>> ADD THESE TWO LINES (defensive init)
@@ -13273,22 +12412,10 @@ def character_level_up(request, pk):
 
 
 
-    cls_level_for_validate = _class_level_after_pick(character, posted_cls)
+    cls_level_for_validate = planner.class_level_after(posted_cls)
 
     # features used at THIS (class, level)
-    try:
-        cl_validate = (
-            ClassLevel.objects
-            .prefetch_related(
-                'features__subclasses',
-                'features__subclass_group',
-                'features__options__grants_feature',
-            )
-            .get(character_class=posted_cls, level=cls_level_for_validate)
-        )
-        base_feats = list(cl_validate.features.all())
-    except ClassLevel.DoesNotExist:
-        base_feats = []
+    base_feats = planner.level_features(posted_cls, cls_level_for_validate)
 
     # only real ClassFeature instances go here
     to_choose = base_feats.copy()
@@ -13305,8 +12432,8 @@ def character_level_up(request, pk):
         for f in base_feats
     )
 
-    uni_qs = UniversalLevelFeature.objects.filter(level=next_level)
-    uni = uni_qs.first()
+    uni_qs = planner.universal_features(next_level)
+    uni = uni_qs[0] if uni_qs else None
 
     grants_general_feat = any(getattr(u, "grants_general_feat", False) for u in uni_qs)
     grants_asi          = any(getattr(u, "grants_asi", False) for u in uni_qs)
@@ -13343,254 +12470,13 @@ def character_level_up(request, pk):
     request.POST = post
 
     if advance_track == "prestige":
-        print("DEBUG: ENTERING PRESTIGE BRANCH")
-        PrestigeClassModel = apps.get_model("characters", "PrestigeClass")
-        PrestigeChoice     = apps.get_model("characters", "CharacterPrestigeLevelChoice")
-        PrestigeLevel      = apps.get_model("characters", "PrestigeLevel")
-        PrestigeFeature    = apps.get_model("characters", "PrestigeFeature")
-
-        # 1) Next character level must meet prestige entry
-        next_level = character.level + 1
-        if next_level < 7:
-            messages.error(request, "You must be level 7+ to take a prestige level.")
-            return redirect("characters:character_detail", pk=pk)
-
-
-
-        # 2) Which prestige CLASS?
-        #    Now we only ever use "prestige_class" from the modal.
-        raw_pc_id = (
-            (request.POST.get("prestige_class")
-             or request.GET.get("prestige_class")
-             or "")
-            .strip()
-        )
-
-
-        if not raw_pc_id.isdigit():
-            messages.error(request, "Pick a prestige class.")
-            return redirect("characters:character_detail", pk=pk)
-
-        prestige_cls = PrestigeClassModel.objects.filter(pk=int(raw_pc_id)).first()
-        if not prestige_cls:
-            messages.error(request, "Invalid prestige class selection.")
-            return redirect("characters:character_detail", pk=pk)
-
-
-        # 3) Enforce "single prestige class per character"
-        prev_choice = (
-            PrestigeChoice.objects
-            .select_related("prestige_class")
-            .filter(character=character)
-            .order_by("id")
-            .first()
-        )
-        if prev_choice and prev_choice.prestige_class_id != prestige_cls.pk:
-            messages.error(request, "You already chose a different prestige class for this character.")
-            return redirect("characters:character_detail", pk=pk)
+        return planner.plan_prestige(post), []
 
-        # 4) Determine the prestige *level number* we’re taking now
-        current_p_levels = (
-            PrestigeChoice.objects
-            .filter(character=character, prestige_class=prestige_cls)
-            .count()
-        )
-        p_level = current_p_levels + 1
-
-        try:
-            pl = PrestigeLevel.objects.get(prestige_class=prestige_cls, level=p_level)
-        except PrestigeLevel.DoesNotExist:
-            messages.error(request, "PrestigeLevel row not configured for this prestige level.")
-            return redirect("characters:character_detail", pk=pk)
-
-        # 5) Resolve counts-as class
-        counts_as = None
-        if pl.counts_as_mode == PrestigeLevel.MODE_FIXED:
-            counts_as = pl.fixed_counts_as
-        else:
-            counts_as_id = (request.POST.get("prestige_counts_as") or "").strip()
-            if counts_as_id.isdigit():
-                cand = CharacterClassModel.objects.filter(pk=int(counts_as_id)).first()
-                if cand and pl.allowed_counts_as.filter(pk=cand.pk).exists():
-                    counts_as = cand
-
-            # If nothing valid was posted but there is exactly one legal option,
-            # auto-select it instead of erroring.
-            if not counts_as:
-                allowed_qs = pl.allowed_counts_as.all()
-                if allowed_qs.count() == 1:
-                    counts_as = allowed_qs.first()
-
-            if not counts_as:
-                messages.error(request, "Pick a valid counts-as class for this prestige level.")
-                return redirect("characters:character_detail", pk=pk)
-        # --- Universal progression for THIS character level (applies even on prestige levels) ---
-        uni_qs = UniversalLevelFeature.objects.filter(level=next_level)
-        grants_general_feat = any(getattr(u, "grants_general_feat", False) for u in uni_qs)
-        grants_asi          = any(getattr(u, "grants_asi", False) for u in uni_qs)
-
-        picked_general_feat = None
-        if grants_general_feat:
-            raw_gf = (post.get("general_feat") or "").strip()
-            if not raw_gf.isdigit():
-                messages.error(request, "This level grants a General Feat. Please select one.")
-                return redirect("characters:character_detail", pk=pk)
-            picked_general_feat = ClassFeat.objects.filter(
-                pk=int(raw_gf),
-                feat_type__iexact="General",
-            ).first()
-            if not picked_general_feat:
-                messages.error(request, "Invalid General Feat selection.")
-                return redirect("characters:character_detail", pk=pk)
-
-        asi_payload = None
-        if grants_asi:
-            mode = (post.get("asi_mode") or "").strip()
-            a    = (post.get("asi_a") or "").strip().lower()
-            b    = (post.get("asi_b") or "").strip().lower()
-
-            if not mode or not a:
-                messages.error(request, "This level grants an Ability Score Increase. Please choose your ASI.")
-                return redirect("characters:character_detail", pk=pk)
-
-            valid_fields = {"strength","dexterity","constitution","intelligence","wisdom","charisma"}
-            if a not in valid_fields or (b and b not in valid_fields):
-                messages.error(request, "Invalid Ability Score field(s).")
-                return redirect("characters:character_detail", pk=pk)
-
-            asi_payload = (mode, a, b)
-
-
-        # ── Universal grants at THIS character level (works even when prestige) ──
-        uni_qs = UniversalLevelFeature.objects.filter(level=next_level)
-        needs_general_feat = uni_qs.filter(grants_general_feat=True).exists()
-        needs_asi          = uni_qs.filter(grants_asi=True).exists()
-
-        chosen_general = None
-        if needs_general_feat:
-            gf_id = (request.POST.get("general_feat") or "").strip()
-            if not gf_id.isdigit():
-                messages.error(request, "This level grants a General Feat. Select one.")
-                return redirect("characters:character_detail", pk=pk)
-
-            chosen_general = ClassFeat.objects.filter(
-                pk=int(gf_id),
-                feat_type__iexact="General",
-            ).first()
-
-            if not chosen_general or not _feat_matches_character_race(getattr(chosen_general, "race", ""), character):
-                messages.error(request, "Invalid General Feat selection for this character.")
-                return redirect("characters:character_detail", pk=pk)
-
-        asi_mode = None
-        asi_a = asi_b = None
-        if needs_asi:
-            asi_mode = (request.POST.get("asi_mode") or "").strip()
-            asi_a = (request.POST.get("asi_a") or "").strip().lower()
-            asi_b = (request.POST.get("asi_b") or "").strip().lower()
-
-            if not asi_mode or not asi_a:
-                messages.error(request, "This level grants an Ability Score Increase. Choose it.")
-                return redirect("characters:character_detail", pk=pk)
-
-            valid_fields = {"strength","dexterity","constitution","intelligence","wisdom","charisma"}
-            if asi_a not in valid_fields or (asi_b and asi_b not in valid_fields):
-                messages.error(request, "Invalid Ability Score selection.")
-                return redirect("characters:character_detail", pk=pk)
-
-        with transaction.atomic():
-            # 6) Save prestige level choice
-            PrestigeChoice.objects.create(
-                character=character,
-                prestige_class=prestige_cls,
-                prestige_level=p_level,            # 1,2,3...
-                char_level_at_gain=next_level,     # character level gained at
-                counts_as=counts_as,
-            )
-
-            # 7) Grant prestige features
-            feats = PrestigeFeature.objects.filter(
-                prestige_class=prestige_cls,
-                at_prestige_level=p_level,
-            )
-
-            granted = 0
-            for pf in feats:
-                cf = getattr(pf, "grants_class_feature", None)
-                if cf:
-                    CharacterFeature.objects.get_or_create(
-                        character=character,
-                        feature=cf,
-                        defaults={"level": next_level},
-                    )
-                    granted += 1
-
-            # Apply ASI (if any) BEFORE saving
-            if needs_asi and asi_mode:
-                if asi_mode == "1+1":
-                    if not asi_b or asi_b == asi_a:
-                        messages.error(request, "ASI mode 1+1 requires two different abilities.")
-                        raise ValueError("Invalid ASI 1+1 payload")
-                    setattr(character, asi_a, getattr(character, asi_a) + 1)
-                    setattr(character, asi_b, getattr(character, asi_b) + 1)
-
-                elif asi_mode == "1":
-                    setattr(character, asi_a, getattr(character, asi_a) + 1)
-
-                elif asi_mode == "2":
-                    if asi_b and asi_b != asi_a:
-                        setattr(character, asi_a, getattr(character, asi_a) + 1)
-                        setattr(character, asi_b, getattr(character, asi_b) + 1)
-                    else:
-                        setattr(character, asi_a, getattr(character, asi_a) + 2)
-
-                else:
-                    messages.error(request, "Invalid ASI mode.")
-                    raise ValueError("Invalid ASI mode")
-
-            # 8) Bump character level (save ONCE)
-            # 8) Bump character level (save ONCE)
-            character.level = next_level
-            character.save()  # saves level + ASI changes
-
-            # HP max must be recalculated from formula after level-up
-            CharacterFieldOverride.objects.filter(character=character, key="hp_max").delete()
-
-            # Persist General Feat
-            if chosen_general is not None:
-                CharacterFeat.objects.get_or_create(
-                    character=character,
-                    feat=chosen_general,
-                    defaults={"level": next_level},
-                )
-
-            # Keep your “ASI happened” marker (matches your base-class path)
-            if needs_asi and asi_mode:
-                CharacterFeature.objects.create(
-                    character=character,
-                    feature=None,
-                    level=next_level
-                )
-
-        messages.success(
-            request,
-            f"Advanced in {prestige_cls.name} (Prestige {p_level}). "
-            + (f"Granted {granted} feature(s)." if granted else "No mapped features configured for this prestige level.")
-        )
-        return redirect("characters:character_detail", pk=pk)
-
-
-
-
-    cls_level_for_validate = _class_level_after_pick(character, posted_cls)
+    cls_level_for_validate = planner.class_level_after(posted_cls)
 
 
     # 2) Initialize the grant ONCE (safe even if None) + derived flags
-    skill_grant = (
-        ClassSkillFeatGrant.objects
-        .filter(character_class=posted_cls, at_level=cls_level_for_validate)
-        .first()
-    )
+    skill_grant = planner.skill_feat_grant(posted_cls, cls_level_for_validate)
     num_skill_picks = int(getattr(skill_grant, "num_picks", 0) or 0)
     picks_required  = num_skill_picks > 0
 
@@ -13599,8 +12485,8 @@ def character_level_up(request, pk):
     request.POST = post
 
     next_level = character.level + 1
-    uni_qs = UniversalLevelFeature.objects.filter(level=next_level)
-    uni = uni_qs.first()
+    uni_qs = planner.universal_features(next_level)
+    uni = uni_qs[0] if uni_qs else None
 
     grants_general_feat = any(getattr(u, "grants_general_feat", False) for u in uni_qs)
     grants_asi          = any(getattr(u, "grants_asi", False) for u in uni_qs)
@@ -13611,6 +12497,7 @@ def character_level_up(request, pk):
         preview_cls=preview_cls,
         grants_class_feat=_grants_class_feat_at,
         uni=uni,  # ensures general_feat / ASI fields are present
+        planner=planner,
     )
     # FORCE universal pickers onto the *bound* form too (otherwise cleaned_data never has them)
     next_level = int(character.level or 0) + 1
@@ -13640,9 +12527,7 @@ def character_level_up(request, pk):
     PrestigeChoice       = apps.get_model("characters", "CharacterPrestigeLevelChoice")
     PrestigeLevel        = apps.get_model("characters", "PrestigeLevel")
 
-    # Default class for initial selection
-    first_prog = character.class_progress.select_related('character_class').first()
-    default_cls = first_prog.character_class if first_prog else CharacterClassModel.objects.order_by("name").first()
+    # Default class for initial selection (default_cls from above)
 
     # Ensure the dropdown exists AND has a non-empty queryset
     if "base_class" in level_form.fields:
@@ -13669,13 +12554,14 @@ def character_level_up(request, pk):
     eligible = PrestigeClassModel.objects.filter(min_entry_level__lte=next_level)
 
     # If the character already has prestige levels, lock to that class only
+    # (prestige is only offered from level 7, so don't look before then)
     prev_choice = (
         PrestigeChoice.objects
         .select_related("prestige_class")
         .filter(character=character)
         .order_by("id")
         .first()
-    )
+    ) if next_level >= 7 else None
     if prev_choice:
         eligible = eligible.filter(pk=prev_choice.prestige_class_id)
 
@@ -13771,11 +12657,7 @@ def character_level_up(request, pk):
         )
 
     #   - add "skill_feat_pick" (single or multiple) when ClassSkillFeatGrant exists
-    skill_grant = (
-        ClassSkillFeatGrant.objects
-        .filter(character_class=posted_cls, at_level=cls_level_for_validate)
-        .first()
-    )
+    skill_grant = planner.skill_feat_grant(posted_cls, cls_level_for_validate)
     # ── (D.3) Restrict & finalize the SKILL feat field (mirrors character_detail) ──
     if "skill_feat_pick" in level_form.fields:
         fld = level_form.fields["skill_feat_pick"]
@@ -13858,11 +12740,7 @@ def character_level_up(request, pk):
         race_names.append(character.subrace.name)
 
     # All feats this character already has – used to hide taken feats in all pickers
-    owned_feat_ids = set(
-        CharacterFeat.objects
-        .filter(character=character)
-        .values_list("feat_id", flat=True)
-    )
+    owned_feat_ids = planner.owned_feat_ids()
     for trigger in gain_sub_feat_triggers:
         grp = trigger.subclass_group
         if not grp:
@@ -13997,12 +12875,10 @@ def character_level_up(request, pk):
                 current_tier_by_sub[sub.id] = taken // per  # 0 modules → tier 0
 
             # feature ids already owned in this group (avoid duplicates)
-            owned_feat_ids = set(
-                CharacterFeature.objects.filter(
-                    character=character, feature__scope='subclass_feat',
-                    feature__subclass_group=grp
-                ).values_list('feature_id', flat=True)
-            )
+            owned_group_feature_ids = {
+                fid for _id, fid, _sid, _lvl, f_scope, f_grp in planner.owned_features()
+                if f_scope == 'subclass_feat' and f_grp == grp.pk
+            }
 
             # build eligible set across *all* subclasses
             eligible_ids = []
@@ -14032,7 +12908,7 @@ def character_level_up(request, pk):
                 #     Q(min_level__isnull=True)      | Q(min_level__lte=cls_level_for_validate),
                 # )
 
-                q = q.exclude(pk__in=owned_feat_ids)
+                q = q.exclude(pk__in=owned_group_feature_ids)
 
                 eligible_ids.extend(q.values_list('id', flat=True))
 
@@ -14254,453 +13130,10 @@ def character_level_up(request, pk):
                 except Exception:
                     pass
 
-        lines = []
-        for fname, errs in level_form.errors.items():
-            label = label_by_name.get(fname, fname)
-            lines.append(f"• <strong>{label}</strong>: {'; '.join(errs)}")
-
-        if lines:
-            messages.error(request, mark_safe("Level up couldn’t be applied.<br>" + "<br>".join(lines)))
-        else:
-            messages.error(request, "Level up couldn’t be applied. Please fix the highlighted fields.")
-
-        # Don’t force the #levelUpModal hash in the URL
-        return redirect('characters:character_detail', pk=pk)
-
-
-
-
-    # ── (H) APPLY the level-up (copy the original body verbatim) ────────────
-    # COPY EVERYTHING that was inside:
-
-    if request.method == 'POST' and 'level_up_submit' in request.POST and level_form.is_valid():
-        # ... your existing POST handler ...
-
-        # A) update ClassProgress
-        picked_cls = level_form.cleaned_data['base_class']
-        cp, _ = CharacterClassProgress.objects.get_or_create(
-            character=character,
-            character_class=picked_cls,
-            defaults={'levels': 0}
-        )
-        cp.levels += 1
-        cp.save()
-        # class level in the picked class after this level-up
-        cls_level_after_post = cp.levels
-
-        # B) bump character level
-        character.level = next_level
-        character.save()
-
-        # C) (re)compute and grant auto feats for the actually picked class
-        try:
-            cl_next = (
-                ClassLevel.objects
-                    .prefetch_related('features')
-                    .get(character_class=picked_cls, level=cls_level_after_post)
-            )
-            auto_feats_post = [
-                f for f in cl_next.features.all()
-                if _is_auto_granted_feature(f)
-            ]
-        except ClassLevel.DoesNotExist:
-            auto_feats_post = []
-
-
-
-        picks = level_form.cleaned_data.get("skill_feat_pick")
-        chosen = []
-        if picks is None:
-            chosen = []
-        elif hasattr(picks, "all"):            # multiple
-            chosen = list(picks.all())
-        else:                                   # single
-            chosen = [picks]
-
-        # write CharacterFeat rows at the NEW level you’re granting
-        new_level = next_level
-        for feat in chosen:
-            # guard: only Skill feats
-            if ((feat.feat_type or "").strip().lower() != "skill"):
-                continue
-            CharacterFeat.objects.get_or_create(
-                character=character,
-                feat=feat,
-                defaults={"level": new_level}
-            )
-
-        for feat in auto_feats_post:
-            CharacterFeature.objects.create(
-                character=character,
-                feature=feat,
-                level=next_level
-            )
-        # C.1) LINEAR subclasses: auto-grant this level’s subclass features for the active choice
-        # ensure we have the features for THIS class+level
-        # F) LINEAR subclasses: auto-grant this level’s subclass features for the now-saved choice
-        try:
-            cl_linear = (
-                ClassLevel.objects
-                .prefetch_related('features__subclasses', 'features__subclass_group')
-                .get(character_class=picked_cls, level=cls_level_after_post)
-            )
-            base_feats_for_level = list(cl_linear.features.all())
-        except ClassLevel.DoesNotExist:
-            base_feats_for_level = []
-
-        for grp in picked_cls.subclass_groups.filter(system_type=SubclassGroup.SYSTEM_LINEAR):
-            active_sub = _active_subclass_for_group(character, grp, None, base_feats_for_level)
-            if not active_sub:
-                continue
-            grant_feats = _linear_feats_for_level(picked_cls, grp, active_sub, cls_level_after_post, base_feats_for_level)
-            for sf in grant_feats:
-                CharacterFeature.objects.get_or_create(
-                    character=character,
-                    feature=sf,
-                    subclass=active_sub,
-                    defaults={"level": next_level}
-                )
+        form_errors = [(label_by_name.get(fname, fname), list(errs)) for fname, errs in level_form.errors.items()]
+        return None, form_errors or [("Level up", ["Please fix the highlighted fields."])]
 
-
-
-        # D) general_feat + asi
-        # D) general_feat + asi
-        if level_form.cleaned_data.get('general_feat'):
-            CharacterFeat.objects.get_or_create(
-                character=character,
-                feat=level_form.cleaned_data['general_feat'],
-                defaults={"level": next_level},
-            )
-
-        # NEW: persist the actual ability increases
-        asi_mode = level_form.cleaned_data.get("asi_mode")
-        if asi_mode:
-            a = (level_form.cleaned_data.get("asi_a") or "").strip()
-            b = (level_form.cleaned_data.get("asi_b") or "").strip()
-
-            valid_fields = {"strength","dexterity","constitution","intelligence","wisdom","charisma"}
-            if a not in valid_fields or (b and b not in valid_fields):
-                raise ValidationError("Invalid ASI field(s).")
-
-            if asi_mode == "1+1":
-                setattr(character, a, getattr(character, a) + 1)
-                setattr(character, b, getattr(character, b) + 1)
-
-            elif asi_mode == "1":
-                setattr(character, a, getattr(character, a) + 1)
-
-            elif asi_mode == "2":
-                # If UI sent two different fields with mode "2", normalize to +1/+1.
-                if b and b != a:
-                    setattr(character, a, getattr(character, a) + 1)
-                    setattr(character, b, getattr(character, b) + 1)
-                else:
-                    setattr(character, a, getattr(character, a) + 2)
-
-            else:
-                raise ValidationError("Invalid ASI mode.")
-
-            character.save()
-
-            # keep your audit row that “an ASI happened this level”
-            CharacterFeature.objects.create(
-                character=character,
-                feature=None,
-                level=next_level
-            )
-
-        # HP max must be recalculated from formula after level-up
-        CharacterFieldOverride.objects.filter(character=character, key="hp_max").delete()
-
-        chosen_subclass_by_group = {}
-        # E) subclass choices & feature options
-        for name, val in level_form.cleaned_data.items():
-            
-
-            if name.startswith('feat_') and val:
-                feat_pk = int(name.split('_')[1])
-                cf      = ClassFeature.objects.get(pk=feat_pk)
-                if name.endswith('_subclass'):
-                    sub = cf.subclass_group.subclasses.get(pk=int(val))
-                    grp = cf.subclass_group
-
-                    # 1) record the *choice* feature
-                    CharacterFeature.objects.create(
-                        character=character,
-                        feature=cf,
-                        subclass=sub,
-                        level=next_level
-                    )
-
-                    # 2) also GRANT the subclass features that unlock *at this level*
-                    grant_feats = []
-
-                    if grp.system_type == SubclassGroup.SYSTEM_MODULAR_LINEAR:
-                        # tiers that unlock now
-                        unlock_tiers = _unlocked_tiers(grp, cls_level_after_post)
-
-                        grant_feats = list(
-                            ClassFeature.objects
-                                .filter(scope='subclass_feat', subclass_group=grp, subclasses=sub, tier__in=unlock_tiers)
-                                .filter(Q(level_required__isnull=True) | Q(level_required__lte=cls_level_after_post))
-                                .filter(Q(min_level__isnull=True)      | Q(min_level__lte=cls_level_after_post))
-                        )
-
-                    else:
-                        grant_feats = _linear_feats_for_level(picked_cls, grp, sub, cls_level_after_post, base_feats_for_level)
-
-
-                    # 3) persist the unlocked subclass features
-                    for sf in grant_feats:
-                        CharacterFeature.objects.get_or_create(
-                            character=character,
-                            feature=sf,
-                            subclass=sub,
-                            level=next_level
-                        )
-                    chosen_subclass_by_group[grp.id] = sub.pk  
-                elif name.endswith('_option'):
-                    # (unchanged) record option
-                    opt = cf.options.get(pk=int(val))
-                    CharacterFeature.objects.create(
-                        character=character,
-                        feature=cf,
-                        option=opt,
-                        level=next_level
-                    )
-                elif name.endswith('_subfeats'):
-                    grp = cf.subclass_group
-                    per = max(1, int(getattr(grp, "modules_per_mastery", 2)))
-                    picks_per_trigger = _picks_for_trigger(cf, picked_cls, cls_level_after_post)
-                    gainer_cap = int(getattr(cf, "mastery_rank", 0) or 0)
-
-                    picked_features = list(val) if hasattr(val, '__iter__') else []
-                    if len(picked_features) != picks_per_trigger:
-                        messages.error(request, f"Pick exactly {picks_per_trigger} feature(s) for {grp.name}.")
-                        return redirect('characters:character_detail', pk=pk)
-
-                    # Map current tier by subclass (after previous picks, before this trigger)
-                    from django.db.models import Count
-                    taken_by_sub = dict(
-                        CharacterFeature.objects.filter(
-                            character=character,
-                            feature__scope='subclass_feat',
-                            feature__subclass_group=grp
-                        ).values('subclass_id').annotate(cnt=Count('id'))
-                        .values_list('subclass_id', 'cnt')
-                    )
-                    # 0-based mastery tier
-                    current_tier_by_sub = {}
-                    for sub in grp.subclasses.all():
-                        taken = int(taken_by_sub.get(sub.id, 0))
-                        current_tier_by_sub[sub.id] = taken // per
-
-                    owned_feat_ids = set(
-                        CharacterFeature.objects.filter(
-                            character=character,
-                            feature__scope='subclass_feat',
-                            feature__subclass_group=grp
-                        ).values_list('feature_id', flat=True)
-                    )
-
-                    # Validate each pick against its own subclass tier/cap
-                    to_create = []
-                    for sf in picked_features:
-                        subs = list(sf.subclasses.filter(group=grp))
-                        if len(subs) != 1:
-                            messages.error(request, f"Feature “{sf.name}” is not tied to exactly one subclass.")
-                            return redirect('characters:character_detail', pk=pk)
-                        sub = subs[0]
-
-                        if sf.id in owned_feat_ids:
-                            messages.error(request, f"You already own “{sf.name}”.")
-                            return redirect('characters:character_detail', pk=pk)
-
-                        allowed_cap = current_tier_by_sub.get(sub.id, 0)
-                        if gainer_cap:
-                            allowed_cap = min(allowed_cap, gainer_cap)
-
-                        mr = getattr(sf, "mastery_rank", None)
-                        # enforce mastery_rank even if 0; only ignore when it's truly unset/None
-                        if mr is not None and int(mr) > int(allowed_cap):
-                            messages.error(
-                                request,
-                                f"“{sf.name}” requires tier {mr}, but your allowed tier for {sub.name} is {allowed_cap}."
-                            )
-                            return redirect('characters:character_detail', pk=pk)
-
-                        to_create.append((sf, sub))
-
-                    # Save all valid picks
-                    for sf, sub in to_create:
-                        CharacterFeature.objects.get_or_create(
-                            character=character,
-                            feature=sf,
-                            subclass=sub,
-                            defaults={"level": next_level}
-                        )
-
-
-                                                        
-
-
-
-                # F) class_feat_pick & skill_feat_pick
-
-        # 1) Class Feat (unchanged behavior)
-        # 1) Class Feat
-        pick = level_form.cleaned_data.get('class_feat_pick')
-        if pick:
-            CharacterFeat.objects.get_or_create(
-                character=character,
-                feat=pick,
-                defaults={"level": next_level},
-            )
-
-
-        # 2) Skill Feat(s) – honor ClassSkillFeatGrant.num_picks at this new class level
-        # 2) Skill Feat(s) – honor ClassSkillFeatGrant at this new class level
-        skill_grant_post = (
-            ClassSkillFeatGrant.objects
-            .filter(character_class=picked_cls, at_level=cls_level_after_post)
-            .first()
-        )
-
-        # Collect from cleaned_data OR raw POST (so we never miss the picks)
-        chosen = level_form.cleaned_data.get("skill_feat_pick")
-        if chosen is None:
-            raw_ids = (request.POST.getlist("skill_feat_pick")
-                    or request.POST.getlist("skill_feat_pick[]")
-                    or request.POST.getlist("pick[]"))
-            raw_ids = [x.split("|", 1)[0] for x in raw_ids if x]
-            chosen_list = list(ClassFeat.objects.filter(pk__in=raw_ids, feat_type__iexact="Skill"))
-        else:
-            chosen_list = list(chosen) if hasattr(chosen, "__iter__") and not isinstance(chosen, (str, bytes)) else [chosen]
-
-        need = int(getattr(skill_grant_post, "num_picks", 0) or 0)
-        if need > 0 and len(chosen_list) != need:
-            messages.error(request, f"You must pick exactly {need} Skill Feat{'s' if need != 1 else ''}.")
-            return redirect('characters:character_detail', pk=pk)
-
-        for sf in chosen_list:
-            if (getattr(sf, "feat_type", "") or "").strip().lower() != "skill":
-                continue
-            CharacterFeat.objects.get_or_create(
-                character=character,
-                feat=sf,
-                defaults={"level": next_level}   # ✅ correct level
-            )
-
-
-
-        # G) martial_mastery
-        mm = level_form.cleaned_data.get('martial_mastery')
-        if mm:
-            CharacterFeature.objects.create(
-                character=character,
-                feature=None,
-                level=next_level
-            )
-        # Manual add (feat/feature/racial_feature) with explanation
-
-        # H) Starting skills — only when this is the first level in the chosen class
-        if cls_level_after_post == 1:
-            trained = (ProficiencyLevel.objects
-                    .filter(name__iexact="Trained").order_by("bonus").first())
-            if not trained:
-                messages.error(request, "Missing proficiency levels (need at least ‘Trained’). Please seed the tiers and try again.")
-                return redirect('characters:character_detail', pk=pk)            
-            raw_picks = request.POST.getlist("starting_skill_picks")  # ← from <select multiple>
-
-            # Cap based on the picked class (mods-based formula now)
-            cap = _starting_skills_cap_for(picked_cls)
-            if cap and len(raw_picks) > cap:
-                raw_picks = raw_picks[:cap]  # hard-enforce; or flash a message if you prefer
-
-            if raw_picks:
-                trained = (ProficiencyLevel.objects
-                        .filter(name__iexact="Trained").order_by("bonus").first())
-                if not trained:
-                    trained = (ProficiencyLevel.objects
-                            .exclude(name__iregex=r'(?i)untrained').order_by("bonus").first())
-
-                ct_skill = ContentType.objects.get_for_model(Skill)
-                ct_sub   = ContentType.objects.get_for_model(SubSkill)
-
-                for token in raw_picks:
-                    try:
-                        if token.startswith("sk_"):
-                            sid = int(token[3:])
-                            CharacterSkillProficiency.objects.get_or_create(
-                                character=character,
-                                selected_skill_type=ct_skill,
-                                selected_skill_id=sid,
-                                defaults={"proficiency": trained},
-                            )
-                        elif token.startswith("sub_"):
-                            sid = int(token[4:])
-                            CharacterSkillProficiency.objects.get_or_create(
-                                character=character,
-                                selected_skill_type=ct_sub,
-                                selected_skill_id=sid,
-                                defaults={"proficiency": trained},
-                            )
-                    except ValueError:
-                        pass
-
-
-        # --- Skill points grant for THIS level-up ---
-        # --- Skill points grant for THIS level-up ---
-        # --- Skill points grant for THIS level-up ---
-        # Build a dict: {class_level -> points_awarded} for this class
-        skill_points_by_level = {}
-        for g in picked_cls.skill_point_grants.all():  # uses your working related_name
-            lvl = int(getattr(g, "at_level", 0) or 0)
-            pts = int(getattr(g, "points_awarded", 0) or 0)
-            if lvl > 0 and pts:
-                skill_points_by_level[lvl] = skill_points_by_level.get(lvl, 0) + pts
-
-        # Look up the points for THIS class level (after the level-up)
-        # e.g. Rogue L11 should pull whatever you set in the admin row for Rogue @ 11
-        base_pts = int(getattr(picked_cls, "skill_points_per_level", 0) or 0)
-        pts = skill_points_by_level.get(cls_level_after_post, base_pts)
-
-        # Create the transaction only if we actually have points to award
-        if pts:
-            CharacterSkillPointTx.objects.create(
-                character=character,
-                amount=pts,
-                source="level_award",
-                reason=f"{picked_cls.name} L{cls_level_after_post}",
-                at_level=next_level,        # total character level
-                awarded_class=picked_cls,
-            )
-            messages.success(
-                request,
-                f"Gained {pts} skill point(s) from {picked_cls.name}."
-            )
-
-
-
-
-    # Keep every statement in order (A..H in your comments):
-    #   - create/update CharacterClassProgress
-    #   - bump character.level
-    #   - grant auto features (class_feat, spell tables)
-    #   - LINEAR subclass auto-grants (at this level)
-    #   - general_feat, ASI application
-    #   - loop over `level_form.cleaned_data` for subclass picks / options / subfeats
-    #   - class_feat_pick persistence
-    #   - skill_feat_pick countexit enforcement & persistence (using skill_grant_post)
-    #   - martial_mastery note
-    #   - starting skills (cls_level_after_post == 1) using _starting_skills_cap_for
-    #   - skill points grant, success message
-    #
-    # IMPORTANT: keep all `messages.*` and `return redirect(...)` calls unchanged.
-
-    # (The code you paste here should end with:)
-    # messages.success(request, f"{character.name} advanced to level {next_level}.")
-    return redirect('characters:character_detail', pk=pk)
+    return planner.plan_base(level_form.cleaned_data, request.POST), []
 
 from django.views.decorators.http import require_POST
 
@@ -14877,14 +13310,13 @@ def approve_pending_background(request, pb_id):
 
 
 from django.contrib.auth import get_user_model
-import requests
 from django.conf import settings
+from accounts.outbox import enqueue as enqueue_email
 
 def _send_share_email(to_email: str, created_by, character, accept_url: str):
-    """Optional email send via Resend; safe to no-op if not configured."""
-    api_key = getattr(settings, "RESEND_API_KEY", "")
+    """Optional invite email, queued in the outbox; safe to no-op if not configured."""
     from_addr = getattr(settings, "DEFAULT_FROM_EMAIL", None)
-    if not api_key or not from_addr:
+    if not from_addr:
         return
     subject = f"{created_by.get_username()} shared {character.name} with you"
     text = (
@@ -14897,15 +13329,7 @@ def _send_share_email(to_email: str, created_by, character, accept_url: str):
       <p>This invite is tied to <code>{to_email}</code>.</p>
       <p><a href="{accept_url}">Accept the invite</a></p>
     """
-    payload = {"from": from_addr, "to": [to_email], "subject": subject, "text": text, "html": html}
-    try:
-        requests.post(
-            "https://api.resend.com/emails",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json=payload, timeout=30
-        )
-    except requests.RequestException:
-        pass
+    enqueue_email(from_email=from_addr, to=[to_email], subject=subject, text=text, html=html)
 
 import logging
 logger = logging.getLogger(__name__)
@@ -14922,11 +13346,9 @@ class EmailSendError(RuntimeError):
     pass
 
 def _notify_shared(user, character, url) -> str:
-    api_key   = getattr(settings, "RESEND_API_KEY", "")
+    """Queue the access notification (delivered by drain_email_outbox); returns the outbox id."""
     from_addr = getattr(settings, "DEFAULT_FROM_EMAIL", None)
 
-    if not api_key:
-        raise EmailSendError("RESEND_API_KEY not set")
     if not from_addr:
         raise EmailSendError("DEFAULT_FROM_EMAIL not configured")
     if not user.email:
@@ -14936,38 +13358,8 @@ def _notify_shared(user, character, url) -> str:
     text = f"You can view the character here: {url}\n"
     html = f'<p>You can view the character here: <a href="{url}">{url}</a></p>'
 
-    payload = {
-        "from": from_addr,
-        "to": [user.email],
-        "subject": subject,
-        "text": text,
-        "html": html,
-    }
-
-    try:
-        r = requests.post(
-            "https://api.resend.com/emails",
-            headers={"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"},
-            json=payload,
-            timeout=30,
-        )
-    except requests.RequestException as e:
-        logger.exception("Resend request error")
-        raise EmailSendError(f"Network error sending email: {e!s}")
-
-    if r.status_code // 100 != 2:
-        # bubble up Resend’s error
-        try:
-            data = r.json()
-        except Exception:
-            data = {"error": r.text}
-        msg = data.get("message") or data.get("error") or f"HTTP {r.status_code}"
-        raise EmailSendError(f"Resend API error: {msg}")
-
-    try:
-        return (r.json() or {}).get("id", "")
-    except Exception:
-        return ""
+    row = enqueue_email(from_email=from_addr, to=[user.email], subject=subject, text=text, html=html)
+    return str(row.pk)
 
 @login_required
 def character_share_create(request, pk):
@@ -15114,32 +13506,6 @@ from collections import OrderedDict, defaultdict
 from django.utils.dateparse import parse_date
 from django.db.models import Q
 
-def _is_subclass_bound_feature(f) -> bool:
-    scope = (getattr(f, "scope", "") or "").strip().lower()
-
-    try:
-        has_subclasses = f.subclasses.exists()
-    except Exception:
-        has_subclasses = False
-
-    return bool(
-        scope in {"subclass_feat", "subclass_choice"}
-        or getattr(f, "subclass_group_id", None)
-        or has_subclasses
-    )
-
-
-def _is_auto_granted_feature(f) -> bool:
-    scope = (getattr(f, "scope", "") or "").strip().lower()
-    kind = (getattr(f, "kind", "") or "").strip().lower()
-
-    if scope == "class_feat":
-        return True
-
-    if kind == "spell_table" and not _is_subclass_bound_feature(f):
-        return True
-
-    return False
 def _entry_dt(e):
     return e.published_at or e.occurred_at
 
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class GlossaryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'glossary'
+
+    def ready(self):
+        from . import signals  # noqa
@@ -0,0 +1,162 @@
+# glossary/matcher.py
+"""
+Find every glossary term (and alias) in a text in one linear pass.
+
+All active terms are compiled into two Aho-Corasick automata: one over the
+case-sensitive patterns, one over the lower-cased patterns of the rest. A
+scan walks the text once per automaton and reports (start, end, term_id)
+for each hit; whole-word terms are checked against their neighbouring
+characters, the same rule as the old (?<!\\w)term(?!\\w) regex.
+
+get_matcher() keeps one compiled matcher per worker and rebuilds it when
+GlossaryVersion moves (signals.py bumps it on every GlossaryTerm save/delete).
+"""
+import re
+from collections import deque
+
+from django.conf import settings
+
+from characters.services.versioned_cache import VersionedCache
+
+from .models import GlossaryTerm, GlossaryVersion
+
+# How long a worker trusts its matcher before re-reading the version row (seconds).
+CHECK_INTERVAL = getattr(settings, "GLOSSARY_CHECK_SECONDS", 2.0)
+
+_WORD_RE = re.compile(r"\w")
+
+
+def _is_word_char(ch: str) -> bool:
+    return bool(ch) and _WORD_RE.match(ch) is not None
+
+
+class _Automaton:
+    """Classic Aho-Corasick over str: goto dicts, failure links, merged outputs."""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]      # state -> [(pattern_len, payload)]
+
+    def add(self, pattern: str, payload):
+        state = 0
+        for ch in pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            state = nxt
+        self.out[state].append((len(pattern), payload))
+
+    def build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+        return self
+
+    def __bool__(self):
+        return len(self.goto) > 1
+
+    def iter(self, text: str):
+        """Yield (start, end, payload) for every occurrence, in order of end position."""
+        goto, fail, out = self.goto, self.fail, self.out
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for length, payload in out[state]:
+                    yield i + 1 - length, i + 1, payload
+
+
+class GlossaryMatcher:
+    def __init__(self, terms, version=0):
+        """terms: GlossaryTerm rows (active ones); aliases come from terms_list()."""
+        self.version = version
+        self.term_ids = set()
+        self._cs = _Automaton()
+        self._ci = _Automaton()
+        for t in terms:
+            self.term_ids.add(t.pk)
+            for w in t.terms_list():
+                if not w:
+                    continue
+                if t.case_sensitive:
+                    self._cs.add(w, (t.pk, t.whole_word))
+                else:
+                    self._ci.add(w.lower(), (t.pk, t.whole_word))
+        self._cs.build()
+        self._ci.build()
+
+    @staticmethod
+    def _hits(automaton, text):
+        n = len(text)
+        for start, end, (term_id, whole_word) in automaton.iter(text):
+            if whole_word and ((start > 0 and _is_word_char(text[start - 1]))
+                               or (end < n and _is_word_char(text[end]))):
+                continue
+            yield start, end, term_id
+
+    def finditer(self, text: str, text_lower: str | None = None):
+        """
+        (start, end, term_id) for every term/alias occurrence. Case-insensitive
+        positions refer to `text_lower` (same as text unless lower() changed lengths).
+        """
+        if not text:
+            return
+        if self._cs:
+            yield from self._hits(self._cs, text)
+        if self._ci:
+            yield from self._hits(self._ci, text.lower() if text_lower is None else text_lower)
+
+    def term_ids_in(self, text: str, text_lower: str | None = None) -> set:
+        """Ids of the terms that occur at least once in `text`."""
+        found = set()
+        for _start, _end, term_id in self.finditer(text, text_lower):
+            found.add(term_id)
+            if len(found) == len(self.term_ids):
+                break
+        return found
+
+
+# ── worker cache ──────────────────────────────────────────────────────────────
+_cache = VersionedCache(
+    GlossaryVersion,
+    lambda version: GlossaryMatcher(GlossaryTerm.objects.filter(active=True), version),
+    CHECK_INTERVAL,
+)
+
+
+def current_version() -> int:
+    return _cache.current_version()
+
+
+def get_matcher() -> GlossaryMatcher:
+    """The matcher for the current glossary; costs at most one tiny query per CHECK_INTERVAL."""
+    return _cache.get()
+
+
+def version_stamp():
+    """(version, updated_at) of the glossary counter, for glossary_json's ETag / Last-Modified."""
+    return _cache.stamp()
+
+
+def invalidate_local() -> None:
+    _cache.invalidate_local()
+
+
+def bump_glossary_version() -> None:
+    """Called from signals.py; bumps once per transaction, after commit."""
+    _cache.bump()
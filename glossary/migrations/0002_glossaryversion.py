@@ -0,0 +1,21 @@
+# Generated by Django 5.1.6 on 2026-10-18 09:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('glossary', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlossaryVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
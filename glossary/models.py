@@ -33,3 +33,17 @@ class GlossaryTerm(models.Model):
             if w and w not in seen:
                 out.append(w); seen.add(w)
         return out
+
+
+class GlossaryVersion(models.Model):
+    """
+    Single-row counter for the compiled glossary matcher (glossary/matcher.py).
+
+    Saving or deleting a GlossaryTerm bumps `version`; each worker rebuilds its
+    automaton when the version it was compiled from is out of date.
+    """
+    version = models.PositiveBigIntegerField(default=1)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"glossary v{self.version}"
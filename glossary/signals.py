@@ -0,0 +1,13 @@
+# glossary/signals.py
+from django.db.models.signals import post_save, post_delete
+
+from .matcher import bump_glossary_version
+from .models import GlossaryTerm
+
+
+def _glossary_changed(sender, **kwargs):
+    bump_glossary_version()
+
+
+post_save.connect(_glossary_changed, sender=GlossaryTerm, dispatch_uid="glossary_matcher:save")
+post_delete.connect(_glossary_changed, sender=GlossaryTerm, dispatch_uid="glossary_matcher:delete")
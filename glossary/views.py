@@ -1,10 +1,13 @@
 from django.http import JsonResponse
-from django.views.decorators.cache import cache_page
 from django.urls import reverse
 from urllib.parse import urlencode
+
+from characters.services.codex_cache import codex_response
+
+from .matcher import version_stamp
 from .models import GlossaryTerm
 
-@cache_page(60 * 15)
+@codex_response(version_stamp)
 def glossary_json(request):
     items = (GlossaryTerm.objects
              .filter(active=True)
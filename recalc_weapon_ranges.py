@@ -1,6 +1,7 @@
 import math
 from django.db import transaction
 from characters.models import Weapon
+from characters.services.bulk_writes import bulk_update_audited
 
 
 def ceil_to_5(value):
@@ -67,7 +68,7 @@ def run():
             updated.append(w)
 
     if updated:
-        Weapon.objects.bulk_update(
+        bulk_update_audited(
             updated,
             ["range_effective", "range_suboptimal", "range_maximum"],
             batch_size=500,
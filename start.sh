@@ -0,0 +1,35 @@
+#!/bin/sh
+# Container start command. The image runs as either process type:
+#   PROCESS_TYPE=web     (default) gunicorn
+#   PROCESS_TYPE=worker  background jobs: drain_email_outbox, and
+#                        reindex_rulebook_terms --watch (glossary index upkeep)
+# Deploy it twice, once as the web service and once with PROCESS_TYPE=worker.
+# Mail is only queued by the web service (accounts/outbox.py); without a
+# worker nothing is ever sent. The Procfile declares the same jobs.
+set -e
+
+case "${PROCESS_TYPE:-web}" in
+  web)
+    exec gunicorn LOR_Website.wsgi:application --bind 0.0.0.0:8000 --workers 3 --timeout 120
+    ;;
+  worker)
+    python manage.py drain_email_outbox &
+    mailer=$!
+    python manage.py reindex_rulebook_terms --watch &
+    indexer=$!
+    stopping=
+    trap 'stopping=1; kill -TERM "$mailer" "$indexer" 2>/dev/null' TERM INT
+    # if either job dies, stop the other and exit so the platform restarts us
+    while kill -0 "$mailer" 2>/dev/null && kill -0 "$indexer" 2>/dev/null; do
+      sleep 5
+    done
+    kill -TERM "$mailer" "$indexer" 2>/dev/null || true
+    wait || true
+    [ -n "$stopping" ] && exit 0
+    exit 1
+    ;;
+  *)
+    echo "start.sh: unknown PROCESS_TYPE '${PROCESS_TYPE}' (expected web or worker)" >&2
+    exit 64
+    ;;
+esac